@@ -23,15 +23,20 @@ from rest_framework import routers
 from rest_framework import serializers
 from rest_framework import viewsets
 
+from clearcode import codec
 from clearcode.models import CDitem
 
 
 class CDitemContentFieldSerializer(serializers.Field):
     """
     Custom Field Serializer used to translate between Django ORM binary field and
-    base64-encoded string
+    base64-encoded string. The content is always served gzipped, whatever the
+    codec used to store it.
     """
     def to_representation(self, obj):
+        gzip_codec = codec.get_codec(codec.GzipCodec.name)
+        if obj and not gzip_codec.is_compressed(obj):
+            obj = gzip_codec.compress(codec.decompress(obj))
         return base64.b64encode(obj).decode('utf-8')
 
     def to_internal_value(self, data):
@@ -35,6 +35,8 @@ import click
 from packageurl import PackageURL
 import requests
 
+from minecode.http_client import get_http_client
+
 
 """
 ClearlyDefined utlities.
@@ -330,29 +332,28 @@ def get_coordinates(data_dir):
             yield pth, Coordinate.from_path(cdpth)
 
 
-def _get_response_content(url, retries=2, wait=2, session=requests, verbose=False, _retries=set()):
+def _get_response(url, retries=2, wait=2, session=None, verbose=False, headers=None, _retries=set()):
     """
-    Return a tuple of (etag, md5, content bytes) with the content as bytes or as decoded
-    text if `as_text` is True) of the response of a GET HTTP request at `url`.
-    On HTTP errors (500 or higher), retry up to `retries` time after waiting
-    `wait` seconds.
+    Return the response of a GET HTTP request at `url` sent with optional
+    `headers` mapping. The response status is either 200 or 304 "Not Modified"
+    for conditional requests. On HTTP errors (500 or higher), retry up to
+    `retries` time after waiting `wait` seconds. Use the shared HttpClient
+    unless a `session` is provided.
     """
     if verbose:
         click.echo('  --> Fetching: {url}'.format(**locals()))
 
-    response = session.get(url, timeout=600)
+    session = session or get_http_client()
+    response = session.get(url, timeout=600, headers=headers)
     status_code = response.status_code
 
-    if status_code == requests.codes.ok:  # NOQA
+    if status_code in (requests.codes.ok, requests.codes.not_modified):  # NOQA
         # handle the case where the API returns an empty file and we need
         # to restart from an earlier continuation
         if url in _retries:
             _retries.remove(url)
             print(' SUCCESS after Failure to fetch:', url)
-        etag = response.headers.get('etag')
-        content = response.content
-        checksum = md5(content).hexdigest()
-        return etag, checksum, response.content
+        return response
 
     error_code = requests.codes.get(status_code) or ''
 
@@ -362,35 +363,49 @@ def _get_response_content(url, retries=2, wait=2, session=requests, verbose=Fals
         print(' Failure to fetch:', url, 'with', status_code, error_code, 'retrying after waiting:', wait, 'seconds.')
         _retries.add(url)
         time.sleep(wait)
-        return _get_response_content(
-            url=url, retries=retries, wait=wait, session=session, verbose=verbose)
+        return _get_response(
+            url=url, retries=retries, wait=wait, session=session, verbose=verbose, headers=headers)
 
     # all other errors
     raise Exception('Failed HTTP request for {url} : error: {status_code} : {error_code}'.format(**locals()))
 
 
-def get_response_content(url, retries=2, wait=4, session=requests, verbose=False):
+def get_response(url, retries=2, wait=4, session=None, verbose=False, headers=None):
     """
-    Return the bytes of the response of a GET HTTP request at `url`, an md5 checksum and the URL etag.
+    Return the response of a GET HTTP request at `url` sent with optional
+    `headers` mapping.
     On failures, retry up to `retries` time after waiting `wait` seconds.
     """
     try:
-        return _get_response_content(
+        return _get_response(
                 url=url, retries=retries, wait=wait,
-                session=session, verbose=verbose)
+                session=session, verbose=verbose, headers=headers)
     except Exception as e:
         if retries:
             print(' Failure to fetch:', url, 'with error:', e, 'and retrying after waiting:', wait, 'seconds.')
             # we sleep progressively more after each failure and up to wait seconds
             time.sleep(int(wait / (retries or 1)))
             retries -= 1
-            return get_response_content(
+            return get_response(
                 url=url, retries=retries, wait=wait,
-                session=session, verbose=verbose)
+                session=session, verbose=verbose, headers=headers)
         else:
             raise
 
 
+def get_response_content(url, retries=2, wait=4, session=None, verbose=False):
+    """
+    Return a tuple of (etag, md5, content bytes) of the response of a GET HTTP
+    request at `url`.
+    On failures, retry up to `retries` time after waiting `wait` seconds.
+    """
+    response = get_response(
+        url=url, retries=retries, wait=wait, session=session, verbose=verbose)
+    content = response.content
+    checksum = md5(content).hexdigest()
+    return response.headers.get('etag'), checksum, content
+
+
 def split_url(url):
     """
     Given a URL, return a tuple of URL elements where `query` is a mapping.
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+#
+# ClearCode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/nexB/clearcode-toolkit/ for support and download.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Codecs to compress and decompress the JSON content of CDitems.
+
+Each codec is identified by the "magic" bytes that start all the blobs it
+compresses: blobs compressed with different codecs can coexist in the
+database and are decompressed with the right codec. Rows can therefore be
+recompressed lazily with another codec.
+
+The zstd codec compresses the content of a CDitem with the latest
+CDitemDictionary trained for its coordinate type (such as npm or maven) if
+any. The id of the dictionary is stored in the zstd frame header and is used
+to fetch the dictionary needed to decompress a blob.
+"""
+
+import gzip
+import json
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class UnknownCodecError(Exception):
+    pass
+
+
+def get_coordinate_type(path):
+    """
+    Return the coordinate type of a CDitem `path` such as npm or maven.
+
+    For example:
+    >>> get_coordinate_type('npm/npmjs/-/async/revision/0.2.10.json')
+    'npm'
+    """
+    return path.partition('/')[0]
+
+
+def to_bytes(content):
+    """
+    Return `content` as bytes where `content` is either bytes, a string or a
+    JSON-serializable data structure.
+    """
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, str):
+        return content.encode('utf-8')
+    return json.dumps(content, separators=(',', ':')).encode('utf-8')
+
+
+class Codec:
+    """
+    Base class for CDitem content codecs.
+    """
+    # name of this codec
+    name = None
+    # bytes that start any blob compressed with this codec
+    magic = None
+
+    def compress(self, content, coordinate_type=None):
+        """
+        Return a blob of `content` bytes compressed for a CDitem of
+        `coordinate_type`.
+        """
+        raise NotImplementedError
+
+    def decompress(self, blob):
+        """
+        Return the uncompressed bytes of a `blob`.
+        """
+        raise NotImplementedError
+
+    def is_compressed(self, blob):
+        """
+        Return True if `blob` was compressed with this codec.
+        """
+        return bytes(blob[:len(self.magic)]) == self.magic
+
+
+class GzipCodec(Codec):
+    name = 'gzip'
+    magic = b'\x1f\x8b'
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compress(self, content, coordinate_type=None):
+        # use a fixed modification time such that the same content is always
+        # compressed to the same blob
+        return gzip.compress(content, compresslevel=self.level, mtime=0)
+
+    def decompress(self, blob):
+        return gzip.decompress(blob)
+
+
+def check_zstandard():
+    """
+    Raise an UnknownCodecError if the optional zstandard package is not
+    installed.
+    """
+    if not zstandard:
+        raise UnknownCodecError('The zstd codec requires the zstandard package.')
+
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+    magic = b'\x28\xb5\x2f\xfd'
+
+    def __init__(self, level=3):
+        self.level = level
+        # zstd compressors and decompressors must not be shared across threads
+        self._local = threading.local()
+
+    def get_compressor(self, dictionary=None):
+        """
+        Return a cached ZstdCompressor using an optional `dictionary`.
+        """
+        compressors = self._local.__dict__.setdefault('compressors', {})
+        dict_id = dictionary.dict_id() if dictionary else 0
+        compressor = compressors.get(dict_id)
+        if not compressor:
+            kwargs = dict(dict_data=dictionary) if dictionary else {}
+            compressor = compressors[dict_id] = zstandard.ZstdCompressor(
+                level=self.level,
+                **kwargs,
+            )
+        return compressor
+
+    def get_decompressor(self, dictionary=None):
+        """
+        Return a cached ZstdDecompressor using an optional `dictionary`.
+        """
+        decompressors = self._local.__dict__.setdefault('decompressors', {})
+        dict_id = dictionary.dict_id() if dictionary else 0
+        decompressor = decompressors.get(dict_id)
+        if not decompressor:
+            kwargs = dict(dict_data=dictionary) if dictionary else {}
+            decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(**kwargs)
+        return decompressor
+
+    def compress(self, content, coordinate_type=None):
+        check_zstandard()
+        dictionary = None
+        if coordinate_type:
+            dictionary = get_latest_dictionary(coordinate_type)
+        return self.get_compressor(dictionary).compress(content)
+
+    def decompress(self, blob):
+        check_zstandard()
+        blob = bytes(blob)
+        dict_id = zstandard.get_frame_parameters(blob).dict_id
+        dictionary = get_dictionary(dict_id) if dict_id else None
+        return self.get_decompressor(dictionary).decompress(blob)
+
+
+CODECS = {
+    codec.name: codec
+    for codec in (GzipCodec(), ZstdCodec())
+}
+
+
+# default size in bytes of the trained zstd dictionaries
+DICTIONARY_SIZE = 112 * 1024
+
+# cache of zstd dictionaries by dict id
+_dictionaries_by_id = {}
+
+# cache of the latest zstd dictionary by coordinate type or None if there is
+# no dictionary for a type
+_latest_dictionaries_by_type = {}
+
+
+def get_dictionary(dict_id):
+    """
+    Return a ZstdCompressionDict from the CDitemDictionary with `dict_id`.
+    """
+    dictionary = _dictionaries_by_id.get(dict_id)
+    if not dictionary:
+        from clearcode.models import CDitemDictionary
+
+        cditem_dictionary = CDitemDictionary.objects.get(dict_id=dict_id)
+        dictionary = cache_dictionary(cditem_dictionary)
+    return dictionary
+
+
+def get_latest_dictionary(coordinate_type):
+    """
+    Return a ZstdCompressionDict from the latest CDitemDictionary trained for
+    `coordinate_type` or None. The dictionaries are cached for the life of a
+    process: long running processes need to be restarted to use newly
+    trained dictionaries.
+    """
+    if coordinate_type in _latest_dictionaries_by_type:
+        return _latest_dictionaries_by_type[coordinate_type]
+
+    from clearcode.models import CDitemDictionary
+
+    dictionary = None
+    cditem_dictionary = CDitemDictionary.objects.latest_for_type(coordinate_type)
+    if cditem_dictionary:
+        dictionary = cache_dictionary(cditem_dictionary)
+    _latest_dictionaries_by_type[coordinate_type] = dictionary
+    return dictionary
+
+
+def cache_dictionary(cditem_dictionary):
+    """
+    Cache and return a ZstdCompressionDict built from a `cditem_dictionary`
+    CDitemDictionary.
+    """
+    dictionary = zstandard.ZstdCompressionDict(bytes(cditem_dictionary.data))
+    _dictionaries_by_id[cditem_dictionary.dict_id] = dictionary
+    return dictionary
+
+
+def train_dictionary(coordinate_type, samples, dict_size=DICTIONARY_SIZE):
+    """
+    Train, save and return a new CDitemDictionary for `coordinate_type` from a
+    list of `samples` uncompressed content bytes. This dictionary is used to
+    compress the content of CDitems of this type from now on.
+    """
+    from clearcode.models import CDitemDictionary
+
+    check_zstandard()
+    dictionary = zstandard.train_dictionary(dict_size, samples)
+    cditem_dictionary = CDitemDictionary.objects.create(
+        coordinate_type=coordinate_type,
+        dict_id=dictionary.dict_id(),
+        data=dictionary.as_bytes(),
+    )
+    _dictionaries_by_id[cditem_dictionary.dict_id] = dictionary
+    _latest_dictionaries_by_type[coordinate_type] = dictionary
+    return cditem_dictionary
+
+
+def clear_dictionaries_cache():
+    _dictionaries_by_id.clear()
+    _latest_dictionaries_by_type.clear()
+
+
+def get_codec(name=None):
+    """
+    Return the codec with `name` or the codec set in the CLEARCODE_CONTENT_CODEC
+    setting if `name` is not provided. Raise an UnknownCodecError if this codec
+    is not available.
+    """
+    if not name:
+        from django.conf import settings
+        name = getattr(settings, 'CLEARCODE_CONTENT_CODEC', None) or GzipCodec.name
+
+    codec = CODECS.get(name)
+    if not codec:
+        raise UnknownCodecError(f'Unknown CDitem content codec: {name!r}')
+    if codec.name == ZstdCodec.name:
+        check_zstandard()
+    return codec
+
+
+def get_blob_codec(blob):
+    """
+    Return the codec that compressed a `blob`. Raise an UnknownCodecError if
+    there is no such codec.
+    """
+    for codec in CODECS.values():
+        if codec.is_compressed(blob):
+            return codec
+    raise UnknownCodecError(f'Unknown CDitem content codec for: {bytes(blob[:4])!r}')
+
+
+def compress(content, coordinate_type=None, codec_name=None):
+    """
+    Return a blob of `content` compressed for a CDitem of `coordinate_type`
+    with the codec named `codec_name` or the default codec. `content` is
+    either bytes, a string or a JSON-serializable data structure.
+    """
+    return get_codec(codec_name).compress(to_bytes(content), coordinate_type)
+
+
+def decompress(blob):
+    """
+    Return the uncompressed bytes of a CDitem content `blob` compressed with any
+    codec.
+    """
+    if not blob:
+        return b''
+    return get_blob_codec(blob).decompress(blob)
@@ -0,0 +1,215 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import logging
+import sys
+import uuid
+
+from django.core.management.base import CommandError
+
+from clearcode import codec
+from clearcode.models import CDitem
+from minecode.management.commands import VerboseCommand
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout)
+logger.setLevel(logging.INFO)
+
+
+def get_coordinate_types():
+    """
+    Return a sorted list of the coordinate types of all the CDitems.
+    """
+    paths = CDitem.objects.values_list('path', flat=True).iterator()
+    return sorted({codec.get_coordinate_type(path) for path in paths})
+
+
+def get_sample_cditems(coordinate_type, samples_count):
+    """
+    Return a list of up to `samples_count` CDitems of `coordinate_type` picked
+    at random.
+
+    The uuids of CDitems are random: the CDitems with the uuids that follow a
+    random uuid are a random sample read from the uuid index, rather than
+    sorting the whole table randomly.
+    """
+    cditems = (
+        CDitem.objects
+        .filter(path__startswith=f'{coordinate_type}/')
+        .order_by('uuid')
+        .only('content')
+    )
+    start = uuid.uuid4()
+    sample = list(cditems.filter(uuid__gte=start)[:samples_count])
+    if len(sample) < samples_count:
+        # wrap around to the start of the index
+        sample.extend(cditems.filter(uuid__lt=start)[:samples_count - len(sample)])
+    return sample
+
+
+def train_dictionaries(coordinate_types, samples_count, dict_size):
+    """
+    Train a new zstd dictionary for each of `coordinate_types` using the content
+    of up to `samples_count` CDitems of this type as samples.
+    """
+    for coordinate_type in coordinate_types:
+        cditems = get_sample_cditems(coordinate_type, samples_count)
+        samples = [codec.decompress(cditem.content) for cditem in cditems]
+        samples = [sample for sample in samples if sample]
+        if not samples:
+            continue
+        try:
+            dictionary = codec.train_dictionary(coordinate_type, samples, dict_size)
+        except Exception as e:
+            logger.error(f'Cannot train dictionary for {coordinate_type}: {e}')
+            continue
+        logger.info(
+            f'Trained dictionary {dictionary.dict_id} for {coordinate_type} '
+            f'from {len(samples)} samples.'
+        )
+
+
+def recompress(codec_name, batch_size, limit=0, start_after=None):
+    """
+    Recompress the content of the CDitems with the codec named `codec_name`
+    updating CDitems in batches of `batch_size`. CDitems are processed in path
+    order starting after the `start_after` path if provided. Only process up to
+    `limit` CDitems if `limit` is provided. Return a tuple of (count of CDitems
+    recompressed, total compressed size before, total compressed size after,
+    path of the last CDitem processed or None).
+    """
+    target = codec.get_codec(codec_name)
+    cditems = CDitem.objects.only('path', 'content').order_by('path')
+    if start_after:
+        cditems = cditems.filter(path__gt=start_after)
+    if limit:
+        cditems = cditems[:limit]
+
+    count = size_before = size_after = 0
+    batch = []
+    last_path = None
+    for cditem in cditems.iterator(chunk_size=batch_size):
+        last_path = cditem.path
+        content = bytes(cditem.content)
+        if not content:
+            continue
+        uncompressed = codec.decompress(content)
+        recompressed = target.compress(uncompressed, cditem.coordinate_type)
+        # Keep the current content when recompressing does not reduce its size
+        if len(recompressed) >= len(content):
+            continue
+        cditem.content = recompressed
+        batch.append(cditem)
+        count += 1
+        size_before += len(content)
+        size_after += len(recompressed)
+        if len(batch) >= batch_size:
+            # bulk_update does not update the last_modified_date: the
+            # actual content is unchanged
+            CDitem.objects.bulk_update(batch, fields=['content'])
+            batch = []
+
+    if batch:
+        CDitem.objects.bulk_update(batch, fields=['content'])
+    return count, size_before, size_after, last_path
+
+
+class Command(VerboseCommand):
+    help = """
+    Recompress the content of the CDitems with a codec, optionally training
+    new zstd dictionaries for each coordinate type first. CDitems compressed
+    with any codec can be read anytime, such that this command can be run
+    progressively using the --limit option and resumed from the last processed
+    path using the --start-after option.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--codec',
+            dest='codec',
+            default=None,
+            type=str,
+            help='Recompress the CDitems content with this codec: one of '
+                 f'{", ".join(codec.CODECS)}. Default to the '
+                 'CLEARCODE_CONTENT_CODEC setting.')
+        parser.add_argument(
+            '--train',
+            action='store_true',
+            dest='train',
+            default=False,
+            help='Train a new zstd dictionary for each coordinate type before '
+                 'recompressing.')
+        parser.add_argument(
+            '--coordinate-type',
+            dest='coordinate_types',
+            action='append',
+            default=[],
+            help='Train a dictionary for this coordinate type such as npm. '
+                 'Can be repeated. Default to all the coordinate types.')
+        parser.add_argument(
+            '--samples',
+            dest='samples',
+            default=2000,
+            type=int,
+            help='Number of CDitems used as samples to train each dictionary.')
+        parser.add_argument(
+            '--size',
+            dest='size',
+            default=codec.DICTIONARY_SIZE,
+            type=int,
+            help='Size in bytes of each trained dictionary.')
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            default=1000,
+            type=int,
+            help='Number of CDitems updated at once.')
+        parser.add_argument(
+            '--limit',
+            dest='limit',
+            default=0,
+            type=int,
+            help='Recompress the content of at most this number of CDitems.')
+        parser.add_argument(
+            '--start-after',
+            dest='start_after',
+            default=None,
+            type=str,
+            help='Only recompress the content of the CDitems with a path '
+                 'after this path, such as the last path of a previous run.')
+
+    def handle(self, *args, **options):
+        logger.setLevel(self.get_verbosity(**options))
+
+        try:
+            target = codec.get_codec(options['codec'])
+        except codec.UnknownCodecError as e:
+            raise CommandError(str(e))
+
+        if options['train']:
+            if target.name != codec.ZstdCodec.name:
+                raise CommandError('Dictionaries can only be trained for the zstd codec.')
+            coordinate_types = options['coordinate_types'] or get_coordinate_types()
+            train_dictionaries(coordinate_types, options['samples'], options['size'])
+
+        count, size_before, size_after, last_path = recompress(
+            codec_name=target.name,
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+            start_after=options['start_after'],
+        )
+        self.stdout.write(
+            f'Recompressed {count} CDitems with {target.name}: '
+            f'{size_before} bytes to {size_after} bytes.'
+        )
+        if options['limit'] and last_path:
+            self.stdout.write(f'Last processed path: {last_path}')
+            logger.info(f'Resume with: --start-after {last_path!r}')
@@ -53,7 +53,7 @@ class Command(VerboseCommand):
             dest='processes',
             default=1,
             type=int,
-            help='Set the number of parallel processes to use. '
+            help='Set the number of threads used to fetch harvests concurrently. '
                  'Disable parallel processing if 0.')
         parser.add_argument(
             '--max-def',
@@ -73,6 +73,13 @@ class Command(VerboseCommand):
             type=str,
             help='Path to a file where to log fetched paths, one per line. '
                  'Log entries will be appended to this file if it exists.')
+        parser.add_argument(
+            '--cache-file',
+            dest='cache_file',
+            default=None,
+            type=str,
+            help='Path to a JSON file where to save and load the etags and '
+                 'checksums cache across restarts.')
         parser.add_argument(
             '--verbose',
             dest='verbose',
@@ -89,6 +96,7 @@ class Command(VerboseCommand):
         log_file = options.get('log_file')
         max_def = options.get('max_def')
         only_definitions = options.get('only_definitions')
+        cache_file = options.get('cache_file')
         verbose = options.get('verbose')
 
         sync(
@@ -101,5 +109,6 @@ class Command(VerboseCommand):
             log_file=log_file,
             max_def=max_def,
             only_definitions=only_definitions,
+            cache_file=cache_file,
             verbose=verbose
         )
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clearcode', '0003_cditem_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CDitemDictionary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coordinate_type', models.CharField(db_index=True, help_text='Coordinate type of the CDitems used to train this dictionary such as npm or maven.', max_length=50)),
+                ('dict_id', models.PositiveBigIntegerField(help_text='Id of this dictionary as stored in the zstd frame header of the content compressed with this dictionary.', unique=True)),
+                ('data', models.BinaryField(help_text='Actual zstd dictionary data.')),
+                ('created_date', models.DateTimeField(auto_now_add=True, help_text='Date and time that this dictionary was trained.')),
+            ],
+            options={
+                'verbose_name_plural': 'CDitem dictionaries',
+            },
+        ),
+        migrations.AlterField(
+            model_name='cditem',
+            name='content',
+            field=models.BinaryField(help_text='Actual compressed JSON content.'),
+        ),
+    ]
@@ -17,12 +17,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import gzip
 import json
 import uuid
 
 from django.db import models
 
+from clearcode import codec
+
 
 class VirtualFileStore:
     """
@@ -90,8 +91,9 @@ class CDitemQuerySet(models.QuerySet):
 class CDitem(models.Model):
     """
     A simple key/value pair model where the key is the path to a JSON file as
-    stored in ClearlyDefined blob storage and the value is a GZipped compressed
-    JSON file content, stored as a binary bytes blob.
+    stored in ClearlyDefined blob storage and the value is a compressed JSON
+    file content, stored as a binary bytes blob. The content is compressed with
+    one of the clearcode.codec codecs: gzip or zstd.
     """
     path = models.CharField(primary_key=True, max_length=2048,
         help_text='Path to the original file in the ClearlyDefined file storage.'
@@ -104,7 +106,7 @@ class CDitem(models.Model):
     )
 
     content = models.BinaryField(
-        help_text='Actual gzipped JSON content.'
+        help_text='Actual compressed JSON content.'
     )
 
     last_modified_date = models.DateTimeField(
@@ -133,7 +135,57 @@ class CDitem(models.Model):
         """
         Return the data content deserialized from the content field.
         """
-        uncompressed_content = gzip.decompress(self.content)
+        uncompressed_content = codec.decompress(self.content)
         if not uncompressed_content:
             uncompressed_content = '{}'
         return json.loads(uncompressed_content)
+
+    @property
+    def coordinate_type(self):
+        return codec.get_coordinate_type(self.path)
+
+
+class CDitemDictionaryQuerySet(models.QuerySet):
+    def latest_for_type(self, coordinate_type):
+        """
+        Return the latest CDitemDictionary trained for `coordinate_type` or None.
+        """
+        return self.filter(coordinate_type=coordinate_type).order_by('-created_date', '-id').first()
+
+
+class CDitemDictionary(models.Model):
+    """
+    A zstd compression dictionary trained on the content of the CDitems of a
+    coordinate type. CDitems content compressed with a dictionary can only be
+    decompressed with this same dictionary: dictionaries must never be deleted
+    while there are CDitems compressed with them.
+    """
+    coordinate_type = models.CharField(
+        max_length=50,
+        db_index=True,
+        help_text='Coordinate type of the CDitems used to train this dictionary '
+                  'such as npm or maven.',
+    )
+
+    dict_id = models.PositiveBigIntegerField(
+        unique=True,
+        help_text='Id of this dictionary as stored in the zstd frame header of '
+                  'the content compressed with this dictionary.',
+    )
+
+    data = models.BinaryField(
+        help_text='Actual zstd dictionary data.'
+    )
+
+    created_date = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time that this dictionary was trained.',
+    )
+
+    objects = CDitemDictionaryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'CDitem dictionaries'
+
+    def __str__(self):
+        return f'{self.coordinate_type}: {self.dict_id}'
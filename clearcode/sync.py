@@ -17,12 +17,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import gzip
+from hashlib import md5
 import json
-from multiprocessing import pool
 import os
 from os import path
+import threading
 import time
 
 import click
@@ -30,6 +33,7 @@ from django.utils import timezone
 import requests
 
 from clearcode import cdutils
+from minecode.http_client import HttpClient
 
 
 """
@@ -82,13 +86,22 @@ known_types = (
 )
 
 
-# each process gets its own session
-session = requests.Session()
+def get_session(pool_size=10):
+    """
+    Return an HttpClient that keeps up to `pool_size` connections open to
+    each host, to be shared by as many threads. Failed requests are retried by
+    cdutils.get_response() and not by the client.
+    """
+    return HttpClient(max_connections_per_host=pool_size, retries=0)
+
+
+# default session shared by all the fetches of a process
+session = get_session()
 
 
 def fetch_and_save_latest_definitions(
         base_api_url, cache, output_dir=None, save_to_db=False,
-        by_latest=True, retries=2, verbose=True):
+        by_latest=True, retries=2, session=session, verbose=True):
     """
     Fetch ClearlyDefined definitions and paginate through. Save these as blobs
     to data_dir.
@@ -103,7 +116,9 @@ def fetch_and_save_latest_definitions(
     if by_latest:
         definitions_url = cdutils.update_url(definitions_url, qs_mapping=dict(sort='releaseDate', sortDesc='true'))
 
-    for content in fetch_definitions(api_url=definitions_url, cache=cache, retries=retries, verbose=TRACE):
+    definitions_batches = fetch_definitions(
+        api_url=definitions_url, cache=cache, retries=retries, session=session, verbose=TRACE)
+    for content in definitions_batches:
         # content is a batch of 100 definitions
         definitions = content and content.get('data')
         if not definitions:
@@ -134,7 +149,7 @@ def fetch_and_save_latest_definitions(
             yield coordinate, blob_path
 
 
-def fetch_definitions(api_url, cache, retries=1, verbose=True):
+def fetch_definitions(api_url, cache, retries=1, session=session, verbose=True):
     """
     Yield batches of definitions each as a list of mappings from calling the
     ClearlyDefined API at `api_url`. Retry on failure up to `retries` times.
@@ -223,13 +238,20 @@ def db_saver(content, blob_path, **kwargs):
     configured DB. Return the length of the written payload or 0 if it existed
     and was not update.
     """
+    from clearcode import codec
     from clearcode import models
 
-    compressed = compress(content)
+    content = codec.to_bytes(content)
+    compressed = codec.compress(content, codec.get_coordinate_type(blob_path))
 
-    cditem, created = models.CDitem.objects.get_or_create(path=blob_path)
+    cditem, created = models.CDitem.objects.get_or_create(
+        path=blob_path, defaults=dict(content=compressed))
     if not created:
-        if cditem.content != compressed and cditem.last_modified_date < timezone.now():
+        # Compare the uncompressed content: the same content may have been
+        # compressed with another codec or dictionary. Updated items are
+        # recompressed with the current codec.
+        existing = codec.decompress(cditem.content)
+        if existing != content and cditem.last_modified_date < timezone.now():
             cditem.content = compressed
             cditem.save()
             if TRACE:
@@ -268,18 +290,21 @@ def save_harvest(
 
 def fetch_and_save_harvests(
         coordinate, cache, output_dir=None, save_to_db=False, retries=2,
-        session=session, verbose=True):
+        session=session, base_api_url=None, verbose=True):
     """
     Fetch all the harvests for `coordinate` Coordinate object and save them in
     `outputdir` using blob-style paths, one file for each harvest/scan.
+    Use the ClearlyDefined API at `base_api_url` if provided.
 
     (Note: Return a tuple of (etag, md5, url) for usage as a callback)
     """
     assert output_dir or save_to_db, 'You must select one of the --output-dir or --save-to-db options.'
 
-    url = coordinate.get_harvests_api_url()
-    etag, checksum, content = cache.get_content(
+    url = coordinate.get_harvests_api_url(base_api_url=base_api_url)
+    fetched = cache.get_content(
         url, retries=retries, session=session, with_cache_keys=True)
+    # nothing is returned if the content is unchanged or already fetched
+    etag, checksum, content = fetched or (None, None, None)
 
     if content:
         savers = []
@@ -309,74 +334,108 @@ def fetch_and_save_harvests(
 
 class Cache(object):
     """
-    A caching object for etags and checksums to avoid refetching things.
+    A least recently used caching object for etags, last modified dates and
+    checksums to avoid refetching things. Fetches are conditional GET requests
+    using the cached etag and last modified date of a URL, such that unchanged
+    content costs a single round-trip and is not transferred.
+
+    The cache can be shared by threads and saved to and loaded from a JSON file
+    to be reused across restarts.
     """
 
     def __init__(self, max_size=100 * 1000):
-        self.etags_cache = {}
-        self.checksums_cache = {}
+        # {url: etag}
+        self.etags_cache = OrderedDict()
+        # {url: last modified date as an HTTP date string}
+        self.modified_cache = OrderedDict()
+        # {checksum: url}
+        self.checksums_cache = OrderedDict()
         self.max_size = max_size
+        self.lock = threading.RLock()
 
-    def is_unchanged_remotely(self, url, session=session):
+    def get_conditional_headers(self, url):
         """
-        Return True if a `url` content is unchanged from cache based on HTTP
-        HEADER Etag.
+        Return a mapping of conditional request headers for `url` based on the
+        cached etag and last modified date.
         """
-        try:
-            response = session.head(url)
-            remote_etag = response.headers.get('etag')
-            if remote_etag and self.etags_cache.get(url) == remote_etag:
-                return True
-        except:
-            return False
+        headers = {}
+        with self.lock:
+            etag = self.etags_cache.get(url)
+            if etag:
+                headers['If-None-Match'] = etag
+                self.etags_cache.move_to_end(url)
+            last_modified = self.modified_cache.get(url)
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+                self.modified_cache.move_to_end(url)
+        return headers
 
     def is_fetched(self, checksum, url):
         """
         Return True if the content checksum exists for url, using MD5 checksum.
         """
-        return url and checksum and self.checksums_cache.get(checksum) == url
-
-    def add(self, etag, checksum, url):
-        if etag:
-            self.etags_cache[url] = etag
-        if checksum:
-            self.checksums_cache[checksum] = url
+        if not (url and checksum):
+            return False
+        with self.lock:
+            if self.checksums_cache.get(checksum) == url:
+                self.checksums_cache.move_to_end(checksum)
+                return True
+        return False
+
+    def add(self, etag, checksum, url, last_modified=None):
+        with self.lock:
+            if etag:
+                self.etags_cache[url] = etag
+                self.etags_cache.move_to_end(url)
+            if last_modified:
+                self.modified_cache[url] = last_modified
+                self.modified_cache.move_to_end(url)
+            if checksum:
+                self.checksums_cache[checksum] = url
+                self.checksums_cache.move_to_end(checksum)
 
     def add_args(self, args):
         self.add(*args)
 
     def trim(self):
         """
-        Trim the cache to its max size.
+        Trim the cache to its max size evicting the least recently used items.
         """
 
         def _resize(cache):
             extra_items = len(cache) - self.max_size
-            if extra_items > 0:
-                for ei in list(cache)[:extra_items]:
-                    del cache[ei]
+            for _ in range(max(extra_items, 0)):
+                cache.popitem(last=False)
 
-        _resize(self.etags_cache)
-        _resize(self.checksums_cache)
+        with self.lock:
+            _resize(self.etags_cache)
+            _resize(self.modified_cache)
+            _resize(self.checksums_cache)
 
     def get_content(self, url, retries=1, session=session, with_cache_keys=False):
         """
         Return fetched content as bytes or None if already fetched or unchanged.
         Updates the cache as needed.
         """
-        if self.is_unchanged_remotely(url=url, session=session):
+        response = cdutils.get_response(
+            url,
+            retries=retries,
+            session=session,
+            headers=self.get_conditional_headers(url),
+        )
+        if response.status_code == requests.codes.not_modified:  # NOQA
             return
 
-        etag, checksum, content = cdutils.get_response_content(
-            url, retries=retries, session=session)
-
+        content = response.content
         if not content:
             return
 
+        checksum = md5(content).hexdigest()
         if self.is_fetched(checksum, url):
             return
 
-        self.add(etag, checksum, url)
+        etag = response.headers.get('etag')
+        self.add(etag, checksum, url, response.headers.get('last-modified'))
 
         if with_cache_keys:
             return etag, checksum, content
@@ -388,25 +447,67 @@ class Cache(object):
         Return a deep copy of self
         """
         cache = Cache(self.max_size)
-        cache.checksums_cache = dict(self.checksums_cache)
-        cache.etags_cache = dict(self.etags_cache)
+        with self.lock:
+            cache.checksums_cache = OrderedDict(self.checksums_cache)
+            cache.etags_cache = OrderedDict(self.etags_cache)
+            cache.modified_cache = OrderedDict(self.modified_cache)
+        return cache
+
+    def save(self, location):
+        """
+        Save the trimmed cache as JSON to the file at `location`.
+        """
+        self.trim()
+        with self.lock:
+            data = dict(
+                etags=list(self.etags_cache.items()),
+                modified=list(self.modified_cache.items()),
+                checksums=list(self.checksums_cache.items()),
+            )
+        temp_location = location + '.tmp'
+        with open(temp_location, 'w') as cache_file:
+            json.dump(data, cache_file)
+        os.replace(temp_location, location)
+
+    @classmethod
+    def load(cls, location, max_size=100 * 1000):
+        """
+        Return a new Cache loaded from the JSON file at `location` if it exists.
+        """
+        cache = cls(max_size=max_size)
+        if not path.exists(location):
+            return cache
+        with open(location) as cache_file:
+            data = json.load(cache_file)
+        cache.etags_cache = OrderedDict(data.get('etags', []))
+        cache.modified_cache = OrderedDict(data.get('modified', []))
+        cache.checksums_cache = OrderedDict(data.get('checksums', []))
+        cache.trim()
         return cache
 
 
 def sync(output_dir=None, save_to_db=False,
         base_api_url='https://api.clearlydefined.io',
         wait=60, processes=1, unsorted=False,
-        log_file=None, max_def=0, only_definitions=False, session=session,
-        verbose=False, *arg, **kwargs):
+        log_file=None, max_def=0, only_definitions=False, session=None,
+        cache_file=None, verbose=False, *arg, **kwargs):
     """
     Fetch the latest definitions and harvests from ClearlyDefined and save these
     as gzipped JSON either as as files in output-dir or in a PostgreSQL
     database. Loop forever after waiting some seconds between each cycles.
+
+    Harvests are fetched concurrently by `processes` threads sharing the
+    connections of `session`. The etags and checksums cache is saved to and
+    loaded from `cache_file` if provided.
     """
     assert output_dir or save_to_db, 'You must select at least one of the --output-dir or --save-to-db options.'
 
     fetch_harvests = not only_definitions
 
+    if not session:
+        # one connection per fetcher thread and one for the definitions
+        session = get_session(pool_size=max(processes, 0) + 1)
+
     cycles = 0
     total_defs_count = 0
     total_duration = 0
@@ -414,7 +515,10 @@ def sync(output_dir=None, save_to_db=False,
     coordinate = None
     file_path = None
 
-    cache = Cache(max_size=100 * 1000)
+    if cache_file:
+        cache = Cache.load(cache_file, max_size=100 * 1000)
+    else:
+        cache = Cache(max_size=100 * 1000)
 
     sleeping = False
     harvest_fetchers = None
@@ -424,8 +528,8 @@ def sync(output_dir=None, save_to_db=False,
         log_file_fn = open(log_file, 'a')
 
     try:
-        if fetch_harvests:
-            harvest_fetchers = pool.Pool(processes=processes, maxtasksperchild=10000)
+        if fetch_harvests and processes:
+            harvest_fetchers = ThreadPoolExecutor(max_workers=processes)
 
         # loop forever. Complete one loop once we have fetched all the latest
         # items and we are not getting new pages (based on etag)
@@ -452,6 +556,7 @@ def sync(output_dir=None, save_to_db=False,
                     save_to_db=save_to_db,
                     cache=cache,
                     by_latest=not unsorted,
+                    session=session,
                     verbose=verbose)
 
                 for coordinate, file_path in definitions:
@@ -464,20 +569,20 @@ def sync(output_dir=None, save_to_db=False,
                     if TRACE: print('  Saved def for:', coordinate)
 
                     if fetch_harvests:
+                        # the cache is shared by the fetcher threads
                         kwds = dict(
                             coordinate=coordinate,
                             output_dir=output_dir,
                             save_to_db=save_to_db,
-                            # that's a copy of the cache, since we are in some
-                            # subprocess, the data is best not shared to avoid
-                            # any sync issue
-                            cache=cache.copy(),
+                            cache=cache,
+                            session=session,
+                            base_api_url=base_api_url,
                             verbose=verbose)
 
-                        harvest_fetchers.apply_async(
-                            fetch_and_save_harvests,
-                            kwds=kwds,
-                            callback=cache.add_args)
+                        if harvest_fetchers:
+                            harvest_fetchers.submit(fetch_and_save_harvests, **kwds)
+                        else:
+                            fetch_and_save_harvests(**kwds)
 
                     if max_def and max_def <= cycle_defs_count:
                         break
@@ -490,8 +595,10 @@ def sync(output_dir=None, save_to_db=False,
             total_duration += cycle_duration
 
             if not sleeping:
+                rate = cycle_defs_count / cycle_duration if cycle_duration else 0
                 print('Saved', cycle_defs_count, 'defs and harvests,',
-                      'in:', int(cycle_duration), 'sec.')
+                      'in:', int(cycle_duration), 'sec.',
+                      f'({rate:.1f} defs/sec)')
 
                 print('TOTAL cycles:', cycles,
                       'with:', total_defs_count, 'defs and combined harvests,',
@@ -503,6 +610,8 @@ def sync(output_dir=None, save_to_db=False,
                 print('.', end='')
 
             sleeping = True
+            if cache_file:
+                cache.save(cache_file)
             time.sleep(wait)
             cache.trim()
 
@@ -515,8 +624,10 @@ def sync(output_dir=None, save_to_db=False,
             log_file_fn.close()
 
         if harvest_fetchers:
-            harvest_fetchers.close()
-            harvest_fetchers.terminate()
+            harvest_fetchers.shutdown(cancel_futures=True)
+
+        if cache_file:
+            cache.save(cache_file)
 
         print('TOTAL cycles:', cycles,
               'with:', total_defs_count, 'defs and combined harvests,',
@@ -551,7 +662,7 @@ def sync(output_dir=None, save_to_db=False,
 @click.option('-n', '--processes',
     type=int, metavar='INT',
     default=1, show_default=True,
-    help='Set the number of parallel processes to use. '
+    help='Set the number of threads used to fetch harvests concurrently. '
          'Disable parallel processing if 0.')
 
 @click.option('--max-def',
@@ -568,6 +679,11 @@ def sync(output_dir=None, save_to_db=False,
     help='Path to a file where to log fetched paths, one per line. '
          'Log entries will be appended to this file if it exists.')
 
+@click.option('--cache-file',
+    type=click.Path(), default=None,
+    help='Path to a JSON file where to save and load the etags and checksums '
+         'cache across restarts.')
+
 @click.option('--verbose',
     is_flag=True,
     help='Display more verbose progress messages.')
@@ -576,8 +692,8 @@ def sync(output_dir=None, save_to_db=False,
 def cli(output_dir=None, save_to_db=False,
         base_api_url='https://api.clearlydefined.io',
         wait=60, processes=1, unsorted=False,
-        log_file=None, max_def=0, only_definitions=False, session=session,
-        verbose=False, *arg, **kwargs):
+        log_file=None, max_def=0, only_definitions=False, session=None,
+        cache_file=None, verbose=False, *arg, **kwargs):
     """
     Fetch the latest definitions and harvests from ClearlyDefined and save these
     as gzipped JSON either as as files in output-dir or in a PostgreSQL
@@ -594,6 +710,7 @@ def cli(output_dir=None, save_to_db=False,
         max_def=max_def,
         only_definitions=only_definitions,
         session=session,
+        cache_file=cache_file,
         verbose=verbose,
         *arg,
         **kwargs,
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+#
+# ClearCode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/nexB/clearcode-toolkit/ for support and download.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+from io import StringIO
+import json
+from unittest import mock
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import override_settings
+
+from clearcode import codec
+from clearcode.management.commands.clearcompress import get_sample_cditems
+from clearcode.models import CDitem
+from clearcode.models import CDitemDictionary
+
+
+def get_samples(count=200):
+    return [
+        json.dumps({
+            'coordinates': {'type': 'npm', 'provider': 'npmjs', 'name': f'package-{i}', 'revision': f'1.0.{i}'},
+            'licensed': {'declared': 'MIT', 'facets': {'core': {'files': i, 'attribution': {'unknown': i}}}},
+            'described': {'releaseDate': '2020-01-01', 'urls': {'registry': f'https://npmjs.com/package/package-{i}'}},
+        }).encode('utf-8')
+        for i in range(count)
+    ]
+
+
+class CodecTestCase(TestCase):
+    def tearDown(self):
+        codec.clear_dictionaries_cache()
+
+    def test_gzip_codec_round_trip_is_stable(self):
+        content = {'test': 'content'}
+        blob = codec.compress(content, codec_name='gzip')
+        self.assertEqual(blob, codec.compress(content, codec_name='gzip'))
+        self.assertEqual(b'{"test":"content"}', codec.decompress(blob))
+
+    def test_decompress_legacy_gzip_content(self):
+        content = json.dumps({'test': 'content'}).encode('utf-8')
+        blob = gzip.compress(content, compresslevel=9)
+        self.assertEqual(content, codec.decompress(blob))
+        self.assertEqual(codec.GzipCodec.name, codec.get_blob_codec(blob).name)
+
+    def test_decompress_unknown_content(self):
+        with self.assertRaises(codec.UnknownCodecError):
+            codec.decompress(b'{"test": "content"}')
+
+    def test_get_codec_unknown(self):
+        with self.assertRaises(codec.UnknownCodecError):
+            codec.get_codec('lzma')
+
+    def test_zstd_codec_without_zstandard(self):
+        zstd_blob = codec.ZstdCodec.magic + b'\x00' * 8
+        with mock.patch('clearcode.codec.zstandard', None):
+            with self.assertRaises(codec.UnknownCodecError):
+                codec.get_codec('zstd')
+            with self.assertRaises(codec.UnknownCodecError):
+                codec.decompress(zstd_blob)
+            with self.assertRaises(codec.UnknownCodecError):
+                codec.ZstdCodec().compress(b'content')
+            with self.assertRaises(codec.UnknownCodecError):
+                codec.train_dictionary('npm', [b'content'])
+
+    @override_settings(CLEARCODE_CONTENT_CODEC='gzip')
+    def test_get_codec_default(self):
+        self.assertEqual(codec.GzipCodec.name, codec.get_codec().name)
+
+    @skipIf(not codec.zstandard, 'zstandard is not installed')
+    def test_zstd_codec_with_dictionary(self):
+        samples = get_samples()
+        self.assertIsNone(codec.get_latest_dictionary('npm'))
+        no_dict_blob = codec.compress(samples[0], 'npm', codec_name='zstd')
+
+        # the dictionary cache is updated when training
+        dictionary = codec.train_dictionary('npm', samples, dict_size=4096)
+        self.assertEqual(dictionary.dict_id, codec.get_latest_dictionary('npm').dict_id())
+
+        blob = codec.compress(samples[0], 'npm', codec_name='zstd')
+        self.assertTrue(len(blob) < len(no_dict_blob))
+        self.assertEqual(codec.ZstdCodec.name, codec.get_blob_codec(blob).name)
+
+        # decompressing loads the dictionary from the database
+        codec.clear_dictionaries_cache()
+        self.assertEqual(samples[0], codec.decompress(blob))
+        self.assertEqual(samples[0], codec.decompress(no_dict_blob))
+
+        # other coordinate types do not use this dictionary
+        blob = codec.compress(samples[0], 'maven', codec_name='zstd')
+        self.assertEqual(no_dict_blob, blob)
+
+    @skipIf(not codec.zstandard, 'zstandard is not installed')
+    def test_cditems_compressed_with_different_codecs(self):
+        samples = get_samples(count=2)
+        gzip_item = CDitem.objects.create(
+            path='npm/npmjs/-/package-0/revision/1.0.0.json',
+            content=codec.compress(samples[0], 'npm', codec_name='gzip'),
+        )
+        zstd_item = CDitem.objects.create(
+            path='npm/npmjs/-/package-1/revision/1.0.1.json',
+            content=codec.compress(samples[1], 'npm', codec_name='zstd'),
+        )
+        self.assertEqual(json.loads(samples[0]), gzip_item.data)
+        self.assertEqual(json.loads(samples[1]), zstd_item.data)
+
+
+@skipIf(not codec.zstandard, 'zstandard is not installed')
+class ClearCompressCommandTestCase(TestCase):
+    def tearDown(self):
+        codec.clear_dictionaries_cache()
+
+    def test_clearcompress_train_and_recompress(self):
+        for i, sample in enumerate(get_samples()):
+            CDitem.objects.create(
+                path=f'npm/npmjs/-/package-{i}/revision/1.0.{i}.json',
+                content=gzip.compress(sample, compresslevel=9),
+            )
+        dates = dict(CDitem.objects.values_list('path', 'last_modified_date'))
+
+        call_command('clearcompress', codec='zstd', train=True, size=4096, verbosity=0)
+
+        self.assertEqual(1, CDitemDictionary.objects.filter(coordinate_type='npm').count())
+        for cditem in CDitem.objects.all():
+            self.assertEqual(codec.ZstdCodec.name, codec.get_blob_codec(cditem.content).name)
+            self.assertEqual(dates[cditem.path], cditem.last_modified_date)
+            self.assertIn('coordinates', cditem.data)
+
+    def test_clearcompress_recompresses_progressively(self):
+        for i, sample in enumerate(get_samples(count=5)):
+            CDitem.objects.create(
+                path=f'npm/npmjs/-/package-{i}/revision/1.0.{i}.json',
+                content=gzip.compress(sample, compresslevel=0),
+            )
+        paths = sorted(CDitem.objects.values_list('path', flat=True))
+
+        def get_codecs():
+            return [
+                codec.get_blob_codec(CDitem.objects.get(path=path).content).name
+                for path in paths
+            ]
+
+        stdout = StringIO()
+        call_command('clearcompress', codec='zstd', limit=2, stdout=stdout, verbosity=0)
+        self.assertIn(f'Last processed path: {paths[1]}', stdout.getvalue())
+        self.assertEqual(['zstd', 'zstd', 'gzip', 'gzip', 'gzip'], get_codecs())
+
+        call_command('clearcompress', codec='zstd', limit=2, start_after=paths[1], verbosity=0)
+        self.assertEqual(['zstd', 'zstd', 'zstd', 'zstd', 'gzip'], get_codecs())
+
+    def test_get_sample_cditems(self):
+        for i, sample in enumerate(get_samples(count=5)):
+            CDitem.objects.create(path=f'npm/npmjs/-/package-{i}/revision/1.0.{i}.json', content=sample)
+        CDitem.objects.create(path='maven/mavencentral/foo/bar/revision/1.0.json', content=b'{}')
+        self.assertEqual(3, len(get_sample_cditems('npm', 3)))
+        sample = get_sample_cditems('npm', 10)
+        self.assertEqual(5, len(sample))
+        self.assertTrue(all(cditem.path.startswith('npm/') for cditem in sample))
@@ -18,13 +18,22 @@
 # limitations under the License.
 
 import gzip
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 import json
+import os
+import tempfile
+import threading
 
 from django.test import TestCase
 from django.utils import timezone
 
 from clearcode.models import CDitem
+from clearcode.sync import Cache
 from clearcode.sync import db_saver
+from clearcode.sync import fetch_and_save_harvests
+from clearcode.sync import fetch_and_save_latest_definitions
+from clearcode.sync import get_session
 
 
 class SyncDbsaverTestCase(TestCase):
@@ -44,3 +53,160 @@ class SyncDbsaverTestCase(TestCase):
     def test_db_saver_different_path(self):
         db_saver(content=self.test_content, blob_path='new/blob/path.json')
         self.assertEqual(2, len(CDitem.objects.all()))
+
+    def test_db_saver_does_not_update_identical_content(self):
+        content = {'test': 'new content'}
+        db_saver(content=content, blob_path=self.test_path)
+        cditem = CDitem.objects.get(path=self.test_path)
+        self.assertEqual(content, cditem.data)
+
+        last_modified_date = cditem.last_modified_date
+        self.assertEqual(0, db_saver(content=content, blob_path=self.test_path))
+        cditem.refresh_from_db()
+        self.assertEqual(last_modified_date, cditem.last_modified_date)
+
+    def test_db_saver_saves_content_of_new_cditem(self):
+        db_saver(content=self.test_content, blob_path='new/blob/path.json')
+        cditem = CDitem.objects.get(path='new/blob/path.json')
+        self.assertEqual(self.test_content, cditem.data)
+
+
+class ClearlyDefinedStandInHandler(BaseHTTPRequestHandler):
+    """
+    Serve a minimal ClearlyDefined API with etags and conditional GET support.
+    """
+    definitions = [
+        {'coordinates': {'type': 'npm', 'provider': 'npmjs', 'name': f'package-{i}', 'revision': '1.0.0'}}
+        for i in range(3)
+    ]
+    harvest = {'scancode': {'3.0.0': {'content': {'files': []}}}}
+    last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+    def do_GET(self):
+        self.server.requests.append((self.command, self.path, dict(self.headers)))
+        if self.path.startswith('/definitions'):
+            data = dict(data=self.definitions, continuationToken='')
+        elif self.path.startswith('/harvest/'):
+            data = self.harvest
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        etag = f'"{hash(self.path)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        content = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.last_modified)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class SyncFetchTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ClearlyDefinedStandInHandler)
+        cls.server.requests = []
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_api_url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.session = get_session(pool_size=2)
+
+    def test_cache_get_content_uses_conditional_get(self):
+        cache = Cache()
+        url = self.base_api_url + '/definitions'
+        content = cache.get_content(url, session=self.session)
+        self.assertEqual(3, len(json.loads(content)['data']))
+
+        self.assertIsNone(cache.get_content(url, session=self.session))
+        methods = [method for method, _path, _headers in self.server.requests]
+        self.assertEqual(['GET', 'GET'], methods)
+        _method, _path, headers = self.server.requests[-1]
+        self.assertEqual(cache.etags_cache[url], headers['If-None-Match'])
+        self.assertEqual(
+            ClearlyDefinedStandInHandler.last_modified, headers['If-Modified-Since'])
+
+    def test_cache_trim_evicts_least_recently_used(self):
+        cache = Cache(max_size=2)
+        cache.add('"1"', 'md5-1', 'http://a')
+        cache.add('"2"', 'md5-2', 'http://b')
+        # use the oldest entry
+        cache.get_conditional_headers('http://a')
+        cache.add('"3"', 'md5-3', 'http://c')
+        cache.trim()
+        self.assertEqual(['http://a', 'http://c'], list(cache.etags_cache))
+
+    def test_cache_save_and_load(self):
+        cache = Cache()
+        cache.add('"1"', 'md5-1', 'http://a', 'Wed, 21 Oct 2015 07:28:00 GMT')
+        location = os.path.join(tempfile.mkdtemp(), 'cache.json')
+        cache.save(location)
+
+        loaded = Cache.load(location)
+        self.assertEqual(cache.etags_cache, loaded.etags_cache)
+        self.assertEqual(cache.modified_cache, loaded.modified_cache)
+        self.assertEqual(cache.checksums_cache, loaded.checksums_cache)
+        self.assertEqual({}, Cache.load(location + '.missing').etags_cache)
+
+    def test_fetch_and_save_definitions_and_harvests(self):
+        cache = Cache()
+        definitions = list(fetch_and_save_latest_definitions(
+            base_api_url=self.base_api_url,
+            cache=cache,
+            save_to_db=True,
+            session=self.session,
+            verbose=False,
+        ))
+        self.assertEqual(3, len(definitions))
+
+        for coordinate, _blob_path in definitions:
+            fetch_and_save_harvests(
+                coordinate=coordinate,
+                cache=cache,
+                save_to_db=True,
+                session=self.session,
+                base_api_url=self.base_api_url,
+                verbose=False,
+            )
+        # fetching unchanged harvests again does not fail nor save anything
+        coordinate, _blob_path = definitions[0]
+        etag, checksum, url = fetch_and_save_harvests(
+            coordinate=coordinate,
+            cache=cache,
+            save_to_db=True,
+            session=self.session,
+            base_api_url=self.base_api_url,
+            verbose=False,
+        )
+        self.assertIsNone(etag)
+
+        paths = sorted(CDitem.objects.values_list('path', flat=True))
+        expected = [
+            'npm/npmjs/-/package-0/revision/1.0.0.json',
+            'npm/npmjs/-/package-0/revision/1.0.0/tool/scancode/3.0.0.json',
+            'npm/npmjs/-/package-1/revision/1.0.0.json',
+            'npm/npmjs/-/package-1/revision/1.0.0/tool/scancode/3.0.0.json',
+            'npm/npmjs/-/package-2/revision/1.0.0.json',
+            'npm/npmjs/-/package-2/revision/1.0.0/tool/scancode/3.0.0.json',
+        ]
+        self.assertEqual(expected, paths)
+        self.assertTrue(all(method == 'GET' for method, _path, _headers in self.server.requests))
@@ -40,20 +40,6 @@ def get_resource_license_expressions(file_data):
     return '\n'.join(expressions)
 
 
-def get_resource_copyright_statements(file_data):
-    """
-    Return a string that contains all the copyright statements (deduped), with a newline
-    separating each or None if there are no copyright statements in the scan data.
-    """
-    copyrights = file_data.get('copyrights', []) or []
-    if copyrights == []:
-        return
-
-    statements = set(list(copyright.get('value') for copyright in copyrights))
-
-    return '\n'.join(statements)
-
-
 def create_from_harvest(package_scan={}, files_data=[], cditem_path=''):
     """
     Return a Package object, created or updated via a ScanCode-Toolkit "package" scan.
@@ -86,6 +72,9 @@ def create_from_harvest(package_scan={}, files_data=[], cditem_path=''):
     )
 
     package_data = {field_name: package_scan.get(field_name) for field_name in fields}
+    # ScanCode-Toolkit harvests use the older names of the license fields
+    package_data['declared_license_expression'] = package_data.pop('license_expression')
+    package_data['extracted_license_statement'] = package_data.pop('declared_license')
 
     stringify_null_purl_fields(package_data)
 
@@ -143,33 +132,61 @@ def create_from_harvest(package_scan={}, files_data=[], cditem_path=''):
             logger.info('Created package from scancode harvest: {}'.format(package))
 
     # Now, add resources to the Package.
-    for f in files_data:
-        path = f.get('path')
-        is_file = f.get('type', '') == 'file'
-        copyright = get_resource_copyright_statements(f)
-        license_expression = get_resource_license_expressions(f)
-        file_data = dict(
-            package=package,
-            path=path,
-            size=f.get('size'),
-            sha1=f.get('sha1'),
-            md5=f.get('md5'),
-            sha256=f.get('sha256'),
-            git_sha1=f.get('git_sha1'),
-            is_file=is_file,
-            copyright=copyright,
-            license_expression=license_expression,
-        )
-
-        # Ensure there will be no `path` collision
-        try:
-            Resource.objects.get(package=package, path=path)
-        except Resource.DoesNotExist:
-            Resource.objects.create(**file_data)
+    create_resources_from_harvest(package, files_data)
 
     return package
 
 
+# number of Resources inserted at once
+RESOURCE_BATCH_SIZE = 1000
+
+
+def build_resource(package, file_data):
+    """
+    Return a new unsaved Resource of `package` from a ScanCode-Toolkit scan
+    `file_data` mapping.
+    """
+    return Resource(
+        package=package,
+        path=file_data.get('path'),
+        size=file_data.get('size'),
+        sha1=file_data.get('sha1'),
+        md5=file_data.get('md5'),
+        sha256=file_data.get('sha256'),
+        git_sha1=file_data.get('git_sha1'),
+        is_file=file_data.get('type', '') == 'file',
+        copyrights=file_data.get('copyrights', []) or [],
+        detected_license_expression=get_resource_license_expressions(file_data) or '',
+    )
+
+
+def create_resources_from_harvest(package, files_data, batch_size=RESOURCE_BATCH_SIZE):
+    """
+    Create the Resources of `package` from a `files_data` list of ScanCode-Toolkit
+    scan file mappings using bulk inserts of `batch_size` rows. Resources with
+    a path that already exists for `package` are not created. Return the
+    number of Resources to create.
+
+    Resources created concurrently for the same path, such as by another
+    worker process mapping a harvest of the same package, are ignored.
+    """
+    # Ensure there will be no `path` collision
+    existing_paths = set(
+        Resource.objects.filter(package=package).values_list('path', flat=True)
+    )
+
+    resources = []
+    for file_data in files_data:
+        path = file_data.get('path')
+        if path in existing_paths:
+            continue
+        existing_paths.add(path)
+        resources.append(build_resource(package, file_data))
+
+    Resource.objects.bulk_create(resources, batch_size=batch_size, ignore_conflicts=True)
+    return len(resources)
+
+
 def map_scancode_harvest(cditem):
     """
     Return the number of created or merged Packages from a scancode harvest and create
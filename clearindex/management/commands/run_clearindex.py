@@ -7,11 +7,14 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from concurrent.futures import ProcessPoolExecutor
 import logging
+import multiprocessing
 import signal
 import sys
 import time
 
+import django
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
 from django.db.utils import OperationalError
@@ -99,15 +102,54 @@ class Command(VerboseCommand):
             action='store_true',
             help='Do not loop forever. Exit when the queue is empty.')
 
+        parser.add_argument(
+            '--processes',
+            dest='processes',
+            default=1,
+            type=int,
+            help='Number of worker processes used to map CDitems. '
+                 'Default to 1 to map in the current process.')
+
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            default=MAP_BATCH_SIZE,
+            type=int,
+            help='Number of definitions and of harvests CDitems mapped at once. '
+                 f'Default to {MAP_BATCH_SIZE}.')
+
     def handle(self, *args, **options):
         """
         Get the next available CDitem and start the processing.
         Loops forever and sleeps a short while if there are no CDitem left to map.
         """
-        global MUST_STOP
-
         logger.setLevel(self.get_verbosity(**options))
         exit_on_empty = options.get('exit_on_empty')
+        processes = options.get('processes') or 1
+        batch_size = options.get('batch_size') or MAP_BATCH_SIZE
+
+        executor = None
+        if processes > 1:
+            # Each worker process has its own Django setup and database
+            # connection and saves the Packages it maps.
+            executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+
+        try:
+            self.map_loop(executor, batch_size, exit_on_empty)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def map_loop(self, executor, batch_size, exit_on_empty):
+        """
+        Map batches of `batch_size` CDitems using the `executor` pool of
+        processes if provided.
+        """
+        global MUST_STOP
 
         sleeping = False
         created_packages_count = 0
@@ -118,8 +160,10 @@ class Command(VerboseCommand):
                 logger.info('Graceful exit of the map loop.')
                 break
 
-            mappable_definitions = CDitem.objects.mappable_definitions()[:MAP_BATCH_SIZE]
-            mappable_scancode_harvests = CDitem.objects.mappable_scancode_harvests()[:MAP_BATCH_SIZE]
+            mappable_definitions = CDitem.objects.mappable_definitions()
+            mappable_definitions = list(mappable_definitions.values_list('pk', flat=True)[:batch_size])
+            mappable_scancode_harvests = CDitem.objects.mappable_scancode_harvests()
+            mappable_scancode_harvests = list(mappable_scancode_harvests.values_list('pk', flat=True)[:batch_size])
 
             try:
                 if not mappable_definitions and not mappable_scancode_harvests:
@@ -137,17 +181,11 @@ class Command(VerboseCommand):
 
                 sleeping = False
 
-                for cditem in mappable_definitions:
-                    package = map_definition(cditem)
-                    if not package:
-                        continue
-                    created_packages_count += 1
-
-                for cditem in mappable_scancode_harvests:
-                    # scancode harvests may contain multiple package entries
-                    package_count = harvest.map_scancode_harvest(cditem)
-                    if isinstance(package_count, int):
-                        created_packages_count += package_count
+                created_packages_count += map_cditems(
+                    definition_pks=mappable_definitions,
+                    harvest_pks=mappable_scancode_harvests,
+                    executor=executor,
+                )
 
             except OperationalError as e:
                 logger.error(e)
@@ -158,6 +196,54 @@ class Command(VerboseCommand):
             logger.info(msg)
 
 
+def map_cditems(definition_pks, harvest_pks, executor=None):
+    """
+    Map the CDitems with a primary key in the `definition_pks` list of CD
+    definitions and in the `harvest_pks` list of scancode harvests. Return the
+    number of processed Packages.
+
+    The CDitems are mapped in the `executor` pool of processes if provided.
+    Otherwise they are mapped one at a time in this process.
+    """
+    if executor:
+        definitions = executor.map(map_definition_of_pk, definition_pks)
+        harvests = executor.map(map_scancode_harvest_of_pk, harvest_pks)
+    else:
+        definitions = map(map_definition_of_pk, definition_pks)
+        harvests = map(map_scancode_harvest_of_pk, harvest_pks)
+
+    # scancode harvests may contain multiple package entries
+    return sum(definitions) + sum(harvests)
+
+
+def map_definition_of_pk(pk):
+    """
+    Map the CD definition of the CDitem with primary key `pk`. Return 1 if a
+    Package was created or updated or 0 otherwise.
+    """
+    cditem = CDitem.objects.get(pk=pk)
+    return 1 if map_definition(cditem) else 0
+
+
+def map_scancode_harvest_of_pk(pk):
+    """
+    Map the scancode harvest of the CDitem with primary key `pk`. Return the
+    number of created or merged Packages or 0 if an Exception has occured.
+    """
+    cditem = CDitem.objects.get(pk=pk)
+    try:
+        package_count = harvest.map_scancode_harvest(cditem)
+    except Exception as e:
+        msg = 'Error: Failed to map while processing CDitem: {}\n'.format(
+            repr(cditem.path))
+        msg += get_error_message(e)
+        logger.error(msg)
+        cditem.map_error = msg
+        cditem.save()
+        return 0
+    return package_count if isinstance(package_count, int) else 0
+
+
 def map_definition(cditem):
     """
     Map a CD definition. Return the Package created from a mapped CD definition
@@ -0,0 +1,109 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from clearcode import codec
+from clearcode.models import CDitem
+from clearindex import harvest
+from packagedb.models import Package
+from packagedb.models import Resource
+
+
+def get_harvest_content(name, paths):
+    """
+    Return the compressed content of a scancode harvest CDitem for a maven
+    Package named `name` with a file for each path of `paths`.
+    """
+    data = {
+        'content': {
+            'files': [
+                {'path': path, 'type': 'file', 'size': 10, 'sha1': '0' * 40}
+                for path in paths
+            ],
+            'summary': {
+                'packages': [
+                    {
+                        'type': 'maven',
+                        'namespace': 'org.example',
+                        'name': name,
+                        'version': '1.0',
+                        'download_url': f'https://repo1.maven.org/maven2/org/example/{name}/1.0/{name}-1.0.jar',
+                    }
+                ]
+            },
+        }
+    }
+    return codec.compress(json.dumps(data).encode('utf-8'), 'maven', codec_name='gzip')
+
+
+def create_harvest_cditem(name, paths):
+    return CDitem.objects.create(
+        path=f'maven/mavencentral/org.example/{name}/revision/1.0/tool/scancode/3.2.2.json',
+        content=get_harvest_content(name, paths),
+    )
+
+
+class CreateResourcesFromHarvestTestCase(TestCase):
+
+    def setUp(self):
+        self.package = Package.objects.create(
+            type='maven',
+            namespace='org.example',
+            name='example',
+            version='1.0',
+            download_url='https://repo1.maven.org/maven2/org/example/example/1.0/example-1.0.jar',
+        )
+
+    def get_paths(self):
+        return sorted(self.package.resources.values_list('path', flat=True))
+
+    def test_create_resources_from_harvest_skips_existing_paths(self):
+        Resource.objects.create(package=self.package, path='a.txt', size=1)
+        files_data = [
+            {'path': 'a.txt', 'type': 'file', 'size': 10},
+            {'path': 'b.txt', 'type': 'file', 'size': 10},
+            {'path': 'b.txt', 'type': 'file', 'size': 10},
+            {'path': 'dir', 'type': 'directory'},
+        ]
+        self.assertEqual(2, harvest.create_resources_from_harvest(self.package, files_data))
+        self.assertEqual(['a.txt', 'b.txt', 'dir'], self.get_paths())
+        # existing Resources are not updated
+        self.assertEqual(1, self.package.resources.get(path='a.txt').size)
+        self.assertFalse(self.package.resources.get(path='dir').is_file)
+
+    def test_create_resources_from_harvest_inserts_in_batches(self):
+        files_data = [{'path': f'{i}.txt', 'type': 'file'} for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            created = harvest.create_resources_from_harvest(self.package, files_data, batch_size=2)
+        self.assertEqual(5, created)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(3, len(inserts))
+        self.assertEqual([f'{i}.txt' for i in range(5)], self.get_paths())
+
+    def test_create_resources_from_harvest_ignores_concurrently_created_paths(self):
+        def iter_files_data():
+            yield {'path': 'a.txt', 'type': 'file'}
+            # created by another process after the existing paths are queried
+            Resource.objects.create(package=self.package, path='b.txt', size=1)
+            yield {'path': 'b.txt', 'type': 'file', 'size': 10}
+
+        harvest.create_resources_from_harvest(self.package, iter_files_data())
+        self.assertEqual(['a.txt', 'b.txt'], self.get_paths())
+        self.assertEqual(1, self.package.resources.get(path='b.txt').size)
+
+    def test_map_scancode_harvest(self):
+        cditem = create_harvest_cditem('example', ['a.txt', 'b.txt'])
+        self.assertEqual(1, harvest.map_scancode_harvest(cditem))
+        self.assertIsNotNone(cditem.last_map_date)
+        self.assertEqual(['a.txt', 'b.txt'], self.get_paths())
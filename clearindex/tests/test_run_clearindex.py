@@ -0,0 +1,92 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+
+from clearcode.models import CDitem
+from clearindex.management.commands import run_clearindex
+from clearindex.tests.test_harvest import create_harvest_cditem
+from packagedb.models import Package
+
+
+class InlineExecutor:
+    """
+    An executor mapping in the current process. Worker processes use their
+    own database connections and cannot see the data of a test transaction.
+    """
+
+    def __init__(self, max_workers, **kwargs):
+        self.max_workers = max_workers
+
+    def map(self, func, *iterables):
+        return map(func, *iterables)
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class RunClearindexTestCase(TestCase):
+
+    def test_map_scancode_harvest_of_pk_records_map_error(self):
+        cditem = create_harvest_cditem('example', ['a.txt'])
+        with mock.patch(
+            'clearindex.harvest.map_scancode_harvest',
+            side_effect=IntegrityError('duplicate key value'),
+        ):
+            self.assertEqual(0, run_clearindex.map_scancode_harvest_of_pk(cditem.path))
+        cditem.refresh_from_db()
+        self.assertIn('duplicate key value', cditem.map_error)
+        self.assertIsNone(cditem.last_map_date)
+        self.assertFalse(CDitem.objects.mappable().exists())
+
+    def test_map_cditems_continues_after_a_failed_harvest(self):
+        failed = create_harvest_cditem('failed', ['a.txt'])
+        mapped = create_harvest_cditem('mapped', ['a.txt'])
+        map_scancode_harvest = run_clearindex.harvest.map_scancode_harvest
+
+        def map_or_fail(cditem):
+            if cditem.path == failed.path:
+                raise IntegrityError('duplicate key value')
+            return map_scancode_harvest(cditem)
+
+        with mock.patch('clearindex.harvest.map_scancode_harvest', side_effect=map_or_fail):
+            count = run_clearindex.map_cditems(
+                definition_pks=[],
+                harvest_pks=[failed.path, mapped.path],
+                executor=InlineExecutor(max_workers=2),
+            )
+        self.assertEqual(1, count)
+        self.assertEqual(['mapped'], list(Package.objects.values_list('name', flat=True)))
+
+    def test_run_clearindex_with_processes_and_batch_size(self):
+        for i in range(5):
+            create_harvest_cditem(f'example{i}', ['a.txt', 'b.txt'])
+
+        with mock.patch.object(run_clearindex, 'ProcessPoolExecutor', side_effect=InlineExecutor) as executor, \
+                mock.patch.object(run_clearindex, 'map_cditems', wraps=run_clearindex.map_cditems) as map_cditems:
+            call_command('run_clearindex', exit_on_empty=True, processes=2, batch_size=2, verbosity=0)
+
+        self.assertEqual(2, executor.call_args.kwargs['max_workers'])
+        batch_sizes = [len(call.kwargs['harvest_pks']) for call in map_cditems.call_args_list]
+        self.assertEqual([2, 2, 1], batch_sizes)
+        self.assertFalse(CDitem.objects.mappable().exists())
+        self.assertEqual(5, Package.objects.count())
+        for package in Package.objects.all():
+            self.assertEqual(2, package.resources.count())
+
+    def test_run_clearindex_maps_in_process_by_default(self):
+        create_harvest_cditem('example', ['a.txt'])
+        with mock.patch.object(run_clearindex, 'ProcessPoolExecutor') as executor:
+            call_command('run_clearindex', exit_on_empty=True, verbosity=0)
+        self.assertFalse(executor.called)
+        self.assertEqual(1, Package.objects.count())
@@ -261,19 +261,22 @@ class ExactPackageArchiveIndexViewSet(BaseFileIndexViewSet):
 class BaseDirectoryIndexViewSet(ReadOnlyModelViewSet):
     lookup_field = 'fingerprint'
 
-    @action(detail=False)
-    def match(self, request):
-        fingerprints = request.query_params.getlist('fingerprint')
-        if not fingerprints:
-            return Response()
-
+    def get_match_results(self, fingerprints, exact_directory_match=False):
+        """
+        Return a mapping of {fingerprint: list of match results} for each
+        fingerprint in `fingerprints`.
+        """
         model_class = self.get_serializer().Meta.model
-        results = []
-        unique_fingerprints = set(fingerprints)
-        for fingerprint in unique_fingerprints:
-            matches = model_class.match(fingerprint)
+        matches_by_fingerprint = model_class.match_many(
+            fingerprints,
+            exact_directory_match=exact_directory_match,
+        )
+
+        results_by_fingerprint = {}
+        for fingerprint, matches in matches_by_fingerprint.items():
+            _, bah128 = split_fingerprint(fingerprint)
+            results = []
             for match in matches:
-                _, bah128 = split_fingerprint(fingerprint)
                 # Get fingerprint from the match
                 fp = match.fingerprint()
                 _, match_bah128 = split_fingerprint(fp)
@@ -287,6 +290,21 @@ class BaseDirectoryIndexViewSet(ReadOnlyModelViewSet):
                         'similarity_score': similarity_score,
                     }
                 )
+            results_by_fingerprint[fingerprint] = results
+        return results_by_fingerprint
+
+    @action(detail=False)
+    def match(self, request):
+        fingerprints = request.query_params.getlist('fingerprint')
+        if not fingerprints:
+            return Response()
+
+        results_by_fingerprint = self.get_match_results(fingerprints)
+        results = [
+            result
+            for results in results_by_fingerprint.values()
+            for result in results
+        ]
 
         serialized_match_results = BaseDirectoryIndexMatchSerializer(
             results,
@@ -295,6 +313,44 @@ class BaseDirectoryIndexViewSet(ReadOnlyModelViewSet):
         )
         return Response(serialized_match_results.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk_match(self, request):
+        """
+        Match a list of directory fingerprints at once and return a mapping of
+        match results keyed by fingerprint.
+
+        Example:
+
+            {
+                "fingerprints": [
+                    "00000007af7d63765c78fa516b5353f5ffa7df45",
+                    "00000004d10982208810240820080a6a3e852486"
+                ],
+                "exact_directory_match": false
+            }
+        """
+        if hasattr(request.data, 'getlist'):
+            fingerprints = request.data.getlist('fingerprints')
+        else:
+            fingerprints = request.data.get('fingerprints') or []
+        exact_directory_match = request.data.get('exact_directory_match', False)
+        if isinstance(exact_directory_match, str):
+            exact_directory_match = exact_directory_match.lower() in ('true', '1', 'yes')
+
+        results_by_fingerprint = self.get_match_results(
+            fingerprints,
+            exact_directory_match=bool(exact_directory_match),
+        )
+        serialized_results_by_fingerprint = {
+            fingerprint: BaseDirectoryIndexMatchSerializer(
+                results,
+                context={'request': request},
+                many=True
+            ).data
+            for fingerprint, results in results_by_fingerprint.items()
+        }
+        return Response(serialized_results_by_fingerprint)
+
 
 class ApproximateDirectoryContentIndexViewSet(BaseDirectoryIndexViewSet):
     queryset = ApproximateDirectoryContentIndex.objects.all()
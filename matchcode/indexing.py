@@ -7,17 +7,28 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from itertools import groupby
+from operator import itemgetter
+import binascii
 import logging
 import os
 import sys
+import time
 
 from commoncode.resource import VirtualCodebase
+from django.db import transaction
 
 from matchcode_toolkit.fingerprinting import compute_codebase_directory_fingerprints
+from matchcode_toolkit.fingerprinting import create_halohash_chunks
+from matchcode_toolkit.fingerprinting import hexstring_to_binarray
+from matchcode_toolkit.fingerprinting import split_fingerprint
 from matchcode.models import ApproximateDirectoryContentIndex
 from matchcode.models import ApproximateDirectoryStructureIndex
 from matchcode.models import ExactPackageArchiveIndex
 from matchcode.models import ExactFileIndex
+from matchcode.models import PackageIndexShard
+from packagedb.models import Package
+from packagedb.models import Resource
 
 
 TRACE = False
@@ -63,20 +74,35 @@ def _create_virtual_codebase_from_package_resources(package):
     # TODO: Evolve this into something more elaborate, e.g.
     #       Codebase class methods can manipulate Resource table entries
     package_resources = package.resources.order_by('path')
-    if not package_resources:
-        return
+    rows = package_resources.values_list(*VIRTUAL_CODEBASE_FILE_FIELDS)
+    files = [_build_file(*row) for row in rows]
+    return _create_virtual_codebase_from_files(package, files)
+
+
+# Resource fields used to create a VirtualCodebase
+VIRTUAL_CODEBASE_FILE_FIELDS = ('path', 'size', 'sha1', 'md5', 'is_file')
+
+
+def _build_file(path, size, sha1, md5, is_file):
+    """
+    Return a mapping of scan-like file data from Resource field values.
+    """
+    return {
+        'path': path,
+        'size': size,
+        'sha1': sha1,
+        'md5': md5,
+        'type': 'file' if is_file else 'directory',
+    }
 
-    files = []
-    for resource in package_resources:
-        files.append(
-            {
-                'path': resource.path,
-                'size': resource.size,
-                'sha1': resource.sha1,
-                'md5': resource.md5,
-                'type': resource.type,
-            }
-        )
+
+def _create_virtual_codebase_from_files(package, files):
+    """
+    Return a VirtualCodebase from a list of `files` mappings of `package`
+    Resources sorted by path, or None if there are no `files`.
+    """
+    if not files:
+        return
 
     make_new_root = False
     sample_file_path = files[0].get('path', '')
@@ -152,3 +178,174 @@ def index_package_directories(package):
 
     vc = compute_codebase_directory_fingerprints(vc)
     return index_directory_fingerprints(vc, package)
+
+
+# Index models rebuilt by rebuild_package_indexes
+INDEX_MODELS = (
+    ExactPackageArchiveIndex,
+    ExactFileIndex,
+    ApproximateDirectoryContentIndex,
+    ApproximateDirectoryStructureIndex,
+)
+
+# number of index entries inserted at once
+INDEX_BATCH_SIZE = 1000
+
+
+def build_directory_indexes(codebase, package):
+    """
+    Return a tuple of lists of unsaved ApproximateDirectoryContentIndex and
+    ApproximateDirectoryStructureIndex built from the directory fingerprints of
+    `codebase` for `package`.
+    """
+    adcis = []
+    adsis = []
+    for resource in codebase.walk(topdown=False):
+        directory_content_fingerprint = resource.extra_data.get('directory_content', '')
+        directory_structure_fingerprint = resource.extra_data.get('directory_structure', '')
+
+        if directory_content_fingerprint:
+            adcis.append(
+                _build_directory_index(
+                    ApproximateDirectoryContentIndex,
+                    directory_content_fingerprint,
+                    resource.path,
+                    package,
+                )
+            )
+
+        if directory_structure_fingerprint:
+            adsis.append(
+                _build_directory_index(
+                    ApproximateDirectoryStructureIndex,
+                    directory_structure_fingerprint,
+                    resource.path,
+                    package,
+                )
+            )
+
+    return adcis, adsis
+
+
+def _build_directory_index(model, directory_fingerprint, resource_path, package):
+    indexed_elements_count, fp = split_fingerprint(directory_fingerprint)
+    chunk1, chunk2, chunk3, chunk4 = create_halohash_chunks(fp)
+    return model(
+        indexed_elements_count=indexed_elements_count,
+        chunk1=chunk1,
+        chunk2=chunk2,
+        chunk3=chunk3,
+        chunk4=chunk4,
+        path=resource_path,
+        package=package,
+    )
+
+
+class IndexWriter:
+    """
+    Insert index entries of a model in bulk by batches of `batch_size` and keep
+    track of the count of inserted entries and the time spent to build and
+    insert these.
+    """
+
+    def __init__(self, model, batch_size=INDEX_BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self.batch = []
+        self.count = 0
+        self.duration = 0
+
+    def add(self, entries):
+        self.batch.extend(entries)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.model.objects.bulk_create(self.batch, batch_size=self.batch_size)
+            self.count += len(self.batch)
+            self.batch = []
+
+
+def get_sha1_binarray(sha1):
+    """
+    Return a `sha1` hex string as a bytearray or None if it is not a valid hex
+    string.
+    """
+    try:
+        return hexstring_to_binarray(sha1)
+    except (binascii.Error, ValueError, TypeError):
+        logger.error(f'Invalid SHA1: {sha1!r}')
+
+
+def rebuild_package_indexes(start_id, end_id, batch_size=INDEX_BATCH_SIZE):
+    """
+    Rebuild the ExactPackageArchiveIndex, ExactFileIndex,
+    ApproximateDirectoryContentIndex and ApproximateDirectoryStructureIndex
+    entries of the Packages with an id in the [`start_id`, `end_id`) range,
+    inserting entries in bulk by batches of `batch_size`. Record this range as
+    a completed PackageIndexShard.
+
+    Return a mapping of {index model name: (created count, duration)} where
+    duration is the time in seconds spent to build and insert the entries of
+    this index. The two directory indexes share the same duration as they are
+    computed together.
+    """
+    packages = Package.objects.filter(id__gte=start_id, id__lt=end_id)
+    resources = Resource.objects.filter(package_id__gte=start_id, package_id__lt=end_id)
+    writers = {model: IndexWriter(model, batch_size) for model in INDEX_MODELS}
+
+    with transaction.atomic():
+        for model in INDEX_MODELS:
+            model.objects.filter(package_id__gte=start_id, package_id__lt=end_id).delete()
+
+        writer = writers[ExactPackageArchiveIndex]
+        start = time.perf_counter()
+        for package_id, sha1 in packages.filter(sha1__isnull=False).values_list('id', 'sha1'):
+            sha1 = get_sha1_binarray(sha1)
+            if sha1:
+                writer.add([ExactPackageArchiveIndex(package_id=package_id, sha1=sha1)])
+        writer.flush()
+        writer.duration = time.perf_counter() - start
+
+        writer = writers[ExactFileIndex]
+        start = time.perf_counter()
+        file_sha1s = resources.filter(sha1__isnull=False).order_by().values_list('package_id', 'sha1')
+        # index a SHA1 once for each Package, as done by ExactFileIndex.index()
+        for package_id, sha1 in set(file_sha1s):
+            sha1 = get_sha1_binarray(sha1)
+            if sha1:
+                writer.add([ExactFileIndex(package_id=package_id, sha1=sha1)])
+        writer.flush()
+        writer.duration = time.perf_counter() - start
+
+        adci_writer = writers[ApproximateDirectoryContentIndex]
+        adsi_writer = writers[ApproximateDirectoryStructureIndex]
+        start = time.perf_counter()
+        packages_by_id = packages.only('id', 'name', 'version').in_bulk()
+        rows = resources.order_by('package_id', 'path').values_list('package_id', *VIRTUAL_CODEBASE_FILE_FIELDS)
+        for package_id, package_rows in groupby(rows.iterator(), key=itemgetter(0)):
+            package = packages_by_id[package_id]
+            files = [_build_file(*row[1:]) for row in package_rows]
+            codebase = _create_virtual_codebase_from_files(package, files)
+            codebase = compute_codebase_directory_fingerprints(codebase)
+            adcis, adsis = build_directory_indexes(codebase, package)
+            adci_writer.add(adcis)
+            adsi_writer.add(adsis)
+        adci_writer.flush()
+        adsi_writer.flush()
+        adci_writer.duration = adsi_writer.duration = time.perf_counter() - start
+
+        stats = {
+            model.__name__: (writer.count, writer.duration)
+            for model, writer in writers.items()
+        }
+        PackageIndexShard.objects.update_or_create(
+            start_id=start_id,
+            end_id=end_id,
+            defaults=dict(
+                indexed_counts={name: count for name, (count, _) in stats.items()},
+            ),
+        )
+
+    return stats
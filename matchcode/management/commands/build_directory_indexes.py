@@ -0,0 +1,70 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import logging
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from minecode.management.commands import VerboseCommand
+from matchcode.models import ApproximateDirectoryContentIndex
+from matchcode.models import ApproximateDirectoryStructureIndex
+from matchcode.search import DirectoryFingerprintIndex
+from matchcode.search import get_directory_fingerprint_index_location
+
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout)
+logger.setLevel(logging.INFO)
+
+
+class Command(VerboseCommand):
+    help = (
+        'Build the in-memory directory fingerprint indexes from the '
+        'ApproximateDirectoryContentIndex and ApproximateDirectoryStructureIndex '
+        'tables and save them as memory-mappable files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            dest='directory',
+            default=getattr(settings, 'MATCHCODE_DIRECTORY_INDEX_DIR', ''),
+            help='Directory where to save the index files. '
+                 'Default to the MATCHCODE_DIRECTORY_INDEX_DIR setting.',
+        )
+
+    def handle(self, *args, **options):
+        logger.setLevel(self.get_verbosity(**options))
+        directory = options.get('directory')
+        if not directory:
+            raise CommandError(
+                'An index --directory or a MATCHCODE_DIRECTORY_INDEX_DIR setting is required.'
+            )
+        os.makedirs(directory, exist_ok=True)
+
+        for model in (ApproximateDirectoryContentIndex, ApproximateDirectoryStructureIndex):
+            start = time.time()
+            index = DirectoryFingerprintIndex.from_model(model)
+            location = get_directory_fingerprint_index_location(model, directory)
+            # Write to a temporary file first such that running processes that
+            # memory map the previous index are not affected
+            tmp_location = f'{location}.tmp'
+            index.save(tmp_location)
+            os.replace(tmp_location, location)
+            duration = time.time() - start
+            logger.info(
+                f'Built {model.__name__} index with {len(index)} entries '
+                f'in {duration:.2f} seconds: {location}'
+            )
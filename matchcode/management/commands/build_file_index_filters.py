@@ -0,0 +1,99 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import logging
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from minecode.management.commands import VerboseCommand
+from matchcode.models import ExactFileIndex
+from matchcode.models import ExactPackageArchiveIndex
+from matchcode.search import SHA1BloomFilter
+from matchcode.search import get_sha1_filter_location
+
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout)
+logger.setLevel(logging.INFO)
+
+
+class Command(VerboseCommand):
+    help = (
+        'Build or incrementally update the SHA1 Bloom filters of the '
+        'ExactFileIndex and ExactPackageArchiveIndex tables used to reject '
+        'unknown SHA1 before querying the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            dest='directory',
+            default=getattr(settings, 'MATCHCODE_DIRECTORY_INDEX_DIR', ''),
+            help='Directory where to save the filter files. '
+                 'Default to the MATCHCODE_DIRECTORY_INDEX_DIR setting.',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            dest='rebuild',
+            default=False,
+            help='Rebuild the filters from scratch rather than adding the new rows. '
+                 'Rebuild periodically to add the rows that were committed long '
+                 'after rows with a higher primary key.',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            dest='error_rate',
+            default=0.01,
+            help='False positive rate of rebuilt filters.',
+        )
+
+    def handle(self, *args, **options):
+        logger.setLevel(self.get_verbosity(**options))
+        directory = options.get('directory')
+        if not directory:
+            raise CommandError(
+                'A filter --directory or a MATCHCODE_DIRECTORY_INDEX_DIR setting is required.'
+            )
+        os.makedirs(directory, exist_ok=True)
+
+        for model in (ExactFileIndex, ExactPackageArchiveIndex):
+            start = time.time()
+            location = get_sha1_filter_location(model, directory)
+            rebuild = options['rebuild'] or not os.path.exists(location)
+
+            if not rebuild:
+                sha1_filter = SHA1BloomFilter.load(location, writable=True)
+                added = sha1_filter.update_from_model(model)
+                if sha1_filter.is_full():
+                    logger.info(f'{model.__name__} filter is over capacity: rebuilding')
+                    rebuild = True
+
+            if rebuild:
+                sha1_filter = SHA1BloomFilter.from_model(model, error_rate=options['error_rate'])
+                added = sha1_filter.count
+
+            # Write to a temporary file first such that running processes that
+            # memory map the previous filter are not affected
+            tmp_location = f'{location}.tmp'
+            sha1_filter.save(tmp_location)
+            os.replace(tmp_location, location)
+            duration = time.time() - start
+            logger.info(
+                f'{"Rebuilt" if rebuild else "Updated"} {model.__name__} filter '
+                f'with {added} new entries ({sha1_filter.count} total) '
+                f'in {duration:.2f} seconds: {location}'
+            )
@@ -7,17 +7,27 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
 from datetime import datetime
 import logging
+import multiprocessing
 import sys
 import time
 
+import django
 from django.db import transaction
+from django.db.models import Max
+from django.db.models import Min
 
 from minecode.management.commands import VerboseCommand
+from matchcode.indexing import INDEX_BATCH_SIZE
+from matchcode.indexing import INDEX_MODELS
 from matchcode.indexing import index_package_archives
 from matchcode.indexing import index_package_directories
 from matchcode.indexing import index_package_file
+from matchcode.indexing import rebuild_package_indexes
+from matchcode.models import PackageIndexShard
 from packagedb.models import Package
 from packagedb.models import Resource
 
@@ -29,17 +39,79 @@ logging.basicConfig(stream=sys.stdout)
 logger.setLevel(logging.INFO)
 
 
+# number of Package ids in a shard of a rebuild
+SHARD_SIZE = 1000
+
+
+def get_shards(shard_size=SHARD_SIZE):
+    """
+    Return a list of (start id, end id) ranges of `shard_size` Package ids
+    covering all the Packages. The shards boundaries are multiples of
+    `shard_size` such that they stay the same when Packages are added.
+    """
+    ids = Package.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    min_id = ids['min_id']
+    max_id = ids['max_id']
+    if min_id is None:
+        return []
+    first_start = (min_id // shard_size) * shard_size
+    return [
+        (start, start + shard_size)
+        for start in range(first_start, max_id + 1, shard_size)
+    ]
+
+
 class Command(VerboseCommand):
     help = 'Index all Package SHA1 from PackageDB.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            dest='rebuild',
+            default=False,
+            action='store_true',
+            help='Rebuild the indexes of all the Packages in shards of Package '
+                 'ids, inserting index entries in bulk. An interrupted rebuild '
+                 'resumes from the last completed shard.')
+
+        parser.add_argument(
+            '--processes',
+            dest='processes',
+            default=1,
+            type=int,
+            help='Number of worker processes used to rebuild shards. '
+                 'Default to 1 to rebuild in the current process.')
+
+        parser.add_argument(
+            '--shard-size',
+            dest='shard_size',
+            default=SHARD_SIZE,
+            type=int,
+            help=f'Number of Package ids in a rebuild shard. Default to {SHARD_SIZE}.')
+
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            default=INDEX_BATCH_SIZE,
+            type=int,
+            help='Number of index entries inserted at once during a rebuild. '
+                 f'Default to {INDEX_BATCH_SIZE}.')
+
     def handle(self, *args, **options):
+        logger.setLevel(self.get_verbosity(**options))
+        if options.get('rebuild'):
+            return self.rebuild(
+                processes=options.get('processes') or 1,
+                shard_size=options.get('shard_size') or SHARD_SIZE,
+                batch_size=options.get('batch_size') or INDEX_BATCH_SIZE,
+            )
+
         # Stats to keep track of during indexing
         total_indexed_package_archives = 0
         total_indexed_package_files = 0
         total_indexed_adci = 0
         total_indexed_adsi = 0
 
-        logger.setLevel(self.get_verbosity(**options))
         start = time.time()
 
         packages = Package.objects.filter(sha1__isnull=False)
@@ -71,3 +143,60 @@ class Command(VerboseCommand):
         print('ExactFileIndex: {}'.format(total_indexed_package_files))
         print('ApproximateDirectoryContentIndex: {}'.format(total_indexed_adci))
         print('ApproximateDirectoryStructureIndex: {}'.format(total_indexed_adsi))
+
+    def rebuild(self, processes=1, shard_size=SHARD_SIZE, batch_size=INDEX_BATCH_SIZE):
+        """
+        Rebuild the indexes of all the Packages by shards of `shard_size`
+        Package ids using `processes` worker processes. Skip the shards
+        completed by a previous interrupted rebuild.
+        """
+        start = time.time()
+        shards = get_shards(shard_size)
+        completed = set(PackageIndexShard.objects.values_list('start_id', 'end_id'))
+        pending = [shard for shard in shards if shard not in completed]
+        logger.info(
+            f'Rebuilding indexes: {len(pending)} shards of {shard_size} Package ids '
+            f'to rebuild, {len(shards) - len(pending)} shards already rebuilt.'
+        )
+
+        # {index model name: [created count, duration]}
+        totals = {model.__name__: [0, 0] for model in INDEX_MODELS}
+
+        def add_stats(stats):
+            for name, (count, duration) in stats.items():
+                totals[name][0] += count
+                totals[name][1] += duration
+
+        if processes > 1:
+            # Each worker process has its own Django setup and database
+            # connection and rebuilds the indexes of a shard in a transaction.
+            executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+            try:
+                futures = [
+                    executor.submit(rebuild_package_indexes, start_id, end_id, batch_size)
+                    for start_id, end_id in pending
+                ]
+                for done, future in enumerate(as_completed(futures), 1):
+                    add_stats(future.result())
+                    logger.info(f'Rebuilt {done}/{len(pending)} shards.')
+            finally:
+                executor.shutdown(cancel_futures=True)
+        else:
+            for done, (start_id, end_id) in enumerate(pending, 1):
+                add_stats(rebuild_package_indexes(start_id, end_id, batch_size))
+                logger.info(f'Rebuilt {done}/{len(pending)} shards.')
+
+        # The rebuild is completed: the next rebuild starts from scratch
+        PackageIndexShard.objects.all().delete()
+
+        total_duration = time.time() - start
+        print('Package indexes rebuild completed at: {}'.format(datetime.utcnow().isoformat()))
+        print('Total run duration: {} seconds'.format(int(total_duration)))
+        print('Created:')
+        for name, (count, duration) in totals.items():
+            rate = count / duration if duration else 0
+            print(f'{name}: {count} in {duration:.2f} seconds ({rate:.0f} per second per process)')
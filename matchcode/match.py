@@ -7,10 +7,7 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
-from functools import reduce
-from operator import or_
-
-from django.db.models import Q
+from collections import defaultdict
 
 from matchcode.models import ApproximateDirectoryContentIndex
 from matchcode.models import ApproximateDirectoryStructureIndex
@@ -56,21 +53,26 @@ def package_archive_match(codebase):
 
     Return the number of matches found in `codebase`
     """
-    match_count = 0
-    for resource in codebase.walk(topdown=True):
-        if (resource.is_dir
+    resources = [
+        resource for resource in codebase.walk(topdown=True)
+        if not (resource.is_dir
                 or not resource.is_archive
-                or resource.extra_data.get('matched', False)):
-            continue
+                or resource.extra_data.get('matched', False))
+    ]
+    archive_matches_by_sha1 = ExactPackageArchiveIndex.match_many(
+        [resource.sha1 for resource in resources]
+    )
 
-        archive_matches, match_type = get_archive_match(resource)
+    match_count = 0
+    for resource in resources:
+        archive_matches = archive_matches_by_sha1.get(resource.sha1)
         if not archive_matches:
             continue
 
         match_count += len(archive_matches)
 
         # Tag matched Resource as `matched` as to not analyze it later
-        tag_matched_resources(resource, codebase, archive_matches, match_type)
+        tag_matched_resources(resource, codebase, archive_matches, 'exact-archive')
     return match_count
 
 
@@ -120,17 +122,22 @@ def individual_file_match(codebase):
 
     Return the number of matches found in `codebase`
     """
-    match_count = 0
-    for resource in codebase.walk(topdown=True):
-        if resource.is_dir or resource.extra_data.get('matched', False):
-            continue
+    resources = [
+        resource for resource in codebase.walk(topdown=True)
+        if not (resource.is_dir or resource.extra_data.get('matched', False))
+    ]
+    file_matches_by_sha1 = ExactFileIndex.match_many(
+        [resource.sha1 for resource in resources]
+    )
 
-        file_matches, match_type = get_file_match(resource)
+    match_count = 0
+    for resource in resources:
+        file_matches = file_matches_by_sha1.get(resource.sha1)
         if not file_matches:
             continue
 
         match_count += len(file_matches)
-        tag_matched_resources(resource, codebase, file_matches, match_type)
+        tag_matched_resources(resource, codebase, file_matches, 'exact-file')
     return match_count
 
 
@@ -163,22 +170,6 @@ def get_directory_structure_match(resource):
     return matches, match_type
 
 
-def get_archive_match(resource):
-    """
-    Match an Archive resource to a Package
-    """
-    file_matches = ExactPackageArchiveIndex.match(resource.sha1)
-    return file_matches, 'exact-archive'
-
-
-def get_file_match(resource):
-    """
-    Match an individual file back to the Package it is from
-    """
-    file_matches = ExactFileIndex.match(resource.sha1)
-    return file_matches, 'exact-file'
-
-
 def tag_matched_resource(resource, codebase, purl):
     """
     Set a resource to be flagged as matched, so it will not be considered in
@@ -196,6 +187,10 @@ def tag_matched_resources(resource, codebase, matches, match_type):
     candidates for matching by checking to see if a Resource path from
     `resource` or its children exists in the matched packages in `matches`
     """
+    children = list(resource.walk(codebase))
+    purls_by_child_path = defaultdict(list)
+    resource_paths_by_package_id = {}
+
     for match in matches:
         # Prep matched package data and append to `codebase`
         matched_package_info = match.package.to_dict()
@@ -206,15 +201,36 @@ def tag_matched_resources(resource, codebase, matches, match_type):
         # Tag the Resource where we found a match
         tag_matched_resource(resource, codebase, purl)
 
-        # Find matching package child path for `resource` by creating all possible
-        # path suffixes from `child.path`, chaining them in Q objects (joined
-        # by or), then querying the matched packages resources to see if any of
-        # those suffixes match a package child resource path
-        for child in resource.walk(codebase):
-            query = reduce(or_, (Q(path=suffix) for suffix in path_suffixes(child.path)), Q())
-            matched_child_resources = match.package.resources.filter(query)
-            if len(matched_child_resources) > 0:
-                tag_matched_resource(child, codebase, purl)
+        if not children:
+            continue
+
+        # Load the resource paths of a matched package only once, even if it
+        # is matched multiple times
+        package_id = match.package_id
+        package_resource_paths = resource_paths_by_package_id.get(package_id)
+        if package_resource_paths is None:
+            package_resource_paths = set(
+                match.package.resources.values_list('path', flat=True)
+            )
+            resource_paths_by_package_id[package_id] = package_resource_paths
+
+        # Find matching package child path for `resource` by checking if any
+        # of the path suffixes from `child.path` is a resource path of the
+        # matched package
+        for child in children:
+            if any(suffix in package_resource_paths for suffix in path_suffixes(child.path)):
+                purls_by_child_path[child.path].append(purl)
+
+    # Tag and save each matched child only once for all the matches
+    for child in children:
+        purls = purls_by_child_path.get(child.path)
+        if not purls:
+            continue
+        for purl in purls:
+            if purl not in child.matched_to:
+                child.matched_to.append(purl)
+        child.extra_data['matched'] = True
+        child.save(codebase)
 
 
 def path_suffixes(path):
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchcode', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageIndexShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_id', models.BigIntegerField(help_text='First Package id of this shard.')),
+                ('end_id', models.BigIntegerField(help_text='Package id after the last Package id of this shard.')),
+                ('completed_date', models.DateTimeField(auto_now_add=True, help_text='Date and time when the indexes of this shard were rebuilt.')),
+                ('indexed_counts', models.JSONField(blank=True, default=dict, help_text='Mapping of {index model name: number of entries created} for this shard.')),
+            ],
+            options={
+                'unique_together': {('start_id', 'end_id')},
+            },
+        ),
+    ]
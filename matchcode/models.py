@@ -21,7 +21,6 @@ from minecode.management.commands import get_error_message
 from matchcode_toolkit.fingerprinting import create_halohash_chunks
 from matchcode_toolkit.fingerprinting import hexstring_to_binarray
 from matchcode_toolkit.fingerprinting import split_fingerprint
-from matchcode_toolkit.halohash import byte_hamming_distance
 from packagedb.models import Package
 
 
@@ -108,6 +107,52 @@ class BaseFileIndex(models.Model):
                 logger_debug(cls.__name__, 'match:', 'matched_file:', dct)
         return matches
 
+    @classmethod
+    def match_many(cls, sha1s, use_filter=True, chunk_size=10000):
+        """
+        Return a mapping of {sha1: list of matched BaseFileIndex} for each SHA1
+        string in `sha1s`.
+
+        If `use_filter` is True and a SHA1BloomFilter has been built for this
+        model, the SHA1 that are not in the filter are only looked up in the
+        rows that may be missing from the filter, above its `overlap_pk`. The
+        SHA1 are looked up with one query per batch of `chunk_size`.
+        """
+        from matchcode.search import get_sha1_filter
+
+        sha1s = [sha1 for sha1 in dict.fromkeys(sha1s) if sha1]
+        matches_by_sha1 = {sha1: [] for sha1 in sha1s}
+        sha1_filter = use_filter and get_sha1_filter(cls)
+
+        for start in range(0, len(sha1s), chunk_size):
+            batch = sha1s[start:start + chunk_size]
+            in_filter = batch
+            not_in_filter = []
+            if sha1_filter:
+                in_filter = []
+                for sha1 in batch:
+                    if sha1 in sha1_filter:
+                        in_filter.append(sha1)
+                    else:
+                        not_in_filter.append(sha1)
+
+            if TRACE:
+                logger_debug(cls.__name__, 'match_many:', 'in filter:', len(in_filter), 'of', len(batch))
+
+            query = models.Q()
+            if in_filter:
+                query |= models.Q(sha1__in=[hexstring_to_binarray(sha1) for sha1 in in_filter])
+            if not_in_filter:
+                query |= models.Q(
+                    sha1__in=[hexstring_to_binarray(sha1) for sha1 in not_in_filter],
+                    pk__gt=sha1_filter.overlap_pk,
+                )
+            matches = cls.objects.filter(query).select_related('package').order_by('pk')
+            for match in matches:
+                matches_by_sha1[match.fingerprint()].append(match)
+
+        return matches_by_sha1
+
     def fingerprint(self):
         return binascii.hexlify(self.sha1).decode('utf-8')
 
@@ -283,38 +328,23 @@ class BaseDirectoryIndex(models.Model):
                 dct = model_to_dict(match)
                 logger_debug(cls.__name__, 'match:', 'matched_package:', dct)
 
-        # Step 2: calculate Hamming distance of all matches
-
-        # Store all close matches in a dictionary of querysets
-        matches_by_hamming_distance = defaultdict(cls.objects.none)
-        for match in matches:
-            # Get fingerprint from the match
-            fp = match.fingerprint()
-            _, match_bah128 = split_fingerprint(fp)
-
-            # Perform Hamming distance calculation between the fingerprint we
-            # are looking up and a potential match fingerprint
-            hd = byte_hamming_distance(bah128, match_bah128)
+        # Step 2: calculate Hamming distance of all matches at once, ranked
+        # from lowest Hamming distance to highest Hamming distance
+        from matchcode.search import rank_by_hamming_distance
 
-            # TODO: try other thresholds if this is too restrictive
-            if hd < 8:
-                # Save match to `matches_by_hamming_distance` by adding the matched object to the queryset
-                matches_by_hamming_distance[hd] |= cls.objects.filter(pk=match.pk)
+        candidates = matches.values_list('pk', 'chunk1', 'chunk2', 'chunk3', 'chunk4')
+        # TODO: try other thresholds if this is too restrictive
+        distances, pks = rank_by_hamming_distance(bah128, candidates.iterator())
 
         if TRACE:
-            logger_debug(list(matches_by_hamming_distance.items()))
+            logger_debug(list(zip(distances, pks)))
 
-        # Step 3: order matches from lowest Hamming distance to highest Hamming distance
+        # Step 3: If we have an exact match, return and disregard others,
+        # otherwise return all close matches we have
         # TODO: consider limiting matches for brevity
-        good_matches = cls.objects.none()
-        for hamming_distance, match in sorted(matches_by_hamming_distance.items()):
-            if hamming_distance == 0:
-                # If we have an exact match, return and disregard others
-                good_matches |= match
-                break
-            else:
-                # If we don't have an exact match, add all close matches we have
-                good_matches |= match
+        if len(distances) and distances[0] == 0:
+            pks = [pk for distance, pk in zip(distances, pks) if distance == 0]
+        good_matches = cls.objects.filter(pk__in=[int(pk) for pk in pks])
 
         if TRACE:
             for match in good_matches:
@@ -323,6 +353,120 @@ class BaseDirectoryIndex(models.Model):
 
         return good_matches
 
+    @classmethod
+    def match_many(cls, directory_fingerprints, exact_directory_match=False, chunk_size=1000):
+        """
+        Return a mapping of {directory fingerprint: list of matched
+        BaseDirectoryIndex} for each string in `directory_fingerprints`, where
+        matches are ordered by increasing Hamming distance.
+
+        Fingerprints are matched in batches of `chunk_size`, with one query per
+        batch to fetch the candidate fingerprints. This follows the semantics
+        of `match`: if there are exact matches, only those are returned.
+        """
+        from matchcode.search import MAX_HAMMING_DISTANCE
+        from matchcode.search import chunk_to_int
+        from matchcode.search import get_fingerprint_chunks
+        from matchcode.search import popcount
+
+        fingerprints = [fp for fp in dict.fromkeys(directory_fingerprints) if fp]
+        matches_by_fingerprint = {}
+
+        for start in range(0, len(fingerprints), chunk_size):
+            batch = fingerprints[start:start + chunk_size]
+
+            # Map each fingerprint chunk value to the fingerprints containing
+            # it, for each of the four chunk positions
+            fingerprints_by_chunk = [defaultdict(list) for _ in range(4)]
+            ranges_by_fingerprint = {}
+            chunks_by_fingerprint = {}
+            for fingerprint in batch:
+                indexed_elements_count, chunks = get_fingerprint_chunks(fingerprint)
+                if exact_directory_match:
+                    ranges_by_fingerprint[fingerprint] = (indexed_elements_count, indexed_elements_count)
+                else:
+                    ranges_by_fingerprint[fingerprint] = bah128_ranges(indexed_elements_count)
+                chunks_by_fingerprint[fingerprint] = chunks
+                for position, chunk in enumerate(chunks):
+                    fingerprints_by_chunk[position][chunk].append(fingerprint)
+
+            # Exact matches must have all four chunks in common, so we only
+            # need to look up the first one
+            positions = range(1) if exact_directory_match else range(4)
+            query = models.Q()
+            for position in positions:
+                lookup = f'chunk{position + 1}__in'
+                values = [chunk.to_bytes(4, 'big') for chunk in fingerprints_by_chunk[position]]
+                query |= models.Q(**{lookup: values})
+
+            lowest = min(low for low, _ in ranges_by_fingerprint.values())
+            highest = max(high for _, high in ranges_by_fingerprint.values())
+            candidates = cls.objects.filter(
+                query,
+                indexed_elements_count__range=(lowest, highest),
+            ).values_list(
+                'pk', 'indexed_elements_count', 'chunk1', 'chunk2', 'chunk3', 'chunk4'
+            )
+
+            distances_by_fingerprint = defaultdict(list)
+            for pk, count, *candidate_chunks in candidates.iterator(chunk_size=chunk_size):
+                candidate_chunks = [chunk_to_int(chunk) for chunk in candidate_chunks]
+                seen = set()
+                for position in positions:
+                    chunk = candidate_chunks[position]
+                    for fingerprint in fingerprints_by_chunk[position].get(chunk, []):
+                        if fingerprint in seen:
+                            continue
+                        seen.add(fingerprint)
+                        low, high = ranges_by_fingerprint[fingerprint]
+                        if not low <= count <= high:
+                            continue
+                        hd = sum(
+                            popcount(c1 ^ c2)
+                            for c1, c2 in zip(candidate_chunks, chunks_by_fingerprint[fingerprint])
+                        )
+                        if hd < MAX_HAMMING_DISTANCE:
+                            distances_by_fingerprint[fingerprint].append((hd, pk))
+
+            for fingerprint, distances in distances_by_fingerprint.items():
+                distances.sort()
+                if exact_directory_match or distances[0][0] == 0:
+                    distances = [(hd, pk) for hd, pk in distances if hd == 0]
+                distances_by_fingerprint[fingerprint] = distances
+
+            pks = [pk for distances in distances_by_fingerprint.values() for _, pk in distances]
+            matches_by_pk = cls.objects.select_related('package').in_bulk(pks)
+            for fingerprint in batch:
+                matches_by_fingerprint[fingerprint] = [
+                    matches_by_pk[pk]
+                    for _, pk in distances_by_fingerprint.get(fingerprint, [])
+                    if pk in matches_by_pk
+                ]
+
+        return matches_by_fingerprint
+
+    @classmethod
+    def match_in_memory(cls, directory_fingerprint, exact_directory_match=False):
+        """
+        Return a list of matched BaseDirectoryIndex, ordered by increasing
+        Hamming distance, using the in-memory DirectoryFingerprintIndex of this
+        model rather than querying the fingerprint chunks in the database.
+        """
+        from matchcode.search import get_directory_fingerprint_index
+
+        index = get_directory_fingerprint_index(cls)
+        results = index.search(
+            directory_fingerprint=directory_fingerprint,
+            exact_directory_match=exact_directory_match,
+        )
+        if not results:
+            return []
+
+        matches_by_pk = cls.objects.select_related('package').in_bulk(
+            [pk for _, pk in results]
+        )
+        return [matches_by_pk[pk] for _, pk in results if pk in matches_by_pk]
+
     def get_chunks(self):
         chunk1 = binascii.hexlify(self.chunk1)
         chunk2 = binascii.hexlify(self.chunk2)
@@ -343,3 +487,36 @@ class ApproximateDirectoryStructureIndex(BaseDirectoryIndex):
 
 class ApproximateDirectoryContentIndex(BaseDirectoryIndex):
     pass
+
+
+class PackageIndexShard(models.Model):
+    """
+    A range of Package ids whose matching indexes have been rebuilt. This is
+    used to resume an interrupted rebuild of the indexes: the shards are deleted
+    once a rebuild is completed.
+    """
+    start_id = models.BigIntegerField(
+        help_text='First Package id of this shard.',
+    )
+
+    end_id = models.BigIntegerField(
+        help_text='Package id after the last Package id of this shard.',
+    )
+
+    completed_date = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time when the indexes of this shard were rebuilt.',
+    )
+
+    indexed_counts = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Mapping of {index model name: number of entries created} '
+                  'for this shard.',
+    )
+
+    class Meta:
+        unique_together = ['start_id', 'end_id']
+
+    def __str__(self):
+        return f'{self.start_id}-{self.end_id}'
@@ -0,0 +1,579 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+
+from django.conf import settings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from matchcode_toolkit.fingerprinting import split_fingerprint
+from matchcode.models import bah128_ranges
+
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout)
+logger.setLevel(logging.INFO)
+
+
+# Directory fingerprints with a Hamming distance equal or greater than this are
+# not considered as matches. This is the same threshold used by
+# `BaseDirectoryIndex.match`
+MAX_HAMMING_DISTANCE = 8
+
+DIRECTORY_INDEX_MAGIC = b'MCDIRIDX'
+DIRECTORY_INDEX_HEADER = struct.Struct('<8sQ')
+
+
+def popcount(value):
+    """
+    Return the number of bits set to one in the integer `value`.
+    """
+    return bin(value).count('1')
+
+
+def get_fingerprint_chunks(directory_fingerprint):
+    """
+    Return a tuple of (indexed elements count, chunks) from the string
+    `directory_fingerprint` where chunks is a tuple of the four 32-bit integer
+    chunks of the bah128 fingerprint.
+    """
+    indexed_elements_count, bah128 = split_fingerprint(directory_fingerprint)
+    chunks = tuple(int(bah128[i:i + 8], 16) for i in range(0, 32, 8))
+    return indexed_elements_count, chunks
+
+
+def get_hamming_distances(bah128, fingerprints):
+    """
+    Return a NumPy array of the Hamming distances between the `bah128`
+    fingerprint string and each row of the `fingerprints` NumPy uint32 array of
+    shape (N, 4).
+    """
+    query = numpy.frombuffer(bytes.fromhex(bah128), dtype=numpy.uint32)
+    # The XOR and popcount of each 32-bit word do not depend on the byte order
+    # as long as both sides use the same layout
+    xored = numpy.bitwise_xor(fingerprints, query)
+    if hasattr(numpy, 'bitwise_count'):
+        return numpy.bitwise_count(xored).sum(axis=1, dtype=numpy.uint32)
+    bits = numpy.unpackbits(xored.view(numpy.uint8), axis=1)
+    return bits.sum(axis=1, dtype=numpy.uint32)
+
+
+def rank_by_hamming_distance(bah128, candidates, max_distance=MAX_HAMMING_DISTANCE):
+    """
+    Return a tuple of (distances, pks) sequences for the `candidates` iterable
+    of (pk, chunk1, chunk2, chunk3, chunk4) tuples, with binary chunks as stored
+    in a BaseDirectoryIndex, whose Hamming distance from the `bah128`
+    fingerprint string is lower than `max_distance`. Both sequences are sorted by
+    increasing distance then pk.
+
+    Distances are computed in a single vectorized call when NumPy is available.
+    """
+    if numpy is None:
+        query_chunks = [int(bah128[i:i + 8], 16) for i in range(0, 32, 8)]
+        ranked = []
+        for pk, *chunks in candidates:
+            distance = sum(
+                popcount(chunk_to_int(chunk) ^ query_chunk)
+                for chunk, query_chunk in zip(chunks, query_chunks)
+            )
+            if distance < max_distance:
+                ranked.append((distance, pk))
+        ranked.sort()
+        return [d for d, _ in ranked], [pk for _, pk in ranked]
+
+    pks = []
+    buffer = bytearray()
+    for pk, *chunks in candidates:
+        pks.append(pk)
+        for chunk in chunks:
+            buffer += chunk
+
+    fingerprints = numpy.frombuffer(bytes(buffer), dtype=numpy.uint32).reshape(-1, 4)
+    distances = get_hamming_distances(bah128, fingerprints)
+    pks = numpy.array(pks, dtype=numpy.int64)
+
+    close = distances < max_distance
+    distances = distances[close]
+    pks = pks[close]
+    order = numpy.lexsort((pks, distances))
+    return distances[order], pks[order]
+
+
+def chunk_to_int(chunk):
+    """
+    Return a 32-bit integer from the binary `chunk` stored in a
+    BaseDirectoryIndex chunk field.
+    """
+    return int.from_bytes(bytes(chunk), 'big')
+
+
+class DirectoryFingerprintIndex:
+    """
+    An in-memory multi-index hash over the rows of a BaseDirectoryIndex model,
+    used to find approximate directory matches without querying the database.
+
+    Each directory fingerprint is stored as four 32-bit chunks. Rows are sorted
+    by their indexed elements count and, for each of the four chunks, we keep a
+    sorted array of the chunk values along with the matching row numbers. A
+    lookup is a binary search on each of the four chunk tables restricted to the
+    rows within the indexed elements count range, followed by a popcount scan of
+    the Hamming distance on the candidate rows.
+
+    All the data is kept in flat arrays of integers such that an index can be
+    saved to a file and loaded back as a read-only memory map.
+    """
+
+    def __init__(self, pks, counts, chunks, keys, rows):
+        # Package fingerprint row primary keys, sorted by indexed elements count
+        self.pks = pks
+        # Indexed elements count of each row, sorted
+        self.counts = counts
+        # Four sequences of the 32-bit chunks of each row
+        self.chunks = chunks
+        # Four sequences of sorted chunk values
+        self.keys = keys
+        # Four sequences of row numbers, in the same order as `keys`
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.pks)
+
+    @classmethod
+    def build(cls, entries):
+        """
+        Return a new DirectoryFingerprintIndex built from an iterable of
+        `entries` tuples of (pk, indexed elements count, chunk1, chunk2, chunk3,
+        chunk4) where chunks are 32-bit integers.
+        """
+        entries = sorted(entries, key=lambda e: (e[1], e[0]))
+        pks = array('q', (e[0] for e in entries))
+        counts = array('I', (e[1] for e in entries))
+        chunks = [
+            array('I', (e[i] for e in entries))
+            for i in range(2, 6)
+        ]
+        del entries
+
+        keys = []
+        rows = []
+        for column in chunks:
+            # Within a chunk value, row numbers are sorted and therefore also
+            # sorted by indexed elements count
+            order = sorted(range(len(column)), key=column.__getitem__)
+            keys.append(array('I', (column[r] for r in order)))
+            rows.append(array('I', order))
+
+        return cls(pks=pks, counts=counts, chunks=chunks, keys=keys, rows=rows)
+
+    @classmethod
+    def from_model(cls, model, chunk_size=10000):
+        """
+        Return a new DirectoryFingerprintIndex built from all the rows of the
+        BaseDirectoryIndex `model`.
+        """
+        rows = model.objects.values_list(
+            'pk',
+            'indexed_elements_count',
+            'chunk1',
+            'chunk2',
+            'chunk3',
+            'chunk4',
+        )
+        entries = (
+            (pk, count, chunk_to_int(c1), chunk_to_int(c2), chunk_to_int(c3), chunk_to_int(c4))
+            for pk, count, c1, c2, c3, c4 in rows.iterator(chunk_size=chunk_size)
+        )
+        return cls.build(entries)
+
+    def get_arrays(self):
+        """
+        Return a list of all the arrays of this index in their storage order.
+        """
+        return [self.pks, self.counts, *self.chunks, *self.keys, *self.rows]
+
+    def save(self, location):
+        """
+        Save this index to the file at `location`.
+        """
+        with open(location, 'wb') as output:
+            output.write(DIRECTORY_INDEX_HEADER.pack(DIRECTORY_INDEX_MAGIC, len(self)))
+            for arr in self.get_arrays():
+                if isinstance(arr, array):
+                    arr.tofile(output)
+                else:
+                    output.write(arr)
+
+    @classmethod
+    def load(cls, location):
+        """
+        Return a DirectoryFingerprintIndex loaded from the file at `location`
+        as a read-only memory map.
+        """
+        with open(location, 'rb') as inp:
+            mapped = mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, size = DIRECTORY_INDEX_HEADER.unpack_from(mapped)
+        if magic != DIRECTORY_INDEX_MAGIC:
+            raise ValueError(f'Invalid directory fingerprint index: {location}')
+
+        view = memoryview(mapped)
+        offset = DIRECTORY_INDEX_HEADER.size
+
+        def read_array(typecode):
+            nonlocal offset
+            length = array(typecode).itemsize * size
+            arr = view[offset:offset + length].cast(typecode)
+            offset += length
+            return arr
+
+        pks = read_array('q')
+        counts = read_array('I')
+        chunks = [read_array('I') for _ in range(4)]
+        keys = [read_array('I') for _ in range(4)]
+        rows = [read_array('I') for _ in range(4)]
+        return cls(pks=pks, counts=counts, chunks=chunks, keys=keys, rows=rows)
+
+    def get_candidates(self, chunks, row_start, row_end):
+        """
+        Return a set of row numbers within `row_start` and `row_end` that share
+        at least one chunk with `chunks`.
+        """
+        candidates = set()
+        for keys, rows, chunk in zip(self.keys, self.rows, chunks):
+            lo = bisect_left(keys, chunk)
+            hi = bisect_right(keys, chunk, lo)
+            if lo == hi:
+                continue
+            start = bisect_left(rows, row_start, lo, hi)
+            end = bisect_left(rows, row_end, start, hi)
+            candidates.update(rows[start:end])
+        return candidates
+
+    def get_distance(self, row, chunks):
+        """
+        Return the Hamming distance between the fingerprint at `row` and the
+        fingerprint `chunks`.
+        """
+        return sum(
+            popcount(column[row] ^ chunk)
+            for column, chunk in zip(self.chunks, chunks)
+        )
+
+    def search(self, directory_fingerprint, exact_directory_match=False):
+        """
+        Return a list of (Hamming distance, pk) tuples for the rows matching the
+        string `directory_fingerprint`, sorted by increasing distance.
+
+        This follows the semantics of `BaseDirectoryIndex.match`: if there are
+        exact matches, only those are returned.
+        """
+        if not directory_fingerprint:
+            return []
+
+        indexed_elements_count, chunks = get_fingerprint_chunks(directory_fingerprint)
+        if exact_directory_match:
+            low = high = indexed_elements_count
+        else:
+            low, high = bah128_ranges(indexed_elements_count)
+
+        row_start = bisect_left(self.counts, low)
+        row_end = bisect_right(self.counts, high, row_start)
+        if row_start == row_end:
+            return []
+
+        if exact_directory_match:
+            candidates = self.get_candidates(chunks[:1], row_start, row_end)
+        else:
+            candidates = self.get_candidates(chunks, row_start, row_end)
+
+        matches = []
+        for row in candidates:
+            distance = self.get_distance(row, chunks)
+            if distance < MAX_HAMMING_DISTANCE:
+                matches.append((distance, self.pks[row]))
+
+        matches.sort()
+        if exact_directory_match or (matches and matches[0][0] == 0):
+            matches = [(d, pk) for d, pk in matches if d == 0]
+
+        if TRACE:
+            logger.debug(f'DirectoryFingerprintIndex.search: {directory_fingerprint}: {matches}')
+
+        return matches
+
+
+_directory_fingerprint_indexes = {}
+
+
+def get_directory_fingerprint_index_location(model, directory=None):
+    """
+    Return the location of the saved DirectoryFingerprintIndex file for the
+    BaseDirectoryIndex `model` in `directory`, defaulting to the
+    MATCHCODE_DIRECTORY_INDEX_DIR setting. Return None if there is no directory.
+    """
+    directory = directory or getattr(settings, 'MATCHCODE_DIRECTORY_INDEX_DIR', '')
+    if directory:
+        return os.path.join(directory, f'{model._meta.model_name}.idx')
+
+
+def get_directory_fingerprint_index(model, reload=False):
+    """
+    Return the cached DirectoryFingerprintIndex of the BaseDirectoryIndex
+    `model`. The index is loaded from the MATCHCODE_DIRECTORY_INDEX_DIR file if
+    present, or else built from the `model` table.
+
+    Reload the index if `reload` is True.
+    """
+    index = _directory_fingerprint_indexes.get(model)
+    if index is not None and not reload:
+        return index
+
+    location = get_directory_fingerprint_index_location(model)
+    if location and os.path.exists(location):
+        index = DirectoryFingerprintIndex.load(location)
+    else:
+        index = DirectoryFingerprintIndex.from_model(model)
+
+    logger.info(f'Loaded {model.__name__} fingerprint index with {len(index)} entries')
+    _directory_fingerprint_indexes[model] = index
+    return index
+
+
+SHA1_FILTER_MAGIC = b'MCSHA1BF'
+SHA1_FILTER_HEADER = struct.Struct('<8sQQQQQ')
+
+# Number of primary keys below the highest primary key of a SHA1BloomFilter
+# that are scanned again when the filter is updated and looked up for the SHA1
+# rejected by the filter: rows of a transaction that committed after rows with
+# a higher primary key are not missed.
+SHA1_FILTER_PK_OVERLAP = 10000
+
+
+class SHA1BloomFilter:
+    """
+    A Bloom filter of the SHA1 values of a BaseFileIndex model, used to reject
+    the SHA1 values that are not indexed without querying the database.
+
+    SHA1 values are uniformly distributed, so the bit positions are derived
+    directly from the SHA1 bytes using double hashing. The filter tracks the
+    highest primary key it contains such that it can be updated incrementally
+    with the rows added to a table since it was built.
+
+    Primary keys are not committed in order: a row can be committed after rows
+    with a higher primary key were added to the filter. The rows with a primary
+    key above `overlap_pk` are scanned again on update and must be looked up
+    for the SHA1 rejected by the filter. A row committed after the filter
+    moved more than SHA1_FILTER_PK_OVERLAP primary keys past it is only added
+    when the filter is rebuilt.
+    """
+
+    def __init__(self, bits, num_bits, num_hashes, capacity, count=0, last_pk=0):
+        self.bits = bits
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        # The number of SHA1 for which the false positive rate is guaranteed
+        self.capacity = capacity
+        # The number of SHA1 added to this filter
+        self.count = count
+        # The highest primary key of the rows added to this filter
+        self.last_pk = last_pk
+
+    @classmethod
+    def create(cls, capacity, error_rate=0.01):
+        """
+        Return a new empty SHA1BloomFilter sized to hold `capacity` SHA1 with a
+        false positive rate of `error_rate`.
+        """
+        capacity = max(capacity, 1)
+        num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        # Round up to a whole number of bytes
+        num_bits = max(8, (num_bits + 7) // 8 * 8)
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(
+            bits=bytearray(num_bits // 8),
+            num_bits=num_bits,
+            num_hashes=num_hashes,
+            capacity=capacity,
+        )
+
+    @classmethod
+    def from_model(cls, model, capacity=None, error_rate=0.01, chunk_size=10000):
+        """
+        Return a new SHA1BloomFilter built from all the rows of the BaseFileIndex
+        `model`. The default `capacity` leaves room to grow to twice the current
+        number of rows.
+        """
+        if not capacity:
+            capacity = model.objects.count() * 2
+        sha1_filter = cls.create(capacity=capacity, error_rate=error_rate)
+        sha1_filter.update_from_model(model, chunk_size=chunk_size)
+        return sha1_filter
+
+    @property
+    def overlap_pk(self):
+        """
+        Return the primary key above which rows may be missing from this filter.
+        """
+        return max(self.last_pk - SHA1_FILTER_PK_OVERLAP, 0)
+
+    def update_from_model(self, model, chunk_size=10000):
+        """
+        Add the SHA1 of the rows of the BaseFileIndex `model` that were created
+        since this filter was last built or updated, including the rows above
+        `overlap_pk` that were committed late. Return the number of added rows.
+        """
+        rows = (
+            model.objects.filter(pk__gt=self.overlap_pk)
+            .order_by('pk')
+            .values_list('pk', 'sha1')
+        )
+        last_pk = self.last_pk
+        added = 0
+        for pk, sha1 in rows.iterator(chunk_size=chunk_size):
+            sha1 = bytes(sha1)
+            if pk <= last_pk and sha1 in self:
+                continue
+            self.add(sha1)
+            self.last_pk = max(self.last_pk, pk)
+            added += 1
+        return added
+
+    def is_full(self):
+        """
+        Return True if this filter holds more SHA1 than its capacity and should
+        be rebuilt to keep its false positive rate.
+        """
+        return self.count > self.capacity
+
+    def get_positions(self, sha1):
+        """
+        Yield the bit positions of the binary `sha1`.
+        """
+        h1 = int.from_bytes(sha1[:8], 'little')
+        h2 = int.from_bytes(sha1[8:16], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, sha1):
+        """
+        Add the binary `sha1` to this filter.
+        """
+        bits = self.bits
+        for position in self.get_positions(sha1):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, sha1):
+        """
+        Return True if the `sha1` hex string or binary may have been added to
+        this filter and False if it has certainly not been added.
+        """
+        if isinstance(sha1, str):
+            sha1 = bytes.fromhex(sha1)
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self.get_positions(sha1)
+        )
+
+    def save(self, location):
+        """
+        Save this filter to the file at `location`.
+        """
+        with open(location, 'wb') as output:
+            output.write(
+                SHA1_FILTER_HEADER.pack(
+                    SHA1_FILTER_MAGIC,
+                    self.num_bits,
+                    self.num_hashes,
+                    self.capacity,
+                    self.count,
+                    self.last_pk,
+                )
+            )
+            output.write(self.bits)
+
+    @classmethod
+    def load(cls, location, writable=False):
+        """
+        Return a SHA1BloomFilter loaded from the file at `location` as a
+        read-only memory map, or in memory if `writable` is True.
+        """
+        with open(location, 'rb') as inp:
+            if writable:
+                data = inp.read()
+            else:
+                data = mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, num_bits, num_hashes, capacity, count, last_pk = SHA1_FILTER_HEADER.unpack_from(data)
+        if magic != SHA1_FILTER_MAGIC:
+            raise ValueError(f'Invalid SHA1 filter: {location}')
+
+        bits = memoryview(data)[SHA1_FILTER_HEADER.size:]
+        if writable:
+            bits = bytearray(bits)
+
+        return cls(
+            bits=bits,
+            num_bits=num_bits,
+            num_hashes=num_hashes,
+            capacity=capacity,
+            count=count,
+            last_pk=last_pk,
+        )
+
+
+def get_sha1_filter_location(model, directory=None):
+    """
+    Return the location of the saved SHA1BloomFilter file for the BaseFileIndex
+    `model` in `directory`, defaulting to the MATCHCODE_DIRECTORY_INDEX_DIR
+    setting. Return None if there is no directory.
+    """
+    directory = directory or getattr(settings, 'MATCHCODE_DIRECTORY_INDEX_DIR', '')
+    if directory:
+        return os.path.join(directory, f'{model._meta.model_name}.bloom')
+
+
+_sha1_filters = {}
+
+
+def get_sha1_filter(model):
+    """
+    Return the SHA1BloomFilter of the BaseFileIndex `model` memory mapped from
+    its file in the MATCHCODE_DIRECTORY_INDEX_DIR directory, or None if there is
+    no such file.
+
+    The filter is cached and reloaded when its file is updated.
+    """
+    location = get_sha1_filter_location(model)
+    if not location or not os.path.exists(location):
+        return
+
+    mtime = os.path.getmtime(location)
+    cached = _sha1_filters.get(location)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    sha1_filter = SHA1BloomFilter.load(location)
+    _sha1_filters[location] = (mtime, sha1_filter)
+    return sha1_filter
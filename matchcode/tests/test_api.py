@@ -165,3 +165,37 @@ class ApproximateDirectoryStructureIndexAPITestCase(MatchcodeTestCase):
         expected_package = 'http://testserver' + reverse('api:package-detail', args=[self.test_package2.uuid])
         self.assertEqual(expected_package, result['package'])
         self.assertEqual(1.0, result['similarity_score'])
+
+    def test_api_approximate_directory_content_index_bulk_match(self):
+        test_fingerprint = '00000007af7d63765c78fa516b5353f5ffa7df45'
+        close_fingerprint = '00000007af7d63765c78fa516b5353f5ffa7d000'
+        no_match_fingerprint = '000000020e1d2124040134564e1941a6a620db34'
+        response = self.client.post(
+            reverse('api:approximatedirectorycontentindex-bulk-match'),
+            data={'fingerprints': [test_fingerprint, close_fingerprint, no_match_fingerprint]},
+            content_type='application/json',
+        )
+        self.assertEqual(200, response.status_code)
+        results = response.data
+        self.assertEqual(
+            {test_fingerprint, close_fingerprint, no_match_fingerprint},
+            set(results)
+        )
+        self.assertEqual([], results[no_match_fingerprint])
+        expected_package = 'http://testserver' + reverse('api:package-detail', args=[self.test_package1.uuid])
+        result = results[test_fingerprint][0]
+        self.assertEqual(test_fingerprint, result['matched_fingerprint'])
+        self.assertEqual(expected_package, result['package'])
+        self.assertEqual(1.0, result['similarity_score'])
+        result = results[close_fingerprint][0]
+        self.assertEqual(test_fingerprint, result['matched_fingerprint'])
+        self.assertEqual(0.9453125, result['similarity_score'])
+
+    def test_api_approximate_directory_content_index_bulk_match_exact(self):
+        close_fingerprint = '00000007af7d63765c78fa516b5353f5ffa7d000'
+        response = self.client.post(
+            reverse('api:approximatedirectorycontentindex-bulk-match'),
+            data={'fingerprints': [close_fingerprint], 'exact_directory_match': True},
+            content_type='application/json',
+        )
+        self.assertEqual({close_fingerprint: []}, response.data)
@@ -13,17 +13,20 @@ from commoncode.resource import VirtualCodebase
 
 from matchcode_toolkit.fingerprinting import compute_codebase_directory_fingerprints
 from matchcode_toolkit.fingerprinting import hexstring_to_binarray
+from matchcode.indexing import INDEX_MODELS
 from matchcode.indexing import _create_virtual_codebase_from_package_resources
 from matchcode.indexing import index_directory_fingerprints
 from matchcode.indexing import index_package_archives
 from matchcode.indexing import index_package_directories
 from matchcode.indexing import index_package_file
+from matchcode.indexing import rebuild_package_indexes
 from matchcode.management.commands import index_packages
 from matchcode.models import ApproximateDirectoryContentIndex
 from matchcode.models import ApproximateDirectoryStructureIndex
 from matchcode.models import create_halohash_chunks
 from matchcode.models import ExactPackageArchiveIndex
 from matchcode.models import ExactFileIndex
+from matchcode.models import PackageIndexShard
 from matchcode.utils import load_resources_from_scan
 from matchcode.utils import MatchcodeTestCase
 from packagedb.models import Package
@@ -199,3 +202,50 @@ class IndexPackagesTestCase(MatchcodeTestCase):
         expected_adsi_fingerprint = '00000002160440008028c38c24a8038040006040'
         self.assertEqual(expected_adci_fingerprint, adci.fingerprint())
         self.assertEqual(expected_adsi_fingerprint, adsi.fingerprint())
+
+    def get_index_fingerprints(self):
+        return {
+            model.__name__: sorted(
+                (entry.package_id, getattr(entry, 'path', ''), entry.fingerprint())
+                for entry in model.objects.all()
+            )
+            for model in INDEX_MODELS
+        }
+
+    def test_index_packages_rebuild_matches_index_packages(self):
+        index_packages.Command().handle()
+        expected = self.get_index_fingerprints()
+
+        index_packages.Command().handle(rebuild=True, shard_size=7, batch_size=3)
+        self.assertEqual(expected, self.get_index_fingerprints())
+        # the rebuild is completed
+        self.assertFalse(PackageIndexShard.objects.exists())
+
+    def test_index_packages_rebuild_resumes_from_completed_shards(self):
+        shard_size = 1000
+        shards = index_packages.get_shards(shard_size)
+        self.assertEqual(1, len(shards))
+        start_id, end_id = shards[0]
+        self.assertTrue(start_id <= self.test_package1.id < end_id)
+
+        # the only shard was completed by an interrupted rebuild
+        PackageIndexShard.objects.create(start_id=start_id, end_id=end_id)
+        index_packages.Command().handle(rebuild=True, shard_size=shard_size)
+        self.assertFalse(ExactFileIndex.objects.exists())
+        self.assertFalse(PackageIndexShard.objects.exists())
+
+        index_packages.Command().handle(rebuild=True, shard_size=shard_size)
+        self.assertTrue(ExactFileIndex.objects.exists())
+
+    def test_rebuild_package_indexes(self):
+        stats = rebuild_package_indexes(self.test_package1.id, self.test_package1.id + 1)
+        self.assertEqual(1, stats['ExactPackageArchiveIndex'][0])
+        self.assertEqual(1, stats['ApproximateDirectoryContentIndex'][0])
+        self.assertEqual(1, stats['ApproximateDirectoryStructureIndex'][0])
+        self.assertEqual(ExactFileIndex.objects.count(), stats['ExactFileIndex'][0])
+
+        # rebuilding again replaces the index entries
+        rebuild_package_indexes(self.test_package1.id, self.test_package1.id + 1)
+        self.assertEqual(1, ExactPackageArchiveIndex.objects.count())
+        shard = PackageIndexShard.objects.get()
+        self.assertEqual(stats['ExactFileIndex'][0], shard.indexed_counts['ExactFileIndex'])
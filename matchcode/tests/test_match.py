@@ -11,6 +11,8 @@ import os
 
 import attr
 from commoncode.resource import VirtualCodebase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from packagedb.models import Package
 
 from matchcode_toolkit.fingerprinting import compute_codebase_directory_fingerprints
@@ -21,6 +23,8 @@ from matchcode.match import APPROXIMATE_DIRECTORY_CONTENT_MATCH
 from matchcode.match import EXACT_FILE_MATCH
 from matchcode.match import do_match
 from matchcode.match import path_suffixes
+from matchcode.match import tag_matched_resources
+from matchcode.models import ApproximateDirectoryStructureIndex
 from matchcode.utils import index_package_files_sha1
 from matchcode.utils import index_packages_sha1
 from matchcode.utils import load_resources_from_scan
@@ -168,6 +172,34 @@ class MatchNestedPackagesTestCase(MatchcodeTestCase):
         expected = self.get_test_loc('match/nested/nested-expected.json')
         self.check_codebase(vc, expected, regen=False)
 
+    def test_tag_matched_resources_loads_package_resource_paths_once(self):
+        vc = VirtualCodebase(
+            location=self.get_test_loc('match/nested/nested.json'),
+            codebase_attributes=dict(
+                matches=attr.ib(default=attr.Factory(list))
+            ),
+            resource_attributes=dict(
+                matched_to=attr.ib(default=attr.Factory(list))
+            )
+        )
+        root = vc.root
+        # The same package matched twice
+        match = ApproximateDirectoryStructureIndex.objects.filter(package=self.test_package2).first()
+        matches = [match, match]
+
+        with CaptureQueriesContext(connection) as queries:
+            tag_matched_resources(root, vc, matches, 'approximate-structure')
+        resource_queries = [q for q in queries if 'FROM "packagedb_resource"' in q['sql']]
+        self.assertEqual(1, len(resource_queries))
+
+        purl = self.test_package2.package_url
+        self.assertEqual([purl], vc.root.matched_to)
+        matched_children = [r for r in vc.walk() if r.matched_to]
+        self.assertTrue(len(matched_children) > 1)
+        for child in matched_children:
+            self.assertEqual([purl], child.matched_to)
+            self.assertTrue(child.extra_data['matched'])
+
 
 class MatchUtilityFunctionsTestCase(MatchcodeTestCase):
     def test_path_suffixes(self):
@@ -209,6 +209,42 @@ class ApproximateDirectoryMatchingIndexModelTestCase(MatchcodeTestCase):
         expected = self.get_test_loc('models/directory-matching/async-0.2.9-i-expected-content.json')
         self.check_codebase(codebase, expected, regen=False)
 
+    def get_directory_fingerprints(self, fingerprint_type):
+        scan_location = self.get_test_loc('models/directory-matching/async-0.2.9-i.json')
+        vc = VirtualCodebase(location=scan_location)
+        codebase = compute_codebase_directory_fingerprints(vc)
+        fingerprints = []
+        for resource in codebase.walk(topdown=True):
+            fp = resource.extra_data.get(fingerprint_type, '')
+            if resource.is_dir and fp:
+                fingerprints.append(fp)
+        return fingerprints
+
+    def test_ApproximateDirectoryContentIndex_match_many(self):
+        fingerprints = self.get_directory_fingerprints('directory_content')
+        results = ApproximateDirectoryContentIndex.match_many(fingerprints)
+        self.assertEqual(set(fingerprints), set(results))
+        for fp in fingerprints:
+            expected = ApproximateDirectoryContentIndex.match(fp)
+            self.assertEqual(
+                sorted(match.pk for match in expected),
+                sorted(match.pk for match in results[fp]),
+            )
+
+    def test_ApproximateDirectoryStructureIndex_match_many_exact(self):
+        fingerprints = self.get_directory_fingerprints('directory_structure')
+        results = ApproximateDirectoryStructureIndex.match_many(
+            fingerprints,
+            exact_directory_match=True,
+            chunk_size=2,
+        )
+        for fp in fingerprints:
+            expected = ApproximateDirectoryStructureIndex.match(fp, exact_directory_match=True)
+            self.assertEqual(
+                sorted(match.pk for match in expected),
+                sorted(match.pk for match in results[fp]),
+            )
+
 
 class MatchcodeModelUtilsTestCase(MatchcodeTestCase):
     def test_create_halohash_chunks(self):
@@ -0,0 +1,290 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from unittest import mock
+import os
+import tempfile
+
+from commoncode.resource import VirtualCodebase
+from django.test import override_settings
+from packagedb.models import Package
+
+from matchcode_toolkit.fingerprinting import compute_codebase_directory_fingerprints
+from matchcode.indexing import index_package_directories
+from matchcode.models import ApproximateDirectoryContentIndex
+from matchcode.models import ApproximateDirectoryStructureIndex
+from matchcode.models import ExactFileIndex
+from matchcode.search import DirectoryFingerprintIndex
+from matchcode.search import SHA1BloomFilter
+from matchcode.search import get_directory_fingerprint_index
+from matchcode.search import get_fingerprint_chunks
+from matchcode.search import get_sha1_filter_location
+from matchcode.search import rank_by_hamming_distance
+from matchcode.utils import index_package_files_sha1
+from matchcode.utils import load_resources_from_scan
+from matchcode.utils import MatchcodeTestCase
+
+
+class DirectoryFingerprintIndexTestCase(MatchcodeTestCase):
+    BASE_DIR = os.path.join(os.path.dirname(__file__), 'testfiles')
+
+    def setUp(self):
+        super(DirectoryFingerprintIndexTestCase, self).setUp()
+        self.test_package1, _ = Package.objects.get_or_create(
+            filename='async-0.2.10.tgz',
+            sha1='b6bbe0b0674b9d719708ca38de8c237cb526c3d1',
+            md5='fd313a0e8cc2343569719e80cd7a67ac',
+            size=15772,
+            name='async',
+            version='0.2.10',
+            download_url='https://registry.npmjs.org/async/-/async-0.2.10.tgz',
+            type='npm',
+        )
+        load_resources_from_scan(self.get_test_loc('models/directory-matching/async-0.2.10.tgz-i.json'), self.test_package1)
+        index_package_directories(self.test_package1)
+
+        self.test_package2, _ = Package.objects.get_or_create(
+            filename='async-0.2.9.tgz',
+            sha1='df63060fbf3d33286a76aaf6d55a2986d9ff8619',
+            md5='895ac62ba7c61086cffdd50ab03c0447',
+            size=15672,
+            name='async',
+            version='0.2.9',
+            download_url='https://registry.npmjs.org/async/-/async-0.2.9.tgz',
+            type='npm',
+        )
+        load_resources_from_scan(self.get_test_loc('models/directory-matching/async-0.2.9-i.json'), self.test_package2)
+        index_package_directories(self.test_package2)
+
+        get_directory_fingerprint_index(ApproximateDirectoryContentIndex, reload=True)
+        get_directory_fingerprint_index(ApproximateDirectoryStructureIndex, reload=True)
+
+        vc = VirtualCodebase(location=self.get_test_loc('models/directory-matching/async-0.2.9-i.json'))
+        self.codebase = compute_codebase_directory_fingerprints(vc)
+
+    def get_fingerprints(self, fingerprint_type):
+        for resource in self.codebase.walk(topdown=True):
+            fingerprint = resource.extra_data.get(fingerprint_type, '')
+            if resource.is_dir and fingerprint:
+                yield fingerprint
+
+    def check_match_in_memory(self, model, fingerprint_type, exact_directory_match=False):
+        fingerprints = list(self.get_fingerprints(fingerprint_type))
+        self.assertTrue(fingerprints)
+        for fingerprint in fingerprints:
+            expected = model.match(fingerprint, exact_directory_match=exact_directory_match)
+            results = model.match_in_memory(fingerprint, exact_directory_match=exact_directory_match)
+            self.assertEqual(
+                sorted(m.pk for m in expected),
+                sorted(m.pk for m in results),
+            )
+
+    def test_ApproximateDirectoryContentIndex_match_in_memory(self):
+        self.check_match_in_memory(ApproximateDirectoryContentIndex, 'directory_content')
+
+    def test_ApproximateDirectoryStructureIndex_match_in_memory(self):
+        self.check_match_in_memory(ApproximateDirectoryStructureIndex, 'directory_structure')
+
+    def test_ApproximateDirectoryContentIndex_match_in_memory_exact(self):
+        self.check_match_in_memory(
+            ApproximateDirectoryContentIndex,
+            'directory_content',
+            exact_directory_match=True,
+        )
+
+    def test_DirectoryFingerprintIndex_save_and_load(self):
+        index = DirectoryFingerprintIndex.from_model(ApproximateDirectoryContentIndex)
+        location = os.path.join(tempfile.mkdtemp(), 'index.idx')
+        index.save(location)
+        loaded = DirectoryFingerprintIndex.load(location)
+        self.assertEqual(len(index), len(loaded))
+        for fingerprint in self.get_fingerprints('directory_content'):
+            self.assertEqual(index.search(fingerprint), loaded.search(fingerprint))
+
+    def test_DirectoryFingerprintIndex_search_ranks_by_distance(self):
+        fingerprint = '0000000a' + '49280e141724c001e1080128621a4210'
+        _, (c1, c2, c3, c4) = get_fingerprint_chunks(fingerprint)
+        index = DirectoryFingerprintIndex.build([
+            # one bit different in chunk4
+            (1, 10, c1, c2, c3, c4 ^ 1),
+            # too far in indexed elements count
+            (2, 20, c1, c2, c3, c4 ^ 3),
+            # three bits different in chunk1
+            (3, 10, c1 ^ 7, c2, c3, c4),
+            # no chunk in common
+            (4, 10, c1 ^ 1, c2 ^ 1, c3 ^ 1, c4 ^ 1),
+        ])
+        self.assertEqual([(1, 1), (3, 3)], index.search(fingerprint))
+        self.assertEqual([], index.search(fingerprint, exact_directory_match=True))
+
+        index = DirectoryFingerprintIndex.build([
+            (1, 10, c1, c2, c3, c4 ^ 1),
+            (5, 10, c1, c2, c3, c4),
+        ])
+        self.assertEqual([(0, 5)], index.search(fingerprint))
+        self.assertEqual([(0, 5)], index.search(fingerprint, exact_directory_match=True))
+
+    def check_rank_by_hamming_distance(self):
+        bah128 = '49280e141724c001e1080128621a4210'
+        _, chunks = get_fingerprint_chunks('0000000a' + bah128)
+        candidates = []
+        for pk, xors in [
+            (1, (0, 0, 0, 1)),
+            (2, (0, 0, 0, 0)),
+            (3, (7, 0, 0, 0)),
+            (4, (0xff, 0, 0, 0)),
+            (5, (0, 0, 0, 0)),
+        ]:
+            candidate_chunks = [
+                (chunk ^ xor).to_bytes(4, 'big')
+                for chunk, xor in zip(chunks, xors)
+            ]
+            candidates.append((pk, *candidate_chunks))
+
+        distances, pks = rank_by_hamming_distance(bah128, candidates)
+        self.assertEqual([0, 0, 1, 3], [int(d) for d in distances])
+        self.assertEqual([2, 5, 1, 3], [int(pk) for pk in pks])
+
+        distances, pks = rank_by_hamming_distance(bah128, [])
+        self.assertEqual(0, len(distances))
+        self.assertEqual(0, len(pks))
+
+    def test_rank_by_hamming_distance(self):
+        self.check_rank_by_hamming_distance()
+
+    def test_rank_by_hamming_distance_without_numpy(self):
+        with mock.patch('matchcode.search.numpy', None):
+            self.check_rank_by_hamming_distance()
+
+
+class SHA1BloomFilterTestCase(MatchcodeTestCase):
+    BASE_DIR = os.path.join(os.path.dirname(__file__), 'testfiles')
+
+    def setUp(self):
+        super(SHA1BloomFilterTestCase, self).setUp()
+        self.test_package, _ = Package.objects.get_or_create(
+            filename='test.tar.gz',
+            sha1='deadbeef',
+            size=42589,
+            name='test',
+            version='0.01',
+            download_url='https://test.com/test.tar.gz',
+            type='maven'
+        )
+        index_package_files_sha1(self.test_package, self.get_test_loc('models/match-test.json'))
+        self.indexed_sha1s = [index.fingerprint() for index in ExactFileIndex.objects.all()]
+        self.unknown_sha1s = [f'{i:040x}' for i in range(100)]
+
+    def test_SHA1BloomFilter_from_model(self):
+        sha1_filter = SHA1BloomFilter.from_model(ExactFileIndex, error_rate=0.001)
+        self.assertEqual(len(self.indexed_sha1s), sha1_filter.count)
+        for sha1 in self.indexed_sha1s:
+            self.assertIn(sha1, sha1_filter)
+        rejected = [sha1 for sha1 in self.unknown_sha1s if sha1 not in sha1_filter]
+        self.assertGreater(len(rejected), 90)
+
+    def test_SHA1BloomFilter_update_from_model(self):
+        sha1_filter = SHA1BloomFilter.create(capacity=100)
+        self.assertEqual(len(self.indexed_sha1s), sha1_filter.update_from_model(ExactFileIndex))
+        self.assertEqual(0, sha1_filter.update_from_model(ExactFileIndex))
+
+        new_sha1 = 'a' * 40
+        self.assertNotIn(new_sha1, sha1_filter)
+        ExactFileIndex.index(new_sha1, self.test_package)
+        self.assertEqual(1, sha1_filter.update_from_model(ExactFileIndex))
+        self.assertIn(new_sha1, sha1_filter)
+        self.assertFalse(sha1_filter.is_full())
+
+    def test_SHA1BloomFilter_save_and_load(self):
+        sha1_filter = SHA1BloomFilter.from_model(ExactFileIndex)
+        location = os.path.join(tempfile.mkdtemp(), 'filter.bloom')
+        sha1_filter.save(location)
+        for writable in (False, True):
+            loaded = SHA1BloomFilter.load(location, writable=writable)
+            self.assertEqual(sha1_filter.count, loaded.count)
+            self.assertEqual(sha1_filter.last_pk, loaded.last_pk)
+            for sha1 in self.indexed_sha1s + self.unknown_sha1s:
+                self.assertEqual(sha1 in sha1_filter, sha1 in loaded)
+
+    def test_ExactFileIndex_match_many_with_filter(self):
+        sha1s = self.indexed_sha1s + self.unknown_sha1s
+        expected = ExactFileIndex.match_many(sha1s)
+        self.assertEqual(set(sha1s), set(expected))
+        for sha1 in self.indexed_sha1s:
+            self.assertEqual(1, len(expected[sha1]))
+
+        directory = tempfile.mkdtemp()
+        with override_settings(MATCHCODE_DIRECTORY_INDEX_DIR=directory):
+            # An empty filter up to date with the table rejects everything
+            # below its overlap
+            location = get_sha1_filter_location(ExactFileIndex)
+            sha1_filter = SHA1BloomFilter.create(capacity=100)
+            sha1_filter.last_pk = ExactFileIndex.objects.latest('pk').pk
+            sha1_filter.save(location)
+            # only look up the rejected SHA1 in the rows above the overlap
+            with self.assertNumQueries(1):
+                results = ExactFileIndex.match_many(sha1s)
+            self.assertEqual(set(sha1s), set(results))
+            self.assertEqual(set(self.indexed_sha1s), {sha1 for sha1, m in results.items() if m})
+            with mock.patch('matchcode.search.SHA1_FILTER_PK_OVERLAP', 0):
+                results = ExactFileIndex.match_many(sha1s)
+            self.assertFalse(any(results.values()))
+
+            SHA1BloomFilter.from_model(ExactFileIndex).save(location + '.tmp')
+            os.replace(location + '.tmp', location)
+            # Make sure the modification time changes to reload the filter
+            os.utime(location, (0, 0))
+            with self.assertNumQueries(1):
+                results = ExactFileIndex.match_many(sha1s)
+            self.assertEqual(
+                {sha1: [m.pk for m in matches] for sha1, matches in expected.items()},
+                {sha1: [m.pk for m in matches] for sha1, matches in results.items()},
+            )
+
+    def test_ExactFileIndex_match_many_matches_rows_indexed_after_the_filter(self):
+        directory = tempfile.mkdtemp()
+        with override_settings(MATCHCODE_DIRECTORY_INDEX_DIR=directory):
+            location = get_sha1_filter_location(ExactFileIndex)
+            SHA1BloomFilter.from_model(ExactFileIndex).save(location)
+
+            new_sha1 = 'a' * 40
+            ExactFileIndex.index(new_sha1, self.test_package)
+            self.assertNotIn(new_sha1, SHA1BloomFilter.load(location))
+
+            sha1s = [new_sha1] + self.indexed_sha1s + self.unknown_sha1s
+            results = ExactFileIndex.match_many(sha1s)
+            self.assertEqual([self.test_package], [m.package for m in results[new_sha1]])
+            for sha1 in self.indexed_sha1s:
+                self.assertEqual(1, len(results[sha1]))
+            for sha1 in self.unknown_sha1s:
+                self.assertEqual([], results[sha1])
+
+    def test_SHA1BloomFilter_matches_and_adds_rows_committed_late(self):
+        directory = tempfile.mkdtemp()
+        with override_settings(MATCHCODE_DIRECTORY_INDEX_DIR=directory):
+            sha1_filter = SHA1BloomFilter.from_model(ExactFileIndex)
+            late_sha1 = 'a' * 40
+            ExactFileIndex.index(late_sha1, self.test_package)
+            new_sha1 = 'b' * 40
+            ExactFileIndex.index(new_sha1, self.test_package)
+            # the row of new_sha1 was added to the filter before the row of
+            # late_sha1 with a lower primary key was committed
+            sha1_filter.add(bytes.fromhex(new_sha1))
+            sha1_filter.last_pk = ExactFileIndex.objects.latest('pk').pk
+            self.assertNotIn(late_sha1, sha1_filter)
+            sha1_filter.save(get_sha1_filter_location(ExactFileIndex))
+
+            results = ExactFileIndex.match_many([late_sha1, new_sha1])
+            self.assertEqual([self.test_package], [m.package for m in results[late_sha1]])
+            self.assertEqual([self.test_package], [m.package for m in results[new_sha1]])
+
+            count = sha1_filter.count
+            self.assertEqual(1, sha1_filter.update_from_model(ExactFileIndex))
+            self.assertIn(late_sha1, sha1_filter)
+            self.assertEqual(count + 1, sha1_filter.count)
@@ -283,8 +283,69 @@ def _match_purldb_resources(
     )
 
 
-def match_purldb_directories(project, exact_directory_match=False, logger=None):
-    """Match directory CodebaseResources from `project` against the PurlDB."""
+def has_matched_ancestor(path, matched_paths):
+    """
+    Return True if `path` or one of its parent directory paths is in the set of
+    `matched_paths`.
+    """
+    segments = path.split("/")
+    for i in range(1, len(segments) + 1):
+        if "/".join(segments[:i]) in matched_paths:
+            return True
+    return False
+
+
+def match_purldb_directories_batch(
+    project, directories, matched_paths, exact_directory_match=False
+):
+    """
+    Match the directory CodebaseResources from `directories` in the PurlDB,
+    looking up all their fingerprints at once.
+
+    Directories under a directory path from the `matched_paths` set are skipped
+    and the paths of the newly matched directories are added to `matched_paths`.
+    Return the number of matched directories.
+    """
+    directories = [
+        directory
+        for directory in directories
+        if not has_matched_ancestor(directory.path, matched_paths)
+    ]
+    fingerprints = [
+        directory.extra_data.get("directory_content", "")
+        for directory in directories
+    ]
+    matches_by_fingerprint = ApproximateDirectoryContentIndex.match_many(
+        fingerprints,
+        exact_directory_match=exact_directory_match,
+    )
+
+    matched_count = 0
+    for directory in directories:
+        # A parent directory may have been matched from this same batch
+        if has_matched_ancestor(directory.path, matched_paths):
+            continue
+        fingerprint = directory.extra_data.get("directory_content", "")
+        matches = matches_by_fingerprint.get(fingerprint)
+        if not matches:
+            continue
+        package_data = matches[0].package.to_dict()
+        create_package_from_purldb_data(
+            project, [directory], package_data, flag.MATCHED_TO_PURLDB_DIRECTORY
+        )
+        matched_paths.add(directory.path)
+        matched_count += 1
+    return matched_count
+
+
+def match_purldb_directories(
+    project, exact_directory_match=False, chunk_size=2000, logger=None
+):
+    """
+    Match directory CodebaseResources from `project` against the PurlDB.
+
+    Directory fingerprints are matched in batches of `chunk_size`.
+    """
     # If we are able to get match results for a directory fingerprint, then that
     # means every resource and directory under that directory is part of a
     # Package. By starting from the root to/ directory, we are attempting to
@@ -294,6 +355,7 @@ def match_purldb_directories(project, exact_directory_match=False, logger=None):
     directories = (
         project.codebaseresources.directories()
         .no_status(status=flag.MATCHED_TO_PURLDB_PACKAGE)
+        .no_status(status=flag.MATCHED_TO_PURLDB_DIRECTORY)
         .order_by("path")
     )
     directory_count = directories.count()
@@ -304,17 +366,25 @@ def match_purldb_directories(project, exact_directory_match=False, logger=None):
             f"director{pluralize(directory_count, 'y,ies')} against PurlDB"
         )
 
-    directory_iterator = directories.iterator(chunk_size=2000)
+    directory_iterator = directories.iterator(chunk_size=chunk_size)
     progress = LoopProgress(directory_count, logger)
+    # Paths of the directories matched so far, so that we skip their subtrees
+    # without querying the database for their status
+    matched_paths = set()
+    batch = []
 
     for directory in progress.iter(directory_iterator):
-        directory.refresh_from_db()
-        if directory.status != flag.MATCHED_TO_PURLDB_DIRECTORY:
-            match_purldb_directory(
-                project,
-                directory,
-                exact_directory_match
+        batch.append(directory)
+        if len(batch) == chunk_size:
+            match_purldb_directories_batch(
+                project, batch, matched_paths, exact_directory_match
             )
+            batch = []
+
+    if batch:
+        match_purldb_directories_batch(
+            project, batch, matched_paths, exact_directory_match
+        )
 
     matched_count = (
         project.codebaseresources.directories()
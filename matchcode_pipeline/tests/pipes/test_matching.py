@@ -122,6 +122,44 @@ class MatchingPipesTest(TestCase):
             self.assertEqual("matched-to-purldb-directory", resource.status)
             self.assertEqual(package, resource.discovered_packages.get())
 
+    def test_matchcode_pipeline_pipes_matching_match_purldb_directories_skip_matched_subtrees(self):
+        to_1 = make_resource_directory(
+            self.project1,
+            "package.jar-extract",
+            extra_data={"directory_content": "00000003238f6ed2c218090d4da80b3b42160e69"},
+        )
+        # Same fingerprint as its parent, but skipped as its parent is matched
+        to_2 = make_resource_directory(
+            self.project1,
+            "package.jar-extract/sub",
+            extra_data={"directory_content": "00000003238f6ed2c218090d4da80b3b42160e69"},
+        )
+        to_3 = make_resource_file(self.project1, "package.jar-extract/sub/a.class")
+        to_4 = make_resource_directory(
+            self.project1,
+            "other",
+            extra_data={"directory_content": "00000003238f6ed2c218090d4da80b3b42160e69"},
+        )
+
+        buffer = io.StringIO()
+        matching.match_purldb_directories(
+            self.project1,
+            exact_directory_match=True,
+            chunk_size=2,
+            logger=buffer.write,
+        )
+
+        expected = (
+            "Matching 3 directories against PurlDB" "3 directories matched in PurlDB"
+        )
+        self.assertEqual(expected, buffer.getvalue())
+
+        # Both top-level directories are matched to the same package
+        self.assertEqual(1, self.project1.discoveredpackages.count())
+        for resource in [to_1, to_2, to_3, to_4]:
+            resource.refresh_from_db()
+            self.assertEqual("matched-to-purldb-directory", resource.status)
+
 
     def test_matchcode_pipeline_pipes_matching_match_purldb_resources_post_process(self):
         to_map = self.data_location / "d2d-javascript" / "to" / "main.js.map"
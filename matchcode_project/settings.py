@@ -43,6 +43,9 @@ if not MATCHCODEIO_REQUIRE_AUTHENTICATION:
         "rest_framework.permissions.AllowAny",
     )
 
+# Directory where the memory-mapped matchcode indexes and filters are stored
+MATCHCODE_DIRECTORY_INDEX_DIR = env.str("MATCHCODE_DIRECTORY_INDEX_DIR", "")
+
 INSTALLED_APPS += [
     'clearcode',
     'clearindex',
@@ -0,0 +1,316 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from bisect import bisect_left
+from urllib.parse import urlsplit
+import logging
+import sys
+import threading
+import time
+
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+from urllib3.util.retry import Retry
+
+
+"""
+A shared HTTP client for the fetchers of minecode, packagedb and clearcode.
+
+All the requests of a process go through a pooled requests Session such that
+connections are kept alive and reused across requests to the same host. The
+number of concurrent connections to a host is limited: threads wait for a free
+connection once this limit is reached. Failed requests are retried with an
+exponential backoff. Latencies and received bytes are tracked for each host.
+
+This client does not sleep between requests: the politeness delays such as
+the robots.txt delays of run_visit get_sleep_time() still apply on top of it.
+"""
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout)
+logger.setLevel(logging.INFO)
+
+
+# default maximum number of concurrent connections to a host
+MAX_CONNECTIONS_PER_HOST = 10
+
+# default number of seconds to wait for a free connection to a host
+POOL_TIMEOUT = 60
+
+# default number of retries of a failed request
+RETRIES = 3
+
+# default backoff factor: retries wait for 0.5, 1, 2, ... seconds
+BACKOFF_FACTOR = 0.5
+
+# statuses of responses retried as transient failures
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+def get_host(url):
+    """
+    Return the host of a `url`.
+
+    For example:
+    >>> get_host('https://repo1.maven.org/maven2/')
+    'repo1.maven.org'
+    """
+    return urlsplit(url).hostname or ''
+
+
+class PoolTimeout(requests.exceptions.ConnectionError):
+    """
+    Raised when no connection to a host is freed in time because the maximum
+    number of concurrent connections to this host are all in use.
+    """
+
+
+class PoolTimeoutMixin:
+    """
+    A urllib3 connection pool mixin that waits for at most `pool_timeout`
+    seconds for a free connection rather than forever. requests does not pass
+    a pool timeout to urllib3.
+    """
+    pool_timeout = POOL_TIMEOUT
+
+    def urlopen(self, *args, pool_timeout=None, **kwargs):
+        if pool_timeout is None:
+            pool_timeout = self.pool_timeout
+        return super().urlopen(*args, pool_timeout=pool_timeout, **kwargs)
+
+
+class BlockingHTTPAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter with blocking connection pools that wait for at most
+    `pool_timeout` seconds for a free connection.
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['pool_timeout']
+
+    def __init__(self, pool_timeout=POOL_TIMEOUT, **kwargs):
+        self.pool_timeout = pool_timeout
+        super().__init__(pool_block=True, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attributes = dict(pool_timeout=self.pool_timeout)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type(
+                'HTTPConnectionPool', (PoolTimeoutMixin, HTTPConnectionPool), attributes
+            ),
+            'https': type(
+                'HTTPSConnectionPool', (PoolTimeoutMixin, HTTPSConnectionPool), attributes
+            ),
+        }
+
+
+
+class HostMetrics:
+    """
+    Request metrics for a host: counts of requests and errors, a histogram of
+    the request latencies and the number of bytes received.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self.latency_total = 0
+        # one count for each of the LATENCY_BUCKETS
+        self.latency_histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add_request(self, latency, bytes_received=0, error=False):
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.bytes_received += bytes_received
+        self.latency_total += latency
+        self.latency_histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def to_dict(self):
+        return dict(
+            requests=self.requests,
+            errors=self.errors,
+            bytes_received=self.bytes_received,
+            latency_total=self.latency_total,
+            latency_histogram={
+                str(bucket): count
+                for bucket, count in zip(LATENCY_BUCKETS, self.latency_histogram)
+            },
+        )
+
+
+class HttpClient:
+    """
+    A thread-safe HTTP client with a pool of at most `max_connections_per_host`
+    connections to each host or the number set in the `host_limits` mapping of
+    {host: maximum connections} for a host. Requests wait for up to
+    `pool_timeout` seconds for a free connection and then raise a
+    PoolTimeout. Failed requests are retried up to `retries` times waiting for
+    an exponential `backoff_factor` between each retry.
+
+    Streamed responses hold a connection until they are closed: use them as
+    context managers.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host=MAX_CONNECTIONS_PER_HOST,
+        host_limits=None,
+        retries=RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        pool_timeout=POOL_TIMEOUT,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.host_limits = dict(host_limits or {})
+        self.pool_timeout = pool_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.metrics_lock = threading.Lock()
+        # {host: HostMetrics}
+        self.metrics = {}
+
+        self.session = requests.Session()
+        self.session.mount('http://', self.get_adapter(max_connections_per_host))
+        self.session.mount('https://', self.get_adapter(max_connections_per_host))
+        for host, limit in self.host_limits.items():
+            adapter = self.get_adapter(limit)
+            for scheme in ('http', 'https'):
+                # mount prefixes ending the host such that a limit for
+                # "example.com" does not apply to "example.community"
+                self.session.mount(f'{scheme}://{host}/', adapter)
+                self.session.mount(f'{scheme}://{host}:', adapter)
+
+    def get_adapter(self, max_connections):
+        """
+        Return an HTTPAdapter with a pool of `max_connections` for each host.
+        Requests wait for a free connection when all are used, for up to
+        `pool_timeout` seconds.
+        """
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=('GET', 'HEAD'),
+            respect_retry_after_header=True,
+            # return the last response rather than raising an exception
+            raise_on_status=False,
+        )
+        return BlockingHTTPAdapter(
+            pool_timeout=self.pool_timeout,
+            pool_maxsize=max_connections,
+            max_retries=retry,
+        )
+
+    def get(self, url, **kwargs):
+        """
+        Send a GET request to `url` and return a response. `kwargs` are passed
+        to requests. The content of a response is read at once unless
+        `stream` is True: callers then report the bytes they receive with
+        add_bytes_received().
+        """
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            if method == 'GET':
+                response = self.session.get(url, **kwargs)
+            else:
+                response = self.session.request(method, url, **kwargs)
+        except EmptyPoolError as e:
+            self.add_request(url, time.perf_counter() - start, error=True)
+            raise PoolTimeout(
+                f'No free connection to {get_host(url)} after waiting for '
+                f'{self.pool_timeout} seconds: all connections are in use or '
+                'were not released.'
+            ) from e
+        except Exception:
+            self.add_request(url, time.perf_counter() - start, error=True)
+            raise
+
+        bytes_received = 0
+        if not kwargs.get('stream'):
+            bytes_received = len(response.content or b'')
+        error = not (200 <= response.status_code < 400)
+        self.add_request(url, time.perf_counter() - start, bytes_received, error)
+        if TRACE:
+            logger.debug(f'{method} {url}: {response.status_code}')
+        return response
+
+    def get_host_metrics(self, url):
+        host = get_host(url)
+        host_metrics = self.metrics.get(host)
+        if not host_metrics:
+            host_metrics = self.metrics[host] = HostMetrics()
+        return host_metrics
+
+    def add_request(self, url, latency, bytes_received=0, error=False):
+        with self.metrics_lock:
+            self.get_host_metrics(url).add_request(latency, bytes_received, error)
+
+    def add_bytes_received(self, url, bytes_received):
+        """
+        Add `bytes_received` for `url` such as the bytes of a streamed response.
+        """
+        with self.metrics_lock:
+            self.get_host_metrics(url).bytes_received += bytes_received
+
+    def reset_metrics(self):
+        """
+        Clear the metrics of all hosts such as at the start of a run.
+        """
+        with self.metrics_lock:
+            self.metrics = {}
+
+    def get_metrics(self):
+        """
+        Return a mapping of {host: metrics mapping} for all the hosts requested.
+        """
+        with self.metrics_lock:
+            return {host: metrics.to_dict() for host, metrics in self.metrics.items()}
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Return the HttpClient shared by all the fetchers of this process. Its
+    connection limits are set with the PURLDB_HTTP_MAX_CONNECTIONS_PER_HOST,
+    PURLDB_HTTP_HOST_LIMITS and PURLDB_HTTP_POOL_TIMEOUT settings.
+    """
+    global _http_client
+    if not _http_client:
+        with _http_client_lock:
+            if not _http_client:
+                _http_client = HttpClient(
+                    max_connections_per_host=getattr(
+                        settings,
+                        'PURLDB_HTTP_MAX_CONNECTIONS_PER_HOST',
+                        MAX_CONNECTIONS_PER_HOST,
+                    ),
+                    host_limits=getattr(settings, 'PURLDB_HTTP_HOST_LIMITS', {}),
+                    pool_timeout=getattr(
+                        settings, 'PURLDB_HTTP_POOL_TIMEOUT', POOL_TIMEOUT
+                    ),
+                )
+    return _http_client
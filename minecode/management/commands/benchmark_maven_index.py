@@ -0,0 +1,103 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import logging
+import os
+import sys
+import time
+
+from django.core.management.base import CommandError
+
+from minecode.management.commands import VerboseCommand
+from minecode.visitors import java_stream
+from minecode.visitors import maven
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout)
+logger.setLevel(logging.INFO)
+
+
+def get_entries_legacy(location, fields=frozenset(maven.ENTRY_FIELDS)):
+    """
+    Yield Maven index entry mappings from a Gzipped Maven nexus index data file
+    at `location` reading each field from a Java-like stream as done before
+    get_entries used decode_entries.
+    """
+    with maven.GzipFileWithTrailing(location, 'rb') as nexus_index:
+        jstream = java_stream.DataInputStream(nexus_index)
+        maven.decode_index_header(jstream)
+        while True:
+            try:
+                entry = maven.decode_entry(jstream, fields)
+            except EOFError:
+                break
+            if entry:
+                yield entry
+
+
+def benchmark(get_entries, location, fields):
+    """
+    Return a tuple of (duration in seconds, entries count, artifacts count)
+    for decoding the index at `location` with `get_entries` and building
+    artifacts from the decoded entries.
+    """
+    entries_count = 0
+    artifacts_count = 0
+    start = time.perf_counter()
+    for entry in get_entries(location, fields):
+        entries_count += 1
+        if maven.build_artifact(entry):
+            artifacts_count += 1
+    return time.perf_counter() - start, entries_count, artifacts_count
+
+
+class Command(VerboseCommand):
+    help = 'Benchmark the decoding of a Gzipped Maven Nexus index file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'location',
+            help='Path to a Gzipped Maven Nexus index file such as '
+                 'nexus-maven-repository-index.gz.',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            dest='compare',
+            default=False,
+            help='Also decode the index reading one field at a time from a '
+                 'Java-like stream and check that the entries are the same.',
+        )
+
+    def handle(self, *args, **options):
+        logger.setLevel(self.get_verbosity(**options))
+        location = options['location']
+        if not os.path.exists(location):
+            raise CommandError(f'Index file does not exist: {location}')
+
+        fields = frozenset(maven.ENTRY_FIELDS)
+        decoders = [('buffered', maven.get_entries)]
+        if options['compare']:
+            decoders.append(('legacy', get_entries_legacy))
+
+        counts = set()
+        for name, get_entries in decoders:
+            duration, entries_count, artifacts_count = benchmark(
+                get_entries, location, fields)
+            counts.add((entries_count, artifacts_count))
+            rate = entries_count / duration if duration else 0
+            self.stdout.write(
+                f'{name}: {entries_count} entries, {artifacts_count} artifacts '
+                f'in {duration:.2f}s: {rate:.0f} entries/s'
+            )
+
+        if len(counts) > 1:
+            raise CommandError('Decoded entries differ.')
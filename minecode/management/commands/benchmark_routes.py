@@ -0,0 +1,138 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import logging
+import sys
+import time
+
+from django.core.management.base import CommandError
+
+# NOTE: mappers and visitors are Unused Import here: But importing the mappers
+# module triggers routes registration
+from minecode import mappers  # NOQA
+from minecode import visitors  # NOQA
+from minecode import map_router
+from minecode import priority_router
+from minecode import visit_router
+from minecode.management.commands import VerboseCommand
+from minecode.models import ResourceURI
+from minecode.route import MultipleRoutesDefined
+from minecode.route import NoRouteAvailable
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout)
+logger.setLevel(logging.INFO)
+
+
+ROUTERS = {
+    'visit': visit_router,
+    'map': map_router,
+    'priority': priority_router,
+}
+
+
+def resolve_linear(router, uri):
+    """
+    Resolve `uri` with `router` matching `uri` against every route pattern as
+    done before the Router used a RuleIndex. Return an endpoint or an
+    exception class.
+    """
+    candidates = [r for r in router.route_map.values() if r.match(uri)]
+    if not candidates:
+        return NoRouteAvailable
+    if len(candidates) > 1:
+        return MultipleRoutesDefined
+    return candidates[0].endpoint
+
+
+def resolve_indexed(router, uri):
+    """
+    Resolve `uri` with `router`. Return an endpoint or an exception class.
+    """
+    try:
+        return router.resolve(uri)
+    except (NoRouteAvailable, MultipleRoutesDefined) as e:
+        return e.__class__
+
+
+def benchmark(resolver, router, uris, repeat):
+    """
+    Return the best duration in seconds of resolving all `uris` with
+    `resolver` and `router` out of `repeat` runs and the list of results.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [resolver(router, uri) for uri in uris]
+        durations.append(time.perf_counter() - start)
+    return min(durations), results
+
+
+class Command(VerboseCommand):
+    help = (
+        'Benchmark the resolution of URIs by the visit, map and priority '
+        'routers compared to matching URIs against every route pattern.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uris-file',
+            dest='uris_file',
+            help='Path to a file with one URI per line to resolve. '
+                 'Default to use URIs from the ResourceURI table.',
+        )
+        parser.add_argument(
+            '--limit',
+            dest='limit',
+            default=10000,
+            type=int,
+            help='Maximum number of URIs to resolve.',
+        )
+        parser.add_argument(
+            '--repeat',
+            dest='repeat',
+            default=3,
+            type=int,
+            help='Number of timed runs for each router.',
+        )
+
+    def handle(self, *args, **options):
+        logger.setLevel(self.get_verbosity(**options))
+        limit = options['limit']
+
+        uris_file = options.get('uris_file')
+        if uris_file:
+            with open(uris_file) as f:
+                uris = [line.strip() for line in f if line.strip()][:limit]
+        else:
+            uris = list(ResourceURI.objects.values_list('uri', flat=True)[:limit])
+
+        if not uris:
+            raise CommandError('No URIs to resolve.')
+
+        for name, router in ROUTERS.items():
+            linear_duration, linear_results = benchmark(
+                resolve_linear, router, uris, options['repeat'])
+            indexed_duration, indexed_results = benchmark(
+                resolve_indexed, router, uris, options['repeat'])
+
+            if linear_results != indexed_results:
+                raise CommandError(f'{name} router: resolved endpoints differ.')
+
+            routed = sum(1 for r in indexed_results if r is not NoRouteAvailable)
+            speedup = linear_duration / indexed_duration if indexed_duration else 0
+            self.stdout.write(
+                f'{name} router: {len(router.route_map)} routes, '
+                f'{len(uris)} URIs ({routed} routed): '
+                f'linear {linear_duration:.4f}s, '
+                f'indexed {indexed_duration:.4f}s, '
+                f'{speedup:.1f}x faster'
+            )
@@ -12,7 +12,6 @@ import signal
 import sys
 import time
 
-from django.db import transaction
 from django.utils import timezone
 
 # UnusedImport here!
@@ -23,6 +22,7 @@ from minecode.management.commands import get_error_message
 from minecode.management.commands import VerboseCommand
 from minecode.models import PriorityResourceURI
 from minecode.models import ScannableURI
+from minecode.models import release_batch
 from minecode.route import NoRouteAvailable
 
 
@@ -37,6 +37,9 @@ if TRACE:
 # sleep duration in seconds when the queue is empty
 SLEEP_WHEN_EMPTY = 10
 
+# number of PriorityResourceURI claimed at once
+REQUEST_BATCH_SIZE = 10
+
 MUST_STOP = False
 
 
@@ -65,42 +68,50 @@ class Command(VerboseCommand):
 
         sleeping = False
         processed_counter = 0
-
-        while True:
-            if MUST_STOP:
-                logger.info('Graceful exit of the request queue.')
-                break
-
-            with transaction.atomic():
-                priority_resource_uri = PriorityResourceURI.objects.get_next_request()
-
-            if not priority_resource_uri:
-                # Only log a single message when we go to sleep
-                if not sleeping:
-                    sleeping = True
-                    logger.info('No more processable request, sleeping...')
-
-                time.sleep(SLEEP_WHEN_EMPTY)
-                continue
-
-            sleeping = False
-
-            # process request
-            logger.info('Processing {}'.format(priority_resource_uri))
-            try:
-                errors = process_request(priority_resource_uri)
-            except Exception as e:
-                errors = 'Error: Failed to process PriorityResourceURI: {}\n'.format(
-                    repr(priority_resource_uri))
-                errors += get_error_message(e)
-            finally:
-                if errors:
-                    priority_resource_uri.processing_error = errors
-                    logger.error(errors)
-                priority_resource_uri.processed_date = timezone.now()
-                priority_resource_uri.wip_date = None
-                priority_resource_uri.save()
-                processed_counter += 1
+        # PriorityResourceURIs claimed for processing but not yet processed
+        claimed = []
+
+        try:
+            while True:
+                if MUST_STOP:
+                    logger.info('Graceful exit of the request queue.')
+                    break
+
+                if not claimed:
+                    claimed = PriorityResourceURI.objects.claim_batch(REQUEST_BATCH_SIZE)
+                priority_resource_uri = claimed and claimed.pop(0) or None
+
+                if not priority_resource_uri:
+                    # Only log a single message when we go to sleep
+                    if not sleeping:
+                        sleeping = True
+                        logger.info('No more processable request, sleeping...')
+
+                    time.sleep(SLEEP_WHEN_EMPTY)
+                    continue
+
+                sleeping = False
+
+                # process request
+                logger.info('Processing {}'.format(priority_resource_uri))
+                errors = None
+                try:
+                    errors = process_request(priority_resource_uri)
+                except Exception as e:
+                    errors = 'Error: Failed to process PriorityResourceURI: {}\n'.format(
+                        repr(priority_resource_uri))
+                    errors += get_error_message(e)
+                finally:
+                    if errors:
+                        priority_resource_uri.processing_error = errors
+                        logger.error(errors)
+                    priority_resource_uri.processed_date = timezone.now()
+                    priority_resource_uri.wip_date = None
+                    priority_resource_uri.save()
+                    processed_counter += 1
+        finally:
+            # put back the claimed PriorityResourceURIs that were not processed in the queue
+            release_batch(claimed)
 
         return processed_counter
 
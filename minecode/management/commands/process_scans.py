@@ -2,14 +2,22 @@
 # Copyright (c) 2018 by nexB, Inc. http://www.nexb.com/ - All rights reserved.
 #
 
+from collections import Counter
+from collections import defaultdict
 import logging
+import os
+import shutil
 import signal
 import sys
+import time
 import traceback
 
 from django.db import transaction
 
 from licensedcode.cache import build_spdx_license_expression
+from matchcode_toolkit.fingerprinting import create_halohash_chunks
+from matchcode_toolkit.fingerprinting import hexstring_to_binarray
+from matchcode_toolkit.fingerprinting import split_fingerprint
 from packagedcode.utils import combine_expressions
 
 from matchcode.models import ApproximateDirectoryContentIndex
@@ -18,7 +26,10 @@ from matchcode.models import ExactFileIndex
 from minecode.management import scanning
 from minecode.management.commands import get_error_message
 from minecode.models import ScannableURI
+from minecode.model_utils import build_resource
 from minecode.model_utils import merge_or_create_resource
+from minecode.utils import get_temp_file
+from packagedb.models import Resource
 
 
 logger = logging.getLogger(__name__)
@@ -30,6 +41,8 @@ class Command(scanning.ScanningCommand):
 
     logger = logger
 
+    claim_batch_size = 10
+
     help = ('Check scancode.io requested scans for status then fetch and process '
             'completed scans for indexing and updates.')
 
@@ -43,6 +56,36 @@ class Command(scanning.ScanningCommand):
             scannable_uri = ScannableURI.objects.get_next_processable()
         return scannable_uri
 
+    @classmethod
+    def get_next_uris(cls, size):
+        return ScannableURI.objects.claim_batch(size)
+
+    @classmethod
+    def set_process_scan_error(cls, scannable_uri, error_message):
+        """
+        Record an `error_message` for a `scannable_uri` ScannableURI that failed
+        to be processed.
+
+        A completed scan that failed to be indexed is an index error and its
+        status is set to "index failed". Otherwise, for instance when the status
+        of a scan could not be checked, this is a scan error and the status is
+        kept such that processing resumes from this status once the scan_error
+        is cleared.
+        """
+        # the status may have been updated in memory before the failure
+        scannable_uri.refresh_from_db(fields=['scan_status'])
+        if scannable_uri.scan_status != ScannableURI.SCAN_COMPLETED:
+            return super().set_process_scan_error(scannable_uri, error_message)
+
+        scannable_uri.index_error = error_message
+        scannable_uri.scan_status = ScannableURI.SCAN_INDEX_FAILED
+        scannable_uri.wip_date = None
+        ScannableURI.objects.filter(pk=scannable_uri.pk).update(
+            index_error=error_message,
+            scan_status=ScannableURI.SCAN_INDEX_FAILED,
+            wip_date=None,
+        )
+
     @classmethod
     def process_scan(cls, scannable_uri, get_scan_info_save_loc='', get_scan_data_save_loc='', **kwargs):
         """
@@ -76,15 +119,23 @@ class Command(scanning.ScanningCommand):
                     timeout = max(computed_timeout, scanning.REQUEST_TIMEOUT)
                 else:
                     timeout = scanning.REQUEST_TIMEOUT
-                scan_data = scanning.get_scan_data(
-                    scannable_uri.scan_uuid,
-                    api_url=cls.api_url,
-                    api_auth_headers=cls.api_auth_headers,
-                    timeout=timeout,
-                    get_scan_data_save_loc=get_scan_data_save_loc
-                )
-                indexing_errors = index_package_files(package, scan_data, reindex=rescan)
-                scan_index_errors.extend(indexing_errors)
+                # The scan data is fully fetched and validated before anything
+                # is indexed or deleted, then parsed incrementally from disk
+                scan_data_loc = get_scan_data_save_loc or get_temp_file('scan_data', '.json')
+                try:
+                    scanning.download_scan_data(
+                        scannable_uri.scan_uuid,
+                        location=scan_data_loc,
+                        api_url=cls.api_url,
+                        api_auth_headers=cls.api_auth_headers,
+                        timeout=timeout,
+                    )
+                    scan_data = dict(files=scanning.iter_scan_data_files(scan_data_loc))
+                    indexing_errors = index_package_files(package, scan_data, reindex=rescan)
+                    scan_index_errors.extend(indexing_errors)
+                finally:
+                    if not get_scan_data_save_loc:
+                        shutil.rmtree(os.path.dirname(scan_data_loc), ignore_errors=True)
 
                 summary = scanning.get_scan_summary(
                     scannable_uri.scan_uuid,
@@ -228,7 +279,7 @@ def _update_package_checksums(package, scan_object):
     return updated
 
 
-def index_package_files(package, scan_data, reindex=False):
+def index_package_files(package, scan_data, reindex=False, bulk=True, batch_size=1000):
     """
     Index scan data for `package` Package.
 
@@ -236,6 +287,10 @@ def index_package_files(package, scan_data, reindex=False):
 
     If `reindex` is True, then all fingerprints related to `package` will be
     deleted and recreated from `scan_data`.
+
+    If `bulk` is True, Resources and fingerprints are written using bulk
+    inserts of `batch_size` rows per table. Otherwise, they are written one
+    at a time.
     """
     if reindex:
         logger.info(f'Deleting fingerprints and Resources related to {package.package_url}')
@@ -247,32 +302,14 @@ def index_package_files(package, scan_data, reindex=False):
     scan_index_errors = []
     try:
         logger.info(f'Indexing Resources and fingerprints related to {package.package_url} from scan data')
-        for resource in scan_data.get('files', []):
-            r, _, _ = merge_or_create_resource(package, resource)
-            path = r.path
-            sha1 = r.sha1
-            if sha1:
-                _, _ = ExactFileIndex.index(
-                    sha1=sha1,
-                    package=package
-                )
-
-            resource_extra_data = resource.get('extra_data', {})
-            directory_content_fingerprint = resource_extra_data.get('directory_content', '')
-            directory_structure_fingerprint = resource_extra_data.get('directory_structure', '')
-
-            if directory_content_fingerprint:
-                _, _ = ApproximateDirectoryContentIndex.index(
-                    directory_fingerprint=directory_content_fingerprint,
-                    resource_path=path,
-                    package=package,
-                )
-            if directory_structure_fingerprint:
-                _, _ = ApproximateDirectoryStructureIndex.index(
-                    directory_fingerprint=directory_structure_fingerprint,
-                    resource_path=path,
-                    package=package,
-                )
+        resources = scan_data.get('files', [])
+        if bulk:
+            writer = BulkIndexWriter(package, batch_size=batch_size)
+            writer.index_resources(resources)
+            for line in writer.get_report():
+                logger.info(line)
+        else:
+            _index_package_files(package, resources)
 
     except Exception as e:
         msg = get_error_message(e)
@@ -280,3 +317,158 @@ def index_package_files(package, scan_data, reindex=False):
         logger.error(msg)
 
     return scan_index_errors
+
+
+def _index_package_files(package, resources):
+    """
+    Index the scanned `resources` mappings of `package` Package one at a time.
+    """
+    for resource in resources:
+        r, _, _ = merge_or_create_resource(package, resource)
+        path = r.path
+        sha1 = r.sha1
+        if sha1:
+            _, _ = ExactFileIndex.index(
+                sha1=sha1,
+                package=package
+            )
+
+        resource_extra_data = resource.get('extra_data', {})
+        directory_content_fingerprint = resource_extra_data.get('directory_content', '')
+        directory_structure_fingerprint = resource_extra_data.get('directory_structure', '')
+
+        if directory_content_fingerprint:
+            _, _ = ApproximateDirectoryContentIndex.index(
+                directory_fingerprint=directory_content_fingerprint,
+                resource_path=path,
+                package=package,
+            )
+        if directory_structure_fingerprint:
+            _, _ = ApproximateDirectoryStructureIndex.index(
+                directory_fingerprint=directory_structure_fingerprint,
+                resource_path=path,
+                package=package,
+            )
+
+
+class BulkIndexWriter:
+    """
+    Write the Resources and the ExactFileIndex,
+    ApproximateDirectoryContentIndex and ApproximateDirectoryStructureIndex
+    fingerprints of a `package` Package using bulk inserts of `batch_size` rows
+    per table.
+
+    Rows that already exist are ignored, except for existing Resources which
+    are updated with their new scan results one at a time.
+    """
+
+    def __init__(self, package, batch_size=1000):
+        self.package = package
+        self.batch_size = batch_size
+        self.batches = defaultdict(list)
+        # number of rows submitted and seconds spent writing, keyed by model
+        self.counts = Counter()
+        self.timings = Counter()
+
+        self.existing_paths = set(
+            package.resources.values_list('path', flat=True)
+        )
+        # ExactFileIndex has no unique constraint: track the indexed SHA1 to
+        # avoid duplicated rows
+        self.indexed_sha1s = set(
+            bytes(sha1) for sha1 in
+            package.exactfileindex_set.values_list('sha1', flat=True)
+        )
+
+    def index_resources(self, resources):
+        """
+        Index an iterable of scanned `resources` mappings and write all
+        pending rows.
+        """
+        for resource_data in resources:
+            self.index_resource(resource_data)
+        self.flush()
+
+    def index_resource(self, resource_data):
+        """
+        Queue the Resource and fingerprints of the scanned `resource_data`
+        mapping for writing.
+        """
+        package = self.package
+        path = resource_data.get('path')
+        if path in self.existing_paths:
+            resource, _, _ = merge_or_create_resource(package, resource_data)
+            self.counts[Resource] += 1
+        else:
+            resource = build_resource(package, resource_data)
+            resource.set_scan_results(resource_data)
+            self.existing_paths.add(path)
+            self.add(resource)
+
+        sha1 = resource.sha1
+        if sha1:
+            sha1 = bytes(hexstring_to_binarray(sha1))
+            if sha1 not in self.indexed_sha1s:
+                self.indexed_sha1s.add(sha1)
+                self.add(ExactFileIndex(package=package, sha1=sha1))
+
+        extra_data = resource_data.get('extra_data', {})
+        fingerprints = [
+            (ApproximateDirectoryContentIndex, extra_data.get('directory_content', '')),
+            (ApproximateDirectoryStructureIndex, extra_data.get('directory_structure', '')),
+        ]
+        for model, directory_fingerprint in fingerprints:
+            if not directory_fingerprint:
+                continue
+            indexed_elements_count, fp = split_fingerprint(directory_fingerprint)
+            chunk1, chunk2, chunk3, chunk4 = create_halohash_chunks(fp)
+            self.add(
+                model(
+                    indexed_elements_count=indexed_elements_count,
+                    chunk1=chunk1,
+                    chunk2=chunk2,
+                    chunk3=chunk3,
+                    chunk4=chunk4,
+                    path=path,
+                    package=package,
+                )
+            )
+
+    def add(self, obj):
+        """
+        Queue the unsaved model instance `obj` and write its batch when full.
+        """
+        model = obj.__class__
+        batch = self.batches[model]
+        batch.append(obj)
+        if len(batch) >= self.batch_size:
+            self.write(model)
+
+    def write(self, model):
+        """
+        Write the pending rows of `model`.
+        """
+        batch = self.batches.pop(model, [])
+        if not batch:
+            return
+        start = time.time()
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        self.timings[model] += time.time() - start
+        self.counts[model] += len(batch)
+
+    def flush(self):
+        """
+        Write all the pending rows.
+        """
+        for model in list(self.batches):
+            self.write(model)
+
+    def get_report(self):
+        """
+        Return a list of per-table report lines with the number of rows
+        written and the time spent writing them.
+        """
+        return [
+            f'{model.__name__}: {count} rows written in {self.timings[model]:.2f} seconds'
+            for model, count in self.counts.items()
+        ]
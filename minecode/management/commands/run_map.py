@@ -8,11 +8,14 @@
 #
 
 
+from concurrent.futures import ProcessPoolExecutor
 import logging
+import multiprocessing
 import signal
 import sys
 import time
 
+import django
 from django.db import transaction
 from django.utils import timezone
 
@@ -26,7 +29,9 @@ from minecode.models import ResourceURI
 from minecode.management.commands import get_error_message
 from minecode.management.commands import VerboseCommand
 from minecode.model_utils import merge_or_create_package
+from minecode.model_utils import merge_or_create_packages
 from minecode.models import ScannableURI
+from minecode.models import release_batch
 
 
 TRACE = True
@@ -67,15 +72,55 @@ class Command(VerboseCommand):
             action='store_true',
             help='Do not loop forever. Exit when the queue is empty.')
 
+        parser.add_argument(
+            '--processes',
+            dest='processes',
+            default=1,
+            type=int,
+            help='Number of worker processes used to run the mappers. '
+                 'Default to 1 to map in the current process.')
+
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            default=MAP_BATCH_SIZE,
+            type=int,
+            help='Number of ResourceURIs claimed, mapped and saved at once. '
+                 f'Default to {MAP_BATCH_SIZE}.')
+
     def handle(self, *args, **options):
         """
         Get the next available candidate ResourceURI and start the processing.
         Loops forever and sleeps a short while if there are no ResourceURI left to map.
         """
-        global MUST_STOP
-
         logger.setLevel(self.get_verbosity(**options))
         exit_on_empty = options.get('exit_on_empty')
+        processes = options.get('processes') or 1
+        batch_size = options.get('batch_size') or MAP_BATCH_SIZE
+
+        executor = None
+        if processes > 1:
+            # Mappers are CPU bound: run these in worker processes each with
+            # their own Django setup and database connection. Only this
+            # process writes to the database.
+            executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+
+        try:
+            self.map_loop(executor, batch_size, exit_on_empty)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def map_loop(self, executor, batch_size, exit_on_empty):
+        """
+        Map batches of `batch_size` ResourceURIs using the `executor` pool of
+        processes if provided.
+        """
+        global MUST_STOP
 
         sleeping = False
 
@@ -84,7 +129,7 @@ class Command(VerboseCommand):
                 logger.info('Graceful exit of the map loop.')
                 break
 
-            mappables = ResourceURI.objects.get_mappables()[:MAP_BATCH_SIZE]
+            mappables = ResourceURI.objects.claim_mappable_batch(batch_size)
 
             if not mappables:
                 if exit_on_empty:
@@ -103,12 +148,19 @@ class Command(VerboseCommand):
 
             for resource_uri in mappables:
                 logger.info('Mapping {}'.format(resource_uri))
-                map_uri(resource_uri)
+            try:
+                map_uris(mappables, executor=executor)
+            except BaseException:
+                # put back in the queue the claimed ResourceURIs that were not
+                # saved as mapped such as when a worker process died
+                release_batch(mappables)
+                raise
 
 
-def map_uri(resource_uri, _map_router=map_router):
+def get_mapped_packages(resource_uri, _map_router=map_router):
     """
-    Call a mapper for a ResourceURI.
+    Call a mapper for a ResourceURI. Return a tuple of (list of mapped
+    PackageData, map error message).
     `_map_router` is the Router to use for routing. Used for tests only.
     """
     # FIXME: returning a string or sequence is UGLY
@@ -125,25 +177,137 @@ def map_uri(resource_uri, _map_router=map_router):
         if not mapped_scanned_packages:
             msg = 'No visited scanned packages returned.'
             logger.error(msg)
-            resource_uri.last_map_date = timezone.now()
-            resource_uri.map_error = msg
-            resource_uri.save()
-            return
+            return [], msg
 
     except Exception as e:
         msg = 'Error: Failed to map while processing ResourceURI: {}\n'.format(
             repr(resource_uri))
         msg += get_error_message(e)
         logger.error(msg)
-        # we had an error, so mapped_scanned_packages is an error string
+        return [], msg
+
+    return mapped_scanned_packages, None
+
+
+def map_uris(resource_uris, executor=None, _map_router=map_router):
+    """
+    Call the mappers for a batch of `resource_uris` ResourceURIs and save all
+    their mapped packages at once.
+
+    The mappers run in the `executor` pool of processes if provided. Otherwise
+    they run one at a time in this process.
+    `_map_router` is the Router to use for routing. Used for tests only.
+    """
+    if executor:
+        mapped = executor.map(get_mapped_packages, resource_uris)
+    else:
+        mapped = (
+            get_mapped_packages(resource_uri, _map_router=_map_router)
+            for resource_uri in resource_uris
+        )
+
+    mapped_resource_uris = []
+    for resource_uri, (mapped_scanned_packages, map_error) in zip(resource_uris, mapped):
+        resource_uri.map_error = map_error
+        if not map_error:
+            mapped_resource_uris.append((resource_uri, mapped_scanned_packages))
+
+    try:
+        with transaction.atomic():
+            save_mapped_packages(mapped_resource_uris)
+    except Exception as e:
+        logger.error(
+            'Error: Failed to save mapped packages of {} ResourceURIs: '
+            'saving them one at a time.\n'.format(len(mapped_resource_uris))
+            + get_error_message(e)
+        )
+        for resource_uri, mapped_scanned_packages in mapped_resource_uris:
+            resource_uri.map_error = save_mapped_packages_of_resource_uri(
+                resource_uri,
+                mapped_scanned_packages,
+            )
+
+    # finally flag and save the processed resource_uris as mapped
+    now = timezone.now()
+    for resource_uri in resource_uris:
+        resource_uri.last_map_date = now
+        resource_uri.wip_date = None
+        # always set the map error, resetting it to empty if the mapping was
+        # succesful
+        resource_uri.map_error = resource_uri.map_error or None
+        resource_uri._prepare_save()
+    ResourceURI.objects.bulk_update(
+        resource_uris,
+        fields=['last_map_date', 'wip_date', 'map_error', 'has_map_error'],
+    )
+
+
+def save_mapped_packages(mapped_resource_uris):
+    """
+    Save the packages mapped from ResourceURIs in bulk given a list of
+    (resource_uri, mapped_scanned_packages) tuples and add the new Packages to
+    the scan queue. Set the map_error of each ResourceURI.
+    """
+    scanned_packages = []
+    resource_uri_indexes = []
+    for index, (resource_uri, mapped_scanned_packages) in enumerate(mapped_resource_uris):
+        for scanned_package in mapped_scanned_packages:
+            scanned_packages.append((scanned_package, resource_uri.mining_level))
+            resource_uri_indexes.append(index)
+
+    results = merge_or_create_packages(scanned_packages)
+
+    map_errors = [''] * len(mapped_resource_uris)
+    scannable_uris = []
+    for index, (package, package_created, _, m_err) in zip(resource_uri_indexes, results):
+        map_errors[index] += m_err
+        if package_created:
+            # Add this Package to the scan queue
+            scannable_uris.append(
+                ScannableURI(uri=package.download_url, package=package)
+            )
+    ScannableURI.objects.bulk_insert(scannable_uris)
+    logger.debug(' + Inserted {} ScannableURI'.format(len(scannable_uris)))
+
+    for (resource_uri, _), map_error in zip(mapped_resource_uris, map_errors):
+        resource_uri.map_error = map_error
+
+
+def map_uri(resource_uri, _map_router=map_router):
+    """
+    Call a mapper for a ResourceURI.
+    `_map_router` is the Router to use for routing. Used for tests only.
+    """
+    mapped_scanned_packages, map_error = get_mapped_packages(resource_uri, _map_router=_map_router)
+    if map_error:
         resource_uri.last_map_date = timezone.now()
-        resource_uri.map_error = msg
+        resource_uri.wip_date = None
+        resource_uri.map_error = map_error
         resource_uri.save()
         return
 
     # if we reached this place, we have mapped_scanned_packages that contains
     # packages in ScanCode models format that these are ready to save to the DB
+    map_error = save_mapped_packages_of_resource_uri(resource_uri, mapped_scanned_packages)
+
+    # finally flag and save the processed resource_uri as mapped
+    resource_uri.last_map_date = timezone.now()
+    resource_uri.wip_date = None
+    # always set the map error, resetting it to empty if the mapping was
+    # succesful
+    if map_error:
+        resource_uri.map_error = map_error
+    else:
+        resource_uri.map_error = None
+    resource_uri.save()
 
+
+def save_mapped_packages_of_resource_uri(resource_uri, mapped_scanned_packages):
+    """
+    Save the `mapped_scanned_packages` PackageData mapped from `resource_uri`
+    ResourceURI one at a time and add the new Packages to the scan queue.
+    Return a map error message.
+    """
     map_error = ''
 
     try:
@@ -176,13 +340,4 @@ def map_uri(resource_uri, _map_router=map_router):
         # this is enough to save the error to the ResourceURI which is done at last
         map_error += msg
 
-    # finally flag and save the processed resource_uri as mapped
-    resource_uri.last_map_date = timezone.now()
-    resource_uri.wip_date = None
-    # always set the map error, resetting it to empty if the mapping was
-    # succesful
-    if map_error:
-        resource_uri.map_error = map_error
-    else:
-        resource_uri.map_error = None
-    resource_uri.save()
+    return map_error
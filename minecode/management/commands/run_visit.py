@@ -28,11 +28,14 @@ from minecode import mappers  # NOQA
 from minecode import visitors  # NOQA
 from minecode import visit_router
 
+from minecode.http_client import get_http_client
 from minecode.management.commands import get_error_message
 from minecode.management.commands import VerboseCommand
 
 from minecode.models import ResourceURI
+from minecode.models import release_batch
 from minecode.route import NoRouteAvailable
+from minecode.visitors import Checkpoint
 
 
 logger = logging.getLogger(__name__)
@@ -47,6 +50,12 @@ if TRACE:
 # sleep duration in seconds when the queue is empty
 SLEEP_WHEN_EMPTY = 10
 
+# number of visitable ResourceURI claimed at once
+VISIT_BATCH_SIZE = 10
+
+# number of URIs yielded by a visit that are inserted at once
+INSERT_BATCH_SIZE = 1000
+
 # Create a global cache for robots.txt. Note that this is process specific and does
 # not span multiple workers
 robots = reppy.cache.RobotsCache()
@@ -129,6 +138,8 @@ class Command(VerboseCommand):
         ignore_robots = options.get('ignore_robots')
         ignore_throttle = options.get('ignore_throttle')
 
+        # only report the requests of this run
+        get_http_client().reset_metrics()
         visited_counter, inserted_counter = visit_uris(
             ignore_robots=ignore_robots,
             ignore_throttle=ignore_throttle,
@@ -139,6 +150,12 @@ class Command(VerboseCommand):
 
         self.stdout.write('Visited {} URIs'.format(visited_counter))
         self.stdout.write('Inserted {} new URIs'.format(inserted_counter))
+        for host, metrics in sorted(get_http_client().get_metrics().items()):
+            self.stdout.write(
+                '{host}: {requests} requests, {errors} errors, '
+                '{bytes_received} bytes received in {latency_total:.2f}s'.format(
+                    host=host, **metrics)
+            )
 
 
 def visit_uris(ignore_robots=False, ignore_throttle=False,
@@ -161,60 +178,67 @@ def visit_uris(ignore_robots=False, ignore_throttle=False,
     uri_counter_by_visitor = Counter()
 
     sleeping = False
+    # ResourceURIs claimed for visit but not yet visited
+    claimed = []
 
-    while True:
-        if MUST_STOP:
-            logger.info('Graceful exit of the visit loop.')
-            break
-
-        with transaction.atomic():
-            resource_uri = ResourceURI.objects.get_next_visitable()
-
-        if not resource_uri:
-            if exit_on_empty:
-                logger.info('exit-on-empty requested: No more visitable resource, exiting...')
+    try:
+        while True:
+            if MUST_STOP:
+                logger.info('Graceful exit of the visit loop.')
                 break
 
-            # Only log a single message when we go to sleep
-            if not sleeping:
-                sleeping = True
-                logger.info('No more visitable resource, sleeping...')
-
-            time.sleep(SLEEP_WHEN_EMPTY)
-            continue
-
-        sleeping = False
+            if not claimed:
+                claimed = ResourceURI.objects.claim_batch(VISIT_BATCH_SIZE)
+            resource_uri = claimed and claimed.pop(0) or None
 
-        if not ignore_robots and robots.disallowed(resource_uri.uri, user_agent):
-            msg = 'Denied by robots.txt'
-            logger.error(msg)
-            resource_uri.last_visit_date = timezone.now()
-            resource_uri.wip_date = None
-            resource_uri.visit_error = msg
-            resource_uri.save()
-            continue
+            if not resource_uri:
+                if exit_on_empty:
+                    logger.info('exit-on-empty requested: No more visitable resource, exiting...')
+                    break
 
-        if not ignore_throttle:
-            sleep_time = get_sleep_time(resource_uri)
-            if sleep_time:
-                logger.debug('Respecting revisit delay: wait for {} for {}'.format(sleep_time, resource_uri.uri))
-                time.sleep(sleep_time)
-            # Set new value in cache 'visit_delay_by_hostname' right before making the request
-            # TODO: The cache logic should move closer to the requests calls
-            uri_hostname = reppy.Utility.hostname(resource_uri.uri)
-            visit_delay_by_hostname.set(uri_hostname, timezone.now())
+                # Only log a single message when we go to sleep
+                if not sleeping:
+                    sleeping = True
+                    logger.info('No more visitable resource, sleeping...')
 
-        # visit proper
-        logger.info('Visiting {}'.format(resource_uri))
-        visited_counter += 1
+                time.sleep(SLEEP_WHEN_EMPTY)
+                continue
 
-        inserted_counter += visit_uri(
-            resource_uri=resource_uri, max_uris=max_uris,
-            uri_counter_by_visitor=uri_counter_by_visitor)
+            sleeping = False
 
-        if max_loops and int(visited_counter) > int(max_loops):
-            logger.info('Stopping visits after max_loops: {} visit loops.'.format(max_loops))
-            break
+            if not ignore_robots and robots.disallowed(resource_uri.uri, user_agent):
+                msg = 'Denied by robots.txt'
+                logger.error(msg)
+                resource_uri.last_visit_date = timezone.now()
+                resource_uri.wip_date = None
+                resource_uri.visit_error = msg
+                resource_uri.save()
+                continue
+
+            if not ignore_throttle:
+                sleep_time = get_sleep_time(resource_uri)
+                if sleep_time:
+                    logger.debug('Respecting revisit delay: wait for {} for {}'.format(sleep_time, resource_uri.uri))
+                    time.sleep(sleep_time)
+                # Set new value in cache 'visit_delay_by_hostname' right before making the request
+                # TODO: The cache logic should move closer to the requests calls
+                uri_hostname = reppy.Utility.hostname(resource_uri.uri)
+                visit_delay_by_hostname.set(uri_hostname, timezone.now())
+
+            # visit proper
+            logger.info('Visiting {}'.format(resource_uri))
+            visited_counter += 1
+
+            inserted_counter += visit_uri(
+                resource_uri=resource_uri, max_uris=max_uris,
+                uri_counter_by_visitor=uri_counter_by_visitor)
+
+            if max_loops and int(visited_counter) > int(max_loops):
+                logger.info('Stopping visits after max_loops: {} visit loops.'.format(max_loops))
+                break
+    finally:
+        # put back the claimed ResourceURIs that were not visited in the queue
+        release_batch(claimed)
 
     return visited_counter, inserted_counter
 
@@ -289,71 +313,67 @@ def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_rout
     new_uris_to_visit = new_uris_to_visit or []
 
     inserted_count = 0
+    # URIs yielded by the visit and not yet inserted
+    batch = []
+    must_stop = False
 
     try:
-        # NOTE: new_uris_to_visit here is an iterable of visitors.URI
-        # objects, NEITHER strings NOR ResourceURI models
-        # TODO: use batching for inserts or create for more efficient DB processing
-        for vuri_count, vuri in enumerate(new_uris_to_visit):
-            # FIXME: should we really do this smart_str here??
-            uri_str = smart_str(vuri.uri)
-            visited_uri = vuri.to_dict()
-
-            last_modified_date = visited_uri.pop('date')
-            if last_modified_date:
-                visited_uri['last_modified_date'] = last_modified_date
-
-            if vuri_count % 1000 == 0:
-                logger.debug(' * Processed: {} visited URIs'.format(vuri_count))
+        try:
+            # NOTE: new_uris_to_visit here is an iterable of visitors.URI
+            # objects, NEITHER strings NOR ResourceURI models, and of optional
+            # visitors.Checkpoint markers
+            for vuri_count, vuri in enumerate(new_uris_to_visit):
+                if vuri_count % 1000 == 0:
+                    logger.debug(' * Processed: {} visited URIs'.format(vuri_count))
+
+                is_checkpoint = isinstance(vuri, Checkpoint)
+                if not is_checkpoint:
+                    batch.append(vuri)
+
+                if batch and (is_checkpoint or len(batch) >= INSERT_BATCH_SIZE):
+                    pending, batch = batch, []
+                    inserted, must_stop = insert_visited_uris(
+                        pending,
+                        visit_errors=visit_errors,
+                        max_uris=max_uris,
+                        uri_counter_by_visitor=uri_counter_by_visitor,
+                        visitor_key=visitor_key,
+                    )
+                    inserted_count += inserted
+                    if must_stop:
+                        break
+
+                # Record progress once all the URIs so far were processed. The
+                # URIs that could not be stored are recorded in visit_errors:
+                # visiting them again would fail again.
+                if is_checkpoint:
+                    vuri.save()
+
+        except Exception as e:
+            msg = 'Visit error for URI: {}'.format(uri_to_visit)
+            msg += '\n'.format(uri_to_visit)
+            msg += get_error_message(e)
+            visit_errors.append(msg)
+            logger.error(msg)
 
+        # Insert the remaining URIs including the URIs yielded before a visit
+        # failure: these would be lost otherwise.
+        if batch and not must_stop:
             try:
-                # insert new if pre-visited
-                pre_visited = visited_uri.pop('visited')
-                if pre_visited:
-                    # set last visit date for this pre-visited URI
-                    visited_uri['last_visit_date'] = timezone.now()
-                    new_uri = ResourceURI(**visited_uri)
-                    new_uri.save()
-                    logger.debug(' + Inserted pre-visited:\t{}'.format(uri_str))
-                    inserted_count += 1
-                    if max_uris:
-                        uri_counter_by_visitor[visitor_key] += 1
-                else:
-                    # if not pre-visited only insert if not existing
-                    if not ResourceURI.objects.filter(uri=vuri.uri, last_visit_date=None).exists():
-                        visited_uri['last_visit_date'] = None
-                        new_uri = ResourceURI(**visited_uri)
-                        new_uri.save()
-                        logger.debug(' + Inserted new:\t{}'.format(uri_str))
-                        inserted_count += 1
-                        if max_uris:
-                            uri_counter_by_visitor[visitor_key] += 1
-                    else:
-                        logger.debug(' + NOT Inserted:\t{}'.format(uri_str))
-
+                inserted, _ = insert_visited_uris(
+                    batch,
+                    visit_errors=visit_errors,
+                    max_uris=max_uris,
+                    uri_counter_by_visitor=uri_counter_by_visitor,
+                    visitor_key=visitor_key,
+                )
+                inserted_count += inserted
             except Exception as e:
-                # FIXME: is catching all expections here correct?
-                msg = 'ERROR while processing URI from a visit through: {}'.format(uri_str)
-                msg += '\n'
-                msg += repr(visited_uri)
-                msg += '\n'
+                msg = 'Visit error for URI: {}'.format(uri_to_visit)
+                msg += '\n'.format(uri_to_visit)
                 msg += get_error_message(e)
                 visit_errors.append(msg)
                 logger.error(msg)
-                if len(visit_errors) > 10:
-                    logger.error(' ! Breaking after processing over 10 vuris errors for: {}'.format(uri_str))
-                    break
-
-            if max_uris and int(uri_counter_by_visitor[visitor_key]) > int(max_uris):
-                logger.info(' ! Breaking after processing max-uris: {} URIs.'.format(max_uris))
-                break
-
-    except Exception as e:
-        msg = 'Visit error for URI: {}'.format(uri_to_visit)
-        msg += '\n'.format(uri_to_visit)
-        msg += get_error_message(e)
-        visit_errors.append(msg)
-        logger.error(msg)
 
     finally:
         # Flag the processed resource_uri as completed and attach data.
@@ -371,6 +391,117 @@ def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_rout
     return inserted_count
 
 
+def insert_visited_uris(vuris, visit_errors, max_uris=0, uri_counter_by_visitor=None, visitor_key=None):
+    """
+    Insert a batch of `vuris` visitors.URI objects yielded by a visit as new
+    ResourceURIs. Pre-visited URIs are always inserted. Other URIs are inserted
+    only if there is no ResourceURI with the same URI pending a visit.
+
+    Append error messages to the `visit_errors` list. Count the inserted URIs
+    in the `uri_counter_by_visitor` Counter for `visitor_key` when `max_uris`
+    is set.
+
+    Return a tuple of (inserted count, must stop) where must stop is True if no
+    more URIs from this visit should be inserted.
+    """
+    pending_visit = set(
+        ResourceURI.objects.filter(
+            uri__in=[vuri.uri for vuri in vuris if not vuri.visited],
+            last_visit_date=None,
+        ).values_list('uri', flat=True)
+    )
+
+    new_uris = []
+    skipped_count = 0
+    must_stop = False
+    for vuri in vuris:
+        # FIXME: should we really do this smart_str here??
+        uri_str = smart_str(vuri.uri)
+        visited_uri = vuri.to_dict()
+
+        try:
+            last_modified_date = visited_uri.pop('date')
+            if last_modified_date:
+                visited_uri['last_modified_date'] = last_modified_date
+
+            # insert new if pre-visited
+            pre_visited = visited_uri.pop('visited')
+            if pre_visited:
+                # set last visit date for this pre-visited URI
+                visited_uri['last_visit_date'] = timezone.now()
+            elif vuri.uri in pending_visit:
+                # if not pre-visited only insert if not existing
+                logger.debug(' + NOT Inserted:\t{}'.format(uri_str))
+                skipped_count += 1
+                continue
+            else:
+                visited_uri['last_visit_date'] = None
+
+            # compute and validate fields here such that an invalid URI is
+            # reported alone rather than failing the insert of the whole batch
+            resource_uri = ResourceURI(**visited_uri)
+            resource_uri._prepare_save()
+
+            if pre_visited:
+                logger.debug(' + Inserted pre-visited:\t{}'.format(uri_str))
+            else:
+                pending_visit.add(vuri.uri)
+                logger.debug(' + Inserted new:\t{}'.format(uri_str))
+
+            new_uris.append(resource_uri)
+
+        except Exception as e:
+            # FIXME: is catching all expections here correct?
+            msg = 'ERROR while processing URI from a visit through: {}'.format(uri_str)
+            msg += '\n'
+            msg += repr(visited_uri)
+            msg += '\n'
+            msg += get_error_message(e)
+            visit_errors.append(msg)
+            logger.error(msg)
+            if len(visit_errors) > 10:
+                logger.error(' ! Breaking after processing over 10 vuris errors for: {}'.format(uri_str))
+                must_stop = True
+                break
+            continue
+
+        if max_uris:
+            uri_counter_by_visitor[visitor_key] += 1
+            if int(uri_counter_by_visitor[visitor_key]) > int(max_uris):
+                logger.info(' ! Breaking after processing max-uris: {} URIs.'.format(max_uris))
+                must_stop = True
+                break
+
+    inserted_count = len(new_uris)
+    try:
+        # use a savepoint such that the transaction is usable after an error
+        with transaction.atomic():
+            ResourceURI.objects.bulk_create(new_uris, batch_size=INSERT_BATCH_SIZE, ignore_conflicts=True)
+    except Exception as e:
+        logger.error(
+            'ERROR while inserting {} URIs from a visit: inserting them one at a time.\n'.format(len(new_uris))
+            + get_error_message(e)
+        )
+        inserted_count = 0
+        for resource_uri in new_uris:
+            try:
+                with transaction.atomic():
+                    ResourceURI.objects.bulk_create([resource_uri], ignore_conflicts=True)
+                inserted_count += 1
+            except Exception as e:
+                msg = 'ERROR while inserting URI from a visit: {}'.format(smart_str(resource_uri.uri))
+                msg += '\n'
+                msg += get_error_message(e)
+                visit_errors.append(msg)
+                logger.error(msg)
+                if max_uris:
+                    # only count the inserted URIs
+                    uri_counter_by_visitor[visitor_key] -= 1
+
+    logger.info(' + Inserted {} new URI(s), skipped {} existing URI(s).'.format(inserted_count, skipped_count))
+    return inserted_count, must_stop
+
+
 def get_sleep_time(resource_uri, minimum_delay_between_visits=1, user_agent=USER_AGENT):
     """
     Return the sleep time in seconds the worker should wait in order to
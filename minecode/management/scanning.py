@@ -1,6 +1,9 @@
 #
 # Copyright (c) 2018 by nexB, Inc. http://www.nexb.com/ - All rights reserved.
 #
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from uuid import uuid4
 import hashlib
 import logging
@@ -9,11 +12,16 @@ import time
 import json
 
 import attr
+import ijson
 import requests
 
 from django.conf import settings
+from django.db import connections
 
 from minecode.management.commands import VerboseCommand
+from minecode.management.commands import get_error_message
+from minecode.models import ScannableURI
+from minecode.models import release_batch
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout)
@@ -25,6 +33,9 @@ SLEEP_WHEN_EMPTY = 1
 # in seconds
 REQUEST_TIMEOUT = 120
 
+# size in bytes of the chunks read when saving streamed scan data
+SCAN_DATA_CHUNK_SIZE = 1024 * 1024
+
 # Only SCANCODEIO_URL can be provided through setting
 SCANCODEIO_URL = settings.SCANCODEIO_URL
 SCANCODEIO_API_URL = f'{SCANCODEIO_URL.rstrip("/")}/api/' if SCANCODEIO_URL else None
@@ -350,6 +361,47 @@ def get_scan_data(
     return results
 
 
+def download_scan_data(
+    scan_uuid,
+    location,
+    api_url=SCANCODEIO_API_URL_PROJECTS,
+    api_auth_headers=SCANCODEIO_AUTH_HEADERS,
+    timeout=REQUEST_TIMEOUT,
+):
+    """
+    Save the scan details data for a `scan_uuid` fetched from ScanCode.io to
+    the `location` file. Raise an exception on error.
+
+    The whole response is received and checked to be a complete and valid JSON
+    document before returning such that a failed or truncated fetch is
+    reported as an error rather than indexed as partial scan data.
+    """
+    scan_url = get_scan_url(scan_uuid, api_url=api_url, suffix='results')
+    with requests.get(url=scan_url, timeout=timeout, headers=api_auth_headers, stream=True) as response:
+        if not response.ok:
+            response.raise_for_status()
+        with open(location, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=SCAN_DATA_CHUNK_SIZE):
+                f.write(chunk)
+
+    # parse the whole document: ijson raises an exception on invalid JSON
+    with open(location, 'rb') as f:
+        for _event in ijson.parse(f):
+            pass
+
+
+def iter_scan_data_files(location):
+    """
+    Yield the scanned file mappings of the scan details data saved at
+    `location` by download_scan_data, one at a time.
+
+    The scan data is parsed incrementally such that memory usage does not grow
+    with the size of the scan.
+    """
+    with open(location, 'rb') as f:
+        yield from ijson.items(f, 'files.item', use_float=True)
+
+
 def get_scan_summary(
     scan_uuid,
     api_url=SCANCODEIO_API_URL_PROJECTS,
@@ -386,6 +438,9 @@ class ScanningCommand(VerboseCommand):
 
     api_auth_headers = SCANCODEIO_AUTH_HEADERS
 
+    # number of ScannableURIs claimed at once with get_next_uris
+    claim_batch_size = 1
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--exit-on-empty',
@@ -402,20 +457,36 @@ class ScanningCommand(VerboseCommand):
             help='Limit the number of Scannable URIs processed to a maximum number. '
                  '0 means no limit. Used only for testing.')
 
+        parser.add_argument(
+            '--workers',
+            dest='workers',
+            type=int,
+            default=1,
+            action='store',
+            help='Number of Scannable URIs processed concurrently in worker threads. '
+                 'Default to 1 which processes them one at a time.')
+
     def handle(self, *args, **options):
         exit_on_empty = options.get('exit_on_empty')
         max_uris = options.get('max_uris', 0)
+        workers = options.get('workers') or 1
 
-        uris_counter = self.process_scans(
+        if workers > 1:
+            process_scans = self.process_scans_concurrently
+        else:
+            process_scans = self.process_scans
+
+        uris_counter = process_scans(
             exit_on_empty=exit_on_empty,
             max_uris=max_uris,
+            workers=workers,
             # Pass options to allow subclasses to add their own options
             options=options
         )
         self.stdout.write('Processed {} ScannableURI.'.format(uris_counter))
 
     @classmethod
-    def process_scans(cls, exit_on_empty=False, max_uris=0, **kwargs):
+    def process_scans(cls, exit_on_empty=False, max_uris=0, workers=1, **kwargs):
         """
         Run an infinite scan processing loop. Return a processed URis count.
 
@@ -425,42 +496,147 @@ class ScanningCommand(VerboseCommand):
         """
         uris_counter = 0
         sleeping = False
+        # ScannableURIs claimed for processing but not yet processed
+        claimed = []
 
-        while True:
-            # Wait before processing anything
-            time.sleep(3)
+        try:
+            while True:
+                # Wait before processing anything
+                time.sleep(3)
 
-            if cls.MUST_STOP:
-                cls.logger.info('Graceful exit of the scan processing loop.')
-                break
+                if cls.MUST_STOP:
+                    cls.logger.info('Graceful exit of the scan processing loop.')
+                    break
 
-            if max_uris and uris_counter >= max_uris:
-                cls.logger.info('max_uris requested reached: exiting scan processing loop.')
-                break
+                if max_uris and uris_counter >= max_uris:
+                    cls.logger.info('max_uris requested reached: exiting scan processing loop.')
+                    break
 
-            scannable_uri = cls.get_next_uri()
+                if not claimed:
+                    claimed = cls.get_next_uris(cls.claim_batch_size)
+                scannable_uri = claimed and claimed.pop(0) or None
 
-            if not scannable_uri:
-                if exit_on_empty:
-                    cls.logger.info('exit-on-empty requested: No more scannable URIs, exiting...')
-                    break
+                if not scannable_uri:
+                    if exit_on_empty:
+                        cls.logger.info('exit-on-empty requested: No more scannable URIs, exiting...')
+                        break
 
-                # Only log a single message when we go to sleep
-                if not sleeping:
-                    sleeping = True
-                    cls.logger.info('No more scannable URIs, sleeping for at least {} seconds...'.format(SLEEP_WHEN_EMPTY))
+                    # Only log a single message when we go to sleep
+                    if not sleeping:
+                        sleeping = True
+                        cls.logger.info('No more scannable URIs, sleeping for at least {} seconds...'.format(SLEEP_WHEN_EMPTY))
 
-                time.sleep(SLEEP_WHEN_EMPTY)
-                continue
+                    time.sleep(SLEEP_WHEN_EMPTY)
+                    continue
 
-            cls.logger.info('Processing scannable URI: {}'.format(scannable_uri))
+                cls.logger.info('Processing scannable URI: {}'.format(scannable_uri))
 
-            cls.process_scan(scannable_uri, **kwargs)
-            uris_counter += 1
-            sleeping = False
+                cls.process_scan(scannable_uri, **kwargs)
+                uris_counter += 1
+                sleeping = False
+        finally:
+            # put back the claimed ScannableURIs that were not processed in the queue
+            release_batch(claimed)
 
         return uris_counter
 
+    @classmethod
+    def process_scans_concurrently(cls, exit_on_empty=False, max_uris=0, workers=4, **kwargs):
+        """
+        Run an infinite scan processing loop using a pool of `workers` threads.
+        Return a processed URis count.
+
+        Like process_scans, but up to `workers` ScannableURIs are processed at
+        once such that waiting on ScanCode.io API calls for one ScannableURI
+        overlaps with the processing of the others. ScannableURIs are still
+        claimed in the main thread.
+        """
+        uris_counter = 0
+        sleeping = False
+        in_flight = set()
+        # ScannableURIs claimed for processing but not yet submitted to a worker
+        claimed = []
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    if cls.MUST_STOP:
+                        cls.logger.info('Graceful exit of the scan processing loop.')
+                        break
+
+                    if max_uris and uris_counter >= max_uris:
+                        cls.logger.info('max_uris requested reached: exiting scan processing loop.')
+                        break
+
+                    if len(in_flight) >= workers:
+                        _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        continue
+
+                    if not claimed:
+                        claimed = cls.get_next_uris(max(cls.claim_batch_size, workers))
+                    scannable_uri = claimed and claimed.pop(0) or None
+
+                    if not scannable_uri:
+                        if in_flight:
+                            # ScannableURIs being processed may become processable again
+                            _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            continue
+
+                        if exit_on_empty:
+                            cls.logger.info('exit-on-empty requested: No more scannable URIs, exiting...')
+                            break
+
+                        # Only log a single message when we go to sleep
+                        if not sleeping:
+                            sleeping = True
+                            cls.logger.info('No more scannable URIs, sleeping for at least {} seconds...'.format(SLEEP_WHEN_EMPTY))
+
+                        time.sleep(SLEEP_WHEN_EMPTY)
+                        continue
+
+                    cls.logger.info('Processing scannable URI: {}'.format(scannable_uri))
+
+                    future = executor.submit(cls.process_scan_in_thread, scannable_uri, **kwargs)
+                    in_flight.add(future)
+                    uris_counter += 1
+                    sleeping = False
+        finally:
+            # put back the claimed ScannableURIs that were not submitted in the queue
+            release_batch(claimed)
+
+        return uris_counter
+
+    @classmethod
+    def process_scan_in_thread(cls, scannable_uri, **kwargs):
+        """
+        Process a single `scannable_uri` ScannableURI from a worker thread.
+        Log and record exceptions on the ScannableURI and do not raise them.
+        """
+        try:
+            cls.process_scan(scannable_uri, **kwargs)
+        except Exception as e:
+            msg = f'Error processing scannable URI: {scannable_uri}\n'
+            msg += get_error_message(e)
+            cls.logger.error(msg)
+            cls.set_process_scan_error(scannable_uri, msg)
+        finally:
+            # Each thread uses its own database connection
+            connections.close_all()
+
+    @classmethod
+    def set_process_scan_error(cls, scannable_uri, error_message):
+        """
+        Record an `error_message` for a `scannable_uri` ScannableURI that failed
+        to be processed and release it such that it is not processed again.
+        Subclasses can override this to record the error of their own step.
+        """
+        scannable_uri.scan_error = error_message[:5000]
+        scannable_uri.wip_date = None
+        ScannableURI.objects.filter(pk=scannable_uri.pk).update(
+            scan_error=scannable_uri.scan_error,
+            wip_date=None,
+        )
+
     @classmethod
     def get_next_uri(self):
         """
@@ -473,6 +649,16 @@ class ScanningCommand(VerboseCommand):
         """
         pass
 
+    @classmethod
+    def get_next_uris(cls, size):
+        """
+        Return a list of up to `size` locked ScannableURIs for processing.
+        Subclasses can override this to claim ScannableURIs in batches.
+        Otherwise, a single ScannableURI from get_next_uri is returned.
+        """
+        scannable_uri = cls.get_next_uri()
+        return scannable_uri and [scannable_uri] or []
+
     @classmethod
     def process_scan(scannable_uri, **kwargs):
         """
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecode', '0031_importableuri'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MavenIndexCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_uri', models.CharField(help_text='URI of a Maven Nexus index file.', max_length=2048, unique=True)),
+                ('chain_id', models.CharField(blank=True, help_text='Nexus index chain id of an increment. Increments are numbered again when a new chain starts.', max_length=255, null=True)),
+                ('increment', models.PositiveIntegerField(blank=True, db_index=True, help_text='Number of an increment index or null for a full index.', null=True)),
+                ('artifacts_count', models.PositiveBigIntegerField(default=0, help_text='Number of index artifacts processed so far. The URIs of these artifacts are already stored as ResourceURIs.')),
+                ('completed_date', models.DateTimeField(blank=True, db_index=True, help_text='Timestamp set when all the index artifacts were processed.', null=True)),
+                ('last_updated_date', models.DateTimeField(auto_now=True, help_text='Timestamp set when this checkpoint was last updated.')),
+            ],
+            options={
+                'verbose_name': 'Maven index checkpoint',
+            },
+        ),
+    ]
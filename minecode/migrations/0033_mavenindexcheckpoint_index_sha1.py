@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecode', '0032_mavenindexcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mavenindexcheckpoint',
+            name='index_sha1',
+            field=models.CharField(blank=True, help_text='SHA1 of the index file being processed. A visit only resumes after the processed artifacts of the same index file.', max_length=40, null=True),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import functools
 import logging
 import sys
 
@@ -12,9 +13,11 @@ from packagedb.models import PackageSet
 from packagedb.models import Party
 from packagedb.models import Resource
 from packagedb.serializers import DependentPackageSerializer
+from packagedb.serializers import PackageMetadataSerializer
 from packagedb.serializers import PartySerializer
 from packagedcode.models import PackageData
 from minecode.utils import stringify_null_purl_fields
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
 
 TRACE = False
@@ -37,7 +40,48 @@ def add_package_to_scan_queue(package):
         logger.debug(' + Inserted ScannableURI\t: {}'.format(uri))
 
 
-def merge_packages(existing_package, new_package_data, replace=False):
+# Package fields merged by merge_packages in the order of the fields of the
+# PackageMetadataSerializer. The `purl` is computed from the other purl fields,
+# `package_sets` are not merged and the other fields are computed properties.
+MERGED_PACKAGE_FIELDS = tuple(
+    field for field in PackageMetadataSerializer.Meta.fields
+    if field not in (
+        'purl',
+        'package_sets',
+        'package_uid',
+        'declared_license_expression_spdx',
+        'other_license_expression_spdx',
+    )
+)
+
+CHECKSUM_FIELDS = ('md5', 'sha1', 'sha256', 'sha512')
+
+
+@functools.lru_cache(maxsize=1)
+def get_package_serializer_fields():
+    """
+    Return a mapping of {field name: serializer field} of the
+    PackageMetadataSerializer used to represent Package field values the same
+    way as Package.to_dict() does, without serializing a whole Package.
+    """
+    return dict(PackageMetadataSerializer().fields)
+
+
+def get_package_field_value(package, field):
+    """
+    Return the value of the `field` of the `package` Package as represented in
+    Package.to_dict().
+    """
+    if field == 'package_content':
+        return package.get_package_content_display()
+
+    value = getattr(package, field)
+    if value is None:
+        return
+    return get_package_serializer_fields()[field].to_representation(value)
+
+
+def merge_packages(existing_package, new_package_data, replace=False, save=True):
     """
     Merge the data from the `new_package_data` mapping into the
     `existing_package` Package model object.
@@ -50,13 +94,15 @@ def merge_packages(existing_package, new_package_data, replace=False):
     existing_package field value will be replaced by the new_package
     field value. Otherwise if `replace` is False, the existing_package
     field value is left unchanged in this case.
-    """
-    existing_mapping = existing_package.to_dict()
 
-    # We remove `purl` from `existing_mapping` because we use the other purl
-    # fields (type, namespace, name, version, etc.) to generate the purl.
-    existing_mapping.pop('purl')
+    The field values are compared directly on the model object and the
+    related parties and dependencies are only loaded when there are new
+    values for these. The updated `existing_package` is saved if `save` is
+    True.
 
+    Return a list of {field, old_value, new_value} mappings for each updated
+    field.
+    """
     # FIXME REMOVE this workaround when a ScanCode bug fixed with
     # https://github.com/nexB/scancode-toolkit/commit/9b687e6f9bbb695a10030a81be7b93c8b1d816c2
     qualifiers = new_package_data.get('qualifiers')
@@ -67,131 +113,194 @@ def merge_packages(existing_package, new_package_data, replace=False):
 
     new_mapping = new_package_data
 
-    fields_to_skip = (
-        'package_uid',
-        'declared_license_expression_spdx',
-        'other_license_expression_spdx',
-    )
     updated_fields = []
 
-    for existing_field, existing_value in existing_mapping.items():
+    for existing_field in MERGED_PACKAGE_FIELDS:
         new_value = new_mapping.get(existing_field)
-        if TRACE:
-            logger.debug(
-                '\n'.join([
-                    'existing_field:', repr(existing_field),
-                    '    existing_value:', repr(existing_value),
-                    '    new_value:', repr(new_value)])
-            )
-
-        # FIXME: handle Booleans??? though there are none for now
 
         # If the checksum from `new_package` is different than the one
         # existing checksum in `existing_package`, there is a big data
         # inconsistency issue and an Exception is raised
-        if (existing_field in ('md5', 'sha1', 'sha256', 'sha512') and
-                existing_value and
-                new_value and
-                existing_value != new_value):
-            raise Exception(
-                '\n'.join([
-                    'Mismatched {} for {}:'.format(existing_field, existing_package.uri),
-                    '    existing_value: {}'.format(existing_value),
-                    '    new_value: {}'.format(new_value)
-                ])
-            )
+        if existing_field in CHECKSUM_FIELDS:
+            existing_value = getattr(existing_package, existing_field)
+            if existing_value and new_value and existing_value != new_value:
+                raise Exception(
+                    '\n'.join([
+                        'Mismatched {} for {}:'.format(existing_field, existing_package.uri),
+                        '    existing_value: {}'.format(existing_value),
+                        '    new_value: {}'.format(new_value)
+                    ])
+                )
 
         if not new_value:
             if TRACE:
-                logger.debug('  No new value: skipping')
-            continue
-
-        if not existing_value or replace:
-            if TRACE and not existing_value:
                 logger.debug(
-                    '  No existing value: set to new: {}'.format(new_value))
+                    'existing_field: {}: No new value: skipping'.format(existing_field))
+            continue
 
-            if TRACE and replace:
-                logger.debug(
-                    '  Existing value and replace: set to new: {}'.format(new_value))
-
-            if existing_field == 'parties':
-                # If `existing_field` is `parties`, then we update the `Party` table
-                parties = new_value
-                existing_parties = Party.objects.filter(package=existing_package)
-                serialized_existing_parties = PartySerializer(existing_parties, many=True).data
-                if replace:
-                    # Delete existing Party objects
-                    existing_parties.delete()
-                for party in parties:
-                    _party, _created = Party.objects.get_or_create(
-                        package=existing_package,
-                        type=party['type'],
-                        role=party['role'],
-                        name=party['name'],
-                        email=party['email'],
-                        url=party['url'],
-                    )
-                entry = dict(
-                    field=existing_field,
-                    old_value=serialized_existing_parties,
-                    new_value=parties,
-                )
+        if existing_field == 'parties':
+            # If `existing_field` is `parties`, then we update the `Party` table
+            entry = merge_related(
+                existing_package,
+                related_name='parties',
+                model=Party,
+                serializer=PartySerializer,
+                new_values=new_value,
+                replace=replace,
+            )
+            if entry:
                 updated_fields.append(entry)
-                continue
-            elif existing_field == 'dependencies':
-                # If `existing_field` is `dependencies`, then we update the `DependentPackage` table
-                dependencies = new_value
-                existing_dependencies = DependentPackage.objects.filter(package=existing_package)
-                serialized_existing_dependencies = DependentPackageSerializer(existing_dependencies, many=True).data
-                if replace:
-                    # Delete existing DependentPackage objects
-                    existing_dependencies.delete()
-                for dependency in dependencies:
-                    _dep, _created = DependentPackage.objects.get_or_create(
-                        package=existing_package,
-                        purl=dependency['purl'],
-                        extracted_requirement=dependency['extracted_requirement'],
-                        scope=dependency['scope'],
-                        is_runtime=dependency['is_runtime'],
-                        is_optional=dependency['is_optional'],
-                        is_resolved=dependency['is_resolved'],
-                    )
-                entry = dict(
-                    field=existing_field,
-                    old_value=serialized_existing_dependencies,
-                    new_value=dependencies,
-                )
+            continue
+
+        elif existing_field == 'dependencies':
+            # If `existing_field` is `dependencies`, then we update the
+            # `DependentPackage` table
+            entry = merge_related(
+                existing_package,
+                related_name='dependencies',
+                model=DependentPackage,
+                serializer=DependentPackageSerializer,
+                new_values=new_value,
+                replace=replace,
+            )
+            if entry:
                 updated_fields.append(entry)
-                continue
-            elif existing_field == 'package_content':
-                # get new_value from extra_data
-                new_value = new_mapping.extra_data.get('package_content')
-                if not new_value:
-                    continue
-            elif existing_field in fields_to_skip:
-                # Continue to next field
-                continue
+            continue
 
-            # If `existing_field` is not `parties` or `dependencies`, then the
-            # `existing_field` is a regular field on the Package model and can
-            # be updated normally.
-            entry = dict(
-                field=existing_field,
-                old_value=existing_value,
-                new_value=new_value
+        existing_value = get_package_field_value(existing_package, existing_field)
+        if TRACE:
+            logger.debug(
+                '\n'.join([
+                    'existing_field:', repr(existing_field),
+                    '    existing_value:', repr(existing_value),
+                    '    new_value:', repr(new_value)])
             )
-            updated_fields.append(entry)
-            setattr(existing_package, existing_field, new_value)
-            existing_package.last_modified_date = timezone.now()
-            existing_package.save()
 
+        if existing_value and not replace:
+            if TRACE:
+                logger.debug('  Existing value and no replace: Nothing done')
+            continue
+
+        if existing_field == 'package_content':
+            # get new_value from extra_data
+            new_value = new_mapping.extra_data.get('package_content')
+            if not new_value:
+                continue
+
+        # Otherwise the `existing_field` is a regular field on the Package
+        # model and can be updated normally.
         if TRACE:
-            logger.debug('  Nothing done')
+            logger.debug('  Set to new: {}'.format(new_value))
+        entry = dict(
+            field=existing_field,
+            old_value=existing_value,
+            new_value=new_value
+        )
+        updated_fields.append(entry)
+        setattr(existing_package, existing_field, new_value)
+        existing_package.last_modified_date = timezone.now()
+
+    if save and updated_fields:
+        existing_package.save()
 
     return updated_fields
 
 
+def merge_related(existing_package, related_name, model, serializer, new_values, replace=False):
+    """
+    Merge the `new_values` list of mappings in the `related_name` related
+    objects of `model` of the `existing_package` Package. Existing related
+    objects are replaced if `replace` is True and left unchanged otherwise.
+
+    Return an updated field {field, old_value, new_value} mapping or None if
+    nothing was updated.
+    """
+    # This uses prefetched related objects when available
+    existing_objects = list(getattr(existing_package, related_name).all())
+    if existing_objects and not replace:
+        return
+
+    serialized_existing_objects = serializer(existing_objects, many=True).data
+    if existing_objects:
+        # Delete existing related objects
+        model.objects.filter(package=existing_package).delete()
+
+    fields = serializer.Meta.fields
+    new_objects = {}
+    for new_object in new_values:
+        values = tuple(new_object[field] for field in fields)
+        new_objects[values] = model(package=existing_package, **dict(zip(fields, values)))
+    model.objects.bulk_create(new_objects.values())
+
+    prefetched_objects = getattr(existing_package, '_prefetched_objects_cache', {})
+    prefetched_objects.pop(related_name, None)
+
+    return dict(
+        field=related_name,
+        old_value=serialized_existing_objects,
+        new_value=new_values,
+    )
+
+
+def merge_packages_in_bulk(merges, save=True):
+    """
+    Merge many packages at once given a `merges` list of (existing_package,
+    new_package_data, replace) tuples as done by merge_packages.
+
+    The related parties and dependencies of the packages with new values for
+    these are fetched together and the updated Packages are saved with a
+    single bulk update if `save` is True.
+
+    Return a list of updated fields lists in the same order as `merges`.
+    """
+    with_related = [
+        existing_package
+        for existing_package, new_package_data, _ in merges
+        if new_package_data.get('parties') or new_package_data.get('dependencies')
+    ]
+    prefetch_related_objects(with_related, 'parties', 'dependencies')
+
+    all_updated_fields = []
+    for existing_package, new_package_data, replace in merges:
+        updated_fields = merge_packages(
+            existing_package=existing_package,
+            new_package_data=new_package_data,
+            replace=replace,
+            save=False,
+        )
+        all_updated_fields.append(updated_fields)
+
+    if save:
+        updated_packages = [
+            existing_package
+            for (existing_package, _, _), updated_fields in zip(merges, all_updated_fields)
+            if updated_fields
+        ]
+        bulk_update_packages(updated_packages, all_updated_fields)
+
+    return all_updated_fields
+
+
+def bulk_update_packages(packages, all_updated_fields, fields=()):
+    """
+    Save the `packages` list of Packages with a bulk update of the fields
+    listed in the `all_updated_fields` list of updated fields lists as
+    returned by merge_packages_in_bulk plus the `fields` field names.
+    """
+    if not packages:
+        return
+
+    fields = set(fields)
+    fields.add('last_modified_date')
+    for updated_fields in all_updated_fields:
+        fields.update(entry['field'] for entry in updated_fields)
+    # These are related tables that are already updated
+    fields.discard('parties')
+    fields.discard('dependencies')
+
+    Package.objects.bulk_update(packages, fields=sorted(fields))
+
+
 def merge_or_create_package(scanned_package, visit_level):
     """
     Update Package from `scanned_package` instance if `visit_level` is greater
@@ -221,7 +330,6 @@ def merge_or_create_package(scanned_package, visit_level):
 
     package_uri = scanned_package.download_url
     logger.debug('Package URI: {}'.format(package_uri))
-    history = scanned_package.extra_data.get('history', [])
 
     stored_package = None
     # Check if we already have an existing PackageDB record to update
@@ -234,56 +342,7 @@ def merge_or_create_package(scanned_package, visit_level):
         pass
 
     if stored_package:
-        # Here we have a pre-existing package that we are updating.
-        # Based on the mining levels, we replace or merge fields
-        # differently
-
-        existing_level = stored_package.mining_level
-
-        if visit_level < existing_level:
-            # if the level of the new visit is lower than the level
-            # of the current package, then existing package data
-            # wins and is more important. Its attributes can only be
-            # updated if there was a null values and there is a non-
-            # null values in the new package data from the visit.
-            updated_fields = merge_packages(
-                existing_package=stored_package,
-                new_package_data=scanned_package.to_dict(),
-                replace=False)
-            # for a foreign key, such as dependencies and parties, we will adopt the
-            # same logic. In this case, parties or dependencies coming from a scanned
-            # package are only added if there is no parties or dependencies in the
-            # existing stored package
-        else:
-            # if the level of the new visit is higher or equal to
-            # the level of the existing package, then new package
-            # data from the visit is more important and wins and its
-            # non-null values replace the values of the existing
-            # package which is updated in the DB.
-            updated_fields = merge_packages(
-                existing_package=stored_package,
-                new_package_data=scanned_package.to_dict(),
-                replace=True)
-            # for a foreign key, such as dependencies and parties, we will adopt the
-            # same logic. In this case, parties or dependencies coming from a scanned
-            # package will override existing values. If there are parties in the scanned
-            # package and the existing package, the existing package parties should be
-            # deleted first and then the new package's parties added.
-
-            stored_package.mining_level = visit_level
-
-        if updated_fields:
-            data = {
-                'updated_fields': updated_fields,
-            }
-            stored_package.append_to_history('Package field values have been updated.', data=data)
-
-        # TODO: append updated_fields information to the package's history
-
-        stored_package.last_modified_date = timezone.now()
-        stored_package.save()
-        logger.debug(' + Updated package\t: {}'.format(package_uri))
-        package = stored_package
+        package = merge_stored_package(stored_package, scanned_package, visit_level)
         merged = True
 
     else:
@@ -300,100 +359,16 @@ def merge_or_create_package(scanned_package, visit_level):
             version=scanned_package.version,
         )
         existing_related_package = existing_related_packages.first()
-        package_content = scanned_package.extra_data.get('package_content')
-
-        package_data = dict(
-            # FIXME: we should get the file_name in the
-            # PackageData object instead.
-            filename=fileutils.file_name(package_uri),
-            # TODO: update the PackageDB model
-            release_date=scanned_package.release_date,
-            mining_level=visit_level,
-            type=scanned_package.type,
-            namespace=scanned_package.namespace,
-            name=scanned_package.name,
-            version=scanned_package.version,
-            qualifiers=normalize_qualifiers(scanned_package.qualifiers, encode=True),
-            subpath=scanned_package.subpath,
-            primary_language=scanned_package.primary_language,
-            description=scanned_package.description,
-            keywords=scanned_package.keywords,
-            homepage_url=scanned_package.homepage_url,
-            download_url=scanned_package.download_url,
-            size=scanned_package.size,
-            sha1=scanned_package.sha1,
-            md5=scanned_package.md5,
-            sha256=scanned_package.sha256,
-            sha512=scanned_package.sha512,
-            bug_tracking_url=scanned_package.bug_tracking_url,
-            code_view_url=scanned_package.code_view_url,
-            vcs_url=scanned_package.vcs_url,
-            copyright=scanned_package.copyright,
-            holder=scanned_package.holder,
-            declared_license_expression=scanned_package.declared_license_expression,
-            license_detections=scanned_package.license_detections,
-            other_license_expression=scanned_package.other_license_expression,
-            other_license_detections=scanned_package.other_license_detections,
-            extracted_license_statement=scanned_package.extracted_license_statement,
-            notice_text=scanned_package.notice_text,
-            source_packages=scanned_package.source_packages,
-            package_content=package_content,
-        )
-
-        stringify_null_purl_fields(package_data)
-
-        created_package = Package.objects.create(**package_data)
-        created_package.append_to_history('New Package created from URI: {}'.format(package_uri))
 
-        # This is used in the case of Maven packages created from the priority queue
-        for h in history:
-            created_package.append_to_history(h)
+        created_package = build_package(scanned_package, visit_level)
+        created_package.save()
 
         if existing_related_package:
-            related_package_sets_count = existing_related_package.package_sets.count()
-            if (
-                related_package_sets_count == 0
-                or (
-                    related_package_sets_count > 0
-                    and created_package.package_content == PackageContentType.BINARY
-                )
-            ):
-                # Binary packages can only be part of one set
-                package_set = PackageSet.objects.create()
-                package_set.add_to_package_set(existing_related_package)
-                package_set.add_to_package_set(created_package)
-            elif (
-                related_package_sets_count > 0
-                and created_package.package_content != PackageContentType.BINARY
-            ):
-                for package_set in existing_related_package.package_sets.all():
-                    package_set.add_to_package_set(created_package)
-
-        for party in scanned_package.parties:
-            Party.objects.create(
-                package=created_package,
-                type=party.type,
-                role=party.role,
-                name=party.name,
-                email=party.email,
-                url=party.url,
-            )
+            add_to_related_package_set(created_package, existing_related_package)
 
-        for dependency in scanned_package.dependencies:
-            DependentPackage.objects.create(
-                package=created_package,
-                purl=dependency.purl,
-                extracted_requirement=dependency.extracted_requirement,
-                scope=dependency.scope,
-                is_runtime=dependency.is_runtime,
-                is_optional=dependency.is_optional,
-                is_resolved=dependency.is_resolved,
-            )
+        Party.objects.bulk_create(build_parties(created_package, scanned_package))
+        DependentPackage.objects.bulk_create(build_dependencies(created_package, scanned_package))
 
-        time = timezone.now()
-        created_package.created_date = time
-        created_package.last_modified_date = time
-        created_package.save()
         package = created_package
         created = True
         logger.debug(' + Inserted package\t: {}'.format(package_uri))
@@ -401,6 +376,325 @@ def merge_or_create_package(scanned_package, visit_level):
     return package, created, merged, map_error
 
 
+def merge_or_create_packages(scanned_packages):
+    """
+    Update or create Packages from a list of (`scanned_package`, `visit_level`)
+    tuples like merge_or_create_package does for a single `scanned_package`.
+
+    Existing Packages are fetched with a single query and new Packages and
+    their Party and DependentPackage are created using bulk inserts.
+
+    Return a list of (package, created, merged, map_error) tuples in the same
+    order as `scanned_packages`.
+    """
+    for scanned_package, _ in scanned_packages:
+        if not isinstance(scanned_package, PackageData):
+            msg = 'Not a ScanCode PackageData type:' + repr(scanned_package)
+            logger.error(msg)
+            raise RuntimeError(msg)
+
+    download_urls = set(
+        scanned_package.download_url
+        for scanned_package, _ in scanned_packages
+        if scanned_package.download_url
+    )
+    stored_packages = {}
+    for package in Package.objects.filter(download_url__in=download_urls):
+        stored_packages.setdefault(package.download_url, package)
+
+    results = [None] * len(scanned_packages)
+    merged_packages = []
+    created_packages = []
+    # Packages without download URL or with a download URL already seen in
+    # this batch are processed one at a time once the new Packages are created
+    deferred = []
+    seen_download_urls = set()
+    for index, (scanned_package, visit_level) in enumerate(scanned_packages):
+        package_uri = scanned_package.download_url
+        if not package_uri or package_uri in seen_download_urls:
+            deferred.append(index)
+            continue
+        seen_download_urls.add(package_uri)
+
+        stored_package = stored_packages.get(package_uri)
+        if stored_package:
+            merged_packages.append((index, stored_package, scanned_package, visit_level))
+        else:
+            package = build_package(scanned_package, visit_level)
+            created_packages.append((index, package, scanned_package))
+
+    if merged_packages:
+        merge_stored_packages([
+            (stored_package, scanned_package, visit_level)
+            for _, stored_package, scanned_package, visit_level in merged_packages
+        ])
+        for index, stored_package, _, _ in merged_packages:
+            results[index] = stored_package, False, True, ''
+
+    if created_packages:
+        Package.objects.bulk_create([package for _, package, _ in created_packages])
+
+        # Check to see if we have a package with the same purl, so we can use
+        # that package_set value
+        related_packages = {}
+        related_candidates = Package.objects.filter(
+            name__in=set(package.name for _, package, _ in created_packages),
+        ).exclude(
+            pk__in=[package.pk for _, package, _ in created_packages],
+        )
+        for package in related_candidates:
+            purl_key = package.type, package.namespace, package.name, package.version
+            related_packages.setdefault(purl_key, package)
+
+        parties = []
+        dependencies = []
+        for index, package, scanned_package in created_packages:
+            purl_key = (
+                scanned_package.type,
+                scanned_package.namespace,
+                scanned_package.name,
+                scanned_package.version,
+            )
+            existing_related_package = related_packages.get(purl_key)
+            if existing_related_package:
+                add_to_related_package_set(package, existing_related_package)
+            else:
+                # A Package created earlier in this batch is related to the next ones
+                related_packages[purl_key] = package
+
+            parties.extend(build_parties(package, scanned_package))
+            dependencies.extend(build_dependencies(package, scanned_package))
+            results[index] = package, True, False, ''
+            logger.debug(' + Inserted package\t: {}'.format(scanned_package.download_url))
+
+        Party.objects.bulk_create(parties)
+        DependentPackage.objects.bulk_create(dependencies)
+
+    for index in deferred:
+        scanned_package, visit_level = scanned_packages[index]
+        results[index] = merge_or_create_package(scanned_package, visit_level)
+
+    return results
+
+
+def merge_stored_package(stored_package, scanned_package, visit_level):
+    """
+    Update and save the existing `stored_package` Package with the data of
+    `scanned_package` based on `visit_level` and the mining level of
+    `stored_package`. Return the updated Package.
+    """
+    # Here we have a pre-existing package that we are updating.
+    # Based on the mining levels, we replace or merge fields
+    # differently
+
+    existing_level = stored_package.mining_level
+
+    if visit_level < existing_level:
+        # if the level of the new visit is lower than the level
+        # of the current package, then existing package data
+        # wins and is more important. Its attributes can only be
+        # updated if there was a null values and there is a non-
+        # null values in the new package data from the visit.
+        updated_fields = merge_packages(
+            existing_package=stored_package,
+            new_package_data=scanned_package.to_dict(),
+            replace=False)
+        # for a foreign key, such as dependencies and parties, we will adopt the
+        # same logic. In this case, parties or dependencies coming from a scanned
+        # package are only added if there is no parties or dependencies in the
+        # existing stored package
+    else:
+        # if the level of the new visit is higher or equal to
+        # the level of the existing package, then new package
+        # data from the visit is more important and wins and its
+        # non-null values replace the values of the existing
+        # package which is updated in the DB.
+        updated_fields = merge_packages(
+            existing_package=stored_package,
+            new_package_data=scanned_package.to_dict(),
+            replace=True)
+        # for a foreign key, such as dependencies and parties, we will adopt the
+        # same logic. In this case, parties or dependencies coming from a scanned
+        # package will override existing values. If there are parties in the scanned
+        # package and the existing package, the existing package parties should be
+        # deleted first and then the new package's parties added.
+
+        stored_package.mining_level = visit_level
+
+    if updated_fields:
+        data = {
+            'updated_fields': updated_fields,
+        }
+        stored_package.append_to_history('Package field values have been updated.', data=data)
+
+    # TODO: append updated_fields information to the package's history
+
+    stored_package.last_modified_date = timezone.now()
+    stored_package.save()
+    logger.debug(' + Updated package\t: {}'.format(scanned_package.download_url))
+    return stored_package
+
+
+def merge_stored_packages(merges):
+    """
+    Update and save many existing Packages at once given a `merges` list of
+    (stored_package, scanned_package, visit_level) tuples as done by
+    merge_stored_package.
+    """
+    package_merges = []
+    for stored_package, scanned_package, visit_level in merges:
+        # The new package data wins if the visit level is higher or equal to
+        # the level of the existing package
+        replace = visit_level >= stored_package.mining_level
+        package_merges.append((stored_package, scanned_package.to_dict(), replace))
+
+    all_updated_fields = merge_packages_in_bulk(package_merges, save=False)
+
+    now = timezone.now()
+    for (stored_package, scanned_package, visit_level), updated_fields in zip(merges, all_updated_fields):
+        if visit_level >= stored_package.mining_level:
+            stored_package.mining_level = visit_level
+
+        if updated_fields:
+            data = {
+                'updated_fields': updated_fields,
+            }
+            stored_package.append_to_history('Package field values have been updated.', data=data)
+
+        stored_package.last_modified_date = now
+        logger.debug(' + Updated package\t: {}'.format(scanned_package.download_url))
+
+    bulk_update_packages(
+        packages=[stored_package for stored_package, _, _ in merges],
+        all_updated_fields=all_updated_fields,
+        fields=['mining_level'],
+    )
+
+
+def build_package(scanned_package, visit_level):
+    """
+    Return a new unsaved Package built from the `scanned_package` PackageData
+    collected at `visit_level`.
+    """
+    package_uri = scanned_package.download_url
+    package_content = scanned_package.extra_data.get('package_content')
+
+    package_data = dict(
+        # FIXME: we should get the file_name in the
+        # PackageData object instead.
+        filename=fileutils.file_name(package_uri),
+        # TODO: update the PackageDB model
+        release_date=scanned_package.release_date,
+        mining_level=visit_level,
+        type=scanned_package.type,
+        namespace=scanned_package.namespace,
+        name=scanned_package.name,
+        version=scanned_package.version,
+        qualifiers=normalize_qualifiers(scanned_package.qualifiers, encode=True),
+        subpath=scanned_package.subpath,
+        primary_language=scanned_package.primary_language,
+        description=scanned_package.description,
+        keywords=scanned_package.keywords,
+        homepage_url=scanned_package.homepage_url,
+        download_url=scanned_package.download_url,
+        size=scanned_package.size,
+        sha1=scanned_package.sha1,
+        md5=scanned_package.md5,
+        sha256=scanned_package.sha256,
+        sha512=scanned_package.sha512,
+        bug_tracking_url=scanned_package.bug_tracking_url,
+        code_view_url=scanned_package.code_view_url,
+        vcs_url=scanned_package.vcs_url,
+        copyright=scanned_package.copyright,
+        holder=scanned_package.holder,
+        declared_license_expression=scanned_package.declared_license_expression,
+        license_detections=scanned_package.license_detections,
+        other_license_expression=scanned_package.other_license_expression,
+        other_license_detections=scanned_package.other_license_detections,
+        extracted_license_statement=scanned_package.extracted_license_statement,
+        notice_text=scanned_package.notice_text,
+        source_packages=scanned_package.source_packages,
+        package_content=package_content,
+    )
+
+    stringify_null_purl_fields(package_data)
+
+    package = Package(**package_data)
+    package.append_to_history('New Package created from URI: {}'.format(package_uri))
+
+    # This is used in the case of Maven packages created from the priority queue
+    history = scanned_package.extra_data.get('history', [])
+    for h in history:
+        package.append_to_history(h)
+
+    time = timezone.now()
+    package.created_date = time
+    package.last_modified_date = time
+    return package
+
+
+def add_to_related_package_set(created_package, existing_related_package):
+    """
+    Add the newly `created_package` Package to the PackageSet of the
+    `existing_related_package` Package that has the same purl.
+    """
+    related_package_sets_count = existing_related_package.package_sets.count()
+    if (
+        related_package_sets_count == 0
+        or (
+            related_package_sets_count > 0
+            and created_package.package_content == PackageContentType.BINARY
+        )
+    ):
+        # Binary packages can only be part of one set
+        package_set = PackageSet.objects.create()
+        package_set.add_to_package_set(existing_related_package)
+        package_set.add_to_package_set(created_package)
+    elif (
+        related_package_sets_count > 0
+        and created_package.package_content != PackageContentType.BINARY
+    ):
+        for package_set in existing_related_package.package_sets.all():
+            package_set.add_to_package_set(created_package)
+
+
+def build_parties(package, scanned_package):
+    """
+    Return a list of new unsaved Party of `package` Package built from the
+    parties of `scanned_package`.
+    """
+    return [
+        Party(
+            package=package,
+            type=party.type,
+            role=party.role,
+            name=party.name,
+            email=party.email,
+            url=party.url,
+        )
+        for party in scanned_package.parties
+    ]
+
+
+def build_dependencies(package, scanned_package):
+    """
+    Return a list of new unsaved DependentPackage of `package` Package built
+    from the dependencies of `scanned_package`.
+    """
+    return [
+        DependentPackage(
+            package=package,
+            purl=dependency.purl,
+            extracted_requirement=dependency.extracted_requirement,
+            scope=dependency.scope,
+            is_runtime=dependency.is_runtime,
+            is_optional=dependency.is_optional,
+            is_resolved=dependency.is_resolved,
+        )
+        for dependency in scanned_package.dependencies
+    ]
+
+
 def merge_or_create_resource(package, resource_data):
     """
     Using Resource data from `resource_data`, create or update the
@@ -417,25 +711,33 @@ def merge_or_create_resource(package, resource_data):
     try:
         resource = Resource.objects.get(package=package, path=path)
     except Resource.DoesNotExist:
-        resource = Resource(
-            package=package,
-            path=path,
-            is_file=resource_data.get('type') == 'file',
-            name=resource_data.get('name'),
-            extension=resource_data.get('extension'),
-            size=resource_data.get('size'),
-            md5=resource_data.get('md5'),
-            sha1=resource_data.get('sha1'),
-            sha256=resource_data.get('sha256'),
-            mime_type=resource_data.get('mime_type'),
-            file_type=resource_data.get('file_type'),
-            programming_language=resource_data.get('programming_language'),
-            is_binary=resource_data.get('is_binary'),
-            is_text=resource_data.get('is_text'),
-            is_archive=resource_data.get('is_archive'),
-            is_media=resource_data.get('is_media'),
-            is_key_file=resource_data.get('is_key_file'),
-        )
+        resource = build_resource(package, resource_data)
         created = True
     _ = resource.set_scan_results(resource_data, save=True)
     return resource, created, merged
+
+
+def build_resource(package, resource_data):
+    """
+    Return a new unsaved purldb Resource of `package` created from the scanned
+    Resource data in `resource_data`.
+    """
+    return Resource(
+        package=package,
+        path=resource_data.get('path'),
+        is_file=resource_data.get('type') == 'file',
+        name=resource_data.get('name'),
+        extension=resource_data.get('extension'),
+        size=resource_data.get('size'),
+        md5=resource_data.get('md5'),
+        sha1=resource_data.get('sha1'),
+        sha256=resource_data.get('sha256'),
+        mime_type=resource_data.get('mime_type'),
+        file_type=resource_data.get('file_type'),
+        programming_language=resource_data.get('programming_language'),
+        is_binary=resource_data.get('is_binary'),
+        is_text=resource_data.get('is_text'),
+        is_archive=resource_data.get('is_archive'),
+        is_media=resource_data.get('is_media'),
+        is_key_file=resource_data.get('is_key_file'),
+    )
@@ -12,7 +12,9 @@ from datetime import timedelta
 import logging
 import sys
 
+from django.db import connections
 from django.db import models
+from django.db import transaction
 from django.utils import timezone
 
 
@@ -56,6 +58,58 @@ def get_canonical(uri):
     return normalized.unicode
 
 
+def claim_batch(queryset, size):
+    """
+    Return a list of up to `size` objects from the ordered `queryset` of a
+    queue-like model and mark them as being "in_progress" by setting their
+    wip_date field.
+
+    The objects are selected and marked in a single UPDATE statement that
+    ignores the rows locked by other workers, e.g.::
+
+        UPDATE ... SET wip_date = now
+        WHERE id IN (SELECT id ... FOR UPDATE SKIP LOCKED LIMIT size)
+        RETURNING *
+    """
+    model = queryset.model
+    using = queryset.db
+    candidates = queryset.select_for_update(skip_locked=True).values('pk')[:size]
+
+    with transaction.atomic(using=using):
+        candidates_sql, params = candidates.query.get_compiler(using=using).as_sql()
+        quote_name = connections[using].ops.quote_name
+        sql = (
+            f'UPDATE {quote_name(model._meta.db_table)} SET wip_date = %s '
+            f'WHERE {quote_name(model._meta.pk.column)} IN ({candidates_sql}) '
+            f'RETURNING *'
+        )
+        claimed = list(model._default_manager.db_manager(using).raw(sql, [timezone.now(), *params]))
+
+    # RETURNING does not keep the order of the queryset: sort by each
+    # ordering field, last one first
+    for ordering in reversed(queryset.query.order_by):
+        if not isinstance(ordering, str):
+            continue
+        field_name = ordering.lstrip('-')
+        claimed.sort(
+            # NULL values come last in ascending order as in PostgreSQL
+            key=lambda obj: (getattr(obj, field_name) is None, getattr(obj, field_name)),
+            reverse=ordering.startswith('-'),
+        )
+    return claimed
+
+
+def release_batch(objects):
+    """
+    Release the claimed `objects` that were not processed such that they are
+    back in their queue by resetting their wip_date field.
+    """
+    if not objects:
+        return
+    model = objects[0].__class__
+    model.objects.filter(pk__in=[obj.pk for obj in objects]).update(wip_date=None)
+
+
 class BaseURI(models.Model):
     """
     A base abstract model to store URI for crawling, scanning and indexing.
@@ -268,13 +322,9 @@ class ResourceURIManager(models.Manager):
         never_visited = self.never_visited().filter(is_visitable__exact=True)
         revisitables = self.get_revisitables(hours=240)
 
-        if revisitables.exists():
-            # Combine both QuerySets
-
-            # TODO: consider returning chunks (.iterator())
-            visitables = never_visited.union(revisitables)
-        else:
-            visitables = never_visited
+        # Combine both QuerySets in a single query: unlike a UNION, this can
+        # be locked with select_for_update
+        visitables = never_visited | revisitables
 
         # NOTE: this matches an index for efficient ordering
         visitables = visitables.order_by('-priority', '-uri')
@@ -319,6 +369,13 @@ class ResourceURIManager(models.Manager):
         resource_uri.save(update_fields=['wip_date'])
         return resource_uri
 
+    def claim_batch(self, size):
+        """
+        Return a list of up to `size` visitable ResourceURIs and mark them as
+        being "in_progress" by setting the wip_date field.
+        """
+        return claim_batch(self.get_visitables(), size)
+
     def never_mapped(self):
         """
         Limit the QuerySet to ResourceURIs that have never been mapped.
@@ -356,6 +413,13 @@ class ResourceURIManager(models.Manager):
         qs = qs.order_by('-priority')
         return qs
 
+    def claim_mappable_batch(self, size):
+        """
+        Return a list of up to `size` mappable ResourceURIs and mark them as
+        being "in_progress" by setting the wip_date field.
+        """
+        return claim_batch(self.get_mappables(), size)
+
 
 class ResourceURI(BaseURI):
     """
@@ -502,18 +566,35 @@ class ResourceURI(BaseURI):
         self.is_visitable = visit_router.is_routable(uri)
         self.is_mappable = map_router.is_routable(uri)
 
-    def save(self, *args, **kwargs):
+    def _prepare_save(self):
         """
-        Save, adding defaults for computed fields and validating fields.
+        Add defaults for computed fields and validate fields before saving.
         """
         self._set_defauts()
         self.normalize_fields()
         self.has_map_error = True if self.map_error else False
         self.has_visit_error = True if self.visit_error else False
+
+    def save(self, *args, **kwargs):
+        """
+        Save, adding defaults for computed fields and validating fields.
+        """
+        self._prepare_save()
         super(ResourceURI, self).save(*args, **kwargs)
 
 
 class ScannableURIManager(models.Manager):
+    def bulk_insert(self, scannable_uris, batch_size=1000):
+        """
+        Insert a list of new unsaved `scannable_uris` ScannableURIs using bulk
+        inserts of `batch_size` rows. Computed fields are set and fields are
+        validated as when saving a single ScannableURI. Conflicting rows are
+        ignored.
+        """
+        for scannable_uri in scannable_uris:
+            scannable_uri._prepare_save()
+        return self.bulk_create(scannable_uris, batch_size=batch_size, ignore_conflicts=True)
+
     def get_scannables(self):
         """
         Return an ordered query set of all scannable ScannableURIs.
@@ -615,6 +696,13 @@ class ScannableURIManager(models.Manager):
         """
         return self.__get_next_candidate(self.get_processables())
 
+    def claim_batch(self, size):
+        """
+        Return a list of up to `size` processable ScannableURIs and mark them
+        as being "in_progress" by setting the wip_date field.
+        """
+        return claim_batch(self.get_processables(), size)
+
 
 class ScannableURI(BaseURI):
     """
@@ -750,13 +838,19 @@ class ScannableURI(BaseURI):
                 fields=['-priority'])
         ]
 
-    def save(self, *args, **kwargs):
+    def _prepare_save(self):
         """
-        Save, adding defaults for computed fields and validating fields.
+        Add defaults for computed fields and validate fields before saving.
         """
         if not self.canonical:
             self.canonical = get_canonical(self.uri)
         self.normalize_fields()
+
+    def save(self, *args, **kwargs):
+        """
+        Save, adding defaults for computed fields and validating fields.
+        """
+        self._prepare_save()
         super(ScannableURI, self).save(*args, **kwargs)
 
     def rescan(self):
@@ -842,6 +936,13 @@ class PriorityResourceURIManager(models.Manager):
         priority_resource_uri.save(update_fields=['wip_date'])
         return priority_resource_uri
 
+    def claim_batch(self, size):
+        """
+        Return a list of up to `size` processable PriorityResourceURIs and mark them as
+        being "in_progress" by setting the wip_date field.
+        """
+        return claim_batch(self.get_requests(), size)
+
 
 class PriorityResourceURI(BaseURI):
     """
@@ -1001,6 +1102,13 @@ class ImportableURIManager(models.Manager):
         importable_uri.save(update_fields=['wip_date'])
         return importable_uri
 
+    def claim_batch(self, size):
+        """
+        Return a list of up to `size` processable ImportableURIs and mark them as
+        being "in_progress" by setting the wip_date field.
+        """
+        return claim_batch(self.get_requests(), size)
+
 
 # TODO: have a second queue for crawling maven repo, that tracks which pages and namespaces we visited
 # when we hit the point of a package page, we add it to the queue that creates skinny packages for the package we visited.
@@ -1063,3 +1171,82 @@ class ImportableURI(BaseURI):
         """
         self.normalize_fields()
         super(ImportableURI, self).save(*args, **kwargs)
+
+
+class MavenIndexCheckpoint(models.Model):
+    """
+    Track the processing of a Maven Nexus index file, either a full index or
+    a numbered increment of a chain of increments, such that an interrupted
+    visit resumes where it stopped and increments are processed only once.
+    """
+    index_uri = models.CharField(
+        max_length=2048,
+        unique=True,
+        help_text='URI of a Maven Nexus index file.',
+    )
+
+    chain_id = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='Nexus index chain id of an increment. Increments are '
+                  'numbered again when a new chain starts.',
+    )
+
+    increment = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text='Number of an increment index or null for a full index.',
+    )
+
+    artifacts_count = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Number of index artifacts processed so far. The URIs of '
+                  'these artifacts are already stored as ResourceURIs.',
+    )
+
+    index_sha1 = models.CharField(
+        max_length=40,
+        null=True,
+        blank=True,
+        help_text='SHA1 of the index file being processed. A visit only resumes '
+                  'after the processed artifacts of the same index file.',
+    )
+
+    completed_date = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text='Timestamp set when all the index artifacts were processed.',
+    )
+
+    last_updated_date = models.DateTimeField(
+        auto_now=True,
+        help_text='Timestamp set when this checkpoint was last updated.',
+    )
+
+    class Meta:
+        verbose_name = 'Maven index checkpoint'
+
+    def __str__(self):
+        return self.index_uri
+
+    def save_progress(self, artifacts_count, completed=False):
+        """
+        Save `artifacts_count` as the number of processed artifacts and mark
+        this index as processed entirely if `completed` is True.
+        """
+        self.artifacts_count = artifacts_count
+        self.completed_date = timezone.now() if completed else None
+        self.save(update_fields=['artifacts_count', 'completed_date', 'last_updated_date'])
+
+    def restart(self, index_sha1):
+        """
+        Reset the progress of this checkpoint to process the index file with
+        `index_sha1` from the start.
+        """
+        self.index_sha1 = index_sha1
+        self.artifacts_count = 0
+        self.completed_date = None
+        self.save(update_fields=['index_sha1', 'artifacts_count', 'completed_date', 'last_updated_date'])
@@ -69,6 +69,141 @@ class Rule(object):
         """
         return self.pattern_match(string)
 
+    @property
+    def literal_prefixes(self):
+        """
+        Return a list of literal string prefixes such that any string matched
+        by this rule starts with one of these prefixes.
+        """
+        return get_literal_prefixes(self.pattern)
+
+
+# regex characters that end a literal prefix
+REGEX_SPECIAL_CHARS = frozenset('.^$*+?{}[]()|')
+
+# maximum number of alternative prefixes of a pattern, doubled for each
+# optional character
+MAX_LITERAL_PREFIXES = 8
+
+
+def has_top_level_alternation(pattern):
+    """
+    Return True if the `pattern` regex contains an alternation "|" that is not
+    nested in a group or a character set.
+    """
+    depth = 0
+    in_set = False
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_set:
+            if char == ']':
+                in_set = False
+        elif char == '[':
+            in_set = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and not depth:
+            return True
+    return False
+
+
+def get_literal_prefixes(pattern):
+    """
+    Return a list of literal string prefixes for a `pattern` regex string such
+    that any string fully matched by the `pattern` starts with one of these
+    prefixes. Optional characters such as the "s" of "https?://" yield two
+    prefixes. Return a list with an empty string prefix if there is no usable
+    literal prefix.
+
+    For example:
+    >>> get_literal_prefixes(r'https?://repo1\\.maven\\.org/maven2/.*')
+    ['http://repo1.maven.org/maven2/', 'https://repo1.maven.org/maven2/']
+    >>> get_literal_prefixes(r'.+/repomd.xml')
+    ['']
+    """
+    if has_top_level_alternation(pattern):
+        return ['']
+
+    prefixes = ['']
+    i = 0
+    length = len(pattern)
+    while i < length:
+        char = pattern[i]
+        if char == '\\':
+            escaped = pattern[i + 1:i + 2]
+            if not escaped or escaped.isalnum():
+                # a character class such as \d or a back reference
+                break
+            literal = escaped
+            width = 2
+        elif char in REGEX_SPECIAL_CHARS:
+            break
+        else:
+            literal = char
+            width = 1
+
+        quantifier = pattern[i + width:i + width + 1]
+        if quantifier in ('*', '{'):
+            # this literal is possibly absent or repeated
+            break
+
+        if quantifier == '?':
+            if len(prefixes) * 2 > MAX_LITERAL_PREFIXES:
+                break
+            prefixes = prefixes + [prefix + literal for prefix in prefixes]
+            i += width + 1
+            continue
+
+        prefixes = [prefix + literal for prefix in prefixes]
+        if quantifier == '+':
+            # this literal is possibly repeated
+            break
+        i += width
+
+    return sorted(set(prefixes))
+
+
+class RuleIndex(object):
+    """
+    A trie of Rules keyed by the characters of their literal prefixes used to
+    select the few Rules that could match a string without matching the string
+    against all the Rule patterns.
+    """
+    def __init__(self, rules):
+        # each trie node is a mapping of {character: child node} with the
+        # list of (rule index, Rule) with this prefix stored under a None key
+        self.root = {}
+        for index, rule in enumerate(rules):
+            for prefix in rule.literal_prefixes:
+                node = self.root
+                for char in prefix:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, []).append((index, rule))
+
+    def get_candidates(self, string):
+        """
+        Return a list of Rules in their original order that could match
+        `string`.
+        """
+        candidates = []
+        node = self.root
+        for char in string:
+            candidates.extend(node.get(None, ()))
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            candidates.extend(node.get(None, ()))
+
+        candidates.sort(key=lambda candidate: candidate[0])
+        return [rule for _, rule in candidates]
+
 
 class RouteAlreadyDefined(TypeError):
     """
@@ -108,6 +243,8 @@ class Router(object):
         self.route_map = route_map or dict()
         # lazy cached pre-compiled regex match() for all route patterns
         self._is_routable = None
+        # lazy cached RuleIndex for all route patterns
+        self._rule_index = None
 
     def __repr__(self):
         return repr(self.route_map)
@@ -126,6 +263,8 @@ class Router(object):
         if pattern in self.route_map:
             raise RouteAlreadyDefined(pattern)
         self.route_map[pattern] = Rule(pattern, endpoint)
+        self._is_routable = None
+        self._rule_index = None
 
     def route(self, *patterns):
         """
@@ -173,9 +312,14 @@ class Router(object):
         possible for a string (typically a URI), a MultipleRoutesDefined
         TypeError is raised.
         """
-        # TODO: we could improve the performance of this by using a single
-        # regex and named groups if this ever becomes a bottleneck.
-        candidates = [r for r in self.route_map.values() if r.match(string)]
+        if not self._rule_index:
+            self._rule_index = RuleIndex(self.route_map.values())
+
+        # Only the rules with a literal prefix of `string` can match it
+        candidates = [
+            r for r in self._rule_index.get_candidates(string)
+            if r.match(string)
+        ]
 
         if not candidates:
             raise NoRouteAvailable(string)
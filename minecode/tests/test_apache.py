@@ -28,7 +28,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheDistIndexVisitor(self):
         uri = 'http://apache.org/dist/zzz/find-ls.gz'
         test_loc = self.get_test_loc('apache/find-ls.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = apache.ApacheDistIndexVisitor(uri)
 
@@ -38,7 +38,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheChecksumVisitor(self):
         uri = 'http://archive.apache.org/dist/abdera/1.1.3/apache-abdera-1.1.3-src.zip.md5'
         test_loc = self.get_test_loc('apache/apache-abdera-1.1.3-src.zip.md5')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _ = apache.ApacheChecksumVisitor(uri)
 
@@ -48,7 +48,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheChecksumVisitor_2(self):
         uri = 'http://archive.apache.org/dist/groovy/2.4.6/distribution/apache-groovy-docs-2.4.6.zip.md5'
         test_loc = self.get_test_loc('apache/apache-groovy-docs-2.4.6.zip.md5')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _ = apache.ApacheChecksumVisitor(uri)
 
@@ -58,7 +58,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheProjectsJsonVisitor(self):
         uri = 'https://projects.apache.org/json/foundation/projects.json'
         test_loc = self.get_test_loc('apache/projects.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # note: remove the "()" below once this visitor route is made active again
             uris, result, _ = apache.ApacheProjectsJsonVisitor()(uri)
@@ -71,7 +71,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheSingleProjectJsonVisitor(self):
         uri = 'https://projects.apache.org/json/projects/ant-dotnet.json'
         test_loc = self.get_test_loc('apache/ant-dotnet.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # note: remove the "()" below once this visitor route is made active again
             _, result, _ = apache.ApacheSingleProjectJsonVisitor()(uri)
@@ -82,7 +82,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheSingleProjectJsonVisitor_error1_json(self):
         uri = 'https://projects.apache.org/json/projects/felix.json'
         test_loc = self.get_test_loc('apache/felix.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # note: remove the "()" below once this visitor route is made active again
             _, result, _ = apache.ApacheSingleProjectJsonVisitor()(uri)
@@ -93,7 +93,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheSingleProjectJsonVisitor_error2_json(self):
         uri = 'https://projects.apache.org/json/projects/attic-mrunit.json'
         test_loc = self.get_test_loc('apache/attic-mrunit.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # note: remove the "()" below once this visitor route is made active again
             _, result, _ = apache.ApacheSingleProjectJsonVisitor()(uri)
@@ -104,7 +104,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApacheSingleProjectJsonVisitor_error3_json(self):
         uri = 'https://projects.apache.org/json/projects/metamodel.json'
         test_loc = self.get_test_loc('apache/metamodel.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # note: remove the "()" below once this visitor route is made active again
             _, result, _ = apache.ApacheSingleProjectJsonVisitor()(uri)
@@ -115,7 +115,7 @@ class ApacheVistorTest(JsonBasedTesting, DjangoTestCase):
     def test_ApachePodlingsJsonVisitor(self):
         uri = 'https://projects.apache.org/json/foundation/podlings.json'
         test_loc = self.get_test_loc('apache/podlings.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # note: remove the "()" below once this visitor route is made active again
             uris, result, _ = apache.ApachePodlingsJsonVisitor()(uri)
@@ -27,7 +27,7 @@ class BowerVistorTest(JsonBasedTesting):
     def test_visit_findls_file(self):
         uri = 'https://registry.bower.io/packages'
         test_loc = self.get_test_loc('bower/packages.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = bower.BowerTopJsonVisitor(uri)
         expected_loc = self.get_test_loc('bower/packages_expected_uris.json')
@@ -36,7 +36,7 @@ class BowerVistorTest(JsonBasedTesting):
     def test_visit_bower_json_file(self):
         uri = 'https://coding.net/u/QiaoButang/p/jquery.easing-qbt/git/raw/master/bower.json'
         test_loc = self.get_test_loc('bower/example1_bower.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = bower.BowerJsonVisitor(uri)
         result = json.loads(data, object_pairs_hook=OrderedDict)
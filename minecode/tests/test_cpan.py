@@ -27,7 +27,7 @@ class CpanVisitorTest(JsonBasedTesting):
     def test_metacpanauthorurlvisitors(self):
         uri = 'https://fastapi.metacpan.org/author/_search?q=email:a*&size=5000'
         test_loc = self.get_test_loc('cpan/search_email_a.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = cpan.CpanModulesVisitors(uri)
         expected_loc = self.get_test_loc('cpan/expected_search_email_a.json')
@@ -36,7 +36,7 @@ class CpanVisitorTest(JsonBasedTesting):
     def test_release_search_from_author_visitors(self):
         uri = 'https://fastapi.metacpan.org/release/_search?q=author:ABERNDT&size=5000'
         test_loc = self.get_test_loc('cpan/release_from_author_ABERNDT.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = cpan.CpanModulesVisitors(uri)
         expected_loc = self.get_test_loc('cpan/expected_release_from_author_ABERNDT.json')
@@ -45,7 +45,7 @@ class CpanVisitorTest(JsonBasedTesting):
     def test_visit_html_modules(self):
         uri = 'http://www.cpan.org/modules/01modules.index.html'
         test_loc = self.get_test_loc('cpan/Modules on CPAN alphabetically.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = cpan.CpanModulesVisitors(uri)
         expected_loc = self.get_test_loc('cpan/expected_html_modules.json')
@@ -54,7 +54,7 @@ class CpanVisitorTest(JsonBasedTesting):
     def test_visit_html_files(self):
         uri = 'http://www.cpan.org/authors/id/L/LD/LDS/'
         test_loc = self.get_test_loc('cpan/Index_of_authors_id_L_LD_LDS.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = cpan.CpanProjectHTMLVisitors(uri)
         expected_loc = self.get_test_loc('cpan/expected_html_files.json')
@@ -63,7 +63,7 @@ class CpanVisitorTest(JsonBasedTesting):
     def test_visit_readme_file(self):
         uri = 'http://www.cpan.org/authors/id/A/AM/AMIRITE/Mojolicious-Plugin-Nour-Config-0.09.readme'
         test_loc = self.get_test_loc('cpan/Mojolicious-Plugin-Nour-Config-0.09.readme')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = cpan.CpanReadmeVisitors(uri)
         result = json.loads(data, object_pairs_hook=OrderedDict)
@@ -113,7 +113,7 @@ class CpanMapperTest(JsonBasedTesting):
     def test_build_packages_readme_from_json(self):
         uri = 'http://www.cpan.org/authors/id/A/AM/AMIRITE/Mojolicious-Plugin-Nour-Config-0.09.readme'
         test_loc = self.get_test_loc('cpan/Mojolicious-Plugin-Nour-Config-0.09.readme')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = cpan.CpanReadmeVisitors(uri)
         packages = mappers.cpan.build_packages_from_readmefile(
@@ -125,7 +125,7 @@ class CpanMapperTest(JsonBasedTesting):
     def test_build_packages_readme_from_json2(self):
         uri = 'http://www.cpan.org/authors/id/A/AB/ABIGAIL/Algorithm-Graphs-TransitiveClosure-2009110901.readme'
         test_loc = self.get_test_loc('cpan/Algorithm-Graphs-TransitiveClosure-2009110901.readme', 'pkg:cpan/Algorithm-Graphs-TransitiveClosure@2009110901')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = cpan.CpanReadmeVisitors(uri)
         packages = mappers.cpan.build_packages_from_readmefile(
@@ -43,7 +43,7 @@ class DockerHubVistorTest(DockerHubTest):
     def test_visit_dockerhub_exlpore_page(self):
         uri = 'https://hub.docker.com/explore/?page=1'
         test_loc = self.get_test_loc('dockerhub/Explore_DockerHub_Page1.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = dockerhub.DockHubExplorePageVisitor(uri)
         expected_loc = self.get_test_loc(
@@ -53,7 +53,7 @@ class DockerHubVistorTest(DockerHubTest):
     def test_visit_dockerhub_project(self):
         uri = 'https://hub.docker.com/_/elixir/'
         test_loc = self.get_test_loc('dockerhub/library_elixir.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = dockerhub.DockHubProjectHTMLVisitor(uri)
 
@@ -65,7 +65,7 @@ class DockerHubVistorTest(DockerHubTest):
     def test_visit_dockerhub_search_api(self):
         uri = 'https://index.docker.io/v1/search?q=1a&n=100&page=2'
         test_loc = self.get_test_loc('dockerhub/search.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = dockerhub.DockHubLibraryRESTJsonVisitor(uri)
         expected_loc = self.get_test_loc('dockerhub/visitor_search_expected')
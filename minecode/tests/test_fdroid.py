@@ -26,7 +26,7 @@ class TestFdroidVisitor(JsonBasedTesting):
     def test_FdroidPackageRepoVisitor(self):
         uri = 'https://f-droid.org/repo/index-v2.json'
         test_loc = self.get_test_loc('fdroid/index-v2.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _errors = fdroid_visitor.FdroidIndexVisitor(uri)
 
@@ -27,7 +27,7 @@ class FreeBSDVistorTest(JsonBasedTesting):
     def test_visit_freebsd_seed(self):
         uri = 'https://pkg.freebsd.org'
         test_loc = self.get_test_loc('freebsd/FreeBSD.org.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = freebsd.FreeBSDBaseHTMLVisitors(uri)
         expected_loc = self.get_test_loc('freebsd/FreeBSD.org.html_expected')
@@ -36,7 +36,7 @@ class FreeBSDVistorTest(JsonBasedTesting):
     def test_visit_freebsd_subHTML(self):
         uri = 'https://pkg.freebsd.org/FreeBSD:10:i386/release_0/'
         test_loc = self.get_test_loc('freebsd/FreeBSD-10-i386_release_0_.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = freebsd.FreeBSDSubHTMLVisitors(uri)
         expected_loc = self.get_test_loc('freebsd/FreeBSD-10-i386_release_0_.html_expected')
@@ -45,7 +45,7 @@ class FreeBSDVistorTest(JsonBasedTesting):
     def test_visit_freebsd_indexvisitor(self):
         uri = 'https://pkg.freebsd.org/FreeBSD:10:i386/release_0/packagesite.txz'
         test_loc = self.get_test_loc('freebsd/packagesite.txz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = freebsd.FreeBSDIndexVisitors(uri)
         expected_loc = self.get_test_loc('freebsd/indexfile_expected')
@@ -29,7 +29,7 @@ class FreedesktopVistorTest(FreedesktopTest):
     def test_visit_software_html_page(self):
         uri = 'https://www.freedesktop.org/wiki/Software'
         test_loc = self.get_test_loc('freedesktop/Software.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = freedesktop.FreedesktopHTMLVisitor(uri)
         expected_loc = self.get_test_loc('freedesktop/freedesktop_software_expected')
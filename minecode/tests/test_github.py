@@ -132,7 +132,7 @@ class GithubVisitorTest(JsonBasedTesting):
     def test_GithubReposVisitor(self):
         uri = 'https://api.github.com/repositories?since=0'
         test_loc = self.get_test_loc('github/repo_since0.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = github.GithubReposVisitor(uri)
         expected_loc = self.get_test_loc('github/repo_since0_expected.json')
@@ -37,7 +37,7 @@ class GitlabVistorTest(JsonBasedTesting):
     def test_visit_metacpan_api_projects(self):
         uri = 'https://gitlab.com/api/v4/projects?page=1&per_page=70&statistics=true'
         test_loc = self.get_test_loc('gitlab/projects_visitor.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = gitlab.GitlabAPIVisitor(uri)
         expected_loc = self.get_test_loc(
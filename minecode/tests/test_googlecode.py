@@ -28,7 +28,7 @@ class GoogleNewAPIVisitorsTest(JsonBasedTesting):
     def test_visit_google_download_zip_visitor(self):
         uri = 'https://storage.googleapis.com/google-code-archive/google-code-archive.txt.zip'
         test_loc = self.get_test_loc('googlecode/google-code-archive.txt.zip')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = googlecode.GooglecodeArchiveVisitor(uri)
         expected_loc = self.get_test_loc('googlecode/expected_google-code-archive.txt.zip.json')
@@ -37,7 +37,7 @@ class GoogleNewAPIVisitorsTest(JsonBasedTesting):
     def test_visit_google_projectpages(self):
         uri = 'https://code.google.com/archive/search?q=domain:code.google.com'
         test_loc = self.get_test_loc('googlecode/v2_api/GoogleCodeProjectHosting.htm')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = googlecode.GoogleDownloadsPageJsonVisitor(uri)
         expected_loc = self.get_test_loc('googlecode/v2_api/expected_googleprojects.json')
@@ -46,7 +46,7 @@ class GoogleNewAPIVisitorsTest(JsonBasedTesting):
     def test_visit_google_projectpage2(self):
         uri = 'https://code.google.com/archive/search?q=domain:code.google.com&page=2'
         test_loc = self.get_test_loc('googlecode/v2_api/GoogleCodeProjectHosting_page2.htm')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = googlecode.GoogleDownloadsPageJsonVisitor(uri)
         expected_loc = self.get_test_loc('googlecode/v2_api/expected_googleproject_page2.json')
@@ -55,7 +55,7 @@ class GoogleNewAPIVisitorsTest(JsonBasedTesting):
     def test_visit_google_download_json(self):
         uri = 'https://storage.googleapis.com/google-code-archive/v2/code.google.com/hg4j/project.json'
         test_loc = self.get_test_loc('googlecode/v2_api/project.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = googlecode.GoogleProjectJsonVisitor(uri)
         self.assertEqual([URI(uri=u'https://storage.googleapis.com/google-code-archive/v2/code.google.com/hg4j/downloads-page-1.json')], list(uris))
@@ -63,7 +63,7 @@ class GoogleNewAPIVisitorsTest(JsonBasedTesting):
     def test_visit_google_json(self):
         uri = 'https://storage.googleapis.com/google-code-archive/v2/code.google.com/hg4j/downloads-page-1.json'
         test_loc = self.get_test_loc('googlecode/v2_api/downloads-page-1.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = googlecode.GoogleDownloadsPageJsonVisitor(uri)
         expected_loc = self.get_test_loc('googlecode/v2_api/hg4j_download_expected.json')
@@ -72,7 +72,7 @@ class GoogleNewAPIVisitorsTest(JsonBasedTesting):
     def test_visit_googleapi_project_json(self):
         uri = 'https://www.googleapis.com/storage/v1/b/google-code-archive/o/v2%2Fapache-extras.org%2F124799961-qian%2Fproject.json?alt=media'
         test_loc = self.get_test_loc('googlecode/v2_apache-extras.org_124799961-qian_project.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = googlecode.GoogleDownloadsPageJsonVisitor(uri)
         expected_loc = self.get_test_loc('googlecode/expected_v2_apache-extras.org_124799961-qian_project2.json')
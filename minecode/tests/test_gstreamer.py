@@ -26,7 +26,7 @@ class GstreamerVistorTest(JsonBasedTesting):
     def test_visit_gstreamer_source_root(self):
         uri = 'https://gstreamer.freedesktop.org/src/'
         test_loc = self.get_test_loc('gstreamer/src_root.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = gstreamer.GstreamerHTMLVisitor(uri)
         expected_loc = self.get_test_loc('gstreamer/src_root.html-expected')
@@ -35,7 +35,7 @@ class GstreamerVistorTest(JsonBasedTesting):
     def test_visit_Gstreamer_subpath_contains_file_resources(self):
         uri = 'https://gstreamer.freedesktop.org/src/gst-openmax/pre/'
         test_loc = self.get_test_loc('gstreamer/src_gst-openmax_pre.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = gstreamer.GstreamerHTMLVisitor(uri)
         expected_loc = self.get_test_loc('gstreamer/src_gst-openmax_pre.html-expected')
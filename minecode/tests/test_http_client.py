@@ -0,0 +1,125 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import threading
+import time
+from unittest import TestCase
+
+from minecode.http_client import HttpClient
+from minecode.http_client import PoolTimeout
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """
+    Serve `content` with keep-alive connections after failing the first
+    `failures` requests with a 503 and waiting `delay` seconds per request.
+    Track the client ports and the maximum number of concurrent requests.
+    """
+    protocol_version = 'HTTP/1.1'
+    content = b'x' * 1000
+    failures = 0
+    delay = 0
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.ports.add(self.client_address[1])
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.count += 1
+            failed = server.count <= self.failures
+        time.sleep(self.delay)
+        with server.lock:
+            server.in_flight -= 1
+
+        if failed:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.content)))
+        self.end_headers()
+        self.wfile.write(self.content)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTest(TestCase):
+    def start_server(self, **attributes):
+        handler = type('Handler', (CountingHandler,), attributes)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.lock = threading.Lock()
+        server.ports = set()
+        server.count = server.in_flight = server.max_in_flight = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+    def test_http_client_reuses_connections(self):
+        server, url = self.start_server()
+        client = HttpClient()
+        for _ in range(5):
+            self.assertEqual(200, client.get(url).status_code)
+        self.assertEqual(1, len(server.ports))
+
+    def test_http_client_retries_failed_requests(self):
+        server, url = self.start_server(failures=2)
+        client = HttpClient(retries=3, backoff_factor=0)
+        response = client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(CountingHandler.content, response.content)
+        self.assertEqual(3, server.count)
+
+    def test_http_client_returns_last_response_after_retries(self):
+        server, url = self.start_server(failures=10)
+        client = HttpClient(retries=1, backoff_factor=0)
+        self.assertEqual(503, client.get(url).status_code)
+        self.assertEqual(2, server.count)
+        self.assertEqual(1, client.get_metrics()['127.0.0.1']['errors'])
+
+    def test_http_client_limits_concurrent_connections_per_host(self):
+        server, url = self.start_server(delay=0.1)
+        client = HttpClient(host_limits={'127.0.0.1': 2})
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            responses = list(executor.map(client.get, [url] * 6))
+        self.assertEqual([200] * 6, [response.status_code for response in responses])
+        self.assertEqual(2, server.max_in_flight)
+
+    def test_http_client_raises_pool_timeout_when_no_connection_is_free(self):
+        _server, url = self.start_server()
+        client = HttpClient(max_connections_per_host=1, pool_timeout=0.1)
+        with client.get(url, stream=True):
+            with self.assertRaises(PoolTimeout):
+                client.get(url)
+        self.assertEqual(1, client.get_metrics()['127.0.0.1']['errors'])
+        # the connection is free once the streamed response is closed
+        self.assertEqual(200, client.get(url).status_code)
+
+    def test_http_client_metrics(self):
+        _server, url = self.start_server()
+        client = HttpClient()
+        client.get(url)
+        response = client.get(url, stream=True)
+        client.add_bytes_received(url, len(response.content))
+
+        metrics = client.get_metrics()['127.0.0.1']
+        self.assertEqual(2, metrics['requests'])
+        self.assertEqual(0, metrics['errors'])
+        self.assertEqual(2000, metrics['bytes_received'])
+        self.assertEqual(2, sum(metrics['latency_histogram'].values()))
+
+        client.reset_metrics()
+        self.assertEqual({}, client.get_metrics())
@@ -20,10 +20,12 @@ from django.test import TestCase as DjangoTestCase
 from minecode.management.commands.run_map import map_uri
 from minecode.management.commands.run_visit import visit_uri
 from minecode.mappers import maven as maven_mapper
+from minecode.models import MavenIndexCheckpoint
 from minecode.models import ResourceURI
 from minecode.utils_test import mocked_requests_get
 from minecode.utils_test import JsonBasedTesting
 from minecode.utils_test import model_to_dict
+from minecode.visitors import Checkpoint
 from minecode.visitors import maven as maven_visitor
 import packagedb
 
@@ -72,6 +74,27 @@ class MavenMiscTest(JsonBasedTesting, DjangoTestCase):
         expected_loc = self.get_test_loc('maven/index/buggy/expected_entries.json')
         self.check_expected_results(result, expected_loc, regen=False)
 
+    def test_decode_entries_with_small_chunks(self):
+        index = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
+        fields = frozenset(maven_visitor.ENTRY_FIELDS)
+        expected = list(maven_visitor.get_entries(index, fields=fields))
+        self.assertTrue(expected)
+        for chunk_size in (1, 7, 1000):
+            with maven_visitor.GzipFileWithTrailing(index, 'rb') as nexus_index:
+                # skip the 9 bytes of the index header
+                nexus_index.read(9)
+                result = list(maven_visitor.decode_entries(
+                    nexus_index, fields=fields, chunk_size=chunk_size))
+            self.assertEqual(expected, result)
+
+    def test_decode_java_utf8(self):
+        self.assertEqual('foo', maven_visitor.decode_java_utf8(b'foo'))
+        value = b'\xc0\x80\xc3\xa9'
+        self.assertEqual(
+            maven_visitor.decode_modified_utf8(value),
+            maven_visitor.decode_java_utf8(value),
+        )
+
     def test_get_artifacts_full(self):
         index = self.get_test_loc('maven/index/nexus-maven-repository-index.gz')
 
@@ -201,7 +224,7 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_uris(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
         test_loc = self.get_test_loc('maven/index/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/expected_uris.json')
@@ -210,7 +233,7 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexPropertiesVisitor(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
         test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.properties')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusPropertiesVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/increment/expected_properties_uris.json')
@@ -219,7 +242,7 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_uris_increment(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.445.gz'
         test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/increment/expected_uris.json')
@@ -228,19 +251,110 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_uris_buggy(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
         test_loc = self.get_test_loc('maven/index/buggy/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/buggy/expected_uris.json')
         self.check_expected_uris(uris, expected_loc, data_is_json=True, regen=False)
 
+    def test_MavenNexusIndexPropertiesVisitor_skips_applied_increments(self):
+        uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
+        test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.properties')
+        index_uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.{}.gz'
+        chain_id = '1318453614498'
+        for increment in (540, 541):
+            checkpoint = MavenIndexCheckpoint.objects.create(
+                index_uri=index_uri.format(increment),
+                chain_id=chain_id,
+                increment=increment,
+            )
+            checkpoint.save_progress(10, completed=True)
+        # increment of a previous chain
+        MavenIndexCheckpoint.objects.create(
+            index_uri=index_uri.format(1),
+            chain_id='1',
+            increment=1,
+        )
+
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            uris, _data, _errors = maven_visitor.MavenNexusPropertiesVisitor(uri)
+            uris = [u.uri for u in uris]
+
+        self.assertEqual(28, len(uris))
+        self.assertNotIn(index_uri.format(540), uris)
+        self.assertNotIn(index_uri.format(541), uris)
+        self.assertIn(index_uri.format(539), uris)
+        checkpoint = MavenIndexCheckpoint.objects.get(index_uri=index_uri.format(539))
+        self.assertEqual(chain_id, checkpoint.chain_id)
+        self.assertEqual(539, checkpoint.increment)
+        self.assertFalse(MavenIndexCheckpoint.objects.filter(chain_id='1').exists())
+
+    def test_MavenNexusIndexVisitor_resumes_from_checkpoint(self):
+        uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.445.gz'
+        test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            all_uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
+            all_uris = list(all_uris)
+
+        checkpoints = [u for u in all_uris if isinstance(u, Checkpoint)]
+        self.assertEqual(1, len(checkpoints))
+        self.assertIs(checkpoints[0], all_uris[-1])
+        all_uris = all_uris[:-1]
+
+        checkpoint = MavenIndexCheckpoint.objects.get(index_uri=uri)
+        self.assertEqual(445, checkpoint.increment)
+        checkpoint.save_progress(100)
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
+            uris = [u for u in uris if not isinstance(u, Checkpoint)]
+        # each artifact yields a pre-visited URI and a POM URI
+        self.assertEqual(all_uris[200:], uris)
+
+    def test_MavenNexusIndexVisitor_restarts_when_the_index_changed(self):
+        uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
+        test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            all_uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
+            all_uris = [u for u in all_uris if not isinstance(u, Checkpoint)]
+
+        checkpoints = MavenIndexCheckpoint.objects.filter(index_uri=uri)
+        self.assertTrue(checkpoints.get().index_sha1)
+        # an interrupted visit of another index file
+        checkpoints.update(index_sha1='0' * 40, artifacts_count=100, completed_date=None)
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
+            uris = [u for u in uris if not isinstance(u, Checkpoint)]
+        self.assertEqual(all_uris, uris)
+
+    def test_visit_uri_processes_MavenNexusIndexVisitor_increment_once(self):
+        uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.445.gz'
+        test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
+        resource_uri = ResourceURI.objects.insert(uri=uri)
+
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            inserted = visit_uri(resource_uri)
+        self.assertTrue(inserted)
+        checkpoint = MavenIndexCheckpoint.objects.get(index_uri=uri)
+        self.assertTrue(checkpoint.completed_date)
+        self.assertTrue(checkpoint.artifacts_count)
+
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            self.assertEqual(0, visit_uri(resource_uri))
+
     def test_visit_uri_does_not_fail_on_incorrect_sha1(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
         resource_uri = ResourceURI.objects.insert(uri=uri)
 
         before = [p.id for p in ResourceURI.objects.all()]
         test_loc = self.get_test_loc('maven/index/buggy/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             visit_uri(resource_uri)
 
@@ -258,7 +372,7 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenPOMVisitor_data(self):
         uri = 'https://repo1.maven.org/maven2/classworlds/classworlds/1.1-alpha-2/classworlds-1.1-alpha-2.pom'
         test_loc = self.get_test_loc('maven/pom/classworlds-1.1-alpha-2.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _ = maven_visitor.MavenPOMVisitor(uri)
         self.assertEqual(None, uris)
@@ -277,7 +391,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
         test_index = self.get_test_loc('maven/index/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_index)
             visit_uri(resource_uri)
 
@@ -292,7 +406,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
         self.check_expected_results(results, expected_loc, regen=False)
 
         pre_visited_uris = ResourceURI.objects.filter(
-            uri__contains='maven-index://').exclude(id__in=before)
+            uri__contains='maven-index://').exclude(id__in=before).order_by('id')
 
         self.assertTrue(
             all(ru.last_visit_date and not ru.last_map_date
@@ -307,7 +421,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
             map_uri(res_uri)
 
         newly_mapped = packagedb.models.Package.objects.filter(
-            download_url__startswith='https://repo1.maven.org/maven2').exclude(id__in=package_ids_before)
+            download_url__startswith='https://repo1.maven.org/maven2').exclude(id__in=package_ids_before).order_by('id')
         # check that the saved packages are there as planned
         self.assertEqual(19, newly_mapped.count())
 
@@ -328,7 +442,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should insert all the test_uris
             visit_uri(resource_uri)
@@ -401,7 +515,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should insert all the test_uris
             visit_uri(resource_uri)
@@ -420,7 +534,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
         test_loc = self.get_test_loc('maven/end2end_index/nexus-maven-repository-index.163.gz')
 
         resource_uri = ResourceURI.objects.get(uri=uri)
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should insert all the test_uris
             visit_uri(resource_uri)
@@ -441,7 +555,7 @@ class MavenXmlMetadataVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_xml_file(self):
         uri = 'https://repo1.maven.org/maven2/st/digitru/identity-core/maven-metadata.xml'
         test_loc = self.get_test_loc('maven/maven-metadata/maven-metadata.xml')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/maven-metadata/expected_maven_xml.json')
@@ -454,7 +568,7 @@ class MavenHtmlIndexVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_html_index_jcenter_1(self):
         uri = 'http://jcenter.bintray.com/'
         test_loc = self.get_test_loc('maven/html/jcenter.bintray.com.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/html/visitor_expected_jcenter.bintray.com2.html.json')
@@ -463,7 +577,7 @@ class MavenHtmlIndexVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_html_index_jcenter_2(self):
         uri = 'http://jcenter.bintray.com/Action/app/'
         test_loc = self.get_test_loc('maven/html/app.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/html/visitor_expected_app.html.json')
@@ -472,7 +586,7 @@ class MavenHtmlIndexVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_html_index_jcenter_3(self):
         uri = "http://jcenter.bintray.com/'com/virtualightning'/stateframework-compiler/"
         test_loc = self.get_test_loc('maven/html/stateframework-compiler.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/html/visitor_expected_stateframework-compiler.html.json')
@@ -486,7 +600,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_axis(self):
         uri = 'https://repo1.maven.org/maven2/axis/axis/1.4/axis-1.4.pom'
         test_loc = self.get_test_loc('maven/mapper/axis-1.4.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -496,7 +610,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_commons_pool(self):
         uri = 'https://repo1.maven.org/maven2/commons-pool/commons-pool/1.5.7/commons-pool-1.5.7.pom'
         test_loc = self.get_test_loc('maven/mapper/commons-pool-1.5.7.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -506,7 +620,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_struts(self):
         uri = 'https://repo1.maven.org/maven2/struts-menu/struts-menu/2.4.2/struts-menu-2.4.2.pom'
         test_loc = self.get_test_loc('maven/mapper/struts-menu-2.4.2.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -516,7 +630,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_mysql(self):
         uri = 'https://repo1.maven.org/maven2/mysql/mysql-connector-java/5.1.27/mysql-connector-java-5.1.27.pom'
         test_loc = self.get_test_loc('maven/mapper/mysql-connector-java-5.1.27.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -526,7 +640,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_xbean(self):
         uri = 'https://repo1.maven.org/maven2/xbean/xbean-jmx/2.0/xbean-jmx-2.0.pom'
         test_loc = self.get_test_loc('maven/mapper/xbean-jmx-2.0.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -536,7 +650,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_maven_all(self):
         uri = 'https://repo1.maven.org/maven2/date/yetao/maven/maven-all/1.0-RELEASE/maven-all-1.0-RELEASE.pom'
         test_loc = self.get_test_loc('maven/mapper/maven-all-1.0-RELEASE.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -546,7 +660,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_with_unicode(self):
         uri = 'https://repo1.maven.org/maven2/edu/psu/swe/commons/commons-jaxrs/1.21/commons-jaxrs-1.21.pom'
         test_loc = self.get_test_loc('maven/mapper/commons-jaxrs-1.21.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -656,7 +770,7 @@ class MavenMapperGetPackageTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_uris_increment_contain_correct_purl(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.457.gz'
         test_loc = self.get_test_loc('maven/index/increment2/nexus-maven-repository-index.457.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         uris = [u for i, u in enumerate(uris) if i % 500 == 0]
@@ -666,7 +780,7 @@ class MavenMapperGetPackageTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_then_get_mini_package_from_index_data(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.457.gz'
         test_loc = self.get_test_loc('maven/index/increment2/nexus-maven-repository-index.457.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         results = []
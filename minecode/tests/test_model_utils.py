@@ -8,11 +8,15 @@
 #
 
 from datetime import timedelta
+import copy
 import os
 
 from django.utils import timezone
 
 from minecode.model_utils import merge_or_create_package
+from minecode.model_utils import merge_or_create_packages
+from minecode.model_utils import merge_packages
+from minecode.model_utils import merge_packages_in_bulk
 from minecode.utils_test import JsonBasedTesting, MiningTestCase
 from packagedb.models import Package
 from packagedcode.maven import _parse
@@ -95,3 +99,96 @@ class ModelUtilsTestCase(MiningTestCase, JsonBasedTesting):
         updated_fields = data['updated_fields']
         expected_updated_fields_loc = self.get_test_loc('model_utils/expected_updated_fields.json')
         self.check_expected_results(updated_fields, expected_updated_fields_loc, regen=False)
+
+    def test_merge_or_create_packages(self):
+        existing = Package.objects.create(
+            type='maven',
+            namespace='org.apache.pulsar',
+            name='pulsar',
+            version='2.5.1',
+            download_url='https://repo1.maven.org/maven2/org/apache/pulsar/pulsar/2.5.1/pulsar-2.5.1.jar',
+        )
+        sources = copy.deepcopy(self.scanned_package)
+        sources.download_url = 'https://repo1.maven.org/maven2/org/apache/pulsar/pulsar/2.5.1/pulsar-2.5.1-sources.jar'
+        pom = copy.deepcopy(self.scanned_package)
+        pom.download_url = 'https://repo1.maven.org/maven2/org/apache/pulsar/pulsar/2.5.1/pulsar-2.5.1.pom'
+
+        results = merge_or_create_packages([
+            (self.scanned_package, 50),
+            (sources, 50),
+            (pom, 50),
+        ])
+        self.assertEqual(3, Package.objects.all().count())
+        self.assertEqual(3, len(results))
+
+        package, created, merged, map_error = results[0]
+        self.assertEqual(existing, package)
+        self.assertFalse(created)
+        self.assertTrue(merged)
+        self.assertEqual('', map_error)
+
+        for (package, created, merged, map_error), scanned_package in zip(results[1:], [sources, pom]):
+            self.assertTrue(created)
+            self.assertFalse(merged)
+            self.assertEqual('', map_error)
+            self.assertEqual(scanned_package.download_url, package.download_url)
+            self.assertEqual(scanned_package.name, package.name)
+            self.assertTrue(package.created_date)
+            self.assertEqual(len(scanned_package.parties), package.parties.count())
+            self.assertEqual(len(scanned_package.dependencies), package.dependencies.count())
+
+        # New packages share a PackageSet with the existing package of the same purl
+        package_set = existing.package_sets.get()
+        self.assertEqual(3, package_set.packages.count())
+
+    def test_merge_packages_only_loads_related_objects_with_new_values(self):
+        package = Package.objects.create(
+            type='maven',
+            namespace='org.apache.pulsar',
+            name='pulsar',
+            version='2.5.1',
+            download_url='https://repo1.maven.org/maven2/org/apache/pulsar/pulsar/2.5.1/pulsar-2.5.1.jar',
+        )
+        new_package_data = self.scanned_package.to_dict()
+        new_package_data['parties'] = []
+        new_package_data['dependencies'] = []
+        # A single query to save the updated package
+        with self.assertNumQueries(1):
+            updated_fields = merge_packages(package, new_package_data, replace=False)
+        self.assertIn('description', [entry['field'] for entry in updated_fields])
+        self.assertEqual(self.scanned_package.description, Package.objects.get().description)
+
+        # Nothing is left to update
+        with self.assertNumQueries(0):
+            self.assertEqual([], merge_packages(package, new_package_data, replace=False))
+
+    def test_merge_packages_in_bulk(self):
+        packages = []
+        merges = []
+        for version in ('2.5.0', '2.5.1'):
+            package = Package.objects.create(
+                type='maven',
+                namespace='org.apache.pulsar',
+                name='pulsar',
+                version=version,
+                download_url=f'https://repo1.maven.org/maven2/org/apache/pulsar/pulsar/{version}/pulsar-{version}.jar',
+            )
+            packages.append(package)
+            new_package_data = self.scanned_package.to_dict()
+            new_package_data['version'] = version
+            new_package_data['download_url'] = package.download_url
+            merges.append((package, new_package_data, False))
+
+        # Two queries to fetch the parties and dependencies, two queries per
+        # package to insert its new parties and dependencies and one to save
+        # all the packages
+        with self.assertNumQueries(7):
+            all_updated_fields = merge_packages_in_bulk(merges)
+        for updated_fields in all_updated_fields:
+            updated = [entry['field'] for entry in updated_fields]
+            self.assertIn('description', updated)
+            self.assertIn('parties', updated)
+            self.assertIn('dependencies', updated)
+        for package in Package.objects.all():
+            self.assertEqual(self.scanned_package.description, package.description)
+            self.assertEqual(len(self.scanned_package.parties), package.parties.count())
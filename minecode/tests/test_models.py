@@ -19,6 +19,7 @@ from minecode import mappers
 from minecode.models import ResourceURI
 from packagedb.models import Package
 from minecode.models import get_canonical
+from minecode.models import release_batch
 from minecode.models import ScannableURI
 
 
@@ -232,6 +233,24 @@ class ResourceURIManagerGetNextVisitableUnmappableURITestCase(TestCase):
         self.assertEqual(self.resource0, ResourceURI.objects.get_next_visitable())
         self.assertIsNone(ResourceURI.objects.get_next_visitable())
 
+    def test_claim_batch_unvisited(self):
+        claimed = ResourceURI.objects.claim_batch(10)
+        self.assertEqual([self.resource1, self.resource0], claimed)
+        self.assertTrue(all(r.wip_date for r in claimed))
+        self.assertEqual([], ResourceURI.objects.claim_batch(10))
+
+    def test_claim_batch_limit_and_release(self):
+        self.assertEqual([self.resource1], ResourceURI.objects.claim_batch(1))
+        claimed = ResourceURI.objects.claim_batch(1)
+        self.assertEqual([self.resource0], claimed)
+        release_batch(claimed)
+        self.assertEqual([self.resource0], ResourceURI.objects.claim_batch(1))
+
+    def test_claim_batch_with_revisitables(self):
+        self.resource0.last_visit_date = timezone.now() - timedelta(hours=250)
+        self.resource0.save()
+        self.assertEqual([self.resource1, self.resource0], ResourceURI.objects.claim_batch(10))
+
     def test_get_next_visitable_none_when_both_visited_less_than_10_days_ago(self):
         self.resource0.last_visit_date = timezone.now() - timedelta(hours=24)
         self.resource1.last_visit_date = timezone.now() - timedelta(hours=24)
@@ -412,6 +431,13 @@ class ScannableURIManagerTestCase(TestCase):
         self.assertIn(self.scannable_uri3, result)
         self.assertIn(self.scannable_uri4, result)
 
+    def test_ScannableURIManager_claim_batch(self):
+        result = ScannableURI.objects.claim_batch(2)
+        self.assertEqual([self.scannable_uri4, self.scannable_uri3], result)
+        self.assertTrue(all(r.wip_date for r in result))
+        result = ScannableURI.objects.claim_batch(2)
+        self.assertEqual([self.scannable_uri2], result)
+
     def test_ScannableURI_get_next_processable(self):
         result = ScannableURI.objects.get_next_processable()
         # scannable_uri4 should always be returned in front of scannable_uri2 and scannable_uri3
@@ -35,7 +35,7 @@ class TestNPMVisit(JsonBasedTesting):
     def test_NpmRegistryVisitor(self):
         uri = 'https://replicate.npmjs.com/registry/_changes?include_docs=true&limit=1000&since=2300000'
         test_loc = self.get_test_loc('npm/replicate_doc1.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _errors = npm.NpmRegistryVisitor(uri)
         # this is a non-persistent visitor, lets make sure we dont return any data
@@ -46,7 +46,7 @@ class TestNPMVisit(JsonBasedTesting):
     def test_NpmRegistryVisitor_OverLimit(self):
         uri = 'https://replicate.npmjs.com/registry/_changes?include_docs=true&limit=1000&since=2300000'
         test_loc = self.get_test_loc('npm/over_limit.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = npm.NpmRegistryVisitor(uri)
         expected_loc = self.get_test_loc('npm/expected_over_limit.json')
@@ -55,7 +55,7 @@ class TestNPMVisit(JsonBasedTesting):
     def test_NpmRegistryVisitor_1000records(self):
         uri = 'https://replicate.npmjs.com/registry/_changes?include_docs=true&limit=1000&since=77777'
         test_loc = self.get_test_loc('npm/1000_records.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = npm.NpmRegistryVisitor(uri)
         expected_loc = self.get_test_loc('npm/expected_1000_records.json')
@@ -92,7 +92,7 @@ class TestNPMMapper(JsonBasedTesting):
     def test_build_package_with_visitor_data(self):
         uri = 'https://replicate.npmjs.com/registry/_changes?include_docs=true&limit=1000&since=77777'
         test_loc = self.get_test_loc('npm/1000_records.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = npm.NpmRegistryVisitor(uri)
         uris_list = list(uris)
@@ -114,7 +114,7 @@ class TestNPMMapper(JsonBasedTesting):
     def test_build_package_with_ticket_439(self):
         uri = 'https://replicate.npmjs.com/registry/_changes?include_docs=true&limit=10&since=7333426'
         test_loc = self.get_test_loc('npm/ticket_439.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = npm.NpmRegistryVisitor(uri)
         uris_list = list(uris)
@@ -130,7 +130,7 @@ class TestNPMMapper(JsonBasedTesting):
     def test_build_package_verify_ticket_440(self):
         uri = 'https://replicate.npmjs.com/registry/_changes?include_docs=true&limit=10&since=7632607'
         test_loc = self.get_test_loc('npm/ticket_440_records.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = npm.NpmRegistryVisitor(uri)
         uris_list = list(uris)
@@ -30,7 +30,7 @@ class OpenSSLVisitorsTest(JsonBasedTesting):
     def test_OpenSSLVisitor(self):
         uri = 'https://ftp.openssl.org/'
         test_loc = self.get_test_loc('openssl/Index.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = openssl.OpenSSLVisitor(uri)
         expected_loc = self.get_test_loc(
@@ -40,7 +40,7 @@ class OpenSSLVisitorsTest(JsonBasedTesting):
     def test_OpenSSLVisitor_sub_folder(self):
         uri = 'https://ftp.openssl.org/source/'
         test_loc = self.get_test_loc('openssl/Indexof_source.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = openssl.OpenSSLVisitor(uri)
         expected_loc = self.get_test_loc(
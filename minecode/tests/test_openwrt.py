@@ -26,7 +26,7 @@ class OpenWRTVistorTest(JsonBasedTesting):
     def test_visit_openwrt_download_pages(self):
         uri = 'https://downloads.openwrt.org/chaos_calmer/15.05/'
         test_loc = self.get_test_loc('openwrt/Index_of_chaos_calmer_15.05_.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = openwrt.OpenWrtDownloadPagesVisitor(uri)
         expected_loc = self.get_test_loc('openwrt/chaos_calmer_15.05_expected')
@@ -35,7 +35,7 @@ class OpenWRTVistorTest(JsonBasedTesting):
     def test_visitor_openwrt_download_pages2(self):
         uri = 'https://downloads.openwrt.org/chaos_calmer/15.05/adm5120/rb1xx/packages/base/'
         test_loc = self.get_test_loc('openwrt/Index_of_chaos_calmer_15.05_adm5120_rb1xx_packages_base_.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = openwrt.OpenWrtDownloadPagesVisitor(uri)
         expected_loc = self.get_test_loc('openwrt/chaos_calmer_15.05_expected_2')
@@ -45,7 +45,7 @@ class OpenWRTVistorTest(JsonBasedTesting):
     def test_visitor_openwrt_packages_gz(self):
         uri = 'https://downloads.openwrt.org/chaos_calmer/15.05/adm5120/rb1xx/packages/base/Packages.gz'
         test_loc = self.get_test_loc('openwrt/Packages.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = openwrt.OpenWrtPackageIndexVisitor(uri)
 
@@ -56,7 +56,7 @@ class OpenWRTVistorTest(JsonBasedTesting):
     def test_visitor_openwrt_ipk(self):
         uri = 'https://downloads.openwrt.org/chaos_calmer/15.05/adm5120/rb1xx/packages/base/6to4_12-2_all.ipk'
         test_loc = self.get_test_loc('openwrt/6to4_12-2_all.ipk')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = openwrt.OpenWrtPackageIndexVisitor(uri)
 
@@ -68,7 +68,7 @@ class OpenWRTVistorTest(JsonBasedTesting):
     def test_visitor_openwrt_ipk2(self):
         uri = 'https://downloads.openwrt.org/kamikaze/7.09/brcm-2.4/packages/wpa-cli_0.5.7-1_mipsel.ipk'
         test_loc = self.get_test_loc('openwrt/wpa-cli_0.5.7-1_mipsel.ipk')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = openwrt.OpenWrtPackageIndexVisitor(uri)
 
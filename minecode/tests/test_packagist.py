@@ -26,7 +26,7 @@ class PackagistVistorTest(JsonBasedTesting):
     def test_visit_packagistlist(self):
         uri = 'https://packagist.org/packages/list.json'
         test_loc = self.get_test_loc('packagist/list.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = packagist.PackagistListVisitor(uri)
         expected_loc = self.get_test_loc('packagist/packagist_list_expected')
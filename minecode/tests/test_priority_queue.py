@@ -8,6 +8,8 @@
 #
 
 
+from unittest import mock
+
 from django.test import TestCase as DjangoTestCase
 from minecode.utils_test import JsonBasedTesting
 from minecode.models import PriorityResourceURI
@@ -40,3 +42,16 @@ class PriorityQueueTests(JsonBasedTesting, DjangoTestCase):
         self.assertIn(
             (purl_sources_str, sources_download_url), purls
         )
+
+    @mock.patch('minecode.management.commands.priority_queue.process_request')
+    def test_priority_queue_releases_claimed_uris_not_processed(self, mock_process_request):
+        mock_process_request.side_effect = [None, KeyboardInterrupt()]
+        for i in range(4):
+            PriorityResourceURI.objects.create(uri=f'pkg:maven/org.example/test{i}@1.0')
+
+        with self.assertRaises(KeyboardInterrupt):
+            priority_queue.Command().handle()
+
+        self.assertEqual(2, PriorityResourceURI.objects.filter(processed_date__isnull=False).count())
+        self.assertFalse(PriorityResourceURI.objects.filter(wip_date__isnull=False).exists())
+        self.assertEqual(2, PriorityResourceURI.objects.get_requests().count())
@@ -10,10 +10,18 @@
 import json
 import os
 
+from mock import MagicMock
 from mock import Mock
 from mock import patch
+import requests
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from matchcode.models import ApproximateDirectoryContentIndex
+from matchcode.models import ApproximateDirectoryStructureIndex
 from matchcode.models import ExactFileIndex
+from minecode.management.commands.process_scans import BulkIndexWriter
 from minecode.management.commands.process_scans import Command
 from minecode.management.commands.process_scans import get_scan_status
 from minecode.management.commands.process_scans import index_package_files
@@ -67,6 +75,57 @@ class ProcessScansTest(MiningTestCase, JsonBasedTesting):
         expected_resources_loc = self.get_test_loc('scancodeio/get_scan_data_expected_resources.json')
         self.check_expected_results(results, expected_resources_loc, regen=False)
 
+    def get_index_counts(self, package):
+        return [
+            model.objects.filter(package=package).count()
+            for model in (
+                Resource,
+                ExactFileIndex,
+                ApproximateDirectoryContentIndex,
+                ApproximateDirectoryStructureIndex,
+            )
+        ]
+
+    def test_ProcessScansTest_index_package_files_bulk_and_single_are_the_same(self):
+        scan_data_loc = self.get_test_loc('scancodeio/get_scan_data.json')
+        with open(scan_data_loc, 'rb') as f:
+            scan_data = json.loads(f.read())
+        package2 = Package.objects.create(
+            download_url='https://example.com/wagon-api.jar',
+            type='maven',
+            name='wagon-api',
+            version='1.0',
+        )
+        self.assertEqual(0, len(index_package_files(self.package1, scan_data, bulk=False)))
+        self.assertEqual(0, len(index_package_files(package2, scan_data, batch_size=7)))
+
+        expected = self.get_index_counts(self.package1)
+        self.assertEqual([64, 45, 11, 11], expected)
+        self.assertEqual(expected, self.get_index_counts(package2))
+        fields = ['path', 'size', 'sha1', 'md5', 'is_file', 'mime_type', 'programming_language']
+        self.assertEqual(
+            list(Resource.objects.filter(package=self.package1).values(*fields)),
+            list(Resource.objects.filter(package=package2).values(*fields)),
+        )
+
+        # Indexing again does not create duplicated rows
+        self.assertEqual(0, len(index_package_files(package2, scan_data)))
+        self.assertEqual(expected, self.get_index_counts(package2))
+
+    def test_ProcessScansTest_BulkIndexWriter_writes_in_batches(self):
+        scan_data_loc = self.get_test_loc('scancodeio/get_scan_data.json')
+        with open(scan_data_loc, 'rb') as f:
+            scan_data = json.loads(f.read())
+        writer = BulkIndexWriter(self.package1, batch_size=100)
+        with CaptureQueriesContext(connection) as queries:
+            writer.index_resources(scan_data['files'])
+        # one insert per table
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(4, len(inserts))
+        self.assertEqual(64, writer.counts[Resource])
+        self.assertEqual(45, writer.counts[ExactFileIndex])
+        self.assertEqual(4, len(writer.get_report()))
+
     @patch('requests.get')
     def test_ProcessScansTest_process_scan(self, mock_get):
         # Set up mock responses
@@ -75,10 +134,12 @@ class ProcessScansTest(MiningTestCase, JsonBasedTesting):
         with open(scan_info_loc, 'rb') as f:
             mock_scan_info_response.json.return_value = json.loads(f.read())
 
-        mock_scan_data_response = Mock()
+        # Scan data is streamed from the response
+        mock_scan_data_response = MagicMock(ok=True)
+        mock_scan_data_response.__enter__.return_value = mock_scan_data_response
         scan_data_loc = self.get_test_loc('scancodeio/get_scan_data.json')
         with open(scan_data_loc, 'rb') as f:
-            mock_scan_data_response.json.return_value = json.loads(f.read())
+            mock_scan_data_response.iter_content.return_value = [f.read()]
 
         mock_scan_summary_response = Mock()
         scan_summary_loc = self.get_test_loc('scancodeio/scan_summary_response.json')
@@ -108,3 +169,43 @@ class ProcessScansTest(MiningTestCase, JsonBasedTesting):
         result = ExactFileIndex.objects.filter(package=self.package1)
         self.assertEqual(45, result.count())
 
+    @patch('requests.get')
+    def test_ProcessScansTest_process_scan_fails_when_scan_data_fetch_fails(self, mock_get):
+        scan_data_loc = self.get_test_loc('scancodeio/get_scan_data.json')
+        with open(scan_data_loc, 'rb') as f:
+            scan_data_content = f.read()
+        index_package_files(self.package1, json.loads(scan_data_content))
+        expected = self.get_index_counts(self.package1)
+
+        mock_scan_info_response = Mock()
+        scan_info_loc = self.get_test_loc('scancodeio/get_scan_info.json')
+        with open(scan_info_loc, 'rb') as f:
+            mock_scan_info_response.json.return_value = json.loads(f.read())
+
+        def iter_content(chunk_size):
+            # the connection is dropped after the first bytes are received
+            yield scan_data_content[:5000]
+            raise requests.exceptions.ChunkedEncodingError('Connection broken')
+
+        mock_scan_data_response = MagicMock(ok=True)
+        mock_scan_data_response.__enter__.return_value = mock_scan_data_response
+        mock_scan_data_response.iter_content.side_effect = iter_content
+
+        mock_get.side_effect = [mock_scan_info_response, mock_scan_data_response]
+
+        scannable_uri = ScannableURI.objects.create(
+            uri='https://repo1.maven.org/maven2/maven/wagon-api/20040705.181715/wagon-api-20040705.181715.jar',
+            scan_uuid='54dc4afe-70ea-4f1c-9ed3-989efd9a991f',
+            scan_status=ScannableURI.SCAN_COMPLETED,
+            package=self.package1,
+            rescan_uri=True,
+        )
+
+        Command.process_scan(scannable_uri)
+
+        scannable_uri.refresh_from_db()
+        self.assertEqual(ScannableURI.SCAN_INDEX_FAILED, scannable_uri.scan_status)
+        self.assertIn('ChunkedEncodingError', scannable_uri.index_error)
+        self.assertIsNone(scannable_uri.wip_date)
+        # nothing is deleted when the scan data cannot be fetched
+        self.assertEqual(expected, self.get_index_counts(self.package1))
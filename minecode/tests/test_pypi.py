@@ -73,7 +73,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageVisitor(self):
         uri = 'https://pypi.python.org/pypi/CAGE/json'
         test_loc = self.get_test_loc('pypi/cage.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _error = visitors.pypi.PypiPackageVisitor(uri)
 
@@ -83,7 +83,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageVisitor_2(self):
         uri = 'https://pypi.python.org/pypi/boolean.py/json'
         test_loc = self.get_test_loc('pypi/boolean.py.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = visitors.pypi.PypiPackageVisitor(uri)
 
@@ -93,7 +93,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageReleaseVisitor_cage12(self):
         uri = 'https://pypi.python.org/pypi/CAGE/1.1.2/json'
         test_loc = self.get_test_loc('pypi/cage_1.1.2.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _error = visitors.pypi.PypiPackageReleaseVisitor(uri)
 
@@ -106,7 +106,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageReleaseVisitor_cage13(self):
         uri = 'https://pypi.python.org/pypi/CAGE/1.1.3/json'
         test_loc = self.get_test_loc('pypi/cage_1.1.3.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _error = visitors.pypi.PypiPackageReleaseVisitor(uri)
 
@@ -119,7 +119,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageReleaseVisitor_boolean(self):
         uri = 'https://pypi.python.org/pypi/boolean.py/2.0.dev3/json'
         test_loc = self.get_test_loc('pypi/boolean.py-2.0.dev3.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _error = visitors.pypi.PypiPackageReleaseVisitor(uri)
 
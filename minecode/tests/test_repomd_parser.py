@@ -56,7 +56,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://archive.cloudera.com/cm5/redhat/6/x86_64/cm/5.3.2/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -76,7 +76,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://vault.centos.org/3.8/updates/x86_64/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -103,7 +103,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://archive.cloudera.com/cm5/redhat/5/x86_64/cm/5.2.0/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -123,7 +123,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://yum.postgresql.org/9.2/redhat/rhel-6-x86_64/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             uris, packages, error = collect_rpm_packages_from_repomd(uri)
         self.assertEqual(None, error)
@@ -150,7 +150,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://download.opensuse.org/distribution/12.3/repo/oss/suse/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -170,7 +170,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://pgpool.net/yum/rpms/3.4/redhat/rhel-6-x86_64/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
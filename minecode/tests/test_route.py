@@ -266,3 +266,55 @@ class RouteTest(TestCase):
         self.assertTrue(uris.is_routable('http://nexc.com'))
         self.assertTrue(uris.is_routable('http://dejb.com'))
         self.assertFalse(uris.is_routable('https://deja.com'))
+
+    def test_get_literal_prefixes(self):
+        self.assertEqual(
+            ['http://repo1.maven.org/maven2/', 'https://repo1.maven.org/maven2/'],
+            route.get_literal_prefixes(r'https?://repo1\.maven\.org/maven2/.*'),
+        )
+        self.assertEqual(['http'], route.get_literal_prefixes('https*://'))
+        self.assertEqual(['ab'], route.get_literal_prefixes('ab+c'))
+        self.assertEqual(['x'], route.get_literal_prefixes(r'x\dy'))
+        self.assertEqual(['pkg:npm/'], route.get_literal_prefixes('pkg:npm/.*'))
+        self.assertEqual([''], route.get_literal_prefixes('.+/repomd.xml'))
+        self.assertEqual([''], route.get_literal_prefixes('http://a|http://b'))
+        self.assertEqual(['http://'], route.get_literal_prefixes('http://(a|b)'))
+
+    def test_resolve_only_matches_rules_with_a_literal_prefix(self):
+        uris = route.Router()
+
+        @uris.route(r'https?://nexb\.com/.*')
+        def myroute(uri):
+            pass
+
+        @uris.route(r'.*/repomd\.xml')
+        def myroute2(uri):
+            pass
+
+        self.assertEqual(myroute.__name__, uris.resolve('https://nexb.com/foo').__name__)
+        self.assertEqual(myroute2.__name__, uris.resolve('https://deja.com/repomd.xml').__name__)
+        self.assertRaises(
+            route.MultipleRoutesDefined, uris.resolve, 'http://nexb.com/repomd.xml')
+        self.assertRaises(route.NoRouteAvailable, uris.resolve, 'https://nexb.org')
+
+        # appending a route after resolving updates the resolution
+        @uris.route(r'https://nexb\.org')
+        def myroute3(uri):
+            pass
+
+        self.assertEqual(myroute3.__name__, uris.resolve('https://nexb.org').__name__)
+        self.assertTrue(uris.is_routable('https://nexb.org'))
+
+    def test_rule_index_candidates_of_real_routers(self):
+        from minecode import mappers  # NOQA
+        from minecode import visitors  # NOQA
+        from minecode import map_router
+        from minecode import priority_router
+        from minecode import visit_router
+
+        for router in (visit_router, map_router, priority_router):
+            rules = list(router.route_map.values())
+            index = route.RuleIndex(rules)
+            for rule in rules:
+                for prefix in rule.literal_prefixes:
+                    self.assertIn(rule, index.get_candidates(prefix + 'xyz'))
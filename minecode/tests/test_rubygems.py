@@ -61,7 +61,7 @@ class RubyGemsVisitorTest(JsonBasedTesting):
     def test_RubyGemsIndexVisitor_latest(self):
         uri = 'http://rubygems.org/specs.4.8.gz'
         test_loc = self.get_test_loc('rubygems/index/latest_specs.4.8.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = RubyGemsIndexVisitor(uri)
         expected_loc = self.get_test_loc('rubygems/index/latest_specs.4.8.gz.expected.json')
@@ -72,7 +72,7 @@ class RubyGemsVisitorTest(JsonBasedTesting):
     def test_RubyGemsApiVersionVisitor(self):
         uri = 'https://rubygems.org/api/v1/versions/0xffffff.json'
         test_loc = self.get_test_loc('rubygems/apiv1/0xffffff.api.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = RubyGemsApiManyVersionsVisitor(uri)
         expected_loc = self.get_test_loc('rubygems/apiv1/expected_0xffffff.api.json')
@@ -81,7 +81,7 @@ class RubyGemsVisitorTest(JsonBasedTesting):
     def test_RubyGemsApiVersionVisitor2(self):
         uri = 'https://rubygems.org/api/v1/versions/a1630ty_a1630ty.json'
         test_loc = self.get_test_loc('rubygems/apiv1/a1630ty_a1630ty.api.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = RubyGemsApiManyVersionsVisitor(uri)
         expected_loc = self.get_test_loc('rubygems/apiv1/expected_a1630ty_a1630ty.api.json')
@@ -90,7 +90,7 @@ class RubyGemsVisitorTest(JsonBasedTesting):
     def test_RubyGemsApiVersionVisitor3(self):
         uri = 'https://rubygems.org/api/v1/versions/zuck.json'
         test_loc = self.get_test_loc('rubygems/apiv1/zuck.api.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = RubyGemsApiManyVersionsVisitor(uri)
         expected_loc = self.get_test_loc('rubygems/apiv1/expected_zuck.api.json')
@@ -99,7 +99,7 @@ class RubyGemsVisitorTest(JsonBasedTesting):
     def test_RubyGemsPackageArchiveMetadataVisitor(self):
         uri = 'https://rubygems.org/downloads/a_okay-0.1.0.gem'
         test_loc = self.get_test_loc('rubygems/a_okay-0.1.0.gem', copy=True)
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = RubyGemsPackageArchiveMetadataVisitor(uri)
         expected_loc = self.get_test_loc('rubygems/a_okay-0.1.0.gem.metadata')
@@ -277,7 +277,7 @@ class RubyEnd2EndTest(JsonBasedTesting, DjangoTestCase):
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should process all the test uris
             visit_uri(resource_uri)
@@ -7,15 +7,19 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
-import os
+from concurrent.futures.process import BrokenProcessPool
 from io import StringIO
+from unittest import mock
+import os
 
 from django.core import management
 from django.utils import timezone
 
 from packagedcode.models import Package as ScannedPackage
 
+from minecode.management.commands.run_map import Command
 from minecode.management.commands.run_map import map_uri
+from minecode.management.commands.run_map import map_uris
 from minecode.model_utils import merge_packages
 from minecode.models import ResourceURI
 from minecode.models import ScannableURI
@@ -306,6 +310,71 @@ class RunMapTest(JsonBasedTesting, MiningTestCase):
         management.call_command('run_map', exit_on_empty=True, stdout=output)
         self.assertEquals('', output.getvalue())
 
+    def test_map_uris_saves_mapped_packages_in_bulk(self):
+        def mock_mapper(uri, resource_uri):
+            if uri.endswith('error'):
+                raise Exception('mapping failed')
+            return [ScannedPackage(
+                type='generic',
+                name=uri.rpartition('/')[-1],
+                version='1.0',
+                download_url=uri + '.zip',
+            )]
+
+        router = Router()
+        router.append('http://testdomaps.com/.*', mock_mapper)
+
+        resource_uris = []
+        for name in ['pack1', 'pack2', 'pack3', 'error']:
+            resource_uri = ResourceURI.objects.insert(
+                uri='http://testdomaps.com/' + name,
+                last_visit_date=timezone.now(),
+                wip_date=timezone.now(),
+            )
+            resource_uris.append(resource_uri)
+
+        # one query to check existing packages, one to insert Packages, one to
+        # insert their history, one to find related packages, one to insert
+        # ScannableURIs and one to update the ResourceURIs plus the savepoint
+        # and transaction queries
+        with self.assertNumQueries(8):
+            map_uris(resource_uris, _map_router=router)
+
+        packages = packagedb.models.Package.objects.order_by('name')
+        self.assertEqual(['pack1', 'pack2', 'pack3'], [p.name for p in packages])
+        self.assertEqual(
+            ['http://testdomaps.com/pack1.zip', 'http://testdomaps.com/pack2.zip', 'http://testdomaps.com/pack3.zip'],
+            sorted(ScannableURI.objects.values_list('uri', flat=True))
+        )
+
+        for resource_uri in ResourceURI.objects.all():
+            self.assertIsNone(resource_uri.wip_date)
+            self.assertIsNotNone(resource_uri.last_map_date)
+            if resource_uri.uri.endswith('error'):
+                self.assertIn('mapping failed', resource_uri.map_error)
+                self.assertTrue(resource_uri.has_map_error)
+            else:
+                self.assertIsNone(resource_uri.map_error)
+                self.assertFalse(resource_uri.has_map_error)
+
+    def test_run_map_map_loop_releases_claimed_uris_when_the_pool_breaks(self):
+        for name in ['pack1', 'pack2', 'pack3']:
+            ResourceURI.objects.insert(
+                uri='http://testdomaps.com/' + name,
+                last_visit_date=timezone.now(),
+            )
+        ResourceURI.objects.update(is_mappable=True)
+        self.assertEqual(3, ResourceURI.objects.get_mappables().count())
+
+        executor = mock.Mock()
+        executor.map.side_effect = BrokenProcessPool('A process in the process pool was terminated')
+        with self.assertRaises(BrokenProcessPool):
+            Command().map_loop(executor=executor, batch_size=2, exit_on_empty=True)
+
+        self.assertTrue(executor.map.called)
+        self.assertFalse(ResourceURI.objects.filter(wip_date__isnull=False).exists())
+        self.assertEqual(3, ResourceURI.objects.get_mappables().count())
+
     def test_map_uri_does_update_with_same_mining_level(self):
         # setup
         # build a mock mapper and register it in a router
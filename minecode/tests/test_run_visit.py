@@ -12,13 +12,21 @@ from operator import itemgetter
 from io import StringIO
 
 from collections import Counter
+from unittest import mock
+
 from django.core import management
+from django.db import connection
+from django.db import DataError
+from django.test.utils import CaptureQueriesContext
 from django.forms.models import model_to_dict
 
 from minecode.utils_test import MiningTestCase
+from minecode.management.commands.run_visit import insert_visited_uris
 from minecode.management.commands.run_visit import visit_uri
+from minecode.management.commands.run_visit import visit_uris
 from minecode.models import ResourceURI
 from minecode.route import Router
+from minecode.visitors import Checkpoint
 from minecode.visitors import URI
 
 
@@ -476,6 +484,197 @@ class RunVisitTest(MiningTestCase):
         expected = 'Visited 0 URIs\nInserted 0 new URIs\n'
         self.assertEquals(expected, output.getvalue())
 
+    def test_visit_uri_inserts_yielded_uris_in_batches(self):
+        ResourceURI.objects.insert(uri='http://test.com/2')
+
+        def get_uris():
+            for i in range(25):
+                yield URI(uri=f'http://test.com/{i}')
+            # duplicates are not inserted twice
+            yield URI(uri='http://test.com/0')
+
+        def mock_visitor(uri):
+            return get_uris(), None, None
+
+        router = Router()
+        router.append(self.uri, mock_visitor)
+
+        with mock.patch('minecode.management.commands.run_visit.INSERT_BATCH_SIZE', 10):
+            with CaptureQueriesContext(connection) as queries:
+                inserted = visit_uri(self.resource_uri, _visit_router=router)
+
+        self.assertEqual(24, inserted)
+        self.assertEqual(25, ResourceURI.objects.filter(uri__startswith='http://test.com/').count())
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(3, len(inserts))
+
+    def test_visit_uri_inserts_valid_uris_of_a_batch_with_an_invalid_uri(self):
+        def get_uris():
+            for i in range(5):
+                yield URI(uri=f'http://test.com/{i}')
+            yield URI(uri='http://[::1')
+            for i in range(5, 10):
+                yield URI(uri=f'http://test.com/{i}')
+
+        def mock_visitor(uri):
+            return get_uris(), None, None
+
+        router = Router()
+        router.append(self.uri, mock_visitor)
+
+        uri_counter_by_visitor = Counter()
+        with mock.patch('minecode.management.commands.run_visit.INSERT_BATCH_SIZE', 100):
+            inserted = visit_uri(
+                self.resource_uri,
+                max_uris=100,
+                uri_counter_by_visitor=uri_counter_by_visitor,
+                _visit_router=router,
+            )
+
+        self.assertEqual(10, inserted)
+        self.assertEqual(10, ResourceURI.objects.filter(uri__startswith='http://test.com/').count())
+        self.assertEqual([10], list(uri_counter_by_visitor.values()))
+        self.resource_uri.refresh_from_db()
+        self.assertIn('http://[::1', self.resource_uri.visit_error)
+
+    def test_insert_visited_uris_inserts_one_at_a_time_when_the_batch_fails(self):
+        vuris = [URI(uri=f'http://test.com/{i}') for i in range(3)]
+        visit_errors = []
+        bulk_create = ResourceURI.objects.bulk_create
+
+        def fail_on_batches(objs, *args, **kwargs):
+            if len(objs) > 1:
+                raise DataError('value too long')
+            if objs[0].uri.endswith('1'):
+                raise DataError('value too long')
+            return bulk_create(objs, *args, **kwargs)
+
+        uri_counter_by_visitor = Counter()
+        with mock.patch.object(ResourceURI.objects, 'bulk_create', side_effect=fail_on_batches):
+            inserted, must_stop = insert_visited_uris(
+                vuris,
+                visit_errors=visit_errors,
+                max_uris=10,
+                uri_counter_by_visitor=uri_counter_by_visitor,
+                visitor_key='test',
+            )
+
+        self.assertEqual(2, inserted)
+        self.assertFalse(must_stop)
+        self.assertEqual(2, uri_counter_by_visitor['test'])
+        self.assertEqual(
+            ['http://test.com/0', 'http://test.com/2'],
+            sorted(ResourceURI.objects.filter(uri__startswith='http://test.com/').values_list('uri', flat=True)),
+        )
+        self.assertEqual(1, len(visit_errors))
+        self.assertIn('http://test.com/1', visit_errors[0])
+
+    def test_visit_uri_saves_checkpoints_after_inserting_previous_uris(self):
+        saved_counts = []
+
+        def save_checkpoint():
+            count = ResourceURI.objects.filter(uri__startswith='http://test.com/').count()
+            saved_counts.append(count)
+
+        def get_uris():
+            for i in range(3):
+                yield URI(uri=f'http://test.com/{i}')
+            yield Checkpoint(save_checkpoint)
+            for i in range(3, 5):
+                yield URI(uri=f'http://test.com/{i}')
+            yield Checkpoint(save_checkpoint)
+
+        def mock_visitor(uri):
+            return get_uris(), None, None
+
+        router = Router()
+        router.append(self.uri, mock_visitor)
+
+        with mock.patch('minecode.management.commands.run_visit.INSERT_BATCH_SIZE', 10):
+            inserted = visit_uri(self.resource_uri, _visit_router=router)
+
+        self.assertEqual(5, inserted)
+        self.assertEqual([3, 5], saved_counts)
+
+    def test_visit_uri_saves_checkpoints_after_recording_invalid_uris_errors(self):
+        saved_counts = []
+
+        def save_checkpoint():
+            count = ResourceURI.objects.filter(uri__startswith='http://test.com/').count()
+            saved_counts.append(count)
+
+        def get_uris():
+            for i in range(3):
+                yield URI(uri=f'http://test.com/{i}')
+            yield URI(uri='http://[::1')
+            yield Checkpoint(save_checkpoint)
+
+        def mock_visitor(uri):
+            return get_uris(), None, None
+
+        router = Router()
+        router.append(self.uri, mock_visitor)
+
+        inserted = visit_uri(self.resource_uri, _visit_router=router)
+
+        self.assertEqual(3, inserted)
+        self.assertEqual([3], saved_counts)
+        self.resource_uri.refresh_from_db()
+        self.assertIn('http://[::1', self.resource_uri.visit_error)
+
+    def test_visit_uri_inserts_yielded_uris_when_the_visitor_fails(self):
+        def get_uris():
+            for i in range(25):
+                yield URI(uri=f'http://test.com/{i}')
+            raise Exception('Visitor failure')
+
+        def mock_visitor(uri):
+            return get_uris(), None, None
+
+        router = Router()
+        router.append(self.uri, mock_visitor)
+
+        with mock.patch('minecode.management.commands.run_visit.INSERT_BATCH_SIZE', 10):
+            inserted = visit_uri(self.resource_uri, _visit_router=router)
+
+        self.assertEqual(25, inserted)
+        self.assertEqual(25, ResourceURI.objects.filter(uri__startswith='http://test.com/').count())
+        self.resource_uri.refresh_from_db()
+        self.assertIn('Visitor failure', self.resource_uri.visit_error)
+        self.assertIsNone(self.resource_uri.wip_date)
+
+    @mock.patch('minecode.management.commands.run_visit.visit_uri')
+    def test_visit_uris_releases_claimed_uris_not_visited(self, mock_visit_uri):
+        mock_visit_uri.return_value = 0
+        for i in range(5):
+            ResourceURI.objects.create(uri=f'http://test-{i}.com')
+        ResourceURI.objects.update(is_visitable=True)
+        self.assertEqual(6, ResourceURI.objects.get_visitables().count())
+
+        visited_counter, _ = visit_uris(ignore_robots=True, ignore_throttle=True, max_loops=1)
+        self.assertEqual(2, visited_counter)
+        visited = [call.kwargs['resource_uri'] for call in mock_visit_uri.call_args_list]
+        self.assertEqual(2, ResourceURI.objects.in_progress().count())
+        self.assertEqual(
+            sorted(r.pk for r in visited),
+            sorted(ResourceURI.objects.in_progress().values_list('pk', flat=True)),
+        )
+        # the other claimed ResourceURIs are back in the queue
+        self.assertEqual(4, ResourceURI.objects.get_visitables().count())
+
+    @mock.patch('minecode.management.commands.run_visit.visit_uri')
+    def test_visit_uris_releases_claimed_uris_when_a_visit_fails(self, mock_visit_uri):
+        mock_visit_uri.side_effect = KeyboardInterrupt()
+        for i in range(5):
+            ResourceURI.objects.create(uri=f'http://test-{i}.com')
+        ResourceURI.objects.update(is_visitable=True)
+
+        with self.assertRaises(KeyboardInterrupt):
+            visit_uris(ignore_robots=True, ignore_throttle=True)
+        # only the ResourceURI being visited is still in progress
+        self.assertEqual(1, ResourceURI.objects.in_progress().count())
+        self.assertEqual(5, ResourceURI.objects.get_visitables().count())
+
     def test_visit_uri_always_inserts_new_uri(self):
         # test proper
         visit_uri(self.resource_uri, _visit_router=self.router2)
@@ -15,8 +15,10 @@ import attr
 import mock
 
 from django.test import TestCase as DjangoTestCase
+from django.utils import timezone
 
 from minecode.management import scanning
+from minecode.models import ScannableURI
 from minecode.utils_test import JsonBasedTesting
 from packagedb.models import Package
 
@@ -192,3 +194,146 @@ class ScanCodeIOAPIHelperFunctionTest(JsonBasedTesting, DjangoTestCase):
         with open(expected_loc, 'rb') as f:
             expected = json.loads(f.read())
         self.assertEqual(expected['files'], result['files'])
+
+    @mock.patch('requests.get')
+    def testscanning_download_scan_data_and_iter_scan_data_files(self, mock_get):
+        test_loc = self.get_test_loc('scancodeio/get_scan_data.json')
+        response = mock.MagicMock(ok=True)
+        response.__enter__.return_value = response
+        with open(test_loc, 'rb') as f:
+            content = f.read()
+        response.iter_content.return_value = [content[:1000], content[1000:]]
+        mock_get.return_value = response
+        scan_uuid = '54dc4afe-70ea-4f1c-9ed3-989efd9a991f'
+        api_url = 'http://127.0.0.1:8001/api/'
+        api_auth_headers = {}
+        location = self.get_temp_file('scan_data.json')
+        scanning.download_scan_data(scan_uuid=scan_uuid, location=location, api_url=api_url, api_auth_headers=api_auth_headers)
+        self.assertTrue(mock_get.call_args.kwargs['stream'])
+
+        expected_loc = self.get_test_loc('scancodeio/get_scan_data_expected.json')
+        with open(expected_loc, 'rb') as f:
+            expected = json.loads(f.read())
+        self.assertEqual(expected['files'], list(scanning.iter_scan_data_files(location)))
+
+    @mock.patch('requests.get')
+    def testscanning_download_scan_data_fails_on_truncated_json(self, mock_get):
+        test_loc = self.get_test_loc('scancodeio/get_scan_data.json')
+        response = mock.MagicMock(ok=True)
+        response.__enter__.return_value = response
+        with open(test_loc, 'rb') as f:
+            response.iter_content.return_value = [f.read()[:5000]]
+        mock_get.return_value = response
+        location = self.get_temp_file('scan_data.json')
+        with self.assertRaises(Exception):
+            scanning.download_scan_data(
+                scan_uuid='54dc4afe-70ea-4f1c-9ed3-989efd9a991f',
+                location=location,
+                api_url='http://127.0.0.1:8001/api/',
+                api_auth_headers={},
+            )
+
+
+class ScanningCommandTest(DjangoTestCase):
+
+    def get_command_class(self, uris):
+        uris = list(uris)
+        processed = []
+        errors = []
+
+        class TestScanningCommand(scanning.ScanningCommand):
+            logger = mock.Mock()
+
+            @classmethod
+            def get_next_uri(cls):
+                return uris and uris.pop(0) or None
+
+            @classmethod
+            def process_scan(cls, scannable_uri, **kwargs):
+                if scannable_uri == 'error':
+                    raise Exception('failed')
+                processed.append(scannable_uri)
+
+            @classmethod
+            def set_process_scan_error(cls, scannable_uri, error_message):
+                errors.append(scannable_uri)
+
+        TestScanningCommand.errors = errors
+        return TestScanningCommand, processed
+
+    def test_ScanningCommand_process_scans_concurrently(self):
+        uris = [f'uri{i}' for i in range(10)] + ['error']
+        command, processed = self.get_command_class(uris)
+        counter = command.process_scans_concurrently(exit_on_empty=True, workers=3)
+        self.assertEqual(11, counter)
+        self.assertEqual(sorted(uris[:-1]), sorted(processed))
+        self.assertTrue(command.logger.error.called)
+        self.assertEqual(['error'], command.errors)
+
+    def test_ScanningCommand_process_scans_concurrently_max_uris(self):
+        command, processed = self.get_command_class([f'uri{i}' for i in range(10)])
+        counter = command.process_scans_concurrently(exit_on_empty=True, max_uris=4, workers=2)
+        self.assertEqual(4, counter)
+        self.assertEqual(4, len(processed))
+
+    @mock.patch('minecode.management.scanning.connections')
+    def test_ScanningCommand_process_scan_in_thread_records_errors(self, mock_connections):
+        scannable_uri = ScannableURI.objects.create(
+            uri='https://example.com/foo.jar',
+            scan_status=ScannableURI.SCAN_COMPLETED,
+            wip_date=timezone.now(),
+            package=Package.objects.create(download_url='https://example.com/foo.jar'),
+        )
+
+        class FailingScanningCommand(scanning.ScanningCommand):
+            logger = mock.Mock()
+
+            @classmethod
+            def process_scan(cls, scannable_uri, **kwargs):
+                raise Exception('failed')
+
+        FailingScanningCommand.process_scan_in_thread(scannable_uri)
+        scannable_uri.refresh_from_db()
+        self.assertIn('failed', scannable_uri.scan_error)
+        self.assertIsNone(scannable_uri.wip_date)
+        self.assertTrue(mock_connections.close_all.called)
+
+    @mock.patch('minecode.management.scanning.connections')
+    def test_process_scans_process_scan_in_thread_records_index_errors(self, mock_connections):
+        from minecode.management.commands.process_scans import Command
+
+        scannable_uri = ScannableURI.objects.create(
+            uri='https://example.com/foo.jar',
+            scan_status=ScannableURI.SCAN_COMPLETED,
+            wip_date=timezone.now(),
+            package=Package.objects.create(download_url='https://example.com/foo.jar'),
+        )
+        with mock.patch.object(Command, 'process_scan', side_effect=Exception('failed')):
+            Command.process_scan_in_thread(scannable_uri)
+        scannable_uri.refresh_from_db()
+        self.assertEqual(ScannableURI.SCAN_INDEX_FAILED, scannable_uri.scan_status)
+        self.assertIn('failed', scannable_uri.index_error)
+        self.assertIsNone(scannable_uri.wip_date)
+
+    @mock.patch('minecode.management.scanning.connections')
+    def test_process_scans_process_scan_in_thread_records_scan_errors_of_uncompleted_scans(self, mock_connections):
+        from minecode.management.commands.process_scans import Command
+
+        scannable_uri = ScannableURI.objects.create(
+            uri='https://example.com/foo.jar',
+            scan_status=ScannableURI.SCAN_SUBMITTED,
+            wip_date=timezone.now(),
+            package=Package.objects.create(download_url='https://example.com/foo.jar'),
+        )
+
+        def process_scan(scannable_uri, **kwargs):
+            scannable_uri.scan_status = ScannableURI.SCAN_COMPLETED
+            raise Exception('failed')
+
+        with mock.patch.object(Command, 'process_scan', side_effect=process_scan):
+            Command.process_scan_in_thread(scannable_uri)
+        scannable_uri.refresh_from_db()
+        self.assertEqual(ScannableURI.SCAN_SUBMITTED, scannable_uri.scan_status)
+        self.assertIn('failed', scannable_uri.scan_error)
+        self.assertIsNone(scannable_uri.index_error)
+        self.assertIsNone(scannable_uri.wip_date)
@@ -8,13 +8,22 @@
 #
 
 
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import hashlib
 import os
+import threading
+from unittest import TestCase
+from unittest import mock
 
 from django.test import TestCase as DjangoTestCase
 
 from packagedcode import models as scan_models
 
+from minecode.http_client import HttpClient
 from minecode.utils_test import JsonBasedTesting
+from minecode.utils import download_http
+from minecode.utils import get_temp_file
 from minecode.utils import is_int
 from minecode.utils import stringify_null_purl_fields
 
@@ -66,3 +75,102 @@ class UtilsTest(JsonBasedTesting, DjangoTestCase):
     def test_is_int(self):
         self.assertTrue(is_int(0))
         self.assertFalse(is_int('a'))
+
+
+class FlakyRangeHandler(BaseHTTPRequestHandler):
+    """
+    Serve `content` dropping the connection after `drop_after` bytes of each
+    response and supporting Range requests if `support_range` is True. Always
+    respond with a `status` and the whole `content` if set.
+    """
+    content = bytes(range(256)) * 1000
+    drop_after = 100 * 1024
+    support_range = True
+
+    status = None
+
+    def do_GET(self):
+        self.server.ranges.append(self.headers.get('Range'))
+        if self.status:
+            self.send_response(self.status)
+            self.send_header('Content-Length', str(len(self.content)))
+            self.end_headers()
+            self.wfile.write(self.content)
+            return
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and self.support_range:
+            start = int(range_header.partition('=')[2].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(self.content) - 1}/{len(self.content)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(self.content) - start))
+        self.end_headers()
+        self.wfile.write(self.content[start:start + self.drop_after])
+        self.wfile.flush()
+        # drop the connection
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadHttpTest(TestCase):
+    def start_server(self, **attributes):
+        handler = type('Handler', (FlakyRangeHandler,), attributes)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.ranges = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, 'http://127.0.0.1:{}/index.gz'.format(server.server_address[1])
+
+    def test_download_http_resumes_with_range_requests(self):
+        server, uri = self.start_server()
+        location = get_temp_file('test_download_http')
+        info = download_http(uri, location, retries=5, wait=0, chunk_size=1024)
+
+        content = FlakyRangeHandler.content
+        with open(location, 'rb') as downloaded:
+            self.assertEqual(content, downloaded.read())
+        self.assertEqual(len(content), info['size'])
+        self.assertEqual(hashlib.sha1(content).hexdigest(), info['sha1'])
+        self.assertEqual(hashlib.md5(content).hexdigest(), info['md5'])
+        self.assertEqual([None, 'bytes=102400-', 'bytes=204800-'], server.ranges)
+
+    def test_download_http_restarts_without_range_support(self):
+        content = FlakyRangeHandler.content
+        server, uri = self.start_server(support_range=False, drop_after=len(content))
+        location = get_temp_file('test_download_http')
+        info = download_http(uri, location, wait=0)
+        self.assertEqual(hashlib.sha1(content).hexdigest(), info['sha1'])
+        self.assertEqual([None], server.ranges)
+
+    def test_download_http_fails_after_retries(self):
+        server, uri = self.start_server(support_range=False)
+        location = get_temp_file('test_download_http')
+        with self.assertRaises(Exception):
+            download_http(uri, location, retries=2, wait=0, chunk_size=1024)
+        self.assertEqual([None, 'bytes=102400-', 'bytes=102400-'], server.ranges)
+
+    def test_download_http_failed_downloads_release_their_connections(self):
+        _server, uri = self.start_server(status=404)
+        location = get_temp_file('test_download_http')
+        client = HttpClient(max_connections_per_host=2, retries=0, pool_timeout=1)
+        with mock.patch('minecode.utils.get_http_client', return_value=client):
+            for _ in range(4):
+                with self.assertRaisesRegex(Exception, 'with 404'):
+                    download_http(uri, location, wait=0)
+        self.assertEqual(404, client.get(uri).status_code)
+
+    def test_download_http_interrupted_downloads_release_their_connections(self):
+        server, uri = self.start_server(support_range=False)
+        location = get_temp_file('test_download_http')
+        client = HttpClient(max_connections_per_host=1, retries=0, pool_timeout=1)
+        with mock.patch('minecode.utils.get_http_client', return_value=client):
+            with self.assertRaises(Exception):
+                download_http(uri, location, retries=2, wait=0, chunk_size=1024)
+        self.assertEqual(3, len(server.ranges))
+        self.assertEqual(200, client.get(uri, stream=True).status_code)
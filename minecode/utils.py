@@ -12,19 +12,22 @@ import hashlib
 import logging
 import os
 import tempfile
+import time
 
 from django.conf import settings
 from django.utils.encoding import force_str
 
 import arrow
 from arrow.parser import ParserError
-import requests
+from requests.exceptions import ChunkedEncodingError
 from requests.exceptions import InvalidSchema
 from requests.exceptions import ConnectionError
+from requests.exceptions import Timeout
 
 from commoncode.fileutils import create_dir
 from extractcode.extract import extract
 
+from minecode.http_client import get_http_client
 from minecode.management.commands import get_settings
 
 logger = logging.getLogger(__name__)
@@ -219,14 +222,14 @@ def get_http_response(uri, timeout=10):
     Fetch and return the response object from an HTTP uri.
     `timeout` is a timeout with precedence over REQUESTS_ARGS settings.
     """
-    requests_args = getattr(settings, 'REQUESTS_ARGS', {})
+    requests_args = dict(getattr(settings, 'REQUESTS_ARGS', {}))
     requests_args['timeout'] = timeout
 
     if not uri.lower().startswith('http'):
         raise Exception('get_http_response: Not an HTTP URI: %(uri)r' % locals())
 
     try:
-        response = requests.get(uri, **requests_args)
+        response = get_http_client().get(uri, **requests_args)
     except (ConnectionError, InvalidSchema) as e:
         logger.error('get_http_response: Download failed for %(uri)r' % locals())
         raise
@@ -238,6 +241,108 @@ def get_http_response(uri, timeout=10):
     return response
 
 
+# size in bytes of the chunks of a streamed download
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+def download_http(uri, location, timeout=10, retries=3, wait=1, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Download the content of an HTTP `uri` to a file at `location` streaming
+    the response by chunks of `chunk_size` bytes such that the content is never
+    loaded in memory as a whole. Return a mapping of the size, sha1 and md5 of
+    the content computed while downloading.
+
+    If the connection drops while downloading, resume the download where it
+    stopped with a Range request after waiting `wait` seconds, up to `retries`
+    times. The download restarts from the beginning if the server does not
+    support Range requests.
+    `timeout` is a timeout with precedence over REQUESTS_ARGS settings.
+    """
+    if not uri.lower().startswith('http'):
+        raise Exception('download_http: Not an HTTP URI: %(uri)r' % locals())
+
+    requests_args = dict(getattr(settings, 'REQUESTS_ARGS', {}))
+    requests_args['timeout'] = timeout
+    base_headers = dict(requests_args.pop('headers', None) or {})
+    # Range offsets are in encoded bytes: the content must not be decoded
+    base_headers['Accept-Encoding'] = 'identity'
+
+    http_client = get_http_client()
+    attempts = 0
+    with open(location, 'wb') as output:
+        sha1 = hashlib.sha1()
+        md5 = hashlib.md5()
+        size = 0
+        while True:
+            headers = dict(base_headers)
+            if size:
+                headers['Range'] = f'bytes={size}-'
+
+            try:
+                # the response must be closed to release its pooled connection
+                with http_client.get(uri, stream=True, headers=headers, **requests_args) as response:
+                    status = response.status_code
+                    if status == 200 and size:
+                        # Range is not supported: restart from the beginning
+                        output.seek(0)
+                        output.truncate()
+                        sha1 = hashlib.sha1()
+                        md5 = hashlib.md5()
+                        size = 0
+                    elif status not in (200, 206):
+                        raise Exception('download_http: Download failed for %(uri)r '
+                                        'with %(status)r' % locals())
+
+                    expected_size = get_expected_size(response)
+                    start_size = size
+                    try:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            output.write(chunk)
+                            sha1.update(chunk)
+                            md5.update(chunk)
+                            size += len(chunk)
+                    finally:
+                        http_client.add_bytes_received(uri, size - start_size)
+
+                if expected_size and size < expected_size:
+                    raise IncompleteDownload(
+                        f'download_http: Received {size} of {expected_size} bytes for {uri!r}')
+                break
+
+            except (ConnectionError, ChunkedEncodingError, Timeout, IncompleteDownload) as e:
+                attempts += 1
+                if attempts > retries:
+                    logger.error('download_http: Download failed for %(uri)r' % locals())
+                    raise
+                logger.info(f'download_http: Resuming download of {uri!r} at {size} bytes after: {e}')
+                time.sleep(wait)
+
+    return dict(size=size, sha1=sha1.hexdigest(), md5=md5.hexdigest())
+
+
+def get_expected_size(response):
+    """
+    Return the total size in bytes of the content of a full or partial HTTP
+    `response` or None if not known.
+    """
+    headers = response.headers or {}
+    content_range = headers.get('Content-Range')
+    if content_range:
+        # such as "bytes 100-199/200" or "bytes 100-199/*"
+        _, _, total = content_range.partition('/')
+        if total.isdigit():
+            return int(total)
+        return
+
+    content_length = headers.get('Content-Length')
+    if content_length and content_length.isdigit():
+        return int(content_length)
+
+
 def system_temp_dir(temp_dir=os.getenv('MINECODE_TMP')):
     """
     Return the global temp directory..
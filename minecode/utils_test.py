@@ -31,6 +31,7 @@ from commoncode.testcase import FileBasedTesting
 from scancode.cli_test_utils import purl_with_fake_uuid
 
 from minecode.utils import get_temp_dir
+from minecode.visitors import Checkpoint
 
 
 """
@@ -168,9 +169,26 @@ def to_os_native_path(path):
 
 class MockResponse:
 
-    def __init__(self, content, status_code):
+    def __init__(self, content, status_code, headers=None):
         self.content = content
         self.status_code = status_code
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size=1):
+        content = self.content or b''
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 def mocked_requests_get(url, location):
@@ -271,6 +289,8 @@ class JsonBasedTesting(FileBasedTesting):
         """
         results = []
         for uri in uris:
+            if isinstance(uri, Checkpoint):
+                continue
             uri_dict = uri.to_dict(data_is_json=data_is_json)
             if uri_dict.get('date'):
                 # Parse date since date will be used as Date field in
@@ -15,6 +15,7 @@ import os
 import pkgutil
 import tempfile
 
+from minecode.utils import download_http
 from minecode.utils import fetch_http
 from minecode.utils import get_temp_file
 
@@ -129,6 +130,23 @@ class URI(object):
         return URI(**kwargs)
 
 
+class Checkpoint(object):
+    """
+    A marker that a visitor get_uris() can yield between URIs to record the
+    progress of a long visit such that an interrupted visit can resume from
+    there. The visit loop calls the `save` callable once all the URIs yielded
+    before this Checkpoint are stored or their errors recorded. Other consumers
+    ignore Checkpoints.
+    """
+    __slots__ = ('save',)
+
+    def __init__(self, save):
+        self.save = save
+
+    def __repr__(self):
+        return 'Checkpoint(save=%(save)r)' % dict(save=self.save)
+
+
 class Visitor(object):
     """
     Abstract base class for visitors. Subclasses must implement the fetch() and
@@ -208,18 +226,20 @@ class NonPersistentHttpVisitor(HttpVisitor):
     actual content at the URI and need to open and read this temporary
     file to obtain the content.
     """
+    # mapping of the size, sha1 and md5 of the last fetched content
+    download_info = None
 
     def fetch(self, uri, timeout=10):
         """
         Return a temporary location where the fetched content was saved.
         Does not return the content proper as a regular fetch does.
+        The content is streamed to this temporary file and its size and
+        checksums are available in `self.download_info` once fetched.
 
         `timeout` is a default timeout.
         """
-        content = super(NonPersistentHttpVisitor, self).fetch(uri, timeout=timeout)
         temp_file = get_temp_file('NonPersistentHttpVisitor')
-        with open(temp_file, 'wb') as tmp:
-            tmp.write(content)
+        self.download_info = download_http(uri, temp_file, timeout=timeout)
         return temp_file
 
     def dumps(self, content):
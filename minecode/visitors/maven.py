@@ -8,12 +8,15 @@
 #
 
 from collections import namedtuple
+from functools import partial
+from itertools import islice
 import gzip
 import hashlib
-import io
 import json
 import logging
 import re
+import struct
+import sys
 from typing import Dict
 from urllib.parse import urlparse
 
@@ -37,6 +40,7 @@ from minecode import seed
 from minecode import priority_router
 from minecode import visit_router
 from minecode.visitors import java_stream
+from minecode.visitors import Checkpoint
 from minecode.visitors import HttpVisitor
 from minecode.visitors import NonPersistentHttpVisitor
 from minecode.visitors import URI
@@ -809,20 +813,95 @@ class MavenNexusPropertiesVisitor(NonPersistentHttpVisitor):
 
         Each value points to a fragment increamental index that has the same
         format as the bigger one.
+
+        Increments that were already processed entirely for the current
+        "nexus.index.chain-id" are skipped.
         """
+        from minecode.models import MavenIndexCheckpoint
 
         base_url = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.{index}.gz'
         with open(content) as config_file:
             properties = javaproperties.load(config_file) or {}
 
+        chain_id = properties.get('nexus.index.chain-id')
+        delete_other_chains_increments(base_url, chain_id)
+        applied_increments = get_applied_increments(base_url, chain_id)
+        if applied_increments:
+            logger.info(
+                f'Maven index chain {chain_id}: last applied increment: '
+                f'{max(applied_increments)}'
+            )
+
         for key, increment_index in properties.items():
             if key.startswith('nexus.index.incremental'):
+                increment = int(increment_index)
+                if increment in applied_increments:
+                    continue
+
+                uri = base_url.format(index=increment)
+                MavenIndexCheckpoint.objects.get_or_create(
+                    index_uri=uri,
+                    defaults=dict(chain_id=chain_id, increment=increment),
+                )
                 yield URI(
-                    uri=base_url.format(index=increment_index),
+                    uri=uri,
                     source_uri=self.uri,
                 )
 
 
+def get_increment_checkpoints(base_url):
+    """
+    Return a queryset of the MavenIndexCheckpoint of the increment indexes with
+    a URI built from the `base_url` template.
+    """
+    from minecode.models import MavenIndexCheckpoint
+
+    return MavenIndexCheckpoint.objects.filter(
+        index_uri__startswith=base_url.partition('{index}')[0],
+        increment__isnull=False,
+    )
+
+
+def delete_other_chains_increments(base_url, chain_id):
+    """
+    Delete the checkpoints of the increment indexes with a URI built from the
+    `base_url` template that are not for `chain_id`: increment numbers restart
+    with a new chain.
+    """
+    get_increment_checkpoints(base_url).exclude(chain_id=chain_id).delete()
+
+
+def get_applied_increments(base_url, chain_id):
+    """
+    Return a set of the numbers of the increment indexes processed entirely
+    for `chain_id` with a URI built from the `base_url` template.
+    """
+    applied = get_increment_checkpoints(base_url).filter(
+        chain_id=chain_id,
+        completed_date__isnull=False,
+    )
+    return set(applied.values_list('increment', flat=True))
+
+
+def get_index_increment(index_uri):
+    """
+    Return the increment number of a Maven Nexus increment index URI or None
+    if this is not an increment.
+
+    For example:
+    >>> get_index_increment('https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.445.gz')
+    445
+    >>> get_index_increment('https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz')
+    """
+    match = re.search(r'nexus-maven-repository-index\.(\d+)\.gz$', index_uri)
+    if match:
+        return int(match.group(1))
+
+
+# number of artifacts processed between two saved checkpoints of an index visit
+MAVEN_INDEX_CHECKPOINT_INTERVAL = 10000
+
+
 @visit_router.route(
     'https?://.*/nexus-maven-repository-index.gz',
     # increments
@@ -841,97 +920,136 @@ class MavenNexusIndexVisitor(NonPersistentHttpVisitor):
 
         For NonPersistentHttpVisitor content is the path to the temp Gzipped
         index file, not the actual file content.
+
+        Also yield a Checkpoint every MAVEN_INDEX_CHECKPOINT_INTERVAL artifacts
+        and when done. A visit resumes after the artifacts of the last saved
+        Checkpoint if the index file is the same as in the previous visit.
+        An increment index is immutable and is not processed again once
+        completed, but a full index is processed again from the start.
         """
+        from minecode.models import MavenIndexCheckpoint
+
         index_location = content
+        index_sha1 = (self.download_info or {}).get('sha1')
 
-        artifacts = get_artifacts(index_location, worthyness=is_worthy_artifact)
+        checkpoint, _ = MavenIndexCheckpoint.objects.get_or_create(
+            index_uri=self.uri,
+            defaults=dict(increment=get_index_increment(self.uri), index_sha1=index_sha1),
+        )
+        if checkpoint.completed_date and checkpoint.increment is not None:
+            logger.info(f'Skipping already processed Maven index: {self.uri}')
+            return
 
-        for artifact in artifacts:
-            # we cannot do much without these
-            group_id = artifact.group_id
-            artifact_id = artifact.artifact_id
-            version = artifact.version
-            extension = artifact.extension
+        if checkpoint.completed_date or checkpoint.index_sha1 != index_sha1:
+            if checkpoint.artifacts_count and not checkpoint.completed_date:
+                logger.info(f'Maven index changed since the last visit: restarting: {self.uri}')
+            checkpoint.restart(index_sha1)
 
-            if not (group_id and artifact_id and version and extension):
-                continue
+        artifacts_count = checkpoint.artifacts_count
+        if artifacts_count:
+            logger.info(f'Resuming Maven index: {self.uri} after {artifacts_count} artifacts')
 
-            qualifiers = {}
-            if extension and extension != 'jar':
-                qualifiers['type'] = extension
+        artifacts = get_artifacts(index_location, worthyness=is_worthy_artifact)
+        # skip the artifacts processed in a previous visit
+        artifacts = islice(artifacts, artifacts_count, None)
 
-            classifier = artifact.classifier
-            if classifier:
-                qualifiers['classifier'] = classifier
+        for artifact in artifacts:
+            artifacts_count += 1
+            yield from self.get_artifact_uris(artifact)
+            if not artifacts_count % MAVEN_INDEX_CHECKPOINT_INTERVAL:
+                yield Checkpoint(partial(checkpoint.save_progress, artifacts_count))
 
-            package_url = PackageURL(
-                type='maven',
-                namespace=group_id,
-                name=artifact_id,
-                version=version,
-                qualifiers=qualifiers or None,
-            )
+        yield Checkpoint(partial(checkpoint.save_progress, artifacts_count, completed=True))
 
-            # FIXME: also use the Artifact.src_exist flags too?
+    def get_artifact_uris(self, artifact):
+        """
+        Yield a pre-visited URI for an index `artifact` and a URI for its POM.
+        """
+        # we cannot do much without these
+        group_id = artifact.group_id
+        artifact_id = artifact.artifact_id
+        version = artifact.version
+        extension = artifact.extension
 
-            # build a URL: This is the real JAR download URL
-            # FIXME: this should be set at the time of creating Artifacts
-            # instead togther with the filename... especially we could use
-            # different REPOs.
-            jar_download_url, file_name = build_url_and_filename(
-                group_id, artifact_id, version, extension, classifier)
+        if not (group_id and artifact_id and version and extension):
+            return
 
-            # FIXME: should this be set in the yielded URI too
-            last_mod = artifact.last_modified
+        qualifiers = {}
+        if extension and extension != 'jar':
+            qualifiers['type'] = extension
 
-            # We yield a pre-visited URI for each JAR
-            mock_maven_index_uri = build_url(
-                group_id, artifact_id, version, file_name,
-                base_url='maven-index://repo1.maven.org')
+        classifier = artifact.classifier
+        if classifier:
+            qualifiers['classifier'] = classifier
 
-            artifact_data = artifact.to_dict()
-            artifact_data['download_url'] = jar_download_url
-            artifact_as_json = json.dumps(artifact_data, separators=(',', ':'))
+        package_url = PackageURL(
+            type='maven',
+            namespace=group_id,
+            name=artifact_id,
+            version=version,
+            qualifiers=qualifiers or None,
+        )
 
-            yield URI(
-                # this is the Maven index index URI
-                source_uri=self.uri,
-                # FIXME: remove these mock URIs after migration
-                uri=mock_maven_index_uri,
-                package_url=package_url.to_string(),
-                visited=True,
-                mining_level=0,
-                file_name=file_name,
-                size=artifact.size,
-                sha1=artifact.sha1,
-                date=last_mod,
-                data=artifact_as_json,
-            )
+        # FIXME: also use the Artifact.src_exist flags too?
+
+        # build a URL: This is the real JAR download URL
+        # FIXME: this should be set at the time of creating Artifacts
+        # instead togther with the filename... especially we could use
+        # different REPOs.
+        jar_download_url, file_name = build_url_and_filename(
+            group_id, artifact_id, version, extension, classifier)
+
+        # FIXME: should this be set in the yielded URI too
+        last_mod = artifact.last_modified
+
+        # We yield a pre-visited URI for each JAR
+        mock_maven_index_uri = build_url(
+            group_id, artifact_id, version, file_name,
+            base_url='maven-index://repo1.maven.org')
+
+        artifact_data = artifact.to_dict()
+        artifact_data['download_url'] = jar_download_url
+        artifact_as_json = json.dumps(artifact_data, separators=(',', ':'))
+
+        yield URI(
+            # this is the Maven index index URI
+            source_uri=self.uri,
+            # FIXME: remove these mock URIs after migration
+            uri=mock_maven_index_uri,
+            package_url=package_url.to_string(),
+            visited=True,
+            mining_level=0,
+            file_name=file_name,
+            size=artifact.size,
+            sha1=artifact.sha1,
+            date=last_mod,
+            data=artifact_as_json,
+        )
 
-            package_url = PackageURL(
-                type='maven',
-                namespace=group_id,
-                name=artifact_id,
-                version=version,
-            )
+        package_url = PackageURL(
+            type='maven',
+            namespace=group_id,
+            name=artifact_id,
+            version=version,
+        )
 
-            # also yield a POM for this. There are no artifacts for
-            # the POM of a Jar in the repo. Only for Parent POMs
-            # therefore we create a download with the pomextension
-            pom_download_url, pom_file_name = build_url_and_filename(
-                group_id, artifact_id, version, extension='pom', classifier='')
-            yield URI(
-                # this is the Maven index index URI
-                source_uri=self.uri,
-                uri=pom_download_url,
-                # use the same PURL as the main jar
-                package_url=package_url.to_string(),
-                visited=False,
-                mining_level=20,
-                file_name=pom_file_name,
-                size=0,
-                date=last_mod,
-            )
+        # also yield a POM for this. There are no artifacts for
+        # the POM of a Jar in the repo. Only for Parent POMs
+        # therefore we create a download with the pomextension
+        pom_download_url, pom_file_name = build_url_and_filename(
+            group_id, artifact_id, version, extension='pom', classifier='')
+        yield URI(
+            # this is the Maven index index URI
+            source_uri=self.uri,
+            uri=pom_download_url,
+            # use the same PURL as the main jar
+            package_url=package_url.to_string(),
+            visited=False,
+            mining_level=20,
+            file_name=pom_file_name,
+            size=0,
+            date=last_mod,
+        )
 
 
 @visit_router.route('https?://jcenter\.bintray\.com/(.+/)*')
@@ -1369,40 +1487,31 @@ def get_entries(location, fields=frozenset(ENTRY_FIELDS)):
     Yield Maven index entry mappings from a Gzipped Maven nexus index
     data file at `location`. Only includes `fields` names.
     """
-    buffer_size = 128 * 1024 * 1024
     if TRACE_DEEP:
         entry = None
         entries_count = 0
         keys = set()
         keys_update = keys.update
 
-    with GzipFileWithTrailing(location, 'rb') as compressed:
-        # using io.BufferedReader for increased perfs
-        with io.BufferedReader(compressed, buffer_size=buffer_size) as nexus_index:
-            jstream = java_stream.DataInputStream(nexus_index)
-
-            # FIXME: we do nothing with these two
-            # NOTE: this reads 1+8=9 bytes of the stream
-            _index_version, _last_modified = decode_index_header(jstream)
-            while True:
-                try:
-                    entry = decode_entry(jstream, fields)
-                    if TRACE_DEEP:
-                        if entry:
-                            keys_update(entry)
-                        entries_count += 1
-
-                    if entry:
-                        yield entry
-
-                except EOFError:
-                    if TRACE_DEEP:
-                        print('Index version: %(_index_version)r last_modified: %(_last_modified)r' % locals())
-                        print('Processed %(entries_count)d docs. Last entry: %(entry)r' % locals())
-                        print('Unique keys:')
-                        for k in sorted(keys):
-                            print(k)
-                    break
+    with GzipFileWithTrailing(location, 'rb') as nexus_index:
+        jstream = java_stream.DataInputStream(nexus_index)
+
+        # FIXME: we do nothing with these two
+        # NOTE: this reads 1+8=9 bytes of the stream
+        _index_version, _last_modified = decode_index_header(jstream)
+
+        for entry in decode_entries(nexus_index, fields):
+            if TRACE_DEEP:
+                keys_update(entry)
+                entries_count += 1
+            yield entry
+
+    if TRACE_DEEP:
+        print('Index version: %(_index_version)r last_modified: %(_last_modified)r' % locals())
+        print('Processed %(entries_count)d docs. Last entry: %(entry)r' % locals())
+        print('Unique keys:')
+        for k in sorted(keys):
+            print(k)
 
 
 def decode_index_header(jstream):
@@ -1428,11 +1537,123 @@ def decode_index_header(jstream):
     return int(index_version), last_modified
 
 
+# size of the chunks of decompressed index data decoded at once
+DECODE_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class IncompleteEntry(Exception):
+    """
+    Raised when an entry is not entirely contained in a buffer.
+    """
+
+
+def decode_entries(stream, fields=(), chunk_size=DECODE_CHUNK_SIZE):
+    """
+    Yield non-empty entry mappings of name -> values read from a Maven index
+    `stream` of decompressed index data positioned after the index header.
+    Only includes `fields` names, or all names if `fields` is empty.
+
+    This decodes the same data layout as decode_entry, but works on large
+    chunks of data rather than reading each field from the `stream`: the
+    values of the fields that are not included are skipped without being
+    decoded and the repeated field names are decoded only once.
+    """
+    # cache of field name bytes -> interned field name string
+    names = {}
+    pending = b''
+    while True:
+        try:
+            chunk = stream.read(chunk_size)
+        except EOFError:
+            chunk = b''
+
+        data = pending + chunk if pending else chunk
+        view = memoryview(data)
+        offset = 0
+        end = len(data)
+        try:
+            while offset < end:
+                entry, offset = decode_entry_from_buffer(view, offset, fields, names)
+                if entry:
+                    yield entry
+            pending = b''
+        except IncompleteEntry:
+            pending = data[offset:]
+        except EOFError:
+            # a corrupted entry: there is nothing more we can decode
+            break
+
+        if not chunk:
+            # we have reached EOF and ignore an incomplete last entry
+            break
+
+
+def decode_entry_from_buffer(view, offset, fields, names):
+    """
+    Return a tuple of (entry mapping, offset) for one entry decoded from the
+    `view` memoryview of bytes starting at `offset` where the returned offset
+    is the start of the next entry. Only includes `fields` names, or all names
+    if `fields` is empty. `names` is a cache mapping of field name bytes ->
+    field name.
+
+    Raise an IncompleteEntry exception if the entry does not end in `view`.
+    Raise an EOFError if the entry is corrupted. See decode_entry for the entry
+    data layout.
+    """
+    unpack_from = struct.unpack_from
+    end = len(view)
+
+    if offset + 4 > end:
+        raise IncompleteEntry
+    field_count = unpack_from('>i', view, offset)[0]
+    offset += 4
+
+    entry = {}
+    for _ in range(field_count):
+        # skip the one byte for Lucene indexing flags, then the name length
+        # on 2 bytes
+        if offset + 3 > end:
+            raise IncompleteEntry
+        name_length = unpack_from('>H', view, offset + 1)[0]
+        name_start = offset + 3
+        value_start = name_start + name_length + 4
+        if value_start > end:
+            raise IncompleteEntry
+
+        raw_name = view[name_start:value_start - 4]
+        name = names.get(raw_name)
+        if name is None:
+            raw_name = bytes(raw_name)
+            name = names[raw_name] = sys.intern(decode_java_utf8(raw_name))
+
+        value_length = unpack_from('>i', view, value_start - 4)[0]
+        if value_length < 0:
+            raise EOFError
+        offset = value_start + value_length
+        if offset > end:
+            raise IncompleteEntry
+
+        if not fields or name in fields:
+            entry[name] = decode_java_utf8(view[value_start:offset].tobytes())
+
+    return entry, offset
+
+
+def decode_java_utf8(value):
+    """
+    Return a string decoded from a Java Modified UTF-8 `value` bytes.
+    """
+    if value.isascii():
+        return value.decode('ascii')
+    return decode_modified_utf8(value)
+
+
 def decode_entry(jstream, fields=()):
     """
     Read and return one entry mapping of name -> values from a Maven
     index `jstream` Java-like stream. Note that the stream is not a
-    standard Java stream for UTF data.
+    standard Java stream for UTF data. decode_entries is a faster
+    alternative to decode many entries.
 
     Only includes `fields` names.
 
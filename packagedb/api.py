@@ -7,11 +7,16 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 import logging
+from operator import attrgetter
 
 import django_filters
+import django_rq
 from django.core.exceptions import ValidationError
-from django.db.models import OuterRef
+from django.db import connections
+from django.db.models import prefetch_related_objects
 from django.db.models import Q
 from django.db.models import Subquery
 from django_filters.filters import Filter
@@ -26,6 +31,7 @@ from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.throttling import AnonRateThrottle
 from univers.version_constraint import InvalidConstraintsError
 from univers.version_range import RANGE_CLASS_BY_SCHEMES
@@ -50,7 +56,9 @@ from packagedb.models import Resource
 from packagedb.package_managers import VERSION_API_CLASSES_BY_PACKAGE_TYPE
 from packagedb.package_managers import get_api_package_name
 from packagedb.package_managers import get_version_fetcher
+from packagedb.schedules import is_redis_running
 from packagedb.serializers import DependentPackageSerializer
+from packagedb.serializers import IndexPackagesJobSerializer
 from packagedb.serializers import IndexPackagesResponseSerializer
 from packagedb.serializers import IndexPackagesSerializer
 from packagedb.serializers import PackageAPISerializer
@@ -62,6 +70,7 @@ from packagedb.serializers import PartySerializer
 from packagedb.serializers import PurlValidateResponseSerializer
 from packagedb.serializers import PurlValidateSerializer
 from packagedb.serializers import ResourceAPISerializer
+from packagedb.tasks import index_packages_job
 from packagedb.throttling import StaffUserRateThrottle
 
 logger = logging.getLogger(__name__)
@@ -325,6 +334,15 @@ class PackagePublicViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = ResourceAPISerializer(paginated_qs, many=True, context={'request': request})
         return self.get_paginated_response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def history(self, request, *args, **kwargs):
+        """
+        Return the history entries of the current Package from oldest to
+        newest.
+        """
+        package = self.get_object()
+        return Response(package.get_history())
+
     @action(detail=True)
     def get_enhanced_package_data(self, request, *args, **kwargs):
         """
@@ -395,24 +413,19 @@ class PackagePublicViewSet(viewsets.ReadOnlyModelViewSet):
 
         lookups = Q()
         for field, value in data.items():
-            # Subquery to get the ids of the Packages with the earliest release_date for each `field`
+            # Subquery to get the ids of the Packages with the earliest
+            # release_date for each `field` value at once using a
+            # "SELECT DISTINCT ON (field)" query
             earliest_release_dates = Package.objects.filter(
-                **{field: OuterRef(field)}
-            ).order_by('release_date').values('id')[:1]
-
-            value = value or []
-            lookups |= Q(
-                **{
-                    f'{field}__in': value,
-                    'id__in': Subquery(earliest_release_dates),
-                }
-            )
+                **{f'{field}__in': value or []}
+            ).order_by(field, 'release_date', 'id').distinct(field).values('id')
+            lookups |= Q(id__in=Subquery(earliest_release_dates))
 
         # Query to get the full Package objects with the earliest release_date for each sha1
         qs = Package.objects.filter(lookups)
         paginated_qs = self.paginate_queryset(qs)
         if enhance_package_data:
-            serialized_package_data = [get_enhanced_package(package=package) for package in paginated_qs]
+            serialized_package_data = get_enhanced_packages(packages=paginated_qs)
         else:
             serializer = PackageAPISerializer(paginated_qs, many=True, context={'request': request})
             serialized_package_data = serializer.data
@@ -489,11 +502,14 @@ def get_enhanced_package(package):
     """
     Return package data from `package`, where the data has been enhanced by
     other packages in the same package_set.
+
+    The package sets of `package` and their members are used as prefetched
+    if available, such as when called from get_enhanced_packages().
     """
     package_content = package.package_content
-    in_package_sets = package.package_sets.count() > 0
+    package_sets = sorted(package.package_sets.all(), key=attrgetter('id'))
     if (
-        not in_package_sets
+        not package_sets
         or not package_content
         or package_content == PackageContentType.SOURCE_REPO
     ):
@@ -505,18 +521,37 @@ def get_enhanced_package(package):
     if package_content in [PackageContentType.BINARY, PackageContentType.SOURCE_ARCHIVE]:
         # Binary packages can only be part of one set
         # TODO: Can source_archive packages be part of multiple sets?
-        package_set = package.package_sets.first()
-        if package_set:
-            package_set_members = package_set.get_package_set_members()
-            if package_content == PackageContentType.SOURCE_ARCHIVE:
-                # Mix data from SOURCE_REPO packages for SOURCE_ARCHIVE packages
-                package_set_members = package_set_members.filter(
-                    package_content=PackageContentType.SOURCE_REPO
-                )
-            # TODO: consider putting in the history field that we enhanced the data
-            return _get_enhanced_package(package, package_set_members)
-        else:
-            return package.to_dict()
+        package_set = package_sets[0]
+        # Sort as the database does with NULL package_content last
+        package_set_members = sorted(
+            package_set.packages.all(),
+            key=lambda member: (member.package_content is None, member.package_content or 0),
+        )
+        if package_content == PackageContentType.SOURCE_ARCHIVE:
+            # Mix data from SOURCE_REPO packages for SOURCE_ARCHIVE packages
+            package_set_members = [
+                member for member in package_set_members
+                if member.package_content == PackageContentType.SOURCE_REPO
+            ]
+        # TODO: consider putting in the history field that we enhanced the data
+        return _get_enhanced_package(package, package_set_members)
+
+
+def get_enhanced_packages(packages):
+    """
+    Return a list of enhanced package data for each Package of `packages`.
+    The related objects needed to enhance and serialize the packages are
+    fetched at once for all the `packages`.
+    """
+    packages = list(packages)
+    prefetch_related_objects(
+        packages,
+        'dependencies',
+        'parties',
+        'package_sets__packages__dependencies',
+        'package_sets__packages__parties',
+    )
+    return [get_enhanced_package(package=package) for package in packages]
 
 
 def _get_enhanced_package(package, packages):
@@ -642,6 +677,8 @@ class CollectViewSet(viewsets.ViewSet):
         **Note:** When a versionless PURL is supplied without a vers range, then all the versions
         of that package will be considered for indexing/reindexing.
 
+        **Note:** Use `index_packages_async` to index many versionless PURLs in a background job.
+
         **Request example:**
 
                 {
@@ -689,78 +726,87 @@ class CollectViewSet(viewsets.ViewSet):
         - unsupported_vers
             - A list of vers range that are not supported by the univers or package_manager.
         """
-        def _reindex_package(package, reindexed_packages):
-            if package in reindexed_packages:
-                return
-            package.rescan()
-            reindexed_packages.append(package)
-        
         serializer = self.serializer_class(data=request.data)
 
         if not serializer.is_valid():
             return Response({'errors': serializer.errors}, status=400)
 
         validated_data = serializer.validated_data
-        packages = validated_data.get('packages', [])
-        reindex = validated_data.get('reindex', False)
-        reindex_set = validated_data.get('reindex_set', False)
-
-        queued_packages = []
-        unqueued_packages = []
-
-        nonexistent_packages = []
-        reindexed_packages = []
-        requeued_packages = []
-
-        supported_ecosystems = ['maven', 'npm']
-
-        unique_purls, unsupported_packages, unsupported_vers = get_resolved_purls(packages, supported_ecosystems)
-
-        if reindex:
-            for purl in unique_purls:
-                lookups = purl_to_lookups(purl)
-                packages = Package.objects.filter(**lookups)
-                if packages.count() > 0:
-                    for package in packages:
-                        _reindex_package(package, reindexed_packages)
-                        if reindex_set:
-                            for package_set in package.package_sets.all():
-                                for p in package_set.packages.all():
-                                    _reindex_package(p, reindexed_packages)
-                else:
-                    nonexistent_packages.append(purl)
-            requeued_packages.extend([p.package_url for p in reindexed_packages])
-
-        elif not reindex or nonexistent_packages:
-            interesting_purls = nonexistent_packages if nonexistent_packages else unique_purls
-            for purl in interesting_purls:
-                is_routable_purl = priority_router.is_routable(purl)
-                if not is_routable_purl:
-                    unsupported_packages.append(purl)
-                else:
-                    # add to queue
-                    priority_resource_uri = PriorityResourceURI.objects.insert(purl)
-                    if priority_resource_uri:
-                        queued_packages.append(purl)
-                    else:
-                        unqueued_packages.append(purl)
-
-        response_data = {
-            'queued_packages_count': len(queued_packages),
-            'queued_packages': queued_packages,
-            'requeued_packages_count': len(requeued_packages),
-            'requeued_packages': requeued_packages,
-            'unqueued_packages_count': len(unqueued_packages),
-            'unqueued_packages': unqueued_packages,
-            'unsupported_packages_count': len(unsupported_packages),
-            'unsupported_packages': unsupported_packages,
-            'unsupported_vers_count': len(unsupported_vers),
-            'unsupported_vers': unsupported_vers,
-        }
+        response_data = process_index_packages(
+            packages=validated_data.get('packages', []),
+            reindex=validated_data.get('reindex', False),
+            reindex_set=validated_data.get('reindex_set', False),
+        )
 
         serializer = IndexPackagesResponseSerializer(response_data, context={'request': request})
         return Response(serializer.data)
 
+    @extend_schema(
+        request=IndexPackagesSerializer,
+        responses={202: IndexPackagesJobSerializer()},
+    )
+    @action(detail=False, methods=['post'], serializer_class=IndexPackagesSerializer)
+    def index_packages_async(self, request, *args, **kwargs):
+        """
+        Take the same data as `index_packages` and index these packages in a
+        background job. Use this for large lists of versionless PURLs as the
+        resolution of their versions can take several minutes.
+
+        Return a mapping containing the `job_id` and `status_url` of this job.
+        The `status_url` reports the `status` and `progress` of the job and its
+        `result` once finished. This `result` is the same as the response of
+        `index_packages`.
+        """
+        serializer = self.serializer_class(data=request.data)
+
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=400)
+
+        if not is_redis_running():
+            message = {'errors': 'The job queue is not available.'}
+            return Response(message, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        validated_data = serializer.validated_data
+        packages = [dict(package) for package in validated_data.get('packages', [])]
+        job = index_packages_job.delay(
+            packages=packages,
+            reindex=validated_data.get('reindex', False),
+            reindex_set=validated_data.get('reindex_set', False),
+        )
+
+        response_data = get_index_packages_job_data(job, request)
+        serializer = IndexPackagesJobSerializer(response_data, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(
+        parameters=[OpenApiParameter('job_id', str, 'query', description='Index packages job id')],
+        responses={200: IndexPackagesJobSerializer()},
+    )
+    @action(detail=False, methods=['get'])
+    def index_packages_status(self, request, *args, **kwargs):
+        """
+        Return the `status` of the index packages job with `job_id`, its
+        `progress` resolving the versions of versionless PURLs and its `result`
+        once finished.
+        """
+        job_id = request.query_params.get('job_id')
+        if not job_id:
+            message = {'errors': 'A job_id is required.'}
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+
+        if not is_redis_running():
+            message = {'errors': 'The job queue is not available.'}
+            return Response(message, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        job = django_rq.get_queue('default').fetch_job(job_id)
+        if not job:
+            message = {'errors': f'No index packages job with id: {job_id}'}
+            return Response(message, status=status.HTTP_404_NOT_FOUND)
+
+        response_data = get_index_packages_job_data(job, request)
+        serializer = IndexPackagesJobSerializer(response_data, context={'request': request})
+        return Response(serializer.data)
+
 
 class PurlValidateViewSet(viewsets.ViewSet):
     """
@@ -871,15 +917,121 @@ class PurlValidateViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
 
-def get_resolved_purls(packages, supported_ecosystems):
+def process_index_packages(packages, reindex=False, reindex_set=False, progress_callback=None):
+    """
+    Take a list of `packages` mappings of PURL or versionless PURL with vers
+    range, put them on the index queue or on the rescan queue if `reindex` is
+    True and return a mapping of the queued, requeued, unqueued and unsupported
+    package urls as described in `CollectViewSet.index_packages`.
+
+    `progress_callback` is called with the number of versionless PURLs resolved
+    and the total number of versionless PURLs to resolve.
+    """
+    def _reindex_package(package, reindexed_packages):
+        if package in reindexed_packages:
+            return
+        package.rescan()
+        reindexed_packages.append(package)
+
+    queued_packages = []
+    unqueued_packages = []
+
+    nonexistent_packages = []
+    reindexed_packages = []
+    requeued_packages = []
+
+    supported_ecosystems = ['maven', 'npm']
+
+    unique_purls, unsupported_packages, unsupported_vers = get_resolved_purls(
+        packages, supported_ecosystems, progress_callback=progress_callback)
+
+    if reindex:
+        for purl in unique_purls:
+            lookups = purl_to_lookups(purl)
+            packages = Package.objects.filter(**lookups)
+            if packages.count() > 0:
+                for package in packages:
+                    _reindex_package(package, reindexed_packages)
+                    if reindex_set:
+                        for package_set in package.package_sets.all():
+                            for p in package_set.packages.all():
+                                _reindex_package(p, reindexed_packages)
+            else:
+                nonexistent_packages.append(purl)
+        requeued_packages.extend([p.package_url for p in reindexed_packages])
+
+    elif not reindex or nonexistent_packages:
+        interesting_purls = nonexistent_packages if nonexistent_packages else unique_purls
+        for purl in interesting_purls:
+            is_routable_purl = priority_router.is_routable(purl)
+            if not is_routable_purl:
+                unsupported_packages.append(purl)
+            else:
+                # add to queue
+                priority_resource_uri = PriorityResourceURI.objects.insert(purl)
+                if priority_resource_uri:
+                    queued_packages.append(purl)
+                else:
+                    unqueued_packages.append(purl)
+
+    response_data = {
+        'queued_packages_count': len(queued_packages),
+        'queued_packages': queued_packages,
+        'requeued_packages_count': len(requeued_packages),
+        'requeued_packages': requeued_packages,
+        'unqueued_packages_count': len(unqueued_packages),
+        'unqueued_packages': unqueued_packages,
+        'unsupported_packages_count': len(unsupported_packages),
+        'unsupported_packages': unsupported_packages,
+        'unsupported_vers_count': len(unsupported_vers),
+        'unsupported_vers': unsupported_vers,
+    }
+
+    return response_data
+
+
+def get_index_packages_job_data(job, request):
+    """
+    Return a mapping of the status, progress and result of an index packages
+    `job`.
+    """
+    status_url = reverse('api:collect-index-packages-status', request=request)
+    data = {
+        'job_id': job.id,
+        'status': job.get_status(),
+        'status_url': f'{status_url}?job_id={job.id}',
+        'progress': job.meta.get('progress'),
+    }
+    if job.is_finished:
+        data['result'] = job.return_value()
+    return data
+
+
+# maximum number of concurrent version fetches for each package type
+VERSION_RESOLUTION_LIMITS_BY_TYPE = {
+    'maven': 4,
+    'npm': 8,
+}
+
+# maximum number of concurrent version fetches for other package types
+DEFAULT_VERSION_RESOLUTION_LIMIT = 4
+
+
+def get_resolved_purls(packages, supported_ecosystems, progress_callback=None):
     """
     Take a list of dict containing purl or version-less purl along with vers
     and return a list of resolved purls, a list of unsupported purls, and a
     list of unsupported vers.
+
+    The versions of version-less purls are fetched concurrently. Call the
+    optional `progress_callback` with the number of version-less purls resolved
+    and the total number of version-less purls to resolve after each one.
     """
     unique_resolved_purls = set()
     unsupported_purls = set()
     unsupported_vers = set()
+    # unique (version-less purl, vers) to resolve
+    versionless_purls = {}
 
     for items in packages or []:
         purl = items.get('purl')
@@ -902,19 +1054,82 @@ def get_resolved_purls(packages, supported_ecosystems):
             unique_resolved_purls.add(purl)
             continue
 
-        # Versionless PURL without any vers-range should give all versions.
-        if not vers and not parsed_purl.version:
-            if resolved:= resolve_all_versions(parsed_purl):
-                unique_resolved_purls.update(resolved)
-            continue
+        versionless_purls[(purl, vers)] = parsed_purl
 
-        if resolved:= resolve_versions(parsed_purl, vers):
+    resolved_versionless_purls = resolve_versionless_purls(
+        [(parsed_purl, vers) for (_purl, vers), parsed_purl in versionless_purls.items()],
+        progress_callback=progress_callback,
+    )
+    for _parsed_purl, vers, resolved in resolved_versionless_purls:
+        # Versionless PURL without any vers-range should give all versions.
+        if resolved:
             unique_resolved_purls.update(resolved)
-        else:
+        elif vers:
             unsupported_vers.add(vers)
 
     return list(unique_resolved_purls), list(unsupported_purls), list(unsupported_vers)
 
+
+def resolve_versionless_purls(versionless_purls, progress_callback=None):
+    """
+    Yield tuples of (parsed purl, vers, list of resolved purls or None) for a
+    list of `versionless_purls` tuples of (parsed version-less purl, vers).
+
+    The versions are fetched concurrently with one thread pool per package type
+    such that a slow package repository does not hold the resolution of the
+    purls of other types. The size of each pool is set in
+    VERSION_RESOLUTION_LIMITS_BY_TYPE.
+    """
+    total = len(versionless_purls)
+    if not total:
+        return
+
+    executors = {}
+    futures = {}
+    try:
+        for parsed_purl, vers in versionless_purls:
+            executor = executors.get(parsed_purl.type)
+            if not executor:
+                max_workers = VERSION_RESOLUTION_LIMITS_BY_TYPE.get(
+                    parsed_purl.type, DEFAULT_VERSION_RESOLUTION_LIMIT)
+                executor = executors[parsed_purl.type] = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=f'resolve-{parsed_purl.type}',
+                )
+            future = executor.submit(resolve_versionless_purl_in_thread, parsed_purl, vers)
+            futures[future] = (parsed_purl, vers)
+
+        for resolved_count, future in enumerate(as_completed(futures), 1):
+            parsed_purl, vers = futures[future]
+            yield parsed_purl, vers, future.result()
+            if progress_callback:
+                progress_callback(resolved_count, total)
+    finally:
+        for executor in executors.values():
+            executor.shutdown(cancel_futures=True)
+
+
+def resolve_versionless_purl_in_thread(parsed_purl, vers=None):
+    """
+    Run resolve_versionless_purl() in a worker thread and close the database
+    connection this thread used to access the cached versions.
+    """
+    try:
+        return resolve_versionless_purl(parsed_purl, vers)
+    finally:
+        connections.close_all()
+
+
+def resolve_versionless_purl(parsed_purl, vers=None):
+    """
+    Return a list of PURLs for the versions of a version-less `parsed_purl`
+    satisfying the `vers` range or for all the released versions if there is
+    no `vers`. Return None if the `vers` range is not supported.
+    """
+    if not vers:
+        return resolve_all_versions(parsed_purl)
+    return resolve_versions(parsed_purl, vers)
+
 def resolve_all_versions(parsed_purl):
     """
     Take versionless and return a list of PURLs for all the released versions.
@@ -984,7 +1199,7 @@ def get_all_versions_plain(purl: PackageURL):
     if not package_name or not versionAPI:
         return
 
-    all_versions = versionAPI().fetch(package_name) or []
+    all_versions = versionAPI().fetch_cached(package_name)
     return [ version.value for version in all_versions ]
 
 def get_all_versions(purl):
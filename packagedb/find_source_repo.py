@@ -14,12 +14,12 @@ from typing import Generator
 from typing import List
 from urllib.parse import urlparse
 
-import requests
 from packageurl import PackageURL
 from packageurl.contrib.purl2url import get_download_url
 from packageurl.contrib.purl2url import purl2url
 from scancode.api import get_urls as get_urls_from_location
 
+from minecode.http_client import get_http_client
 from minecode.model_utils import add_package_to_scan_queue
 from minecode.visitors.maven import get_merged_ancestor_package_from_maven_package
 from packagedb.models import Package
@@ -106,7 +106,7 @@ def get_data_from_url(
         if url in CACHE:
             response = CACHE[url]
             return get_data_from_response(response=response, data_type=data_type)
-        response = requests.get(url=url, timeout=timeout)
+        response = get_http_client().get(url, timeout=timeout)
         if response.status_code != 200:
             non_reachable_urls.append(url)
             return
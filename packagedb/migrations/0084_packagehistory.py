@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packagedb', '0083_delete_apiuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, help_text='Timestamp set when this history entry is created')),
+                ('message', models.TextField(help_text='The message of this history entry')),
+                ('data', models.JSONField(blank=True, default=dict, help_text='A mapping of additional data for this history entry')),
+                ('package', models.ForeignKey(help_text='The Package that this history entry is related to', on_delete=django.db.models.deletion.CASCADE, related_name='history_entries', to='packagedb.package')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:48
+
+from datetime import datetime
+from datetime import timezone
+
+from django.db import migrations
+
+
+def move_package_history_to_package_history_table(apps, schema_editor):
+    """
+    Move the entries of the Package `history` JSON field to the
+    PackageHistory table.
+    """
+    Package = apps.get_model('packagedb', 'Package')
+    PackageHistory = apps.get_model('packagedb', 'PackageHistory')
+    packages = Package.objects.exclude(history=[]).only('id', 'history')
+    package_count = packages.count()
+    chunk_size = 2000
+    iterator = packages.iterator(chunk_size=chunk_size)
+    entries = []
+    for i, package in enumerate(iterator):
+        if (not i % chunk_size) and entries:
+            PackageHistory.objects.bulk_create(entries)
+            entries = []
+            print(f"  {i:,} / {package_count:,} moved")
+        for entry in package.history or []:
+            if isinstance(entry, str):
+                entry = {"message": entry}
+            timestamp = entry.get("timestamp")
+            if timestamp:
+                timestamp = datetime.strptime(timestamp, "%Y-%m-%d-%H:%M:%S")
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            entries.append(
+                PackageHistory(
+                    package_id=package.id,
+                    timestamp=timestamp or datetime.now(tz=timezone.utc),
+                    message=entry.get("message") or "",
+                    data=entry.get("data") or {},
+                )
+            )
+
+    if entries:
+        print("Moving remaining Package history...")
+        PackageHistory.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("packagedb", "0084_packagehistory"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            move_package_history_to_package_history_table,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("packagedb", "0085_populate_packagehistory"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="package",
+            name="history",
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packagedb', '0086_remove_package_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageVersionsCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('package_type', models.CharField(help_text='Package type of the VersionAPI, such as npm or deb/ubuntu.', max_length=32)),
+                ('package_name', models.CharField(help_text='Package name as used by the VersionAPI.', max_length=1024)),
+                ('versions', models.JSONField(blank=True, default=list, help_text='List of versions as mappings of value and release_date.')),
+                ('url', models.CharField(blank=True, help_text='URL of the versions list returned with the etag.', max_length=2048)),
+                ('etag', models.CharField(blank=True, help_text='ETag of the versions list used to revalidate the cached versions.', max_length=1024)),
+                ('fetched_date', models.DateTimeField(help_text='Timestamp indicating when the versions were last fetched or revalidated.')),
+            ],
+            options={
+                'unique_together': {('package_type', 'package_name')},
+            },
+        ),
+    ]
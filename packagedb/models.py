@@ -12,6 +12,7 @@ import logging
 import sys
 import uuid
 from collections import OrderedDict
+from datetime import timedelta
 
 import natsort
 from dateutil.parser import parse as dateutil_parse
@@ -51,6 +52,36 @@ def sort_version(packages):
 
 
 class PackageQuerySet(PackageURLQuerySetMixin, models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Create the `objs` Packages and insert their pending history entries.
+        """
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self.save_history(objs)
+        return objs
+
+    def bulk_update(self, objs, *args, **kwargs):
+        """
+        Update the `objs` Packages and insert their pending history entries.
+        """
+        updated = super().bulk_update(objs, *args, **kwargs)
+        self.save_history(objs)
+        return updated
+
+    def save_history(self, packages):
+        """
+        Insert the pending history entries of the `packages` Packages at once.
+        The entries of unsaved Packages are left pending.
+        """
+        entries = []
+        for package in packages:
+            pending_history = getattr(package, '_pending_history', None)
+            if pending_history and package.pk:
+                entries.extend(pending_history)
+                package._pending_history = []
+        if entries:
+            PackageHistory.objects.bulk_create(entries)
+
     def insert(self, download_url, **extra_fields):
         """
         Create and return a new Package.
@@ -103,19 +134,13 @@ class LowerCaseField(models.CharField):
 
 class HistoryMixin(models.Model):
     """
-    A mixin with a JSONField-based append-only history field. The history field
-    is a list containing mappings representing the history for this object. Each
-    mapping contains the field "timestamp" and "message".
+    A mixin for an append-only history stored in a related history model
+    accessed with the `history_entries` reverse relation. Each history entry
+    contains the fields "timestamp", "message" and "data".
+
+    New history entries are kept on this object until it is saved and are then
+    inserted without rewriting the previous entries.
     """
-    history = models.JSONField(
-        default=list,
-        blank=True,
-        editable=False,
-        help_text=_(
-            'A list of mappings representing the history for this object. '
-            'Each mapping contains the fields "timestamp" and "message".'
-        ),
-    )
     created_date = models.DateTimeField(
         null=True,
         blank=True,
@@ -132,30 +157,53 @@ class HistoryMixin(models.Model):
     class Meta:
         abstract = True
 
+    @property
+    def pending_history(self):
+        """
+        Return the list of unsaved history entries of this object.
+        """
+        if not hasattr(self, '_pending_history'):
+            self._pending_history = []
+        return self._pending_history
+
     def append_to_history(self, message, data={}, save=False):
         """
         Append the ``message`` string to the history of this object.
         """
+        history_model = self._meta.get_field('history_entries').related_model
         time = timezone.now()
-        timestamp = time.strftime("%Y-%m-%d-%H:%M:%S")
-        entry = {
-            "timestamp": timestamp,
-            "message": message,
-            "data": data,
-        }
-        self.history.append(entry)
+        entry = history_model(
+            package=self,
+            timestamp=time,
+            message=message,
+            data=data,
+        )
+        self.pending_history.append(entry)
         self.last_modified_date = time
 
         if save:
             self.save()
 
+    def save_history(self):
+        """
+        Insert the pending history entries of this object.
+        """
+        self.__class__.objects.save_history([self])
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.save_history()
+
     def get_history(self):
         """
         Return a list of mappings of all history entries from oldest to newest as:
             {"timestamp": "<YYYY-MM-DD-HH:MM:SS>", "message": "message"}
         """
-        history_copy = copy.deepcopy(self.history)
-        return history_copy
+        entries = []
+        if self.pk:
+            entries.extend(self.history_entries.all())
+        entries.extend(self.pending_history)
+        return [entry.to_dict() for entry in entries]
 
 
 class HashFieldsMixin(models.Model):
@@ -763,7 +811,7 @@ class Package(
 
                     msg = f"Replaced {model_count} existing entries of field '{field}' with {created_models_count} new entries."
                     self.append_to_history(msg)
-                    replaced_fields.extend([field, 'history'])
+                    replaced_fields.append(field)
             else:
                 # Ensure the incoming value is of the correct type
                 if field == 'qualifiers' and isinstance(value, dict):
@@ -804,7 +852,6 @@ class Package(
                 'Package field values have been updated.',
                 data=data,
             )
-            updated_fields.append('history')
 
         if replaced_fields:
             updated_fields.extend(replaced_fields)
@@ -819,6 +866,46 @@ class Package(
         return self, updated_fields
 
 
+HISTORY_TIMESTAMP_FORMAT = '%Y-%m-%d-%H:%M:%S'
+
+
+class PackageHistory(models.Model):
+    """
+    An entry of the append-only history of a Package.
+    """
+    package = models.ForeignKey(
+        Package,
+        related_name='history_entries',
+        on_delete=models.CASCADE,
+        help_text=_('The Package that this history entry is related to'),
+    )
+    timestamp = models.DateTimeField(
+        default=timezone.now,
+        help_text=_('Timestamp set when this history entry is created'),
+    )
+    message = models.TextField(
+        help_text=_('The message of this history entry'),
+    )
+    data = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text=_('A mapping of additional data for this history entry'),
+    )
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.timestamp}: {self.message}'
+
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp.strftime(HISTORY_TIMESTAMP_FORMAT),
+            'message': self.message,
+            'data': copy.deepcopy(self.data),
+        }
+
+
 party_person = 'person'
 # often loosely defined
 party_project = 'project'
@@ -1421,6 +1508,57 @@ class PackageSet(models.Model):
         )
 
 
+class PackageVersionsCache(models.Model):
+    """
+    The list of versions of a package fetched from an upstream package
+    repository by a VersionAPI, shared by all the API workers and jobs.
+    """
+
+    package_type = models.CharField(
+        max_length=32,
+        help_text=_("Package type of the VersionAPI, such as npm or deb/ubuntu."),
+    )
+
+    package_name = models.CharField(
+        max_length=1024,
+        help_text=_("Package name as used by the VersionAPI."),
+    )
+
+    versions = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_("List of versions as mappings of value and release_date."),
+    )
+
+    url = models.CharField(
+        max_length=2048,
+        blank=True,
+        help_text=_("URL of the versions list returned with the etag."),
+    )
+
+    etag = models.CharField(
+        max_length=1024,
+        blank=True,
+        help_text=_("ETag of the versions list used to revalidate the cached versions."),
+    )
+
+    fetched_date = models.DateTimeField(
+        help_text=_("Timestamp indicating when the versions were last fetched or revalidated."),
+    )
+
+    class Meta:
+        unique_together = ["package_type", "package_name"]
+
+    def __str__(self):
+        return f"{self.package_type}:{self.package_name}"
+
+    def is_expired(self, ttl):
+        """
+        Return True if these versions were fetched more than `ttl` seconds ago.
+        """
+        return self.fetched_date + timedelta(seconds=ttl) <= timezone.now()
+
+
 class ApiUserManager(UserManager):
     def create_api_user(self, username, first_name="", last_name="", **extra_fields):
         """
@@ -10,6 +10,7 @@
 import dataclasses
 import json
 import logging
+import threading
 import traceback
 import xml.etree.ElementTree as ET
 from datetime import datetime
@@ -19,11 +20,13 @@ from typing import Optional
 from typing import Set
 from urllib.parse import urlparse
 
-import requests
 from dateutil import parser as dateparser
+from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from packageurl import PackageURL
 
+from minecode.http_client import get_http_client
+
 logger = logging.getLogger(__name__)
 """
 Utilities to retrieve lists of package versions from remote package
@@ -52,22 +55,67 @@ class VersionResponse:
     newer_versions: Set[str] = dataclasses.field(default_factory=set)
 
 
+class NotModified(Exception):
+    """
+    Raised when the cached versions of a package are not modified upstream.
+    """
+
+
+@dataclasses.dataclass
+class FetchState:
+    """
+    State of the conditional fetch of the versions of a package.
+    """
+
+    # URL and ETag of the cached versions list to revalidate
+    etag_url: Optional[str] = None
+    etag: Optional[str] = None
+    # URL and ETag of the first versions list fetched
+    response_url: Optional[str] = None
+    response_etag: Optional[str] = None
+    # True if any request failed such that the fetched versions are incomplete
+    failed: bool = False
+
+
+# FetchState of the VersionAPI.fetch_cached() running in the current thread
+_fetch_state = threading.local()
+
+
 def get_response(url, content_type="json", headers=None):
     """
     Fetch ``url`` and return its content as ``content_type`` which is one of
     binary, text or json.
+
+    When called from VersionAPI.fetch_cached(), send a conditional request for
+    the URL of the cached versions and raise a NotModified exception if these
+    are not modified.
     """
     assert content_type in ("binary", "text", "json")
 
+    state = getattr(_fetch_state, "state", None)
+    if state and state.etag and url == state.etag_url:
+        headers = dict(headers or {})
+        headers["If-None-Match"] = state.etag
+
     try:
-        resp = requests.get(url=url, headers=headers)
+        resp = get_http_client().get(url, headers=headers)
     except:
         logger.error(traceback.format_exc())
+        if state:
+            state.failed = True
         return
+    if state and resp.status_code == 304:
+        raise NotModified(url)
     if not resp.status_code == 200:
         logger.error(f"Error while fetching {url!r}: {resp.status_code!r}")
+        if state and (resp.status_code == 429 or resp.status_code >= 500):
+            state.failed = True
         return
 
+    if state and not state.response_url:
+        state.response_url = url
+        state.response_etag = resp.headers.get("ETag")
+
     if content_type == "binary":
         return resp.content
     elif content_type == "text":
@@ -109,6 +157,10 @@ class VersionAPI:
     # subclasses must define the purl package_type they catter to
     package_type = None
 
+    # True if the cached versions can be revalidated with a conditional
+    # request of the first URL fetched
+    conditional_fetch = True
+
     def get_until(self, package_name, until=None) -> VersionResponse:
         """
         Return a VersionResponse given a ``package_name`` cache key and an
@@ -133,6 +185,89 @@ class VersionAPI:
         """
         raise NotImplementedError
 
+    def get_cache_type(self):
+        """
+        Return the package type used as key of the cached versions of this API.
+        """
+        return self.package_type
+
+    def fetch_cached(self, pkg: str) -> List[PackageVersion]:
+        """
+        Return a list of PackageVersion versions given a ``pkg`` package name
+        using the PackageVersionsCache shared by all processes.
+
+        Versions are fetched again once expired after the time to live of
+        VERSIONS_CACHE_TTL_BY_TYPE. Expired versions returned with an ETag are
+        revalidated with a conditional request. Expired versions are returned
+        if fetching the versions fails.
+        """
+        from packagedb.models import PackageVersionsCache
+
+        cache_type = self.get_cache_type()
+        ttl = VERSIONS_CACHE_TTL_BY_TYPE.get(self.package_type, DEFAULT_VERSIONS_CACHE_TTL)
+        cached = PackageVersionsCache.objects.filter(
+            package_type=cache_type,
+            package_name=pkg,
+        ).first()
+        if cached and not cached.is_expired(ttl):
+            return get_versions_from_cache(cached)
+
+        state = FetchState()
+        if cached and cached.etag and self.conditional_fetch:
+            state.etag_url = cached.url
+            state.etag = cached.etag
+
+        _fetch_state.state = state
+        try:
+            versions = list(self.fetch(pkg) or [])
+        except NotModified:
+            PackageVersionsCache.objects.filter(pk=cached.pk).update(fetched_date=timezone.now())
+            return get_versions_from_cache(cached)
+        finally:
+            _fetch_state.state = None
+
+        if state.failed:
+            # do not cache incomplete versions
+            if cached:
+                return get_versions_from_cache(cached)
+            return versions
+
+        PackageVersionsCache.objects.update_or_create(
+            package_type=cache_type,
+            package_name=pkg,
+            defaults=dict(
+                versions=[version.to_dict() for version in versions],
+                url=state.response_url or "",
+                etag=state.response_etag or "",
+                fetched_date=timezone.now(),
+            ),
+        )
+        return versions
+
+
+# duration in seconds for which the versions of a package are cached by package type
+VERSIONS_CACHE_TTL_BY_TYPE = {
+    "deb": 24 * 60 * 60,
+    "maven": 6 * 60 * 60,
+    "npm": 60 * 60,
+    "pypi": 60 * 60,
+}
+
+# duration in seconds for which the versions of other package types are cached
+DEFAULT_VERSIONS_CACHE_TTL = 2 * 60 * 60
+
+
+def get_versions_from_cache(cached):
+    """
+    Return a list of PackageVersion from a ``cached`` PackageVersionsCache.
+    """
+    versions = []
+    for version in cached.versions:
+        release_date = version.get("release_date")
+        release_date = release_date and dateparser.parse(release_date) or None
+        versions.append(PackageVersion(value=version["value"], release_date=release_date))
+    return versions
+
 
 def remove_debian_default_epoch(version):
     """
@@ -147,6 +282,11 @@ class LaunchpadVersionAPI(VersionAPI):
     """
 
     package_type = "deb"
+    # versions are paginated: the first page can be unchanged when others are not
+    conditional_fetch = False
+
+    def get_cache_type(self):
+        return "deb/ubuntu"
 
     def fetch(self, pkg: str) -> Iterable[PackageVersion]:
         url = (
@@ -306,6 +446,9 @@ class DebianVersionAPI(VersionAPI):
 
     package_type = "deb"
 
+    def get_cache_type(self):
+        return "deb/debian"
+
     def fetch(self, pkg):
         # Need to set the headers, because the Debian API upgrades
         # the connection to HTTP 2.0
@@ -616,8 +759,14 @@ def get_api_package_name(purl: PackageURL) -> str:
 
 
 def get_version_fetcher(package_url):
+    """
+    Return the VersionAPI class of a ``package_url`` PackageURL or None if its
+    type is not supported.
+    """
     if package_url.type == "deb":
-        versions_fetcher: VersionAPI = VERSION_API_CLASS_BY_PACKAGE_NAMESPACE[package_url.namespace]
+        versions_fetcher: VersionAPI = VERSION_API_CLASS_BY_PACKAGE_NAMESPACE.get(
+            package_url.namespace
+        )
     else:
-        versions_fetcher: VersionAPI = VERSION_API_CLASSES_BY_PACKAGE_TYPE[package_url.type]
+        versions_fetcher: VersionAPI = VERSION_API_CLASSES_BY_PACKAGE_TYPE.get(package_url.type)
     return versions_fetcher
@@ -405,6 +405,22 @@ class IndexPackagesResponseSerializer(Serializer):
         child=CharField(),
         help_text="List of vers range that are not supported by the univers or package_manager."
     )
+
+
+class IndexPackagesJobSerializer(Serializer):
+    job_id = CharField(help_text="Id of the index packages job.")
+    status = CharField(help_text="Status of the job: queued, started, finished or failed.")
+    status_url = CharField(help_text="URL of the status of the job.")
+    progress = JSONField(
+        required=False,
+        help_text="Number of versionless package urls resolved out of the total to resolve."
+    )
+    result = IndexPackagesResponseSerializer(
+        required=False,
+        help_text="Result of the job, once finished."
+    )
+
+
 class PurlValidateResponseSerializer(Serializer):
     valid = BooleanField()
     exists = BooleanField(required=False)
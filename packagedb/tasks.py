@@ -42,13 +42,50 @@ def watch_new_packages(purl):
     watch.save(update_fields=["last_watch_date", "watch_error"])
 
 
+# timeout in seconds of an index packages job
+INDEX_PACKAGES_JOB_TIMEOUT = 60 * 60
+
+# duration in seconds for which the result of an index packages job is kept
+INDEX_PACKAGES_JOB_RESULT_TTL = 24 * 60 * 60
+
+
+@django_rq.job(
+    "default",
+    timeout=INDEX_PACKAGES_JOB_TIMEOUT,
+    result_ttl=INDEX_PACKAGES_JOB_RESULT_TTL,
+)
+def index_packages_job(packages, reindex=False, reindex_set=False):
+    """
+    Index `packages` like the index_packages API endpoint and return the same
+    response mapping. Report the progress of the resolution of versionless
+    PURLs in the "progress" meta of the job.
+    """
+    from rq import get_current_job
+
+    from packagedb.api import process_index_packages
+
+    job = get_current_job()
+
+    def report_progress(resolved, total):
+        if not job:
+            return
+        job.meta["progress"] = {"resolved": resolved, "total": total}
+        job.save_meta()
+
+    return process_index_packages(
+        packages=packages,
+        reindex=reindex,
+        reindex_set=reindex_set,
+        progress_callback=report_progress,
+    )
+
+
 def get_and_index_new_purls(package_url):
     """
     Get new versions of a package and insert the
     new PURLs in PriorityResourceURI for indexing.
     Return error message if any.
     """
-    from fetchcode.package_versions import versions
     from packageurl import PackageURL
 
     from minecode.models import PriorityResourceURI
@@ -63,7 +100,7 @@ def get_and_index_new_purls(package_url):
         name=purl.name,
     ).values_list("version", flat=True)
 
-    all_versions = versions(package_url) or []
+    all_versions = get_package_versions(purl)
 
     try:
         local_versions = [version_class(version) for version in local_versions]
@@ -85,6 +122,25 @@ def get_and_index_new_purls(package_url):
         PriorityResourceURI.objects.insert(new_purl)
 
 
+def get_package_versions(purl):
+    """
+    Return a list of the PackageVersion of the package of a `purl` PackageURL.
+    Use the versions cached in the PackageVersionsCache for the package types
+    with a VersionAPI and fetch the versions with fetchcode otherwise.
+    """
+    from fetchcode.package_versions import versions
+
+    from packagedb.package_managers import get_api_package_name
+    from packagedb.package_managers import get_version_fetcher
+
+    version_api = get_version_fetcher(purl)
+    package_name = version_api and get_api_package_name(purl)
+    if package_name:
+        return version_api().fetch_cached(package_name)
+
+    return versions(purl.to_string()) or []
+
+
 def is_supported_watch_ecosystem(watch):
     """
     Check if PackageWatch.type ecosystem is supported in
@@ -7,9 +7,12 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from collections import Counter
 from uuid import uuid4
 import json
 import os
+import threading
+import time
 
 from django.contrib.postgres.search import SearchVector
 from django.test import TestCase
@@ -21,6 +24,7 @@ from rest_framework.test import APIClient
 from minecode.models import PriorityResourceURI
 from minecode.models import ScannableURI
 from minecode.utils_test import JsonBasedTesting
+from packagedb.api import get_resolved_purls
 from packagedb.models import Package
 from packagedb.models import PackageContentType
 from packagedb.models import PackageSet
@@ -28,6 +32,7 @@ from packagedb.models import Resource
 
 from unittest import mock
 from univers.versions import MavenVersion
+from univers.versions import SemverVersion
 
 class ResourceAPITestCase(JsonBasedTesting, TestCase):
     test_data_dir = os.path.join(os.path.dirname(__file__), 'testfiles')
@@ -443,6 +448,11 @@ class PackageApiTestCase(JsonBasedTesting, TestCase):
         for result, i in zip(response.data['results'], range(0, 10)):
             self.assertEqual(result.get('path'), 'path{}/'.format(i))
 
+    def test_api_package_history_action(self):
+        response = self.client.get(reverse('api:package-history', args=[self.package.uuid]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(['test-message'], [entry['message'] for entry in response.data])
+
     def test_api_package_list_endpoint_multiple_char_filters(self):
         filters = f'?md5={self.package.md5}&md5={self.package2.md5}'
         response = self.client.get(f'/api/packages/{filters}')
@@ -482,6 +492,31 @@ class PackageApiTestCase(JsonBasedTesting, TestCase):
         expected = self.get_test_loc('api/package-filter_by_checksums-enhanced-package-data-expected.json')
         self.check_expected_results(enhanced_response.data['results'], expected, fields_to_remove=["url", "uuid", "resources", "package_sets",], regen=False)
 
+    def test_package_api_filter_by_checksums_returns_earliest_release(self):
+        later = Package.objects.create(
+            type='generic',
+            name='later',
+            version='1.0',
+            download_url='http://example.com/later-1.0.zip',
+            sha1='testsha1',
+            release_date='2030-01-01',
+        )
+        earlier = Package.objects.create(
+            type='generic',
+            name='earlier',
+            version='1.0',
+            download_url='http://example.com/earlier-1.0.zip',
+            sha1='testsha1',
+            release_date='2000-01-01',
+        )
+        data = {'sha1': ['testsha1', 'testsha1-6'], 'enhance_package_data': True}
+        # the query count does not depend on the number of packages
+        with self.assertNumQueries(10):
+            response = self.client.post('/api/packages/filter_by_checksums/', data=data)
+        purls = [result['purl'] for result in response.data['results']]
+        self.assertEqual([self.package6.purl, earlier.purl], purls)
+        self.assertNotIn(later.purl, purls)
+
 
 class PackageApiReindexingTestCase(JsonBasedTesting, TestCase):
     test_data_dir = os.path.join(os.path.dirname(__file__), 'testfiles')
@@ -981,6 +1016,75 @@ class CollectApiTestCase(JsonBasedTesting, TestCase):
         priority_resource_uris_count = PriorityResourceURI.objects.all().count()
         self.assertEqual(13, priority_resource_uris_count)
     
+    @mock.patch("packagedb.api.get_all_versions")
+    def test_get_resolved_purls_resolves_versionless_purls_concurrently(self, mock_get_all_versions):
+        lock = threading.Lock()
+        running = Counter()
+        max_running = Counter()
+
+        def get_all_versions(purl):
+            with lock:
+                running[purl.type] += 1
+                max_running[purl.type] = max(max_running[purl.type], running[purl.type])
+            time.sleep(0.1)
+            with lock:
+                running[purl.type] -= 1
+            version_class = MavenVersion if purl.type == "maven" else SemverVersion
+            return [version_class("1.0.0"), version_class("2.0.0")]
+
+        mock_get_all_versions.side_effect = get_all_versions
+        packages = [{"purl": f"pkg:maven/org.example/name{i}"} for i in range(8)]
+        packages += [{"purl": f"pkg:npm/name{i}"} for i in range(12)]
+        packages += [{"purl": "pkg:npm/name0", "vers": "vers:npm/>=2.0.0"}]
+        progress = []
+
+        resolved, unsupported_purls, unsupported_vers = get_resolved_purls(
+            packages,
+            supported_ecosystems=["maven", "npm"],
+            progress_callback=lambda resolved, total: progress.append((resolved, total)),
+        )
+
+        self.assertEqual(40, len(resolved))
+        self.assertIn("pkg:maven/org.example/name7@2.0.0", resolved)
+        self.assertEqual([], unsupported_purls)
+        self.assertEqual([], unsupported_vers)
+        self.assertEqual(4, max_running["maven"])
+        self.assertEqual(8, max_running["npm"])
+        self.assertEqual([(i, 21) for i in range(1, 22)], progress)
+
+    @mock.patch("packagedb.api.index_packages_job")
+    @mock.patch("packagedb.api.is_redis_running")
+    def test_package_api_index_packages_async_endpoint(self, mock_is_redis_running, mock_index_packages_job):
+        mock_is_redis_running.return_value = True
+        job = mock.Mock(id="job-1", meta={}, is_finished=False)
+        job.get_status.return_value = "queued"
+        mock_index_packages_job.delay.return_value = job
+
+        data = {"packages": [{"purl": "pkg:npm/less"}], "reindex": False}
+        response = self.client.post(
+            "/api/collect/index_packages_async/", data=data, content_type="application/json"
+        )
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+        self.assertEqual("job-1", response.data["job_id"])
+        self.assertEqual("queued", response.data["status"])
+        self.assertTrue(
+            response.data["status_url"].endswith("/api/collect/index_packages_status/?job_id=job-1")
+        )
+        mock_index_packages_job.delay.assert_called_once_with(
+            packages=[{"purl": "pkg:npm/less"}],
+            reindex=False,
+            reindex_set=False,
+        )
+
+        mock_is_redis_running.return_value = False
+        response = self.client.post(
+            "/api/collect/index_packages_async/", data=data, content_type="application/json"
+        )
+        self.assertEqual(status.HTTP_503_SERVICE_UNAVAILABLE, response.status_code)
+
+        response = self.client.get("/api/collect/index_packages_status/")
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
     def test_reindex_packages_bulk(self):
         self.assertEqual(False, self.scannableuri.rescan_uri)
         self.assertEqual(0, self.scannableuri.priority)
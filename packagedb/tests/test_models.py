@@ -15,6 +15,7 @@ from django.utils import timezone
 
 from packagedb.models import DependentPackage, PackageWatch
 from packagedb.models import Package
+from packagedb.models import PackageHistory
 from packagedb.models import Party
 from packagedb.models import Resource
 
@@ -89,6 +90,30 @@ class PackageModelHistoryFieldTestCase(TransactionTestCase):
             self.assertIn(expected_date, entry.get('timestamp'))
             self.assertEqual(expected_message, entry.get('message'))
 
+    def test_history_entries_are_inserted_on_save(self):
+        self.test_package.append_to_history(self.message0)
+        self.assertEqual(0, PackageHistory.objects.count())
+        self.test_package.save()
+        self.test_package.append_to_history(self.message1, save=True)
+
+        entries = PackageHistory.objects.filter(package=self.test_package)
+        self.assertEqual([self.message0, self.message1], [e.message for e in entries])
+        self.assertEqual(
+            [self.message0, self.message1],
+            [e['message'] for e in Package.objects.get().get_history()],
+        )
+
+    def test_history_entries_are_inserted_with_bulk_writes(self):
+        package = Package(download_url='https://test2.com')
+        package.append_to_history(self.message0)
+        Package.objects.bulk_create([package])
+        self.test_package.append_to_history(self.message1)
+        Package.objects.bulk_update([package, self.test_package], fields=['last_modified_date'])
+
+        self.assertEqual([self.message0], [e['message'] for e in package.get_history()])
+        self.assertEqual([self.message1], [e['message'] for e in self.test_package.get_history()])
+        self.assertEqual(2, PackageHistory.objects.count())
+
 
 class PackageModelTestCase(TransactionTestCase):
     def setUp(self):
@@ -150,17 +175,17 @@ class PackageModelTestCase(TransactionTestCase):
 
     def test_packagedb_package_model_update_fields(self):
         p1 = Package.objects.create(download_url='http://a.a', name='name', version='1.0')
-        self.assertFalse(p1.history)
+        self.assertFalse(p1.get_history())
         self.assertEquals('', p1.namespace)
         self.assertEquals(None, p1.homepage_url)
         package, updated_fields = p1.update_fields(namespace='test', homepage_url='https://example.com')
         self.assertEqual(
             sorted(updated_fields),
-            sorted(['homepage_url', 'history', 'namespace'])
+            sorted(['homepage_url', 'namespace'])
         )
         self.assertEqual('test', p1.namespace)
         self.assertEqual('https://example.com', p1.homepage_url)
-        self.assertEqual(1, len(p1.history))
+        self.assertEqual(1, len(p1.get_history()))
         expected_history_entry = {
             'message': 'Package field values have been updated.',
             'data': {
@@ -179,7 +204,7 @@ class PackageModelTestCase(TransactionTestCase):
                 ]
             }
         }
-        history_entry = p1.history[0]
+        history_entry = p1.get_history()[0]
         history_entry.pop('timestamp')
         self.assertEqual(expected_history_entry, history_entry)
 
@@ -204,7 +229,7 @@ class PackageModelTestCase(TransactionTestCase):
             self.assertEqual(timestamp, value)
         self.assertEqual(
             sorted(updated_fields),
-            sorted(date_fields + ['history'])
+            sorted(date_fields)
         )
 
         # Test qualifiers
@@ -216,7 +241,7 @@ class PackageModelTestCase(TransactionTestCase):
         string_qualifiers1='classifier=sources&type=war'
         package, updated_fields = p1.update_fields(qualifiers=dict_qualifiers1)
         self.assertEqual(
-            sorted(['qualifiers', 'history']),
+            sorted(['qualifiers']),
             sorted(updated_fields),
         )
         self.assertEqual(
@@ -226,7 +251,7 @@ class PackageModelTestCase(TransactionTestCase):
         string_qualifiers2='classifier=somethingelse'
         package, updated_fields = p1.update_fields(qualifiers=string_qualifiers2)
         self.assertEqual(
-            sorted(['qualifiers', 'history']),
+            sorted(['qualifiers']),
             sorted(updated_fields),
         )
         self.assertEqual(
@@ -281,7 +306,7 @@ class PackageModelTestCase(TransactionTestCase):
         ]
         # remove timestamp before comparison
         history = []
-        for entry in p1.history:
+        for entry in p1.get_history():
             entry.pop('timestamp')
             history.append(entry)
         self.assertEquals(expected_history, history)
@@ -292,12 +317,12 @@ class PackageModelTestCase(TransactionTestCase):
         resources = [Resource(package=p1, path=path)]
         _, updated_fields = p1.update_fields(resources=resources)
         self.assertEquals(
-            sorted(['resources', 'history']),
+            sorted(['resources']),
             sorted(updated_fields)
         )
         expected_message = "Replaced 0 existing entries of field 'resources' with 1 new entries."
-        self.assertEqual(1, len(p1.history))
-        history_message = p1.history[0]['message']
+        self.assertEqual(1, len(p1.get_history()))
+        history_message = p1.get_history()[0]['message']
         self.assertEqual(expected_message, history_message)
 
         p2 = Package.objects.create(download_url='http://b.b', name='example', version='1.0')
@@ -342,12 +367,12 @@ class PackageModelTestCase(TransactionTestCase):
         ]
         _, updated_fields = p2.update_fields(resources=resources)
         self.assertEquals(
-            sorted(['resources', 'history']),
+            sorted(['resources']),
             sorted(updated_fields)
         )
         expected_message = "Replaced 0 existing entries of field 'resources' with 1 new entries."
-        self.assertEqual(1, len(p2.history))
-        history_message = p2.history[0]['message']
+        self.assertEqual(1, len(p2.get_history()))
+        history_message = p2.get_history()[0]['message']
         self.assertEqual(expected_message, history_message)
 
         p3 = Package.objects.create(download_url='http://foo', name='foo', version='1.0')
@@ -362,12 +387,12 @@ class PackageModelTestCase(TransactionTestCase):
         ]
         _, updated_fields = p3.update_fields(parties=parties)
         self.assertEquals(
-            sorted(['parties', 'history']),
+            sorted(['parties']),
             sorted(updated_fields)
         )
         expected_message = "Replaced 0 existing entries of field 'parties' with 1 new entries."
-        self.assertEqual(1, len(p3.history))
-        history_message = p3.history[0]['message']
+        self.assertEqual(1, len(p3.get_history()))
+        history_message = p3.get_history()[0]['message']
         self.assertEqual(expected_message, history_message)
 
         p4 = Package.objects.create(download_url='http://bar', name='bar', version='1.0')
@@ -383,12 +408,12 @@ class PackageModelTestCase(TransactionTestCase):
         ]
         _, updated_fields = p4.update_fields(parties=parties)
         self.assertEquals(
-            sorted(['parties', 'history']),
+            sorted(['parties']),
             sorted(updated_fields)
         )
         expected_message = "Replaced 0 existing entries of field 'parties' with 1 new entries."
-        self.assertEqual(1, len(p4.history))
-        history_message = p4.history[0]['message']
+        self.assertEqual(1, len(p4.get_history()))
+        history_message = p4.get_history()[0]['message']
         self.assertEqual(expected_message, history_message)
 
         p5 = Package.objects.create(download_url='http://baz', name='baz', version='1.0')
@@ -404,12 +429,12 @@ class PackageModelTestCase(TransactionTestCase):
         ]
         _, updated_fields = p5.update_fields(dependencies=dependencies)
         self.assertEquals(
-            sorted(['dependencies', 'history']),
+            sorted(['dependencies']),
             sorted(updated_fields)
         )
         expected_message = "Replaced 0 existing entries of field 'dependencies' with 1 new entries."
-        self.assertEqual(1, len(p5.history))
-        history_message = p5.history[0]['message']
+        self.assertEqual(1, len(p5.get_history()))
+        history_message = p5.get_history()[0]['message']
         self.assertEqual(expected_message, history_message)
 
         p6 = Package.objects.create(download_url='http://qux', name='qux', version='1.0')
@@ -426,12 +451,12 @@ class PackageModelTestCase(TransactionTestCase):
         ]
         _, updated_fields = p6.update_fields(dependencies=dependencies)
         self.assertEquals(
-            sorted(['dependencies', 'history']),
+            sorted(['dependencies']),
             sorted(updated_fields)
         )
         expected_message = "Replaced 0 existing entries of field 'dependencies' with 1 new entries."
-        self.assertEqual(1, len(p6.history))
-        history_message = p6.history[0]['message']
+        self.assertEqual(1, len(p6.get_history()))
+        history_message = p6.get_history()[0]['message']
         self.assertEqual(expected_message, history_message)
 
     def test_packagedb_package_model_update_fields_exceptions(self):
@@ -9,10 +9,15 @@
 
 import json
 import os
+import threading
 from datetime import datetime
+from datetime import timedelta
 from functools import partial
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 from unittest import mock
 from django.test import TestCase
+from django.utils import timezone
 
 import pytest
 from dateutil.tz import tzlocal
@@ -26,7 +31,10 @@ from packagedb.package_managers import NugetVersionAPI
 from packagedb.package_managers import PackageVersion
 from packagedb.package_managers import PypiVersionAPI
 from packagedb.package_managers import RubyVersionAPI
+from packagedb.models import PackageVersionsCache
+from packagedb.package_managers import VersionAPI
 from packagedb.package_managers import VersionResponse
+from packagedb.package_managers import get_response
 from packagedb.package_managers import get_version_fetcher
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -353,3 +361,81 @@ class TestNugetVersionAPI(TestCase):
             mock_response.return_value = json.load(f)
         results = list(NugetVersionAPI().fetch("Exfat.Ntfs"))
         assert results == self.expected_versions
+
+
+class VersionsHandler(BaseHTTPRequestHandler):
+    """
+    Serve a JSON list of `versions` with an ETag and support conditional
+    requests.
+    """
+
+    versions = ["1.0.0", "1.1.0"]
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("If-None-Match"))
+        content = json.dumps({"versions": self.server.versions}).encode("utf-8")
+        etag = f'"{len(self.server.versions)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalVersionAPI(VersionAPI):
+    package_type = "local"
+    base_url = None
+
+    def fetch(self, pkg):
+        response = get_response(url=f"{self.base_url}/{pkg}", content_type="json")
+        for version in (response or {}).get("versions", []):
+            yield PackageVersion(value=version)
+
+
+class TestVersionAPIFetchCached(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), VersionsHandler)
+        self.server.requests = []
+        self.server.versions = ["1.0.0", "1.1.0"]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.version_api = LocalVersionAPI()
+        self.version_api.base_url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def expire(self):
+        PackageVersionsCache.objects.update(fetched_date=timezone.now() - timedelta(days=1))
+
+    def test_fetch_cached_caches_versions(self):
+        expected = [PackageVersion(value="1.0.0"), PackageVersion(value="1.1.0")]
+        assert self.version_api.fetch_cached("foo") == expected
+        assert self.version_api.fetch_cached("foo") == expected
+        assert self.server.requests == [None]
+
+        cached = PackageVersionsCache.objects.get(package_type="local", package_name="foo")
+        assert cached.etag == '"2"'
+        assert cached.url == f"{self.version_api.base_url}/foo"
+
+    def test_fetch_cached_revalidates_expired_versions(self):
+        self.version_api.fetch_cached("foo")
+        self.expire()
+        expected = [PackageVersion(value="1.0.0"), PackageVersion(value="1.1.0")]
+        assert self.version_api.fetch_cached("foo") == expected
+        assert self.server.requests == [None, '"2"']
+        cached = PackageVersionsCache.objects.get(package_type="local", package_name="foo")
+        assert not cached.is_expired(ttl=60)
+
+        self.server.versions = ["1.0.0", "1.1.0", "2.0.0"]
+        self.expire()
+        versions = self.version_api.fetch_cached("foo")
+        assert [version.value for version in versions] == ["1.0.0", "1.1.0", "2.0.0"]
+        assert self.server.requests == [None, '"2"', '"2"']
+        cached.refresh_from_db()
+        assert cached.etag == '"3"'
@@ -10,11 +10,14 @@
 from unittest.mock import patch
 
 from django.test import TestCase
-from fetchcode.package_versions import PackageVersion
+from univers.versions import MavenVersion
 
 from minecode.models import PriorityResourceURI
 from packagedb.models import Package
+from packagedb.models import PackageVersionsCache
 from packagedb.models import PackageWatch
+from packagedb.package_managers import PackageVersion
+from packagedb.tasks import index_packages_job
 from packagedb.tasks import is_supported_watch_ecosystem
 from packagedb.tasks import watch_new_packages
 
@@ -53,12 +56,12 @@ class PackageWatchTasksTestCase(TestCase):
         self.package1 = Package.objects.create(**self.package_data1)
 
     @patch("packagedb.tasks.is_supported_watch_ecosystem")
-    @patch("fetchcode.package_versions.versions")
+    @patch("packagedb.package_managers.MavenVersionAPI.fetch")
     def test_watch_new_packages_without_local_package(
-        self, mock_versions, mock_is_supported_watch_ecosystem
+        self, mock_fetch, mock_is_supported_watch_ecosystem
     ):
         mock_is_supported_watch_ecosystem.return_value = True
-        mock_versions.return_value = [
+        mock_fetch.return_value = [
             PackageVersion(value="v1.0.1"),
             PackageVersion(value="v1.2.1"),
             PackageVersion(value="v3.0.1"),
@@ -68,13 +71,21 @@ class PackageWatchTasksTestCase(TestCase):
         priority_resource_uris_count = PriorityResourceURI.objects.all().count()
         self.assertEqual(3, priority_resource_uris_count)
 
+        # the versions are cached
+        watch_new_packages(self.package_watch1.package_url)
+        self.assertEqual(1, mock_fetch.call_count)
+        cached = PackageVersionsCache.objects.get(
+            package_type="maven", package_name="org.test:test-package"
+        )
+        self.assertEqual(3, len(cached.versions))
+
     @patch("packagedb.tasks.is_supported_watch_ecosystem")
-    @patch("fetchcode.package_versions.versions")
+    @patch("packagedb.package_managers.MavenVersionAPI.fetch")
     def test_watch_new_packages_with_local_package(
-        self, mock_versions, mock_is_supported_watch_ecosystem
+        self, mock_fetch, mock_is_supported_watch_ecosystem
     ):
         mock_is_supported_watch_ecosystem.return_value = True
-        mock_versions.return_value = [
+        mock_fetch.return_value = [
             PackageVersion(value="v1.0.1"),
             PackageVersion(value="v1.2.1"),
             PackageVersion(value="v3.0.1"),
@@ -97,3 +108,28 @@ class PackageWatchTasksTestCase(TestCase):
             "`unknown` ecosystem is not supported by fetchcode",
             self.package_watch3.watch_error,
         )
+
+
+class IndexPackagesJobTestCase(TestCase):
+    @patch("packagedb.api.get_all_versions")
+    def test_index_packages_job(self, mock_get_all_versions):
+        mock_get_all_versions.return_value = [
+            MavenVersion("1.2.18"),
+            MavenVersion("1.2.19"),
+            MavenVersion("1.2.20"),
+        ]
+        packages = [
+            {"purl": "pkg:maven/ch.qos.reload4j/reload4j", "vers": "vers:maven/>=1.2.19"},
+            {"purl": "pkg:npm/less@1.0.32", "vers": None},
+        ]
+
+        result = index_packages_job(packages=packages)
+
+        expected = [
+            "pkg:maven/ch.qos.reload4j/reload4j@1.2.19",
+            "pkg:maven/ch.qos.reload4j/reload4j@1.2.20",
+            "pkg:npm/less@1.0.32",
+        ]
+        self.assertEqual(3, result["queued_packages_count"])
+        self.assertEqual(expected, sorted(result["queued_packages"]))
+        self.assertEqual(3, PriorityResourceURI.objects.count())
@@ -54,6 +54,30 @@ SCANCODEIO_API_KEY = env.str("SCANCODEIO_API_KEY", "")
 
 PURLDB_LOG_LEVEL = env.str("PURLDB_LOG_LEVEL", "INFO")
 
+# MatchCode
+
+# Directory where the memory-mapped matchcode indexes and filters are stored
+MATCHCODE_DIRECTORY_INDEX_DIR = env.str("MATCHCODE_DIRECTORY_INDEX_DIR", "")
+
+# ClearCode
+
+# Codec used to compress the content of new and updated CDitems: gzip or zstd.
+# zstd requires the zstandard package.
+CLEARCODE_CONTENT_CODEC = env.str("CLEARCODE_CONTENT_CODEC", "gzip")
+
+# Maximum number of concurrent connections to a host of the shared HTTP client
+# used by the fetchers, and per-host overrides such as
+# "repo1.maven.org=4;api.github.com=2".
+PURLDB_HTTP_MAX_CONNECTIONS_PER_HOST = env.int(
+    "PURLDB_HTTP_MAX_CONNECTIONS_PER_HOST", default=10
+)
+PURLDB_HTTP_HOST_LIMITS = env.dict(
+    "PURLDB_HTTP_HOST_LIMITS", cast={"value": int}, default={}
+)
+# Number of seconds a request waits for a free connection to a host before
+# failing when all the connections to this host are in use.
+PURLDB_HTTP_POOL_TIMEOUT = env.int("PURLDB_HTTP_POOL_TIMEOUT", default=60)
+
 # Application definition
 
 INSTALLED_APPS = (